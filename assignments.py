@@ -0,0 +1,168 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from rent_targets import COMPANY_NAME
+
+
+ASSIGNMENT_COLUMNS = ["Vehicle No", "Driver", "Start", "End", "Days", "Amount"]
+
+
+# Day ordinal of 1970-01-01, to turn datetime64 days into date ordinals
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def _ordinal(day):
+    return pd.Timestamp(day).toordinal()
+
+
+def _ordinals(days):
+    return np.asarray(pd.to_datetime(pd.Series(days))).astype("datetime64[D]").astype(np.int64) + EPOCH_ORDINAL
+
+
+# ---------- Assignment intervals ----------
+# Who held which vehicle when, as (vehicle, driver, start, end) intervals: the
+# collection history sorted by vehicle and date, run-length encoded on the
+# driver. A run is every consecutive entry of the vehicle with the same
+# driver, so days without entries inside a run stay with that driver.
+# COMPANY_NAME entries (zero-collection days) are not an assignment: they are
+# left out, so such a day inside a driver's run stays with that driver.
+# Intervals are kept twice, sorted by (vehicle, start) and by (driver, start),
+# with one composite int64 key each, so point and range queries are binary
+# searches:
+#   vehicle_key   vehicle code * KEY_SPAN + start day ordinal
+#   driver_order  interval ids sorted by (driver, start); driver_key alike
+class AssignmentIndex:
+    KEY_SPAN = 1 << 32
+
+    def __init__(self):
+        self.vehicles = np.array([], dtype=object)
+        self.drivers = np.array([], dtype=object)
+        self.vehicle = np.array([], dtype=np.int64)
+        self.driver = np.array([], dtype=np.int64)
+        self.start = np.array([], dtype=np.int64)
+        self.end = np.array([], dtype=np.int64)
+        self.days = np.array([], dtype=np.int64)
+        self.amount = np.array([], dtype=np.float64)
+        self.vehicle_key = np.array([], dtype=np.int64)
+        self.driver_order = np.array([], dtype=np.int64)
+        self.driver_key = np.array([], dtype=np.int64)
+
+    @classmethod
+    def build(cls, df):
+        index = cls()
+        frame = pd.DataFrame({
+            "vehicle": df["Vehicle No"].astype(str).str.strip(),
+            "driver": df["Name"].astype(str).str.strip().where(df["Name"].notna()),
+            "day": pd.to_datetime(df["Collection Date"], errors="coerce"),
+            "amount": pd.to_numeric(df["Amount"], errors="coerce").fillna(0),
+        }).dropna(subset=["day", "driver"])
+        frame = frame[frame["driver"] != COMPANY_NAME]
+        if frame.empty:
+            return index
+
+        vehicle, index.vehicles = pd.factorize(frame["vehicle"], sort=True)
+        driver, index.drivers = pd.factorize(frame["driver"], sort=True)
+        day = _ordinals(frame["day"])
+        order = np.lexsort((driver, day, vehicle))
+        vehicle, driver, day = vehicle[order], driver[order], day[order]
+        amount = frame["amount"].to_numpy(dtype=np.float64)[order]
+
+        # Run boundaries: a new vehicle, or a different driver than the entry before
+        starts = np.flatnonzero(np.r_[True, (vehicle[1:] != vehicle[:-1]) | (driver[1:] != driver[:-1])])
+        ends = np.r_[starts[1:], len(day)] - 1
+        index.vehicle = vehicle[starts].astype(np.int64)
+        index.driver = driver[starts].astype(np.int64)
+        index.start, index.end = day[starts], day[ends]
+        index.amount = np.add.reduceat(amount, starts)
+        # Distinct entry days per run
+        new_day = np.r_[True, (day[1:] != day[:-1]) | (vehicle[1:] != vehicle[:-1])]
+        index.days = np.add.reduceat(new_day.astype(np.int64), starts)
+
+        index.vehicle_key = index.vehicle * cls.KEY_SPAN + index.start
+        index.driver_order = np.lexsort((index.start, index.driver))
+        index.driver_key = index.driver[index.driver_order] * cls.KEY_SPAN + index.start[index.driver_order]
+        return index
+
+    def __len__(self):
+        return len(self.start)
+
+    def _code(self, labels, label):
+        i = np.searchsorted(labels, label)
+        return int(i) if i < len(labels) and labels[i] == label else None
+
+    # ---------- Point queries ----------
+    # Interval ids holding each (vehicle, day): the latest run of the vehicle
+    # starting on or before the day, or -1. With covering_only, a run that
+    # ended before the day does not count (the vehicle sat idle since).
+    def lookup(self, vehicles, days, covering_only=True):
+        vehicles = np.asarray(vehicles, dtype=object)
+        codes = np.searchsorted(self.vehicles, vehicles)
+        codes = np.minimum(codes, max(len(self.vehicles) - 1, 0))
+        known = (self.vehicles[codes] == vehicles) if len(self.vehicles) else np.zeros(len(vehicles), dtype=bool)
+        ordinals = _ordinals(days)
+        ids = np.searchsorted(self.vehicle_key, codes * self.KEY_SPAN + ordinals, side="right") - 1
+        found = known & (ids >= 0)
+        found &= self.vehicle[np.maximum(ids, 0)] == codes
+        if covering_only:
+            found &= self.end[np.maximum(ids, 0)] >= ordinals
+        return np.where(found, ids, -1)
+
+    # Driver of `vehicle` on `day` (None when nobody held it), O(log n)
+    def holder(self, vehicle, day, covering_only=True):
+        i = self.lookup([vehicle], [day], covering_only)[0]
+        return None if i < 0 else self.drivers[self.driver[i]]
+
+    # ---------- Range queries ----------
+    # Intervals of `driver` overlapping [start, end] (all of them when unbounded)
+    def driver_intervals(self, driver, start=None, end=None):
+        code = self._code(self.drivers, driver)
+        if code is None:
+            return self.frame(np.array([], dtype=np.int64))
+        lo = np.searchsorted(self.driver_key, code * self.KEY_SPAN)
+        hi_day = _ordinal(end) if end is not None else self.KEY_SPAN - 1
+        hi = np.searchsorted(self.driver_key, code * self.KEY_SPAN + hi_day, side="right")
+        ids = self.driver_order[lo:hi]
+        if start is not None:
+            ids = ids[self.end[ids] >= _ordinal(start)]
+        return self.frame(ids)
+
+    # Intervals of every vehicle (or the given ones) overlapping [start, end]
+    def intervals(self, start=None, end=None, vehicles=None):
+        mask = np.ones(len(self), dtype=bool)
+        if start is not None:
+            mask &= self.end >= _ordinal(start)
+        if end is not None:
+            mask &= self.start <= _ordinal(end)
+        if vehicles is not None:
+            mask &= np.isin(self.vehicles[self.vehicle], list(vehicles))
+        return self.frame(np.flatnonzero(mask))
+
+    # Days a driver held more than one vehicle: runs of the same driver that
+    # overlap in time, found from the driver-sorted intervals
+    def overlapping_runs(self):
+        order = self.driver_order
+        if len(order) < 2:
+            return self.frame(np.array([], dtype=np.int64))
+        same = self.driver[order][1:] == self.driver[order][:-1]
+        # Latest end so far within each driver (codes only grow along the order)
+        running_end = np.maximum.accumulate(self.driver[order] * self.KEY_SPAN + self.end[order])
+        overlap = same & (self.driver[order][1:] * self.KEY_SPAN + self.start[order][1:] <= running_end[:-1])
+        return self.frame(order[1:][overlap])
+
+    def frame(self, ids):
+        ids = np.asarray(ids, dtype=np.int64)
+        return pd.DataFrame({
+            "Vehicle No": self.vehicles[self.vehicle[ids]] if len(ids) else [],
+            "Driver": self.drivers[self.driver[ids]] if len(ids) else [],
+            "Start": [date.fromordinal(int(x)) for x in self.start[ids]],
+            "End": [date.fromordinal(int(x)) for x in self.end[ids]],
+            "Days": self.days[ids],
+            "Amount": self.amount[ids],
+        }, columns=ASSIGNMENT_COLUMNS)
+
+
+# Drivers with at least one assignment, for pickers
+def drivers(index):
+    return list(index.drivers)
@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+
+from kpi import contributions
+
+
+PARTNERS = ("Govind Kumar", "Kumar Gaurav")
+BANK_CREDITS = ("Collection_Credit", "Investment_Credit", "Payment_Credit", "Settlement_Credit")
+BANK_DEBITS = ("Expence_Debit", "Settlement_Debit", "Investment_Debit")
+
+
+# ---------- Dashboard figures ----------
+# The Dashboard's headline numbers as sums of (metric, person) totals.
+# `total(metric, person=None)` may return scalars (one day) or aligned arrays
+# (a whole time series); the formulas are the same either way.
+def dashboard_figures(total, partners=PARTNERS):
+    cash = {
+        p: (total("collection", p) - total("expense", p) - total("Collection_Credit", p)
+            + total("Settlement_Debit", p) - total("Settlement_Credit", p) + total("investment", p))
+        for p in partners
+    }
+    bank = sum(total(t) for t in BANK_CREDITS) - sum(total(t) for t in BANK_DEBITS)
+    return {
+        "total_collection": sum(total("collection", p) for p in partners),
+        "total_expense": sum(total("expense", p) + total("Expence_Debit", p) for p in partners),
+        "total_investment": sum(total("investment", p) for p in partners)
+                            + total("Investment_Credit") - total("Investment_Debit"),
+        "cash": cash,
+        "bank": bank,
+        "net": sum(cash.values()) + bank,
+    }
+
+
+# ---------- Ledger ----------
+# Daily cumulative totals per (metric, person) over all four sheets: one row
+# per date that has entries, one column per (metric, person). A total as of
+# any day is the cumsum row found by binary search on the dates. Rows without
+# a date cannot be placed in time and are left out.
+class BalanceLedger:
+    def __init__(self, dates, columns, cum):
+        self.dates = dates
+        self.columns = columns
+        self.cum = cum
+        self._positions = {}
+        for i, (metric, person) in enumerate(columns):
+            self._positions.setdefault((metric, None), []).append(i)
+            self._positions.setdefault((metric, person), []).append(i)
+
+    @classmethod
+    def build(cls, frames):
+        events = pd.concat(
+            [contributions(name, df)[["date", "metric", "person", "value"]] for name, df in frames.items()],
+            ignore_index=True,
+        ).dropna(subset=["date"])
+        if events.empty:
+            return cls(np.array([], dtype="datetime64[ns]"), [], np.zeros((0, 0)))
+
+        events["date"] = pd.to_datetime(events["date"]).dt.normalize()
+        daily = events.pivot_table(index="date", columns=["metric", "person"], values="value",
+                                   aggfunc="sum", fill_value=0).sort_index()
+        return cls(daily.index.to_numpy(dtype="datetime64[ns]"), list(daily.columns),
+                   daily.to_numpy(dtype="float64").cumsum(axis=0))
+
+    def _row(self, as_of):
+        if as_of is None:
+            return len(self.dates) - 1
+        return int(np.searchsorted(self.dates, np.datetime64(pd.Timestamp(as_of), "ns"), side="right")) - 1
+
+    # Total of `metric` (for one person, or everyone) up to and including `as_of` (default: all time)
+    def total(self, metric, person=None, as_of=None):
+        cols = self._positions.get((metric, person))
+        row = self._row(as_of)
+        if not cols or row < 0:
+            return 0.0
+        return float(self.cum[row, cols].sum())
+
+    # Total of `metric` over the dates in [start, end]
+    def between(self, metric, person, start, end):
+        return self.total(metric, person, end) - self.total(metric, person, pd.Timestamp(start) - pd.Timedelta(days=1))
+
+    # Cumulative total of `metric` at every ledger date, aligned with `self.dates`
+    def column_series(self, metric, person=None):
+        cols = self._positions.get((metric, person))
+        if not cols:
+            return np.zeros(len(self.dates))
+        return self.cum[:, cols].sum(axis=1)
+
+    def figures(self, as_of=None):
+        return dashboard_figures(lambda metric, person=None: self.total(metric, person, as_of))
+
+    # Daily balances (each partner's cash in hand, bank, net) in [start, end],
+    # long format for st.line_chart: Date, Balance, Value
+    def balance_series(self, start=None, end=None):
+        if len(self.dates) == 0:
+            return pd.DataFrame(columns=["Date", "Balance", "Value"])
+        figs = dashboard_figures(self.column_series)
+        wide = pd.DataFrame(
+            {**{f"{p} Cash": v for p, v in figs["cash"].items()}, "Bank": figs["bank"], "Net": figs["net"]},
+            index=pd.DatetimeIndex(self.dates),
+        )
+        start = pd.Timestamp(start) if start is not None else wide.index[0]
+        end = pd.Timestamp(end) if end is not None else wide.index[-1]
+        days = pd.date_range(min(start, wide.index[0]), end, freq="D")
+        wide = wide.reindex(days, method="ffill").fillna(0).loc[start:end]
+        wide.index.name = "Date"
+        return wide.reset_index().melt(id_vars="Date", var_name="Balance", value_name="Value")
+
@@ -0,0 +1,166 @@
+# Ingestion benchmark: the old pandas loaders against the Arrow ingestion
+# path, on generated sheets at several multiples of today's row counts.
+#
+#   python bench_ingest.py --scales 1 10 100
+#
+# Each scale multiplies the vehicles (and so the collection rows, which
+# dominate); expense and bank rows scale with it. For every sheet it times
+# the old path (pd.read_csv with inferred types, then per-column coercion)
+# and the new one (multi-threaded Arrow CSV reader with explicit types, then
+# the same post-processing), checks both give the same frame, and for the
+# partitioned sheets also times a warm load that only re-fetches recent months.
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import ingest  # noqa: E402
+import partitions  # noqa: E402
+import load_test  # noqa: E402
+
+FILES = {
+    "collection": "collection.csv",
+    "expense": "expense.csv",
+    "investment": "Investment_Details.csv",
+    "bank": "Bank_Transaction.csv",
+}
+
+
+# ---------- Old loaders (before Arrow ingestion) ----------
+def legacy_collection(path):
+    df = pd.read_csv(path, dayfirst=True, dtype={"Vehicle No": str})
+    df['Collection Date'] = pd.to_datetime(df['Collection Date'], dayfirst=True, errors='coerce').dt.date
+    df['Amount'] = pd.to_numeric(df['Amount'], errors='coerce')
+    df['Meter Reading'] = pd.to_numeric(df['Meter Reading'], errors='coerce')
+    df['Month-Year'] = pd.to_datetime(df['Collection Date']).dt.strftime('%Y-%m')
+    return df
+
+
+def legacy_expense(path):
+    df = pd.read_csv(path, dayfirst=True, dtype={"Vehicle No": str})
+    df['Date'] = pd.to_datetime(df['Date'], dayfirst=True, errors='coerce').dt.date
+    df['Amount Used'] = pd.to_numeric(df['Amount Used'], errors='coerce')
+    df['Month-Year'] = pd.to_datetime(df['Date']).dt.strftime('%Y-%m')
+    return df
+
+
+def legacy_investment(path):
+    df = pd.read_csv(path, dayfirst=True)
+    df['Date'] = pd.to_datetime(df['Date'], dayfirst=True, errors='coerce').dt.date
+    df['Amount'] = pd.to_numeric(df['Amount'], errors='coerce')
+    df['Month-Year'] = pd.to_datetime(df['Date']).dt.strftime('%Y-%m')
+    return df
+
+
+def legacy_bank(path):
+    df = pd.read_csv(path, dayfirst=True)
+    df['Date'] = pd.to_datetime(df['Date'], dayfirst=True, errors='coerce').dt.date
+    df['Month-Year'] = pd.to_datetime(df['Date']).dt.strftime('%Y-%m')
+    df['Amount'] = pd.to_numeric(df['Amount'], errors='coerce').fillna(0)
+    return df
+
+
+def arrow_investment(df):
+    dates = ingest.as_dates(df['Date'])
+    df['Date'] = dates.dt.date
+    df['Amount'] = ingest.as_numbers(df['Amount'])
+    df['Month-Year'] = ingest.month_year(dates)
+    return df, []
+
+
+LEGACY = {"collection": legacy_collection, "expense": legacy_expense, "investment": legacy_investment, "bank": legacy_bank}
+ARROW = {**ingest.PARSERS, "investment": arrow_investment}
+
+
+def best_of(repeats, fn):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+# Same rows and values; text columns that were all blank read as float NaN before
+def same_frame(old, new):
+    if list(old.columns) != list(new.columns) or len(old) != len(new):
+        return False
+    for column in old.columns:
+        a, b = old[column], new[column]
+        if a.isna().all() and b.isna().all():
+            continue
+        if not a.astype(str).equals(b.astype(str)):
+            return False
+    return True
+
+
+def bench_scale(scale, args, work_dir):
+    data_dir = os.path.join(work_dir, f"x{scale}")
+    load_test.make_dataset(data_dir, vehicles=args.vehicles * scale, days=args.days, bcrypt_rounds=4)
+    # Expense and bank rows grow with the fleet too
+    for name in ("expense", "bank"):
+        path = os.path.join(data_dir, FILES[name])
+        df = pd.read_csv(path, dtype=str)
+        pd.concat([df] * scale, ignore_index=True).to_csv(path, index=False)
+
+    rows = []
+    for name, file_name in FILES.items():
+        path = os.path.join(data_dir, file_name)
+        old_s, old = best_of(args.repeats, lambda: LEGACY[name](path))
+        new_s, (new, _) = best_of(args.repeats, lambda: ARROW[name](ingest.read_frame(path, name)))
+        row = {
+            "Scale": f"{scale}x", "Sheet": name, "Rows": len(old), "MB": os.path.getsize(path) / 2**20,
+            "pandas (s)": old_s, "Arrow (s)": new_s, "Speed-up": old_s / new_s if new_s else np.nan,
+            "Same": same_frame(old, new), "Warm partitioned (s)": np.nan,
+        }
+        if name in partitions.sheets:
+            sheet = partitions.PartitionedSheet(name, partitions.sheets[name].date_column,
+                                                partitions.sheets[name].amount_column,
+                                                path=os.path.join(work_dir, f"partitions-x{scale}"))
+            sheet.load(path, ingest.PARSERS[name])  # first load freezes the closed months
+            row["Warm partitioned (s)"], _ = best_of(args.repeats, lambda: sheet.load(path, ingest.PARSERS[name]))
+        rows.append(row)
+    shutil.rmtree(data_dir, ignore_errors=True)
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark pandas vs Arrow ingestion of the sheet exports.")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100], help="multiples of today's row counts")
+    parser.add_argument("--vehicles", type=int, default=30, help="vehicles at scale 1")
+    parser.add_argument("--days", type=int, default=400, help="days of generated collection history")
+    parser.add_argument("--repeats", type=int, default=3, help="runs per measurement (best is kept)")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    work_dir = tempfile.mkdtemp(prefix="vayuvolt-ingest-")
+    rows = []
+    try:
+        for scale in args.scales:
+            print(f"Scale {scale}x: generating {args.vehicles * scale} vehicles x {args.days} days ...")
+            rows.extend(bench_scale(scale, args, work_dir))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = pd.DataFrame(rows)
+    with pd.option_context("display.width", 200):
+        print(report.to_string(index=False, formatters={
+            "Rows": "{:,}".format, "MB": "{:,.1f}".format, "pandas (s)": "{:.3f}".format,
+            "Arrow (s)": "{:.3f}".format, "Speed-up": "{:.1f}x".format, "Warm partitioned (s)": "{:.3f}".format,
+        }))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report.to_dict(orient="records"), f, indent=2)
+    return 0 if report["Same"].all() else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
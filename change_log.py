@@ -0,0 +1,260 @@
+import os
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import snapshot
+from data_quality import SHEETS
+from versioning import dataset_version, row_hashes
+
+
+# Last snapshot of each sheet and the change log, kept on disk so edits made
+# while the server was down are still caught on the next load
+CHANGE_DIR = os.environ.get("VAYUVOLT_CHANGES", os.path.join(".cache", "changes"))
+
+# Oldest entries are dropped beyond this many log rows
+MAX_LOG_ROWS = int(os.environ.get("VAYUVOLT_CHANGE_LOG_ROWS", "20000"))
+
+INSERTED, UPDATED, DELETED = "Inserted", "Updated", "Deleted"
+LOG_COLUMNS = ["Detected At", "Sheet", "Change", "Sheet Row", "Month-Year", "Vehicle No", "Columns", "Before", "After"]
+
+
+def _months(rows):
+    return set(rows["Month-Year"].fillna("").astype(str)) if "Month-Year" in rows else set()
+
+
+def _values(rows, columns):
+    # "Column=value; ..." per row, over the given columns
+    if rows.empty or not columns:
+        return pd.Series("", index=rows.index, dtype="str")
+    parts = [column + "=" + rows[column].astype("str").where(rows[column].notna(), "") for column in columns]
+    joined = parts[0]
+    for part in parts[1:]:
+        joined = joined + "; " + part
+    return joined
+
+
+# ---------- Sheet diff ----------
+# Rows of one sheet that changed between two loaded versions. Rows are
+# compared by a hash of their source columns (derived columns such as
+# Distance would flag neighbours of an edited row). A row hash present only
+# in the old version is a removed row, one only in the new version an added
+# row; a removed and an added row in the same place are one edit. Rows that
+# only moved (a row above them was deleted) keep their hash and are not
+# reported.
+class SheetChanges:
+    def __init__(self, name, from_version, to_version, inserted, deleted, before, after):
+        self.name = name
+        self.from_version = from_version
+        self.to_version = to_version
+        self.inserted = inserted  # new rows
+        self.deleted = deleted  # old rows
+        self.before, self.after = before, after  # edited rows, old and new, in pairs
+
+    @classmethod
+    def between(cls, name, old, new):
+        old, new = old.sort_index(), new.sort_index()
+        columns = [c for c in SHEETS[name]["source"] if c in new.columns]
+        old_hashes, new_hashes = row_hashes(old[columns]), row_hashes(new[columns])
+        gone = ~np.isin(old_hashes, new_hashes)
+        fresh = ~np.isin(new_hashes, old_hashes)
+
+        # Pair removed and added rows sitting in the same gap between unchanged
+        # rows (k-th with k-th): sheet rows below a deletion shift up, so
+        # their labels alone cannot tell an edit from a delete and an insert
+        def slots(changed):
+            gap = np.cumsum(~changed)[changed]
+            return pd.DataFrame({"gap": gap, "k": pd.Series(gap).groupby(gap).cumcount().to_numpy(),
+                                 "at": np.flatnonzero(changed)})
+
+        pairs = slots(gone).merge(slots(fresh), on=["gap", "k"], suffixes=("_old", "_new"))
+        paired_old = np.zeros(len(old), dtype=bool)
+        paired_old[pairs["at_old"].to_numpy()] = True
+        paired_new = np.zeros(len(new), dtype=bool)
+        paired_new[pairs["at_new"].to_numpy()] = True
+        return cls(
+            name, dataset_version(old), dataset_version(new),
+            inserted=new[fresh & ~paired_new], deleted=old[gone & ~paired_old],
+            before=old.iloc[pairs["at_old"].to_numpy()], after=new.iloc[pairs["at_new"].to_numpy()],
+        )
+
+    @classmethod
+    def unchanged(cls, name, df):
+        empty = df.iloc[:0]
+        return cls(name, dataset_version(df), dataset_version(df), empty, empty, empty, empty)
+
+    def __len__(self):
+        return len(self.inserted) + len(self.deleted) + len(self.after)
+
+    @property
+    def counts(self):
+        return {INSERTED: len(self.inserted), UPDATED: len(self.after), DELETED: len(self.deleted)}
+
+    # ---------- Changed keys ----------
+    # Keys touched on either side of the change. Months and dates drive the
+    # partial recomputes (KPI totals, the loss matrix); vehicles are only
+    # listed on the Change Log page, since every per-vehicle artifact
+    # rebuilds in milliseconds.
+    def _touched(self):
+        return (self.inserted, self.deleted, self.before, self.after)
+
+    @property
+    def months(self):
+        return set().union(*(_months(rows) for rows in self._touched()))
+
+    @property
+    def vehicles(self):
+        if "Vehicle No" not in self.inserted:
+            return set()
+        return set().union(*(set(rows["Vehicle No"].dropna().astype(str).str.strip()) for rows in self._touched()))
+
+    @property
+    def dates(self):
+        column = SHEETS[self.name]["date"]
+        return set().union(*(set(pd.to_datetime(rows[column], errors="coerce").dropna().dt.normalize())
+                             for rows in self._touched()))
+
+    # ---------- Log rows ----------
+    # Inserted and deleted rows carry all their source values, edits only the
+    # cells that changed
+    def log_rows(self, detected_at):
+        columns = [c for c in SHEETS[self.name]["source"] if c in self.inserted.columns]
+        before, after = self.before[columns].reset_index(drop=True), self.after[columns].reset_index(drop=True)
+        differs = ~((before == after) | (before.isna() & after.isna())).to_numpy()
+        edited = [[c for c, d in zip(columns, row) if d] for row in differs]
+
+        def rows(frame, change, changed_columns, before_text, after_text):
+            return pd.DataFrame({
+                "Detected At": detected_at,
+                "Sheet": self.name,
+                "Change": change,
+                "Sheet Row": np.asarray(frame.index, dtype="int64") + 2,  # loaders keep the sheet's row order as the index
+                "Month-Year": frame["Month-Year"].fillna("").astype(str).to_numpy() if "Month-Year" in frame else "",
+                "Vehicle No": frame["Vehicle No"].fillna("").astype(str).to_numpy() if "Vehicle No" in frame else "",
+                "Columns": changed_columns,
+                "Before": before_text,
+                "After": after_text,
+            }, columns=LOG_COLUMNS)
+
+        return pd.concat([
+            rows(self.inserted, INSERTED, "", "", _values(self.inserted, columns).to_numpy()),
+            rows(self.after, UPDATED, [", ".join(picked) for picked in edited],
+                 [_values(self.before.iloc[[i]], picked).iloc[0] for i, picked in enumerate(edited)],
+                 [_values(self.after.iloc[[i]], picked).iloc[0] for i, picked in enumerate(edited)]),
+            rows(self.deleted, DELETED, "", _values(self.deleted, columns).to_numpy(), ""),
+        ], ignore_index=True)
+
+
+# ---------- Tracker ----------
+# Keeps the last loaded version of each sheet; each new version is diffed
+# against it and the changes appended to the log. The first load of a sheet
+# is the baseline and logs nothing.
+class ChangeTracker:
+    def __init__(self, path=CHANGE_DIR):
+        self.path = path
+        self._snapshots = {}
+        self._log = None
+        self.latest = {}  # sheet -> SheetChanges of its last new version
+
+    def _snapshot_path(self, name):
+        return os.path.join(self.path, f"{name}.pkl")
+
+    @property
+    def log_path(self):
+        return os.path.join(self.path, "log.pkl")
+
+    def snapshot(self, name):
+        if name not in self._snapshots:
+            self._snapshots[name] = snapshot.load(self._snapshot_path(name))
+        return self._snapshots[name]
+
+    @property
+    def log(self):
+        if self._log is None:
+            stored = snapshot.load(self.log_path)
+            self._log = stored if isinstance(stored, pd.DataFrame) else pd.DataFrame(columns=LOG_COLUMNS)
+        return self._log
+
+    # SheetChanges per sheet for these loaded frames (name -> DataFrame)
+    def record(self, frames, detected_at=None):
+        detected_at = detected_at or datetime.now()
+        changes, entries = {}, []
+        for name, df in frames.items():
+            if name not in SHEETS or df is None:
+                continue
+            previous = self.snapshot(name)
+            if previous is not None and dataset_version(previous) == dataset_version(df):
+                changes[name] = self.changes_to(name, dataset_version(df)) or SheetChanges.unchanged(name, df)
+                continue
+            if previous is None or list(previous.columns) != list(df.columns):
+                changes[name] = None  # baseline: nothing to compare against
+            else:
+                changes[name] = SheetChanges.between(name, previous, df)
+                if len(changes[name]):
+                    entries.append(changes[name].log_rows(detected_at))
+            self.latest[name] = changes[name]
+            self._snapshots[name] = df
+            self._save(self._snapshot_path(name), df)
+
+        if entries:
+            log = pd.concat([self.log] + entries, ignore_index=True) if len(self.log) else pd.concat(entries, ignore_index=True)
+            self._log = log.iloc[-MAX_LOG_ROWS:].reset_index(drop=True)
+            self._save(self.log_path, self._log)
+        return changes
+
+    # Changes of `name` that lead to `version`, or None when its last diff
+    # was to another version (or it has none)
+    def changes_to(self, name, version):
+        found = self.latest.get(name)
+        return found if found is not None and found.to_version == version else None
+
+    def _save(self, path, obj):
+        try:
+            snapshot.save(obj, path)
+        except OSError:
+            pass  # the in-memory state still serves this process
+
+
+# One tracker per process, shared by every session: two sessions diffing the
+# same load at once would log its changes twice
+tracker = ChangeTracker()
+_lock = threading.Lock()
+
+
+def record_changes(frames):
+    with _lock:
+        return tracker.record(frames)
+
+
+# ---------- Date-keyed artifacts ----------
+# Last result of each artifact with the data version it was computed for;
+# kept outside the app cache, since the version after a Refresh is exactly
+# the one worth patching
+_derived = {}
+_derived_lock = threading.Lock()
+
+
+# `fn(rows)` for an artifact whose rows of different dates are computed
+# independently (the loss matrix). When the sheet's changes up to `version`
+# are known and the last result was for their starting version, that result
+# is kept for the untouched dates and `fn` runs only on the touched ones.
+# `rules` versions anything else `fn` depends on (the rent targets): a result
+# computed under other rules is not reused.
+def refresh_by_date(key, name, version, rows, fn, date_column, rules=None):
+    with _derived_lock:
+        previous = _derived.get(key)
+        changes = tracker.changes_to(name, version)
+        if previous is not None and changes is not None and previous[:2] == (changes.from_version, rules):
+            dates = changes.dates
+            kept = previous[2]
+            kept = kept[~pd.to_datetime(kept[date_column]).dt.normalize().isin(dates).to_numpy()]
+            touched = rows[pd.to_datetime(rows[date_column]).dt.normalize().isin(dates).to_numpy()]
+            pieces = [kept] + ([fn(touched)] if not touched.empty else [])
+            # Each date comes whole from one piece, so a stable sort keeps its row order
+            result = pd.concat(pieces, ignore_index=True).sort_values(date_column, kind="stable", ignore_index=True)
+        else:
+            result = fn(rows)
+        _derived[key] = (version, rules, result)
+        return result
@@ -0,0 +1,149 @@
+import numpy as np
+import pandas as pd
+
+
+# Upper bound on the number of points sent to the browser for one chart
+MAX_CHART_POINTS = 2000
+
+# A single line never gets squeezed below this many points; when that many
+# per line would break MAX_CHART_POINTS, only the lines with the largest
+# totals are drawn
+MIN_SERIES_POINTS = 12
+
+# Bucket sizes, finest first, and the largest number of buckets one series may
+# span at that size before the next coarser bucket is used
+RESOLUTIONS = ["Daily", "Weekly", "Monthly"]
+MAX_BUCKETS_PER_SERIES = 400
+
+
+# ---------- Bucketing ----------
+def bucket_dates(dates, resolution):
+    dates = pd.to_datetime(dates, errors="coerce").dt.normalize()
+    if resolution == "Daily":
+        return dates
+    if resolution == "Weekly":
+        # Week buckets start on Monday
+        return dates - pd.to_timedelta(dates.dt.dayofweek, unit="D")
+    return dates.dt.to_period("M").dt.start_time
+
+
+# Pick the finest bucket that keeps one series within MAX_BUCKETS_PER_SERIES
+def pick_resolution(start, end):
+    span_days = max((pd.Timestamp(end) - pd.Timestamp(start)).days, 1)
+    if span_days <= MAX_BUCKETS_PER_SERIES:
+        return "Daily"
+    if span_days / 7 <= MAX_BUCKETS_PER_SERIES:
+        return "Weekly"
+    return "Monthly"
+
+
+# Pre-aggregate value_cols per bucket (optionally per series column) for every
+# resolution. Built once per data version; a chart then only slices a rollup.
+def build_rollups(df, date_col, value_cols, by=None):
+    cols = [date_col] + list(value_cols) + ([by] if by else [])
+    frame = df[cols].copy()
+    frame[date_col] = pd.to_datetime(frame[date_col], errors="coerce")
+    frame = frame.dropna(subset=[date_col])
+    for col in value_cols:
+        frame[col] = pd.to_numeric(frame[col], errors="coerce").fillna(0)
+
+    rollups = {}
+    for resolution in RESOLUTIONS:
+        keys = [bucket_dates(frame[date_col], resolution).rename(date_col)]
+        if by:
+            keys.append(frame[by])
+        rollups[resolution] = (
+            frame.groupby(keys, sort=True)[list(value_cols)]
+            .sum()
+            .reset_index()
+        )
+    return rollups
+
+
+# ---------- Downsampling ----------
+# Largest-Triangle-Three-Buckets: returns the positions of n_out points that
+# keep the visual shape (peaks and dips) of the series x/y.
+def lttb(x, y, n_out):
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype="float64")
+    y = np.asarray(y, dtype="float64")
+
+    # n_out - 2 buckets between the fixed first and last points
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            nlo, nhi = edges[i + 1], edges[i + 2]
+            avg_x, avg_y = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        else:
+            avg_x, avg_y = x[-1], y[-1]
+
+        area = np.abs(
+            (x[a] - avg_x) * (y[lo:hi] - y[a])
+            - (x[a] - x[lo:hi]) * (avg_y - y[a])
+        )
+        a = lo + int(area.argmax())
+        keep[i + 1] = a
+    return keep
+
+
+def _downsample(frame, date_col, value_col, n_out):
+    if len(frame) <= n_out:
+        return frame
+    x = frame[date_col].to_numpy(dtype="datetime64[ns]").astype("int64")
+    idx = lttb(x, frame[value_col].to_numpy(), n_out)
+    return frame.iloc[idx]
+
+
+# ---------- Chart frames ----------
+# Long-format frame (date, series, value) for st.line_chart(x=, y=, color=),
+# at the resolution picked for the range and capped at max_points in total.
+# attrs["hidden_series"] counts the lines left out to stay within the cap.
+def chart_frame(rollups, start, end, date_col, value_cols, by=None,
+                max_points=MAX_CHART_POINTS):
+    resolution = pick_resolution(start, end)
+    data = rollups[resolution]
+    # Buckets are labelled by their first day; the one holding `start` may begin before it
+    first_bucket = bucket_dates(pd.Series([pd.Timestamp(start)]), resolution).iloc[0]
+    data = data[(data[date_col] >= first_bucket) & (data[date_col] <= pd.Timestamp(end))]
+
+    if by:
+        # One line per value of `by` (e.g. one per vehicle); a series without
+        # rows in a bucket plots zero there, not a gap
+        long_df = (
+            data.pivot_table(index=date_col, columns=by, values=value_cols[0], aggfunc="sum", fill_value=0)
+            .stack()
+            .rename("Value")
+            .reset_index()
+            .rename(columns={by: "Series"})
+        )
+        long_df = long_df[[date_col, "Series", "Value"]]
+    else:
+        long_df = data.melt(id_vars=[date_col], value_vars=list(value_cols),
+                            var_name="Series", value_name="Value")
+
+    hidden = 0
+    n_series = max(long_df["Series"].nunique(), 1)
+    if len(long_df) > max_points:
+        per_series = max_points // n_series
+        if per_series < MIN_SERIES_POINTS:
+            per_series = min(MIN_SERIES_POINTS, max_points)
+            shown = long_df.groupby("Series")["Value"].sum().abs().nlargest(max_points // per_series).index
+            hidden = n_series - len(shown)
+            long_df = long_df[long_df["Series"].isin(shown)]
+        long_df = pd.concat(
+            [_downsample(g, date_col, "Value", per_series)
+             for _, g in long_df.sort_values(date_col).groupby("Series", sort=False)],
+            ignore_index=True,
+        )
+
+    long_df = long_df.sort_values(["Series", date_col]).reset_index(drop=True)
+    long_df.attrs["hidden_series"] = hidden
+    return long_df, resolution
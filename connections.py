@@ -0,0 +1,80 @@
+import csv
+import os
+import threading
+from time import perf_counter
+
+
+SCOPES = ["https://www.googleapis.com/auth/spreadsheets", "https://www.googleapis.com/auth/drive"]
+
+# Local stand-in for the Google sources (load tests, offline work): a
+# directory holding one "<worksheet name>.csv" per sheet. Unset in production.
+LOCAL_DATA_DIR = os.environ.get("VAYUVOLT_DATA_DIR")
+
+
+# CSV export URL of a worksheet (or its local stand-in file)
+def sheet_csv_url(sheet_id, sheet_name, data_dir=LOCAL_DATA_DIR):
+    if data_dir:
+        return os.path.join(data_dir, f"{sheet_name}.csv")
+    return f"https://docs.google.com/spreadsheets/d/{sheet_id}/gviz/tq?tqx=out:csv&sheet={sheet_name}"
+
+
+# Read-only worksheet backed by a local CSV file, with the gspread calls the app uses
+class LocalWorksheet:
+    def __init__(self, path):
+        self.path = path
+
+    def get_all_records(self):
+        with open(self.path, newline="", encoding="utf-8") as f:
+            return list(csv.DictReader(f))
+
+
+# Registry of Google worksheets that authorizes and opens each one lazily, on
+# first use. gspread and google-auth are imported only then, so the login
+# screen does not pay for them or for opening sheets it never reads. With a
+# local data directory, worksheets are read from its CSV files instead.
+class SheetRegistry:
+    def __init__(self, creds_info, sheets, data_dir=LOCAL_DATA_DIR):
+        self._creds_info = creds_info
+        self._sheets = dict(sheets)  # name -> (spreadsheet id, worksheet name)
+        self._data_dir = data_dir
+        self._client = None
+        self._open = {}
+        self._lock = threading.Lock()
+        self.timings = {}  # name -> seconds spent authorizing/opening
+
+    @property
+    def names(self):
+        return list(self._sheets)
+
+    def is_open(self, name):
+        return name in self._open
+
+    def _get_client(self):
+        if self._client is None:
+            start = perf_counter()
+            import gspread
+            from google.oauth2.service_account import Credentials
+
+            creds = Credentials.from_service_account_info(self._creds_info, scopes=SCOPES)
+            self._client = gspread.authorize(creds)
+            self.timings["authorize"] = perf_counter() - start
+        return self._client
+
+    def get(self, name):
+        with self._lock:
+            if name not in self._open:
+                sheet_id, worksheet_name = self._sheets[name]
+                if self._data_dir:
+                    start = perf_counter()
+                    self._open[name] = LocalWorksheet(os.path.join(self._data_dir, f"{worksheet_name}.csv"))
+                else:
+                    client = self._get_client()
+                    start = perf_counter()
+                    self._open[name] = client.open_by_key(sheet_id).worksheet(worksheet_name)
+                self.timings[name] = perf_counter() - start
+            return self._open[name]
+
+    # Open everything up front (the old, eager behaviour)
+    def open_all(self):
+        for name in self._sheets:
+            self.get(name)
@@ -0,0 +1,265 @@
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+
+from balances import BANK_CREDITS, BANK_DEBITS, PARTNERS
+from rent_targets import COMPANY_NAME
+from versioning import Latest, row_hashes
+
+
+# Per sheet: the columns read from the source (row identity for incremental
+# runs), and the columns each check looks at
+SHEETS = {
+    "collection": {
+        "source": ["Collection Date", "Vehicle No", "Amount", "Meter Reading", "Name", "Received By"],
+        "date": "Collection Date", "amount": "Amount", "person": "Received By",
+    },
+    "expense": {
+        "source": ["Date", "Vehicle No", "Reason of Expense", "Amount Used", "Any Bill", "Expense By"],
+        "date": "Date", "amount": "Amount Used", "person": "Expense By",
+    },
+    "investment": {
+        "source": ["Date", "Investment Type", "Investment Amount", "Comment", "Investor Name"],
+        "date": "Date", "amount": "Investment Amount", "person": None,
+    },
+    "bank": {
+        "source": ["Date", "Transaction By", "Transaction Type", "Reason", "Amount"],
+        "date": "Date", "amount": "Amount", "person": "Transaction By", "outlier_by": "Transaction Type",
+    },
+}
+BANK_TYPES = set(BANK_CREDITS) | set(BANK_DEBITS)
+
+# An amount is an outlier above max(Q3 + OUTLIER_IQR * IQR, OUTLIER_MEDIAN * median)
+# of its sheet (of its transaction type, for the bank)
+OUTLIER_IQR = 3.0
+OUTLIER_MEDIAN = 3.0
+
+ISSUE_COLUMNS = ["Sheet", "Sheet Row", "Check", "Column", "Value", "Detail"]
+
+
+# ---------- Parse failures ----------
+# Cells the loader could not convert: blank, or not a date/number. Called by
+# the loaders (after coercion, with the raw columns) since the raw values are
+# gone afterwards; the result travels with the frame in df.attrs.
+def parse_failures(raw, parsed):
+    records = []
+    for column in raw.columns:
+        failed = parsed[column].isna().to_numpy()
+        if not failed.any():
+            continue
+        values = raw[column][failed]
+        blank = values.isna() | (values.astype(str).str.strip() == "")
+        for label, value, is_blank in zip(values.index, values, blank):
+            records.append({
+                "Row": label, "Column": column, "Value": "" if is_blank else str(value),
+                "Check": "Missing value" if is_blank else "Unparseable value",
+            })
+    return records
+
+
+# Sheet row of each frame row: loaders keep the read_csv index (0 = first data row, below the header)
+def _sheet_rows(labels):
+    return np.asarray(labels, dtype="int64") + 2
+
+
+def _issues(name, df, mask, check, column, values=None, detail=""):
+    mask = np.asarray(mask, dtype=bool)
+    if not mask.any():
+        return pd.DataFrame(columns=ISSUE_COLUMNS)
+    if values is None:
+        values = df[column]
+    values = pd.Series(values, index=df.index)[mask]
+    detail = pd.Series(detail, index=df.index)[mask] if not isinstance(detail, str) else detail
+    return pd.DataFrame({
+        "Sheet": name,
+        "Sheet Row": _sheet_rows(df.index[mask]),
+        "Check": check,
+        "Column": column,
+        "Value": values.astype(str).to_numpy(),
+        "Detail": detail if isinstance(detail, str) else detail.astype(str).to_numpy(),
+    })
+
+
+# ---------- Checks ----------
+# Each check sees the whole frame (for context such as duplicates or the
+# previous meter reading) and reports only the rows in `new`.
+def check_parse_failures(name, df, new):
+    failures = pd.DataFrame(df.attrs.get("parse_failures") or [], columns=["Row", "Column", "Value", "Check"])
+    failures = failures[failures["Row"].isin(df.index[new])]
+    return pd.DataFrame({
+        "Sheet": name,
+        "Sheet Row": _sheet_rows(failures["Row"]),
+        "Check": failures["Check"].to_numpy(),
+        "Column": failures["Column"].to_numpy(),
+        "Value": failures["Value"].to_numpy(),
+        "Detail": "dropped or counted as 0 downstream",
+    }, columns=ISSUE_COLUMNS)
+
+
+def check_future_dates(name, df, new):
+    column = SHEETS[name]["date"]
+    dates = pd.to_datetime(df[column], errors="coerce")
+    return _issues(name, df, new & (dates > pd.Timestamp.today().normalize()).to_numpy(), "Future date", column)
+
+
+def check_amounts(name, df, new):
+    spec = SHEETS[name]
+    column = spec["amount"]
+    amount = pd.to_numeric(df[column], errors="coerce")
+    negative = _issues(name, df, new & (amount < 0).to_numpy(), "Negative amount", column)
+
+    groups = df[spec["outlier_by"]].astype(str).str.strip() if spec.get("outlier_by") else pd.Series("", index=df.index)
+    positive = amount.where(amount > 0)
+    by_group = positive.groupby(groups)
+    q1, q3, median = by_group.transform("quantile", 0.25), by_group.transform("quantile", 0.75), by_group.transform("median")
+    limit = np.maximum(q3 + OUTLIER_IQR * (q3 - q1), OUTLIER_MEDIAN * median)
+    outlier = (amount > limit).to_numpy()
+    detail = "above " + limit.round(0).map("{:,.0f}".format)
+    return pd.concat([negative, _issues(name, df, new & outlier, "Amount outlier", column, detail=detail)])
+
+
+def check_people(name, df, new):
+    column = SHEETS[name]["person"]
+    if column is None:
+        return pd.DataFrame(columns=ISSUE_COLUMNS)
+    unknown = ~df[column].astype(str).str.strip().isin(PARTNERS)
+    return _issues(name, df, new & unknown.to_numpy(), "Unknown partner", column)
+
+
+# Two rows for the same vehicle and day (keys compared by hash). On a delta
+# only the new copy is reported; the earlier row was validated already.
+def check_duplicates(name, df, new):
+    keys = pd.util.hash_pandas_object(
+        pd.DataFrame({"vehicle": df["Vehicle No"].astype(str).str.strip(), "date": pd.to_datetime(df["Collection Date"], errors="coerce")}),
+        index=False,
+    )
+    counts = keys.groupby(keys.to_numpy()).transform("size")
+    detail = counts.astype(str) + " rows for this vehicle and day"
+    return _issues(name, df, new & (counts > 1).to_numpy() & df["Collection Date"].notna().to_numpy(),
+                   "Duplicate vehicle-day", "Vehicle No", detail=detail)
+
+
+# A meter reading below the vehicle's previous one (by date)
+def check_meter(name, df, new):
+    ordered = df.assign(_vehicle=df["Vehicle No"].astype(str).str.strip(),
+                        _date=pd.to_datetime(df["Collection Date"], errors="coerce")).sort_values(["_vehicle", "_date"], kind="stable")
+    previous = ordered.groupby("_vehicle")["Meter Reading"].shift()
+    regression = (ordered["Meter Reading"] < previous).reindex(df.index).to_numpy()
+    detail = ("previous " + previous.reindex(df.index).round(0).map("{:,.0f}".format))
+    return _issues(name, df, new & regression, "Meter regression", "Meter Reading", detail=detail)
+
+
+# Driver names that are blank, or another spelling (case, spacing) of a more common name
+def check_drivers(name, df, new):
+    names = df["Name"].fillna("").astype(str)
+    normalized = names.str.strip().str.casefold().str.replace(r"\s+", " ", regex=True)
+    counts = pd.DataFrame({"norm": normalized, "name": names}).value_counts()  # most common spelling first
+    canonical = counts.reset_index().drop_duplicates("norm").set_index("norm")["name"]
+    expected = normalized.map(canonical)
+    blank = (normalized == "").to_numpy()
+    variant = ((names != expected) & (names != COMPANY_NAME)).to_numpy() & ~blank
+    return pd.concat([
+        _issues(name, df, new & blank, "Unknown driver", "Name", detail="no driver name"),
+        _issues(name, df, new & variant, "Unknown driver", "Name", detail="spelling of " + expected),
+    ])
+
+
+def check_bank_types(name, df, new):
+    types = df["Transaction Type"].astype(str).str.strip()
+    return _issues(name, df, new & ~types.isin(BANK_TYPES).to_numpy(), "Unknown bank type", "Transaction Type")
+
+
+CHECKS = {
+    "collection": [check_parse_failures, check_future_dates, check_amounts, check_people,
+                   check_duplicates, check_meter, check_drivers],
+    "expense": [check_parse_failures, check_future_dates, check_amounts, check_people],
+    "investment": [check_parse_failures, check_future_dates, check_amounts],
+    "bank": [check_parse_failures, check_future_dates, check_amounts, check_people, check_bank_types],
+}
+
+
+def validate(name, df, new=None):
+    if df is None or df.empty:
+        return pd.DataFrame(columns=ISSUE_COLUMNS)
+    new = np.ones(len(df), dtype=bool) if new is None else new
+    found = [check(name, df, new) for check in CHECKS[name]]
+    return pd.concat([f for f in found if not f.empty] or [pd.DataFrame(columns=ISSUE_COLUMNS)], ignore_index=True)
+
+
+# Source columns of a sheet, numbers as float: one blank amount turns an int
+# column into float, which must not make every earlier row look new
+def _source(name, df):
+    source = df[[c for c in SHEETS[name]["source"] if c in df.columns]]
+    numeric = source.select_dtypes("number").columns
+    return source.astype({c: "float64" for c in numeric})
+
+
+# ---------- Report ----------
+# Issues over all four sheets. A new data version that only appends rows is
+# validated as a delta (checks run for the new rows only, earlier issues are
+# kept); any edited or removed row triggers a full run, like the KPIs.
+class QualityReport:
+    def __init__(self):
+        self.issues = pd.DataFrame(columns=ISSUE_COLUMNS)
+        self.hashes = {}
+        self.rows = {}  # sheet -> rows checked
+        self.last_refresh = {"mode": None, "rows": 0, "seconds": 0.0}
+
+    def refresh(self, frames):
+        start = perf_counter()
+        hashes = {
+            name: row_hashes(_source(name, df))
+            for name, df in frames.items() if df is not None and not df.empty
+        }
+        history_changed = self.last_refresh["mode"] is None or any(
+            name not in hashes or not np.isin(old, hashes[name]).all()
+            for name, old in self.hashes.items()
+        )
+
+        report = QualityReport()
+        found = []
+        if history_changed:
+            mode = "full"
+            for name, df in frames.items():
+                if name in hashes:
+                    found.append(validate(name, df))
+            n_rows = sum(len(h) for h in hashes.values())
+        else:
+            mode = "delta"
+            found.append(self.issues)
+            n_rows = 0
+            for name, df in frames.items():
+                if name in hashes:
+                    new = ~np.isin(hashes[name], self.hashes.get(name, []))
+                    n_rows += int(new.sum())
+                    if new.any():
+                        found.append(validate(name, df, new))
+
+        found = [f for f in found if not f.empty]
+        report.issues = (pd.concat(found, ignore_index=True) if found else pd.DataFrame(columns=ISSUE_COLUMNS))
+        report.issues["Sheet Row"] = report.issues["Sheet Row"].astype("int64")
+        report.issues = report.issues.sort_values(["Sheet", "Sheet Row", "Check"], kind="stable").reset_index(drop=True)
+        report.hashes = hashes
+        report.rows = {name: len(h) for name, h in hashes.items()}
+        report.last_refresh = {"mode": mode, "rows": n_rows, "seconds": perf_counter() - start}
+        return report
+
+    # Issue counts per sheet and check
+    def counts(self):
+        if self.issues.empty:
+            return pd.DataFrame(columns=["Sheet", "Check", "Issues", "Rows"])
+        grouped = self.issues.groupby(["Sheet", "Check"])
+        return pd.DataFrame({
+            "Issues": grouped.size(),
+            "Rows": grouped["Sheet Row"].nunique(),
+        }).reset_index()
+
+
+# ---------- Per-process state ----------
+# Issues found so far; checks run again only for rows this report has not seen
+_latest = Latest(QualityReport())
+
+
+def refresh_report(frames):
+    return _latest.advance(lambda report: report.refresh(frames))
@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+
+from rent_targets import COMPANY_NAME, DAILY_TARGET
+
+
+# Trailing windows (days) for the rolling collection columns
+ROLLING_WINDOWS = (7, 30, 90)
+
+
+# ---------- Zero-collection streaks ----------
+# Longest and current (trailing) run of consecutive recorded days with zero
+# collection, per key. `daily` must be sorted by key then date with one row
+# per (key, date).
+def zero_streaks(daily, key, amount_col="Amount"):
+    if daily.empty:
+        return pd.DataFrame(columns=["Longest Zero Streak", "Current Zero Streak"])
+
+    keys = daily[key].to_numpy()
+    zero = daily[amount_col].to_numpy() == 0
+
+    new_key = np.r_[True, keys[1:] != keys[:-1]]
+    boundary = new_key | np.r_[True, zero[1:] != zero[:-1]]
+    run_id = np.cumsum(boundary) - 1
+    run_len = np.bincount(run_id)
+
+    run_starts = np.flatnonzero(boundary)
+    runs = pd.DataFrame({
+        key: keys[run_starts],
+        "zero": zero[run_starts],
+        "length": run_len,
+    })
+
+    longest = runs["length"].where(runs["zero"], 0).groupby(runs[key], sort=False).max()
+    last_run = runs.groupby(key, sort=False).tail(1).set_index(key)
+    current = last_run["length"].where(last_run["zero"], 0)
+
+    return pd.DataFrame({
+        "Longest Zero Streak": longest,
+        "Current Zero Streak": current,
+    }).astype("int64")
+
+
+# ---------- Driver scorecard ----------
+# One vectorized pass over the collection frame (perf_df) and the loss matrix
+# (perf_df_lm) producing one row per driver. `targets` (rent_targets.RentTargets)
+# prices each vehicle-day for the loss rate, like the loss matrix; without
+# it every vehicle-day is DAILY_TARGET.
+def build_driver_scorecard(perf_df, loss_df, as_of=None, targets=None):
+    frame = perf_df[["Collection Date", "Name", "Vehicle No", "Amount"]].dropna(subset=["Collection Date", "Name"])
+    frame = frame[frame["Name"] != COMPANY_NAME]
+    if frame.empty:
+        return pd.DataFrame()
+    rent = (targets.lookup(frame["Vehicle No"], frame["Collection Date"]) if targets is not None
+            else np.full(len(frame), float(DAILY_TARGET)))
+
+    as_of = pd.Timestamp(as_of if as_of is not None else frame["Collection Date"].max()).normalize()
+
+    # Per-driver daily totals, sorted for the streak run-lengths
+    daily = (
+        frame.groupby(["Name", "Collection Date"], sort=True)["Amount"]
+        .sum()
+        .reset_index()
+    )
+
+    # Rolling windows: one (rows x windows) mask, summed per driver in one groupby
+    age_days = (as_of - daily["Collection Date"]).dt.days.to_numpy()
+    windows = np.asarray(ROLLING_WINDOWS)
+    in_window = (age_days[:, None] >= 0) & (age_days[:, None] < windows[None, :])
+    rolling = pd.DataFrame(
+        in_window * daily["Amount"].to_numpy()[:, None],
+        columns=[f"Last {w}d Collection" for w in ROLLING_WINDOWS],
+    )
+    rolling["Name"] = daily["Name"].to_numpy()
+
+    card = rolling.groupby("Name").sum()
+    per_driver = daily.groupby("Name")
+    card["Total Collection"] = per_driver["Amount"].sum()
+    card["Days Active"] = per_driver["Collection Date"].count()
+    card["Avg per Day"] = card["Total Collection"] / card["Days Active"]
+    card["Last Active"] = per_driver["Collection Date"].max().dt.date
+
+    # Loss booked to the driver by the loss matrix, against the target for their days
+    if loss_df is not None and not loss_df.empty:
+        driver_loss = loss_df[loss_df["Name"] != COMPANY_NAME].groupby("Name")["Amount"].sum()
+    else:
+        driver_loss = pd.Series(dtype="float64")
+    card["Driver Loss"] = driver_loss.reindex(card.index).fillna(0)
+    card["Rent Due"] = pd.Series(rent, index=frame.index).groupby(frame["Name"]).sum().reindex(card.index)
+    card["Loss Rate (%)"] = card["Driver Loss"] / card["Rent Due"] * 100
+
+    card = card.join(zero_streaks(daily, "Name"))
+    return card.reset_index()
+
+
+# Top-k rows by `metric` using partial selection instead of a full sort
+def top_k(card, metric, k, largest=True):
+    if largest:
+        return card.nlargest(k, metric)
+    return card.nsmallest(k, metric)
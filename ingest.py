@@ -0,0 +1,190 @@
+import csv
+import os
+import re
+import urllib.request
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from pyarrow import csv as pa_csv
+
+import data_quality
+import metrics
+
+
+# Formats the sheets export dates in (day first, as the old loaders assumed)
+DATE_FORMATS = ["%d/%m/%Y", "%d/%m/%Y %H:%M:%S", "%Y-%m-%d"]
+
+TEXT = pa.string()
+NUMBER = pa.float64()
+# Dates are read as text and parsed by as_dates, which keeps the cell as
+# written for the data-quality report when it is not a valid date
+DATE = TEXT
+
+# Column types per sheet export; columns not listed are inferred
+SCHEMAS = {
+    "collection": {"Collection Date": DATE, "Vehicle No": TEXT, "Amount": NUMBER, "Meter Reading": NUMBER,
+                   "Name": TEXT, "Received By": TEXT},
+    "expense": {"Date": DATE, "Vehicle No": TEXT, "Reason of Expense": TEXT, "Amount Used": NUMBER,
+                "Any Bill": TEXT, "Expense By": TEXT},
+    "investment": {"Date": DATE, "Investment Type": TEXT, "Amount": NUMBER, "Comment": TEXT, "Received From": TEXT},
+    "bank": {"Date": DATE, "Transaction By": TEXT, "Transaction Type": TEXT, "Reason": TEXT, "Amount": NUMBER,
+             "Bill": TEXT},
+}
+
+# Seconds a sheet export download may stall before the load fails
+FETCH_TIMEOUT = float(os.environ.get("VAYUVOLT_FETCH_TIMEOUT", "60"))
+
+_BAD_COLUMN = re.compile(r"CSV column #(\d+)")
+
+
+def _source(url, sheet=None):
+    source = "gviz" if url.startswith(("http://", "https://")) else "file"
+    try:
+        with metrics.fetch_seconds.time(sheet, source):
+            if source == "gviz":
+                with urllib.request.urlopen(url, timeout=FETCH_TIMEOUT) as response:
+                    data = pa.py_buffer(response.read())
+            else:
+                data = pa.memory_map(url).read_buffer()
+    except Exception:
+        metrics.fetch_errors.inc(sheet, source)
+        raise
+    metrics.fetch_bytes.inc(sheet, source, amount=data.size)
+    return data
+
+
+# ---------- Read ----------
+# A sheet export as an Arrow table, parsed on all cores with the sheet's
+# column types. A column holding a value its type cannot take (a typo in a
+# date or amount) is read as text instead and left to the loader's coercion,
+# which records the bad cells; the other columns keep the fast path.
+def read_table(url, sheet):
+    data = _source(url, sheet)
+    column_types = dict(SCHEMAS.get(sheet, {}))
+    while True:
+        try:
+            table = pa_csv.read_csv(
+                pa.BufferReader(data),
+                read_options=pa_csv.ReadOptions(use_threads=True),
+                convert_options=pa_csv.ConvertOptions(column_types=column_types, strings_can_be_null=True),
+            )
+            break
+        except pa.ArrowInvalid as e:
+            match = _BAD_COLUMN.search(str(e))
+            header = next(csv.reader([data.to_pybytes().split(b"\n", 1)[0].decode("utf-8-sig")]))
+            column = header[int(match.group(1))] if match else None
+            if column not in column_types or column_types[column] == TEXT:
+                raise
+            column_types[column] = TEXT
+    return _narrow_integers(table, [c for c, t in column_types.items() if t == NUMBER])
+
+
+# Whole-valued number columns without blanks become int64, as pandas would
+# have inferred them (amounts show as "300", not "300.0")
+def _narrow_integers(table, columns):
+    for name in columns:
+        if name not in table.column_names:
+            continue
+        column = table[name]
+        if column.null_count == 0 and pc.all(pc.equal(pc.trunc(column), column)).as_py() is not False:
+            i = table.column_names.index(name)
+            table = table.set_column(i, name, pc.cast(column, pa.int64()))
+    return table
+
+
+# Pandas view of an Arrow table: numbers and text are handed over without
+# copying where the layout allows (text always, numbers without blanks)
+def to_frame(table):
+    return table.to_pandas(split_blocks=True)
+
+
+def read_frame(url, sheet):
+    table = read_table(url, sheet)
+    with metrics.parse_seconds.time(sheet):
+        return to_frame(table)
+
+
+# ---------- Coercion ----------
+# Dates from text with the known formats. Sheets repeat the same few hundred
+# dates, so each distinct string is parsed once and the result spread back.
+# Impossible days (31/02) fail instead of rolling over; cells no format takes
+# go through pandas' day-first guessing like before, and stay NaT when that
+# fails too.
+def as_dates(column):
+    if pd.api.types.is_datetime64_any_dtype(column):
+        return column
+    codes, uniques = pd.factorize(column)
+    distinct = pd.Series(uniques)
+    dates = pd.Series(pd.NaT, index=distinct.index, dtype="datetime64[s]")
+    missed = np.ones(len(distinct), dtype=bool)
+    for fmt in DATE_FORMATS:
+        if not missed.any():
+            break
+        dates[missed] = pd.to_datetime(distinct[missed], format=fmt, errors="coerce")
+        missed = missed & dates.isna().to_numpy()
+    if missed.any():
+        dates[missed] = pd.to_datetime(distinct[missed], dayfirst=True, errors="coerce", format="mixed")
+    values = dates.to_numpy()[codes]
+    values[codes < 0] = np.datetime64("NaT")
+    return pd.Series(values, index=column.index)
+
+
+def as_numbers(column):
+    if pd.api.types.is_numeric_dtype(column):
+        return column
+    return pd.to_numeric(column, errors="coerce")
+
+
+# "YYYY-MM" per date, formatted once per distinct month
+def month_year(dates):
+    codes, months = pd.factorize(dates.to_numpy().astype("datetime64[M]"))
+    labels = np.asarray(pd.Index(months).strftime("%Y-%m"), dtype=object)
+    return pd.Series(labels[codes], index=dates.index, dtype="str").where(codes >= 0)
+
+
+# ---------- Post-processing ----------
+# Fetched sheet rows -> typed rows, plus the cells that failed to parse
+def parse_collection(df):
+    raw = df[['Collection Date', 'Amount', 'Meter Reading']].copy()
+    dates = as_dates(df['Collection Date'])
+    df['Collection Date'] = dates.dt.date
+    df['Amount'] = as_numbers(df['Amount'])
+    df['Meter Reading'] = as_numbers(df['Meter Reading'])
+    df['Month-Year'] = month_year(dates)
+    return df, data_quality.parse_failures(raw, df)
+
+
+def parse_expense(df):
+    raw = df[['Date', 'Amount Used']].copy()
+    dates = as_dates(df['Date'])
+    df['Date'] = dates.dt.date
+    df['Amount Used'] = as_numbers(df['Amount Used'])
+    df['Month-Year'] = month_year(dates)
+    return df, data_quality.parse_failures(raw, df)
+
+
+def parse_bank(df):
+    raw = df[['Date', 'Amount']].copy()
+    dates = as_dates(df['Date'])
+    df['Date'] = dates.dt.date
+    df['Month-Year'] = month_year(dates)
+    # Ensure Amount is numeric
+    df['Amount'] = as_numbers(df['Amount'])
+    failures = data_quality.parse_failures(raw, df)
+    df['Amount'] = df['Amount'].fillna(0)
+    return df, failures
+
+
+# Distance driven since each vehicle's previous reading, for collection rows
+# sorted by vehicle and date. A meter that went backwards (a reset or a typo)
+# gets the average of the positive distances instead.
+def add_distance(df):
+    df['Distance'] = df.groupby('Vehicle No')['Meter Reading'].diff().fillna(0)
+    positive_avg_distance = df.loc[df['Distance'] > 0, 'Distance'].mean()
+    df.loc[df['Distance'] < 0, 'Distance'] = np.round(positive_avg_distance)
+    return df
+
+
+PARSERS = {"collection": parse_collection, "expense": parse_expense, "bank": parse_bank}
@@ -0,0 +1,126 @@
+import numpy as np
+import pandas as pd
+
+
+FLOW_COLUMNS = ["Date", "Investor Name", "Investment Amount", "Investment Type", "Comment", "Month-Year", "Source"]
+
+# Bank transaction types that move partner capital, with their sign
+BANK_FLOWS = {"Investment_Credit": 1.0, "Investment_Debit": -1.0}
+BANK_FLOW_TYPES = {"Investment_Credit": "Bank Credit", "Investment_Debit": "Bank Debit"}
+
+# XIRR search bracket (annual rate) and bisection steps
+XIRR_BOUNDS = (-0.99, 100.0)
+XIRR_STEPS = 100
+
+
+# ---------- Flows ----------
+# Manual investment sheet and bank investment credits/debits as one signed
+# ledger: money put in is positive, money taken out negative
+def investment_flows(investment_df, bank_df):
+    manual = investment_df.reindex(columns=FLOW_COLUMNS).assign(Source="Manual Sheet")
+    types = bank_df["Transaction Type"].astype(str).str.strip()
+    bank = bank_df[types.isin(list(BANK_FLOWS)).to_numpy()]
+    bank_types = types[types.isin(list(BANK_FLOWS))]
+    bank = pd.DataFrame({
+        "Date": bank["Date"],
+        "Investor Name": bank["Transaction By"],
+        "Investment Amount": pd.to_numeric(bank["Amount"], errors="coerce") * bank_types.map(BANK_FLOWS),
+        "Investment Type": bank_types.map(BANK_FLOW_TYPES),
+        "Comment": bank["Reason"],
+        "Month-Year": bank["Month-Year"],
+        "Source": "Bank Transaction",
+    })
+    return pd.concat([manual, bank], ignore_index=True)
+
+
+# Operating profit up to `as_of`: collections less sheet expenses and bank
+# expense debits (the Dashboard's total expense)
+def operating_profit(collection_df, expense_df, bank_df, as_of):
+    def dated_sum(df, date_col, amount_col, mask=None):
+        if df is None or df.empty:
+            return 0.0
+        dates = pd.to_datetime(df[date_col], errors="coerce")
+        keep = (dates <= as_of).to_numpy() & (True if mask is None else mask)
+        return float(pd.to_numeric(df[amount_col], errors="coerce")[keep].sum())
+
+    bank_expense = (bank_df["Transaction Type"].astype(str).str.strip() == "Expence_Debit").to_numpy()
+    return (dated_sum(collection_df, "Collection Date", "Amount")
+            - dated_sum(expense_df, "Date", "Amount Used")
+            - dated_sum(bank_df, "Date", "Amount", bank_expense))
+
+
+# ---------- XIRR ----------
+# Annual rate r per investor with sum(cf * (1 + r) ** years) = 0, where
+# `years` is how long before the valuation date each flow happened. Solved
+# for every investor at once by bisection on the shared bracket. `codes` maps
+# each flow to its investor; investors whose flows all have one sign get NaN.
+def xirr(codes, years, cash_flows, n_investors):
+    codes = np.asarray(codes, dtype=np.int64)
+    years = np.asarray(years, dtype=np.float64)
+    cash_flows = np.asarray(cash_flows, dtype=np.float64)
+
+    def npv(rates):
+        return np.bincount(codes, weights=cash_flows * (1 + rates[codes]) ** years, minlength=n_investors)
+
+    lo = np.full(n_investors, XIRR_BOUNDS[0])
+    hi = np.full(n_investors, XIRR_BOUNDS[1])
+    npv_lo = npv(lo)
+    bracketed = np.sign(npv_lo) != np.sign(npv(hi))
+    for _ in range(XIRR_STEPS):
+        mid = (lo + hi) / 2
+        npv_mid = npv(mid)
+        # Keep the half whose ends still straddle zero
+        lower = np.sign(npv_mid) == np.sign(npv_lo)
+        lo, npv_lo = np.where(lower, mid, lo), np.where(lower, npv_mid, npv_lo)
+        hi = np.where(lower, hi, mid)
+    return np.where(bracketed, (lo + hi) / 2, np.nan)
+
+
+# ---------- Investor returns ----------
+# Per investor, over all capital flows up to `as_of`:
+#   Capital Employed  time-weighted capital: each flow counts for the share of
+#                     the period (first flow to as_of) it was in the business
+#   Profit Share      operating profit split by capital employed
+#   XIRR              annual return of the investor's flows, with net capital
+#                     plus profit share as the value at as_of
+def investor_returns(flows, profit, as_of):
+    as_of = pd.Timestamp(as_of).normalize()
+    dates = pd.to_datetime(flows["Date"], errors="coerce")
+    amounts = pd.to_numeric(flows["Investment Amount"], errors="coerce")
+    keep = (dates.notna() & amounts.notna() & flows["Investor Name"].notna() & (dates <= as_of)).to_numpy()
+    dates, amounts = dates[keep], amounts[keep].to_numpy(dtype=np.float64)
+    if not len(amounts):
+        return pd.DataFrame(columns=["Investor Name", "Capital Invested", "Capital Withdrawn", "Net Capital",
+                                     "Capital Employed", "Capital Share (%)", "Profit Share", "XIRR (%)"])
+
+    codes, investors = pd.factorize(flows["Investor Name"][keep].astype(str).str.strip(), sort=True)
+    n = len(investors)
+    days_in = (as_of - dates).dt.days.to_numpy(dtype=np.float64)
+    horizon = max(days_in.max(), 1.0)
+
+    invested = np.bincount(codes, weights=np.where(amounts > 0, amounts, 0), minlength=n)
+    withdrawn = np.bincount(codes, weights=np.where(amounts < 0, -amounts, 0), minlength=n)
+    employed = np.bincount(codes, weights=amounts * days_in, minlength=n) / horizon
+    positive = np.clip(employed, 0, None)
+    share = positive / positive.sum() if positive.sum() > 0 else np.zeros(n)
+    profit_share = profit * share
+    net = invested - withdrawn
+
+    # Investor's view: money in is an outflow, the closing value an inflow
+    closing = net + profit_share
+    result = pd.DataFrame({
+        "Investor Name": investors,
+        "Capital Invested": invested,
+        "Capital Withdrawn": withdrawn,
+        "Net Capital": net,
+        "Capital Employed": employed,
+        "Capital Share (%)": share * 100,
+        "Profit Share": profit_share,
+        "XIRR (%)": xirr(
+            np.r_[codes, np.arange(n)],
+            np.r_[days_in, np.zeros(n)] / 365.0,
+            np.r_[-amounts, closing],
+            n,
+        ) * 100,
+    })
+    return result.sort_values("Capital Employed", ascending=False, ignore_index=True)
@@ -0,0 +1,212 @@
+from collections import defaultdict
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+
+from rent_targets import COMPANY_NAME
+from versioning import Latest, dataset_version, row_hashes
+
+
+# ---------- Contributions ----------
+# Each sheet row contributes one dated value to a (metric, person, month) total:
+#   collection  -> "collection" by Received By
+#   expense     -> "expense" by Expense By
+#   investment  -> "investment" by Investor Name
+#   bank        -> its Transaction Type by Transaction By
+# Collection rows also carry what the loss matrix needs (vehicle, driver).
+def contributions(name, df):
+    if df is None or df.empty:
+        return pd.DataFrame(columns=["metric", "person", "month", "value", "date"])
+
+    if name == "collection":
+        frame = pd.DataFrame({
+            "metric": "collection",
+            "person": df["Received By"],
+            "month": df["Month-Year"],
+            "value": pd.to_numeric(df["Amount"], errors="coerce"),
+            "date": pd.to_datetime(df["Collection Date"], errors="coerce").dt.normalize(),
+            "vehicle": df["Vehicle No"].astype(str).str.strip(),
+            "driver": df["Name"],
+        })
+    elif name == "expense":
+        frame = pd.DataFrame({"metric": "expense", "person": df["Expense By"], "month": df["Month-Year"],
+                              "value": pd.to_numeric(df["Amount Used"], errors="coerce"),
+                              "date": pd.to_datetime(df["Date"], errors="coerce")})
+    elif name == "investment":
+        frame = pd.DataFrame({"metric": "investment", "person": df["Investor Name"], "month": df["Month-Year"],
+                              "value": pd.to_numeric(df["Investment Amount"], errors="coerce"),
+                              "date": pd.to_datetime(df["Date"], errors="coerce")})
+    else:
+        frame = pd.DataFrame({"metric": df["Transaction Type"].astype(str).str.strip(),
+                              "person": df["Transaction By"], "month": df["Month-Year"],
+                              "value": pd.to_numeric(df["Amount"], errors="coerce"),
+                              "date": pd.to_datetime(df["Date"], errors="coerce")})
+
+    frame["person"] = frame["person"].fillna("").astype(str)
+    frame["month"] = frame["month"].fillna("").astype(str)
+    frame["value"] = frame["value"].fillna(0)
+    return frame.reset_index(drop=True)
+
+
+# ---------- Accumulator ----------
+# Running totals per (metric, person, month). A new data version that only
+# appends rows is applied as a delta. Edited or removed rows are patched
+# when the sheet's row changes since this state's version are known (see
+# change_log): only the months they touch are summed again. Otherwise any
+# edit triggers a full recompute. Loss totals are kept per date, because the
+# loss matrix couples rows of the same driver and date: only the dates
+# touched by new or changed rows are re-run through the loss logic.
+class KpiAccumulator:
+    def __init__(self):
+        self.totals = defaultdict(float)
+        self.hashes = {}
+        self.loss_by_date = {}  # date -> (total loss, company loss)
+        self.versions = {}  # sheet -> dataset version these totals are for
+        self.metrics = {}  # sheet -> metrics its rows contribute to
+        self.rules = None  # rent target version the losses are priced with
+        self.last_refresh = {"mode": None, "rows": 0, "seconds": 0.0}
+
+    def copy(self):
+        other = KpiAccumulator()
+        other.totals = defaultdict(float, self.totals)
+        other.hashes = dict(self.hashes)
+        other.loss_by_date = dict(self.loss_by_date)
+        other.versions = dict(self.versions)
+        other.metrics = {name: set(metrics) for name, metrics in self.metrics.items()}
+        other.rules = self.rules
+        return other
+
+    def _add(self, contrib):
+        grouped = contrib.groupby(["metric", "person", "month"], sort=False)["value"].sum()
+        for key, value in grouped.items():
+            self.totals[key] += value
+
+    def _apply_losses(self, collection, dates, loss_fn):
+        for day in dates:
+            old = self.loss_by_date.pop(day, None)
+            if old is not None:
+                month = day.strftime("%Y-%m")
+                self.totals[("loss_total", "", month)] -= old[0]
+                self.totals[("loss_company", "", month)] -= old[1]
+
+        rows = collection[collection["date"].isin(dates)]
+        if rows.empty:
+            return
+        lm = loss_fn(pd.DataFrame({
+            "Collection Date": rows["date"],
+            "Vehicle No": rows["vehicle"],
+            "Amount": rows["value"],
+            "Name": rows["driver"],
+        }))
+        if lm.empty:
+            return
+        company = lm["Amount"].where(lm["Name"] == COMPANY_NAME, 0)
+        per_date = pd.DataFrame({"total": lm["Amount"], "company": company}).groupby(lm["Collection Date"]).sum()
+        for day, (total, company_loss) in per_date.iterrows():
+            self.loss_by_date[day] = (total, company_loss)
+            month = day.strftime("%Y-%m")
+            self.totals[("loss_total", "", month)] += total
+            self.totals[("loss_company", "", month)] += company_loss
+
+    # Sum again the months a sheet's changes touched, and re-run the losses
+    # of the dates they touched
+    def _patch(self, name, contrib, changes, loss_fn):
+        months = changes.months
+        metrics = self.metrics.get(name, set()) | set(contrib["metric"])
+        for key in [k for k in self.totals if k[0] in metrics and k[2] in months]:
+            del self.totals[key]
+        touched = contrib[contrib["month"].isin(months)]
+        self._add(touched)
+        if name == "collection":
+            self._apply_losses(contrib, changes.dates, loss_fn)
+        return len(touched)
+
+    # Changes are usable when every sheet either kept this state's version or
+    # has changes from exactly that version to the new one
+    def _patchable(self, versions, changes):
+        if self.last_refresh["mode"] is None or not changes:
+            return False
+        return all(
+            versions[name] == self.versions.get(name) or (
+                changes.get(name) is not None
+                and changes[name].from_version == self.versions.get(name)
+                and changes[name].to_version == versions[name]
+            )
+            for name in versions
+        )
+
+    # New accumulator for `frames` (name -> DataFrame), reusing this one's
+    # state when possible. `changes` (name -> change_log.SheetChanges) lets
+    # edits and deletions be patched instead of recomputed. `rules` is the
+    # version of the rent targets loss_fn prices with; new targets reprice
+    # every date, so they force a full recompute.
+    def refresh(self, frames, loss_fn, changes=None, rules=None):
+        start = perf_counter()
+        contribs = {name: contributions(name, df) for name, df in frames.items()}
+        hashes = {name: row_hashes(c) for name, c in contribs.items()}
+        versions = {name: dataset_version(df) for name, df in frames.items()}
+
+        history_changed = self.last_refresh["mode"] is None or rules != self.rules or any(
+            name not in self.hashes or not np.isin(self.hashes[name], hashes[name]).all()
+            for name in contribs
+        )
+
+        if history_changed and rules == self.rules and self._patchable(versions, changes):
+            state = self.copy()
+            n_rows = sum(
+                state._patch(name, contrib, changes[name], loss_fn)
+                for name, contrib in contribs.items() if versions[name] != self.versions.get(name)
+            )
+            mode = "patch"
+        elif history_changed:
+            state = KpiAccumulator()
+            for contrib in contribs.values():
+                state._add(contrib)
+            collection = contribs.get("collection")
+            if collection is not None and not collection.empty:
+                state._apply_losses(collection, set(collection["date"].dropna()), loss_fn)
+            mode, n_rows = "full", sum(len(c) for c in contribs.values())
+        else:
+            state = self.copy()
+            n_rows = 0
+            for name, contrib in contribs.items():
+                delta = contrib[~np.isin(hashes[name], self.hashes[name])]
+                n_rows += len(delta)
+                state._add(delta)
+                if name == "collection" and not delta.empty:
+                    state._apply_losses(contrib, set(delta["date"].dropna()), loss_fn)
+            mode = "delta"
+
+        state.hashes = hashes
+        state.versions = versions
+        state.metrics = {name: set(c["metric"]) for name, c in contribs.items()}
+        state.rules = rules
+        state.last_refresh = {"mode": mode, "rows": n_rows, "seconds": perf_counter() - start}
+        return state
+
+    # ---------- Queries ----------
+    def total(self, metric, person=None, month=None):
+        return sum(
+            value for (m, p, mo), value in self.totals.items()
+            if m == metric and (person is None or p == person) and (month is None or mo == month)
+        )
+
+    # (total, company) loss over the dates in [start, end]
+    def losses_between(self, start, end):
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        picked = [v for day, v in self.loss_by_date.items() if start <= day <= end]
+        return sum(v[0] for v in picked), sum(v[1] for v in picked)
+
+    def latest_month(self, metric="collection"):
+        months = [mo for (m, _, mo) in self.totals if m == metric and mo]
+        return max(months) if months else None
+
+
+# ---------- Per-process state ----------
+# Totals of the last load; a load that appends rows is applied on top of them
+_latest = Latest(KpiAccumulator())
+
+
+def refresh_kpis(frames, loss_fn, changes=None, rules=None):
+    return _latest.advance(lambda kpis: kpis.refresh(frames, loss_fn, changes, rules))
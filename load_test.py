@@ -0,0 +1,308 @@
+# Load test: N simulated users against one app process.
+#
+#   python load_test.py --users 8 --iterations 3
+#
+# Each user is a Streamlit AppTest session driven from its own thread: it
+# logs in (bcrypt included), then walks the pages and changes a filter on
+# each. All sessions share this process, its caches and its GIL, like
+# sessions of a real server (websocket and browser rendering time are not
+# included; reruns are serialized, see serialize_runs). Data comes from a
+# generated local stand-in for the Google sheets (see
+# connections.LOCAL_DATA_DIR). Reports p50/p95/p99 rerun latency per page and
+# action, plus process CPU and memory.
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "vegi.py")
+
+PAGES = [
+    "Dashboard", "Monthly Summary", "Grouped Data", "Expenses", "Investment", "Collection Data",
+    "Bank Transaction", "Performance", "Driver Scorecard", "Fleet Utilization", "Vehicle P&L", "Rent Targets", "Statements", "Reconciliation", "Data Quality", "Change Log", "SQL Query",
+]
+PARTNERS = ["Govind Kumar", "Kumar Gaurav"]
+PASSWORD = "load-test"
+
+
+# ---------- Local data stand-in ----------
+# One CSV per worksheet, named after the worksheet, in the layout the sheets export
+def make_dataset(data_dir, vehicles=30, days=400, seed=0, bcrypt_rounds=12):
+    import bcrypt
+
+    rng = np.random.default_rng(seed)
+    os.makedirs(data_dir, exist_ok=True)
+    start = date.today() - timedelta(days=days - 1)
+    drivers = [f"Driver {i:02d}" for i in range(vehicles + 5)]
+
+    rows = []
+    for v in range(vehicles):
+        meter = 1000
+        for d in range(days):
+            if rng.random() < 0.08:
+                continue
+            amount = int(rng.choice([0, 150, 300, 300, 300, 350]))
+            meter += int(rng.integers(0, 120))
+            rows.append({
+                "Collection Date": (start + timedelta(days=d)).strftime("%d/%m/%Y"),
+                "Vehicle No": f"BR01LT{v:04d}",
+                "Amount": amount,
+                "Meter Reading": meter,
+                "Name": drivers[(v + d // 45) % len(drivers)] if amount else "Zero Collection",
+                "Received By": PARTNERS[int(rng.integers(0, 2))],
+            })
+    pd.DataFrame(rows).to_csv(os.path.join(data_dir, "collection.csv"), index=False)
+
+    n = days
+    expense_dates = [start + timedelta(days=int(d)) for d in rng.integers(0, days, n)]
+    pd.DataFrame({
+        "Date": [d.strftime("%d/%m/%Y") for d in expense_dates],
+        "Vehicle No": [f"BR01LT{v:04d}" for v in rng.integers(0, vehicles, n)],
+        "Reason of Expense": rng.choice(["Tyre change", "Battery service", "Insurance", "Repair"], n),
+        "Amount Used": rng.integers(100, 3000, n),
+        "Any Bill": "",
+        "Expense By": rng.choice(PARTNERS, n),
+    }).to_csv(os.path.join(data_dir, "expense.csv"), index=False)
+
+    pd.DataFrame({
+        "Date": [(start + timedelta(days=d)).strftime("%d/%m/%Y") for d in range(0, days, 90)],
+        "Investment Type": "Cash",
+        "Amount": 100000,
+        "Comment": "load test",
+        "Received From": [PARTNERS[i % 2] for i in range(0, days, 90)],
+    }).to_csv(os.path.join(data_dir, "Investment_Details.csv"), index=False)
+
+    types = ["Collection_Credit", "Investment_Credit", "Expence_Debit", "Settlement_Credit",
+             "Settlement_Debit", "Investment_Debit", "Payment_Credit"]
+    n = days // 2
+    pd.DataFrame({
+        "Date": [(start + timedelta(days=2 * i)).strftime("%d/%m/%Y") for i in range(n)],
+        "Transaction By": rng.choice(PARTNERS, n),
+        "Transaction Type": rng.choice(types, n),
+        "Reason": "load test",
+        "Amount": rng.integers(500, 20000, n),
+        "Bill": "",
+    }).to_csv(os.path.join(data_dir, "Bank_Transaction.csv"), index=False)
+
+    password_hash = bcrypt.hashpw(PASSWORD.encode(), bcrypt.gensalt(rounds=bcrypt_rounds)).decode()
+    pd.DataFrame({
+        "Username": [f"user{i}" for i in range(100)],
+        "Password": password_hash,
+        "Role": "admin",
+        "Name": [f"Load User {i}" for i in range(100)],
+    }).to_csv(os.path.join(data_dir, "Sheet1.csv"), index=False)
+
+
+# Secrets the app reads at start; the IDs are unused with a local data directory
+def write_secrets(work_dir):
+    os.makedirs(os.path.join(work_dir, ".streamlit"), exist_ok=True)
+    sheets = ["AUTH_SHEET_ID", "COLLECTION_SHEET_ID", "EXPENSE_SHEET_ID", "INVESTMENT_SHEET_ID", "BANK_SHEET_ID"]
+    with open(os.path.join(work_dir, ".streamlit", "secrets.toml"), "w") as f:
+        f.write("[sheets]\n" + "".join(f'{s} = "local"\n' for s in sheets))
+        f.write('[gcp_service_account]\nprivate_key = "unused"\n')
+
+
+# ---------- Process sampling ----------
+def rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class ProcessSampler(threading.Thread):
+    def __init__(self, interval=0.2):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.samples = []
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.is_set():
+            self.samples.append(rss_mb())
+            self._done.wait(self.interval)
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+
+# ---------- Simulated user ----------
+# Filter change per page: the Dashboard range radio, otherwise the first
+# selectbox on the page that has more than one option
+def change_filter(at, page):
+    if page == "Dashboard" and at.main.radio:
+        return at.main.radio[0].set_value("1 Year")
+    for box in at.main.selectbox:
+        if len(box.options) > 1:
+            return box.select_index(1)
+    return None
+
+
+# AppTest swaps process-wide state on every run (the Runtime singleton, the
+# pages manager, secrets, config), so two of its runs cannot overlap. Reruns
+# from all users go through one lock: a rerun's latency includes the time it
+# queued behind other users' reruns, like a server whose CPU-bound reruns
+# contend for the GIL, but without the overlap a real server would get from
+# I/O and GIL-releasing numpy/pandas code. Treat the numbers as an upper bound.
+_run_lock = threading.Lock()
+
+
+def serialize_runs():
+    from streamlit.testing.v1 import AppTest
+
+    if getattr(AppTest._run, "_serialized", False):
+        return
+    run = AppTest._run
+
+    def locked_run(self, *args, **kwargs):
+        with _run_lock:
+            return run(self, *args, **kwargs)
+
+    locked_run._serialized = True
+    AppTest._run = locked_run
+
+
+def simulate_user(user, args, record):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP_PATH, default_timeout=args.timeout)
+
+    def timed(action, step):
+        start = time.perf_counter()
+        try:
+            step()
+            error = at.exception[0].message if at.exception else None
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        record(action, time.perf_counter() - start, error)
+
+    timed("Login screen", at.run)
+    at.text_input[0].input(f"user{user}")
+    at.text_input[1].input(PASSWORD)
+    timed("Login", lambda: at.button[0].click().run())
+
+    for _ in range(args.iterations):
+        for page in args.pages:
+            timed(page, lambda: at.sidebar.radio[0].set_value(page).run())
+            widget = change_filter(at, page)
+            if widget is not None:
+                timed(f"{page} · filter", widget.run)
+
+
+def run_load_test(args):
+    samples = defaultdict(list)
+    errors = defaultdict(int)
+    messages = defaultdict(int)  # (action, first line of the error) -> count
+    lock = threading.Lock()
+
+    def record(action, seconds, error):
+        with lock:
+            samples[action].append(seconds)
+            if error:
+                errors[action] += 1
+                messages[(action, str(error).strip().splitlines()[0][:160])] += 1
+
+    serialize_runs()
+    sampler = ProcessSampler()
+    sampler.start()
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+
+    threads = []
+    for user in range(args.users):
+        thread = threading.Thread(target=simulate_user, args=(user, args, record), name=f"user-{user}")
+        thread.start()
+        threads.append(thread)
+        time.sleep(args.ramp_up / max(args.users, 1))
+    for thread in threads:
+        thread.join()
+
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    sampler.stop()
+
+    rows = []
+    for action, values in samples.items():
+        ms = np.array(values) * 1000
+        rows.append({
+            "Action": action, "Runs": len(ms), "Errors": errors[action],
+            "p50 (ms)": np.percentile(ms, 50), "p95 (ms)": np.percentile(ms, 95),
+            "p99 (ms)": np.percentile(ms, 99), "Max (ms)": ms.max(),
+        })
+    order = {a: i for i, a in enumerate(["Login screen", "Login"] + [p for page in PAGES for p in (page, f"{page} · filter")])}
+    report = pd.DataFrame(rows).sort_values("Action", key=lambda s: s.map(order)).reset_index(drop=True)
+    total_runs = int(report["Runs"].sum())
+    summary = {
+        "users": args.users,
+        "reruns": total_runs,
+        "errors": int(report["Errors"].sum()),
+        "wall_seconds": wall,
+        "reruns_per_second": total_runs / wall if wall else 0.0,
+        "cpu_seconds": cpu,
+        "cpu_utilization_pct": cpu / wall * 100 if wall else 0.0,
+        "rss_peak_mb": max(sampler.samples, default=rss_mb()),
+        "rss_mean_mb": float(np.mean(sampler.samples)) if sampler.samples else rss_mb(),
+        "error_messages": [{"action": a, "error": m, "count": c} for (a, m), c in messages.items()],
+    }
+    return report, summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the app with N concurrent simulated users.")
+    parser.add_argument("--users", type=int, default=4, help="concurrent simulated users")
+    parser.add_argument("--iterations", type=int, default=2, help="passes over the pages per user")
+    parser.add_argument("--pages", nargs="+", default=PAGES, choices=PAGES, metavar="PAGE", help="pages to visit")
+    parser.add_argument("--ramp-up", type=float, default=1.0, help="seconds over which users start")
+    parser.add_argument("--vehicles", type=int, default=30, help="vehicles in the generated data")
+    parser.add_argument("--days", type=int, default=400, help="days of generated collection history")
+    parser.add_argument("--bcrypt-rounds", type=int, default=12, help="cost of the generated password hashes")
+    parser.add_argument("--data-dir", help="existing local data directory (default: generate one)")
+    parser.add_argument("--timeout", type=float, default=300, help="seconds before a single rerun fails")
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args(argv)
+    if args.json:
+        args.json = os.path.abspath(args.json)
+
+    work_dir = tempfile.mkdtemp(prefix="vayuvolt-load-")
+    data_dir = args.data_dir or os.path.join(work_dir, "data")
+    if not args.data_dir:
+        print(f"Generating {args.vehicles} vehicles x {args.days} days into {data_dir} ...")
+        make_dataset(data_dir, args.vehicles, args.days, bcrypt_rounds=args.bcrypt_rounds)
+
+    # The app reads its stand-in data, secrets and caches relative to here
+    os.environ["VAYUVOLT_DATA_DIR"] = os.path.abspath(data_dir)
+    write_secrets(work_dir)
+    os.chdir(work_dir)
+    sys.path.insert(0, os.path.dirname(APP_PATH))
+
+    print(f"Running {args.users} users x {args.iterations} iterations over {len(args.pages)} pages ...")
+    report, summary = run_load_test(args)
+
+    with pd.option_context("display.width", 200, "display.float_format", "{:,.0f}".format):
+        print(report.to_string(index=False))
+    print(
+        f"\n{summary['reruns']:,} reruns ({summary['errors']} with errors) in {summary['wall_seconds']:.1f}s"
+        f" = {summary['reruns_per_second']:.2f} reruns/s"
+        f"\nCPU {summary['cpu_seconds']:.1f}s ({summary['cpu_utilization_pct']:.0f}% of one core)"
+        f" · RSS peak {summary['rss_peak_mb']:.0f} MB, mean {summary['rss_mean_mb']:.0f} MB"
+    )
+    for e in summary["error_messages"]:
+        print(f"  {e['count']}x {e['action']}: {e['error']}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"summary": summary, "actions": report.to_dict(orient="records")}, f, indent=2)
+    return 0 if summary["errors"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,269 @@
+import functools
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import resource_cache
+import view_cache
+
+
+# Prometheus exporters, both off unless set: an HTTP endpoint serving
+# /metrics on this port, and a text file rewritten every METRICS_FILE_INTERVAL
+# seconds (for the node exporter's textfile collector)
+METRICS_PORT = int(os.environ.get("VAYUVOLT_METRICS_PORT", "0"))
+METRICS_FILE = os.environ.get("VAYUVOLT_METRICS_FILE")
+METRICS_FILE_INTERVAL = float(os.environ.get("VAYUVOLT_METRICS_FILE_INTERVAL", "15"))
+
+# A session counts as active when it reran within this many seconds
+ACTIVE_SESSION_SECONDS = 300
+
+# Upper bounds of the histogram buckets, in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in list(zip(names, values)) + list(extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# ---------- Metrics ----------
+# Minimal Prometheus counters, gauges and histograms with labels. Updates are
+# a dict lookup and an add under one lock, cheap enough for every fetch and
+# rerun. `collect`, when given, is called at scrape time for values the app
+# already keeps elsewhere (label values tuple -> value).
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name, help_text, labels=(), collect=None):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self.collect = collect
+        self._lock = threading.Lock()
+        self._values = defaultdict(int)
+        registry.append(self)
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        if self.collect is not None:
+            values.update(self.collect())
+        return [(self.name, _labels(self.label_names, key), value) for key, value in sorted(values.items())]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines += [f"{name}{labels} {_number(value)}" for name, labels, value in self.samples()]
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] += amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [bucket counts..., sum, count]
+
+    def observe(self, value, *labels):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            if i < len(self.buckets):
+                series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    # Seconds spent in the with-block
+    def time(self, *labels):
+        return _Timer(self, labels)
+
+    def samples(self):
+        with self._lock:
+            series = {labels: list(values) for labels, values in self._series.items()}
+        rows = []
+        for labels, values in sorted(series.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets, values):
+                cumulative += n
+                rows.append((f"{self.name}_bucket", _labels(self.label_names, labels, [("le", _number(float(bound)))]),
+                             cumulative))
+            rows.append((f"{self.name}_bucket", _labels(self.label_names, labels, [("le", "+Inf")]), values[-1]))
+            rows.append((f"{self.name}_sum", _labels(self.label_names, labels), values[-2]))
+            rows.append((f"{self.name}_count", _labels(self.label_names, labels), values[-1]))
+        return rows
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram, self.labels = histogram, labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+        return False
+
+
+registry = []
+
+
+def render():
+    return "\n".join(metric.render() for metric in registry) + "\n"
+
+
+# ---------- Sessions ----------
+_sessions = {}  # session id -> last rerun (monotonic seconds)
+_sessions_lock = threading.Lock()
+
+
+def session_seen(session_id):
+    now = time.monotonic()
+    with _sessions_lock:
+        _sessions[session_id] = now
+        # Forget sessions long gone, so the map stays the size of the active set
+        if len(_sessions) > 64:
+            for sid in [s for s, seen in _sessions.items() if now - seen > ACTIVE_SESSION_SECONDS]:
+                del _sessions[sid]
+
+
+def _active_sessions():
+    now = time.monotonic()
+    with _sessions_lock:
+        return {(): sum(now - seen <= ACTIVE_SESSION_SECONDS for seen in _sessions.values())}
+
+
+# ---------- App metrics ----------
+fetch_seconds = Histogram("vayuvolt_sheet_fetch_seconds", "Time to download a sheet export (gviz CSV or local file).",
+                          ["sheet", "source"])
+fetch_bytes = Counter("vayuvolt_sheet_fetch_bytes_total", "Bytes of sheet exports downloaded.", ["sheet", "source"])
+fetch_errors = Counter("vayuvolt_sheet_fetch_errors_total", "Sheet export downloads that failed.", ["sheet", "source"])
+parse_seconds = Histogram("vayuvolt_csv_parse_seconds", "Time to parse a sheet export into a frame.", ["sheet"])
+dataset_rows = Gauge("vayuvolt_dataset_rows", "Rows in the last load of each dataset.", ["sheet"])
+cache_lookups = Counter("vayuvolt_cache_lookups_total", "Calls to cached loaders and derived artifacts.", ["function"])
+cache_misses = Counter("vayuvolt_cache_misses_total", "Cached calls that had to compute their value.", ["function"])
+rerun_seconds = Histogram("vayuvolt_rerun_seconds", "Full script reruns, by page.", ["page"])
+view_cache_hits = Counter("vayuvolt_view_cache_hits_total", "View cache hits, by page.", ["page"],
+                          collect=lambda: {(row.Page,): row.Hits for row in view_cache.views.stats().itertuples()})
+view_cache_misses = Counter("vayuvolt_view_cache_misses_total", "View cache misses, by page.", ["page"],
+                            collect=lambda: {(row.Page,): row.Misses for row in view_cache.views.stats().itertuples()})
+view_cache_bytes = Gauge("vayuvolt_view_cache_bytes", "Memory held by cached views.",
+                         collect=lambda: {(): view_cache.views.bytes})
+resource_cache_bytes = Gauge("vayuvolt_resource_cache_bytes", "Memory held by cached loaders and artifacts, by namespace.",
+                             ["namespace"], collect=lambda: {(row.Namespace,): int(row.MB * 2**20)
+                                                             for row in resource_cache.resources.stats().itertuples()})
+resource_cache_evictions = Counter("vayuvolt_resource_cache_evictions_total",
+                                   "Cached loaders and artifacts evicted to stay within the memory budget.",
+                                   ["namespace"], collect=lambda: {(row.Namespace,): row.Evictions
+                                                                   for row in resource_cache.resources.stats().itertuples()})
+active_sessions = Gauge("vayuvolt_active_sessions", f"Sessions that reran in the last {ACTIVE_SESSION_SECONDS}s.",
+                        collect=_active_sessions)
+
+
+# A cache decorator (ResourceCache.memoize, st.cache_resource) with its
+# lookups and misses counted per function. Misses are counted inside the cached function, so they only
+# tick when the cache computes; the wrapper keeps the function's signature,
+# which the cache uses for its unhashed (_-prefixed) arguments.
+def counted_cache(cache, fn):
+    name = fn.__name__
+
+    @functools.wraps(fn)
+    def compute(*args, **kwargs):
+        cache_misses.inc(name)
+        return fn(*args, **kwargs)
+
+    cached = cache(compute)
+
+    @functools.wraps(fn)
+    def lookup(*args, **kwargs):
+        cache_lookups.inc(name)
+        return cached(*args, **kwargs)
+
+    lookup.clear = cached.clear
+    return lookup
+
+
+# ---------- Exporters ----------
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass  # scrapes every few seconds would flood the server log
+
+
+def write_file(path=METRICS_FILE):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(render())
+    os.replace(tmp_path, path)
+
+
+def _write_forever(path, interval):
+    while True:
+        try:
+            write_file(path)
+        except OSError:
+            pass  # an unwritable path should not take the app down; retried next interval
+        time.sleep(interval)
+
+
+_started = {"server": None, "writer": None}
+_start_lock = threading.Lock()
+
+
+# Start the configured exporters, once per process; returns the HTTP server
+# (None when no port is set)
+def start_exporters(port=METRICS_PORT, path=METRICS_FILE, interval=METRICS_FILE_INTERVAL):
+    with _start_lock:
+        if port and _started["server"] is None:
+            try:
+                server = ThreadingHTTPServer(("0.0.0.0", port), _Handler)
+            except OSError:
+                server = None  # port taken (another server process already exports)
+            if server is not None:
+                threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+                _started["server"] = server
+        if path and _started["writer"] is None:
+            _started["writer"] = threading.Thread(target=_write_forever, args=(path, interval),
+                                                  name="metrics-file", daemon=True)
+            _started["writer"].start()
+        return _started["server"]
@@ -0,0 +1,136 @@
+import numpy as np
+import pandas as pd
+
+
+# Dimensions and measures of the collection cube
+DIMENSIONS = ["Name", "Vehicle No", "Received By", "Month-Year"]
+MEASURES = ["Amount", "Distance", "Total Collections"]
+
+# Time levels the Month-Year dimension rolls up to
+PERIODS = ["Month", "Quarter", "Year"]
+TIME = "Month-Year"
+
+
+def _period_labels(months, period):
+    months = pd.Series(months, dtype="str")
+    if period == "Quarter":
+        return months.str[:4] + "-Q" + ((months.str[5:7].astype("float") - 1) // 3 + 1).astype("Int64").astype("str")
+    if period == "Year":
+        return months.str[:4]
+    return months
+
+
+# ---------- Cube ----------
+# The collection sheet summed over Name x Vehicle No x Received By x
+# Month-Year, built once per data version. Each dimension is stored as
+# integer codes into its labels; only the combinations that occur are kept.
+# Grouping, slicing and period roll-ups are bincounts over these cells, so a
+# page never touches the raw rows again.
+class CollectionCube:
+    def __init__(self):
+        self.labels = {d: np.array([], dtype=object) for d in DIMENSIONS}
+        self.codes = {d: np.array([], dtype=np.int64) for d in DIMENSIONS}
+        self.measures = {m: np.array([], dtype=np.float64) for m in MEASURES}
+        self.period_codes = {}  # period -> (month code -> period code, period labels)
+
+    @classmethod
+    def build(cls, df):
+        cube = cls()
+        if df is None or df.empty:
+            return cube
+        codes = {}
+        for d in DIMENSIONS:
+            codes[d], labels = pd.factorize(df[d], sort=True, use_na_sentinel=False)
+            cube.labels[d] = np.asarray(labels, dtype=object)
+        cells = pd.DataFrame(codes).assign(**{
+            "Amount": pd.to_numeric(df["Amount"], errors="coerce").fillna(0).to_numpy(),
+            "Distance": pd.to_numeric(df["Distance"], errors="coerce").fillna(0).to_numpy(),
+            "Total Collections": df["Collection Date"].notna().to_numpy(dtype=np.float64),
+        }).groupby(DIMENSIONS, sort=False)[MEASURES].sum().reset_index()
+
+        cube.codes = {d: cells[d].to_numpy(dtype=np.int64) for d in DIMENSIONS}
+        cube.measures = {m: cells[m].to_numpy(dtype=np.float64) for m in MEASURES}
+        months = pd.Series(cube.labels[TIME])
+        for period in PERIODS:
+            period_codes, period_labels = pd.factorize(_period_labels(months, period).where(months.notna()),
+                                                       sort=True, use_na_sentinel=False)
+            cube.period_codes[period] = (period_codes, np.asarray(period_labels, dtype=object))
+        return cube
+
+    @property
+    def cells(self):
+        return len(self.measures["Amount"])
+
+    # Codes and labels of a dimension at a time level (only Month-Year has levels)
+    def _dimension(self, dimension, period="Month"):
+        if dimension == TIME:
+            to_period, labels = self.period_codes[period]
+            return to_period[self.codes[TIME]], labels
+        return self.codes[dimension], self.labels[dimension]
+
+    # Labels a dimension takes (at a time level), for filter widgets
+    def members(self, dimension, period="Month"):
+        if not self.cells:
+            return []
+        _, labels = self._dimension(dimension, period)
+        return [label for label in labels if not pd.isna(label)]
+
+    # ---------- Slice ----------
+    # Cells matching every filter: {dimension: label or list of labels}
+    def _mask(self, filters, period):
+        mask = np.ones(self.cells, dtype=bool)
+        for dimension, wanted in (filters or {}).items():
+            codes, labels = self._dimension(dimension, period)
+            wanted = [wanted] if np.isscalar(wanted) else list(wanted)
+            mask &= np.isin(codes, np.flatnonzero(np.isin(labels, wanted)))
+        return mask
+
+    # ---------- Group ----------
+    # Measures summed by one or two dimensions over the sliced cells, plus the
+    # per-collection averages. Groups with a blank label are dropped, like
+    # pandas groupby does.
+    def group(self, by, period="Month", filters=None):
+        by = [by] if isinstance(by, str) else list(by)
+        mask = self._mask(filters, period)
+        keys = np.zeros(int(mask.sum()), dtype=np.int64)
+        sizes = []
+        for dimension in by:
+            codes, labels = self._dimension(dimension, period)
+            keys = keys * len(labels) + codes[mask]
+            sizes.append(len(labels))
+        present, keys = np.unique(keys, return_inverse=True)
+
+        grouped = pd.DataFrame(
+            {d: labels for d, labels in zip(by, self._unravel(present, by, sizes, period))}
+        )
+        for m in MEASURES:
+            grouped[m] = np.bincount(keys, weights=self.measures[m][mask], minlength=len(present))
+        grouped["Total Collections"] = grouped["Total Collections"].astype("int64")
+        grouped = grouped.dropna(subset=by).reset_index(drop=True)
+        count = grouped["Total Collections"].where(grouped["Total Collections"] > 0)
+        grouped["Avg Amount"] = grouped["Amount"] / count
+        grouped["Avg Distance"] = grouped["Distance"] / count
+        return grouped
+
+    def _unravel(self, keys, by, sizes, period):
+        positions = np.unravel_index(keys, sizes) if len(by) > 1 else (keys,)
+        return [self._dimension(d, period)[1][p] for d, p in zip(by, positions)]
+
+    # ---------- Pivot ----------
+    # One measure with `rows` down and `columns` across
+    def pivot(self, rows, columns, measure="Amount", period="Month", filters=None):
+        grouped = self.group([rows, columns], period, filters)
+        return grouped.pivot_table(index=rows, columns=columns, values=measure, aggfunc="sum", fill_value=0)
+
+
+# Top-k rows by `measure` using partial selection: argpartition finds the k
+# largest, and only those are sorted
+def top_k(frame, measure, k, largest=True):
+    if len(frame) <= k:
+        return frame.sort_values(measure, ascending=not largest)
+    values = frame[measure].to_numpy(dtype=np.float64)
+    values = -values if largest else values
+    values = np.where(np.isnan(values), np.inf, values)
+    picked = np.argpartition(values, k - 1)[:k]
+    picked = picked[np.argsort(values[picked], kind="stable")]
+    return frame.iloc[picked]
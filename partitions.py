@@ -0,0 +1,254 @@
+import gzip
+import os
+import pickle
+import threading
+from time import perf_counter
+from urllib.parse import quote
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+import ingest
+
+
+# Closed months of the history sheets, kept on disk one partition per month
+PARTITION_DIR = os.environ.get("VAYUVOLT_PARTITIONS", os.path.join(".cache", "partitions"))
+
+# Closed months still re-fetched along with the open one, for late entries
+# and corrections. Anything older is frozen until the history is rebuilt.
+BACKFILL_MONTHS = int(os.environ.get("VAYUVOLT_BACKFILL_MONTHS", "1"))
+
+# Frozen months are fetched again in full once their partitions are this many
+# days old (0: only on an explicit rebuild), so edits and deletions in closed
+# months do reach the app, the change log and the KPIs, just late
+HISTORY_MAX_AGE_DAYS = float(os.environ.get("VAYUVOLT_HISTORY_MAX_AGE_DAYS", "7"))
+
+UNDATED = "undated"
+
+
+# Spreadsheet column letter of a 0-based column position (0 -> A, 26 -> AA)
+def column_letter(i):
+    letters = ""
+    i += 1
+    while i:
+        i, r = divmod(i - 1, 26)
+        letters = chr(65 + r) + letters
+    return letters
+
+
+def _write(path, obj):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with gzip.open(tmp_path, "wb", compresslevel=6) as f:
+        pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def _read(path):
+    try:
+        with gzip.open(path, "rb") as f:
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return None
+
+
+# Frozen partitions are Arrow IPC files (zstd), read back as Arrow tables.
+# Date columns are stored as dates even when all blank (the undated rows).
+def _write_table(path, frame, date_column):
+    table = pa.Table.from_pandas(frame, preserve_index=True)
+    i = table.column_names.index(date_column)
+    table = table.set_column(i, date_column, table[date_column].cast(pa.date32()))
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with pa.ipc.new_file(tmp_path, table.schema, options=pa.ipc.IpcWriteOptions(compression="zstd")) as writer:
+        writer.write_table(table)
+    os.replace(tmp_path, path)
+    return table
+
+
+def _read_table(path):
+    try:
+        with pa.memory_map(path) as source:
+            return pa.ipc.open_file(source).read_all()
+    except (OSError, pa.ArrowInvalid):
+        return None
+
+
+# ---------- Partitioned sheet ----------
+# One history sheet stored as month partitions. Closed months (older than the
+# open month plus the backfill window) are parsed once, frozen to disk, and
+# afterwards only read back; each load fetches and parses just the rows dated
+# on or after the first month that is not frozen.
+#
+# Frozen months save the fetch and the parse, not the derived figures: the
+# KPI accumulator and the reports are computed from the combined frame, with
+# their own caches keyed on its version.
+#
+# Limitation: between full fetches, an edit or deletion in a frozen month is
+# not seen at all. A full fetch happens on the first load, when the sheet's
+# columns change, when the history is older than HISTORY_MAX_AGE_DAYS and on
+# rebuild() (the app's "Rebuild history" button).
+#
+# `parse(raw)` turns fetched sheet rows into typed rows and returns them with
+# the cells it could not parse (see data_quality.parse_failures). Index labels
+# are sheet positions (0 = first data row), as with a plain read_csv.
+class PartitionedSheet:
+    def __init__(self, name, date_column, amount_column, path=PARTITION_DIR):
+        self.name = name
+        self.date_column = date_column
+        self.amount_column = amount_column
+        self.dir = os.path.join(path, name)
+        self._lock = threading.Lock()
+        self._manifest = None
+        self._frozen = {}  # month -> Arrow table of its rows, read from disk once
+        self.last_load = {"mode": None, "fetched": 0, "frozen": 0, "seconds": 0.0}
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.dir, "manifest.pkl.gz")
+
+    def _partition_path(self, month):
+        return os.path.join(self.dir, f"{month}.arrow")
+
+    def manifest(self):
+        if self._manifest is None:
+            self._manifest = _read(self.manifest_path)
+        return self._manifest
+
+    # Drop every frozen partition; the next load fetches the full sheet and
+    # freezes the closed months again from it
+    def rebuild(self):
+        with self._lock:
+            self._manifest = None
+            self._frozen.clear()
+            if os.path.exists(self.manifest_path):
+                os.remove(self.manifest_path)
+
+    # ---------- Fetch ----------
+    # Sheet rows dated on or after `since` (all rows when None). For a Google
+    # sheet the filter runs server side as a query on the date column; the
+    # query only sees rows, not their positions, so fetched rows are labelled
+    # after the frozen ones. That assumes the sheet is append-only (a form
+    # log): a row inserted or deleted above the open months shifts sheet rows
+    # the labels no longer match until the next full fetch. Local files,
+    # and sheets whose date column cannot be queried, are read whole and
+    # filtered here before parsing.
+    def _fetch(self, url, since, manifest):
+        if since is not None and url.startswith(("http://", "https://")):
+            letter = column_letter(manifest["columns"].index(self.date_column))
+            query = f"select * where {letter} >= date '{since:%Y-%m-%d}'"
+            try:
+                raw = ingest.read_frame(f"{url}&tq={quote(query)}", self.name)
+            except Exception:
+                raw = None
+            if raw is not None and list(raw.columns) == manifest["columns"]:
+                raw.index = pd.RangeIndex(manifest["next_label"], manifest["next_label"] + len(raw))
+                return raw
+
+        raw = ingest.read_frame(url, self.name)
+        if since is not None:
+            raw = raw[(ingest.as_dates(raw[self.date_column]) >= since).to_numpy()]
+        return raw
+
+    # ---------- Load ----------
+    def load(self, url, parse, backfill_months=BACKFILL_MONTHS, today=None):
+        start = perf_counter()
+        open_month = pd.Period(today or pd.Timestamp.today(), "M")
+        cutoff = open_month - backfill_months - 1  # last month that is frozen
+
+        with self._lock:
+            manifest = self.manifest()
+            if manifest is not None and any(self._frozen_partition(m) is None for m in manifest["partitions"]):
+                manifest = None  # a partition file is gone or unreadable: fetch everything again
+            if manifest is not None and HISTORY_MAX_AGE_DAYS and \
+                    pd.Timestamp.now() - pd.Timestamp(manifest.get("built_at", 0)) > pd.Timedelta(days=HISTORY_MAX_AGE_DAYS):
+                manifest = None  # history due for a full fetch, to pick up edits in frozen months
+            if manifest is not None:
+                # A wider backfill window thaws the months it now covers
+                frozen_through = min(pd.Period(manifest["frozen_through"], "M"), cutoff)
+                since = (frozen_through + 1).start_time
+            else:
+                frozen_through, since = None, None
+
+            raw = self._fetch(url, since, manifest)
+            if manifest is not None and list(raw.columns) != manifest["columns"]:
+                # The sheet's columns changed: the frozen partitions no longer fit
+                self._manifest, manifest, frozen_through, since = None, None, None, None
+                self._frozen.clear()
+                raw = self._fetch(url, None, None)
+
+            columns, fetched = list(raw.columns), len(raw)
+            rows, failures = parse(raw)
+            months = pd.to_datetime(rows[self.date_column], errors="coerce").dt.to_period("M")
+            failures = pd.DataFrame(failures, columns=["Row", "Column", "Value", "Check"])
+
+            # Freeze the closed months this fetch covered (and, on a full
+            # fetch, the undated rows, which a date query never returns)
+            if manifest is None:
+                manifest = {"columns": columns, "partitions": {}, "next_label": 0, "built_at": pd.Timestamp.now()}
+            partitions = {m: p for m, p in manifest["partitions"].items()
+                          if m == UNDATED or frozen_through is None or pd.Period(m, "M") <= frozen_through}
+            to_freeze = (months <= cutoff).to_numpy()
+            if since is None:
+                to_freeze = to_freeze | months.isna().to_numpy()
+            keys = months.astype(str).where(months.notna(), UNDATED)
+            os.makedirs(self.dir, exist_ok=True)
+            for month, part in rows[to_freeze].groupby(keys[to_freeze]):
+                self._frozen[month] = _write_table(self._partition_path(month), part, self.date_column)
+                partitions[month] = {
+                    "last_label": int(part.index.max()),
+                    "failures": failures[failures["Row"].isin(part.index)].to_dict("records"),
+                }
+
+            hot = rows[~to_freeze]
+            hot_failures = failures[failures["Row"].isin(hot.index)].to_dict("records")
+            manifest.update(
+                partitions=partitions,
+                frozen_through=str(cutoff),
+                next_label=max([manifest["next_label"]] + [int(p["last_label"]) + 1 for p in partitions.values()]),
+            )
+            _write(self.manifest_path, manifest)
+            self._manifest = manifest
+
+            # Closed months: one Arrow concatenation and one pandas conversion
+            frozen = [self._frozen_partition(m) for m in sorted(partitions)]
+            pieces = [hot]
+            if frozen:
+                pieces.insert(0, ingest.to_frame(pa.concat_tables(frozen, promote_options="permissive")))
+            df = pd.concat([p for p in pieces if not p.empty] or [hot]).sort_index()
+            df.attrs = {"parse_failures": [f for m in sorted(partitions) for f in partitions[m]["failures"]] + hot_failures}
+
+            self.last_load = {
+                "mode": "full" if since is None else "partial",
+                "fetched": fetched,
+                "frozen": sum(t.num_rows for t in frozen),
+                "seconds": perf_counter() - start,
+            }
+            return df
+
+    def _frozen_partition(self, month):
+        if month not in self._frozen:
+            stored = _read_table(self._partition_path(month))
+            if stored is None:
+                return None
+            self._frozen[month] = stored
+        return self._frozen[month]
+
+    # Rows and amount of each frozen partition, for the startup report
+    def stats(self):
+        rows = []
+        with self._lock:
+            manifest = self.manifest() or {"partitions": {}}
+            for month in sorted(manifest["partitions"]):
+                table = self._frozen_partition(month)
+                if table is not None:
+                    amount = pc.sum(pc.cast(table[self.amount_column], pa.float64())).as_py()
+                    rows.append({"Sheet": self.name, "Month": month, "Rows": table.num_rows, "Amount": amount or 0.0})
+        return pd.DataFrame(rows, columns=["Sheet", "Month", "Rows", "Amount"])
+
+
+sheets = {
+    "collection": PartitionedSheet("collection", "Collection Date", "Amount"),
+    "expense": PartitionedSheet("expense", "Date", "Amount Used"),
+    "bank": PartitionedSheet("bank", "Date", "Amount"),
+}
@@ -0,0 +1,329 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from versioning import Latest, row_hashes
+
+
+# Columns of the collection frame the index keeps per row
+ROW_COLUMNS = ["Collection Date", "Vehicle No", "Amount", "Meter Reading", "Name"]
+
+
+def _normalize(df):
+    frame = df[ROW_COLUMNS].copy()
+    frame["Collection Date"] = pd.to_datetime(frame["Collection Date"], errors="coerce").dt.normalize()
+    frame["Vehicle No"] = frame["Vehicle No"].astype(str).str.strip()
+    frame["Amount"] = pd.to_numeric(frame["Amount"], errors="coerce")
+    frame["Meter Reading"] = pd.to_numeric(frame["Meter Reading"], errors="coerce")
+    return frame.dropna(subset=["Collection Date"]).reset_index(drop=True)
+
+
+def _ordinal(day):
+    return pd.Timestamp(day).toordinal()
+
+
+# Day ordinals of a normalized date column, without a Timestamp per row
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def _ordinals(dates):
+    return dates.to_numpy(dtype="datetime64[D]").astype(np.int64) + EPOCH_ORDINAL
+
+
+# ---------- Vehicle x day index ----------
+# Presence and amount matrices indexed by (vehicle, day ordinal - day0).
+#   bits      packed presence bitmap, one bit per (vehicle, day)
+#   amount    summed collection per cell
+#   zero_rows number of zero-amount entries per cell
+#   last_row / last_nonzero_row   row id (into `rows`) of the latest entry per cell
+# Prefix sums over days make range counts/sums O(1) per vehicle.
+class PresenceIndex:
+    def __init__(self):
+        self.vehicles = np.array([], dtype=object)
+        self.vehicle_pos = {}
+        self.day0 = None
+        self.n_days = 0
+        self.bits = np.zeros((0, 0), dtype=np.uint8)
+        self.amount = np.zeros((0, 0), dtype=np.int64)
+        self.zero_rows = np.zeros((0, 0), dtype=np.int32)
+        self.last_row = np.zeros((0, 0), dtype=np.int64)
+        self.last_nonzero_row = np.zeros((0, 0), dtype=np.int64)
+        self.present_cum = np.zeros((0, 1), dtype=np.int32)
+        self.amount_cum = np.zeros((0, 1), dtype=np.int64)
+        self.rows = pd.DataFrame(columns=ROW_COLUMNS)
+        self.hashes = np.array([], dtype=np.uint64)
+
+    @classmethod
+    def build(cls, df):
+        index = cls()
+        index.update(df)
+        return index
+
+    def copy(self):
+        other = PresenceIndex()
+        other.vehicles = self.vehicles.copy()
+        other.vehicle_pos = dict(self.vehicle_pos)
+        other.day0, other.n_days = self.day0, self.n_days
+        for name in ("bits", "amount", "zero_rows", "last_row", "last_nonzero_row",
+                     "present_cum", "amount_cum"):
+            setattr(other, name, getattr(self, name).copy())
+        other.rows = self.rows
+        other.hashes = self.hashes
+        return other
+
+    # ---------- Incremental maintenance ----------
+    def _grow(self, first_day, last_day, vehicles):
+        new_vehicles = [v for v in pd.unique(vehicles) if v not in self.vehicle_pos]
+        day0 = first_day if self.day0 is None else min(self.day0, first_day)
+        end = last_day if self.day0 is None else max(self.day0 + self.n_days - 1, last_day)
+        n_days = end - day0 + 1
+        shift = 0 if self.day0 is None else self.day0 - day0
+        n_vehicles = len(self.vehicles) + len(new_vehicles)
+
+        if new_vehicles or n_days != self.n_days:
+            old_v = len(self.vehicles)
+            presence = np.zeros((n_vehicles, n_days), dtype=bool)
+            if old_v and self.n_days:
+                presence[:old_v, shift:shift + self.n_days] = self.present_matrix()
+            self.bits = np.packbits(presence, axis=1)
+            for name, fill in (("amount", 0), ("zero_rows", 0), ("last_row", -1), ("last_nonzero_row", -1)):
+                old = getattr(self, name)
+                grown = np.full((n_vehicles, n_days), fill, dtype=old.dtype)
+                if old_v and self.n_days:
+                    grown[:old_v, shift:shift + self.n_days] = old
+                setattr(self, name, grown)
+            self.vehicles = np.concatenate([self.vehicles, np.array(new_vehicles, dtype=object)])
+            self.vehicle_pos = {v: i for i, v in enumerate(self.vehicles)}
+            self.day0, self.n_days = day0, n_days
+
+    # Add collection rows (already-absorbed rows must not be passed again).
+    # `hashes` are the rows' hashes within the full frame they came from:
+    # repeats of an identical row are numbered over the whole frame, so
+    # hashing a subset alone would number them differently.
+    def update(self, df, hashes=None):
+        frame = _normalize(df)
+        if frame.empty:
+            self._refresh_prefix()
+            return self
+
+        ordinals = _ordinals(frame["Collection Date"])
+        self._grow(int(ordinals.min()), int(ordinals.max()), frame["Vehicle No"].to_numpy())
+
+        v = frame["Vehicle No"].map(self.vehicle_pos).to_numpy()
+        d = ordinals - self.day0
+        row_ids = np.arange(len(self.rows), len(self.rows) + len(frame))
+        amounts = frame["Amount"].fillna(0).round().astype(np.int64).to_numpy()
+
+        presence = self.present_matrix()
+        presence[v, d] = True
+        self.bits = np.packbits(presence, axis=1)
+        np.add.at(self.amount, (v, d), amounts)
+        np.add.at(self.zero_rows, (v, d), (frame["Amount"] == 0).to_numpy().astype(np.int32))
+        # Later rows win, matching "last entry of the day"
+        np.maximum.at(self.last_row, (v, d), row_ids)
+        nonzero = (frame["Amount"] > 0).to_numpy()
+        np.maximum.at(self.last_nonzero_row, (v[nonzero], d[nonzero]), row_ids[nonzero])
+
+        self.rows = pd.concat([self.rows, frame], ignore_index=True) if len(self.rows) else frame
+        self.hashes = np.concatenate([self.hashes, row_hashes(frame) if hashes is None else hashes])
+        self._refresh_prefix()
+        return self
+
+    # Index for a new version of the collection frame: this one plus its new
+    # rows when nothing was removed or edited, else a fresh build
+    def refresh(self, df):
+        frame = _normalize(df)
+        hashes = row_hashes(frame)
+        if len(self.hashes) <= len(hashes):
+            is_new = ~np.isin(hashes, self.hashes)
+            if np.isin(self.hashes, hashes).all() and len(self.hashes) == len(hashes) - int(is_new.sum()):
+                return self.copy().update(frame[is_new], hashes[is_new])
+        return PresenceIndex.build(frame)
+
+    def _refresh_prefix(self):
+        presence = self.present_matrix()
+        n_vehicles = presence.shape[0]
+        self.present_cum = np.zeros((n_vehicles, self.n_days + 1), dtype=np.int32)
+        self.amount_cum = np.zeros((n_vehicles, self.n_days + 1), dtype=np.int64)
+        np.cumsum(presence, axis=1, out=self.present_cum[:, 1:])
+        np.cumsum(self.amount, axis=1, out=self.amount_cum[:, 1:])
+
+    # ---------- Lookups ----------
+    def present_matrix(self):
+        if self.n_days == 0:
+            return np.zeros((len(self.vehicles), 0), dtype=bool)
+        return np.unpackbits(self.bits, axis=1, count=self.n_days).astype(bool)
+
+    def _day(self, day):
+        return _ordinal(day) - self.day0
+
+    # O(1): was vehicle collected on this day?
+    def was_collected(self, vehicle, day):
+        v = self.vehicle_pos.get(vehicle)
+        d = self._day(day) if self.day0 is not None else -1
+        if v is None or d < 0 or d >= self.n_days:
+            return False
+        return bool((self.bits[v, d >> 3] >> (7 - (d & 7))) & 1)
+
+    # Vehicles with at least one entry on this day
+    def active_vehicles(self, day):
+        d = self._day(day) if self.day0 is not None else -1
+        if d < 0 or d >= self.n_days:
+            return []
+        column = (self.bits[:, d >> 3] >> (7 - (d & 7))) & 1
+        return list(self.vehicles[column.astype(bool)])
+
+    def _clip(self, start, end):
+        lo = max(self._day(start), 0)
+        hi = min(self._day(end), self.n_days - 1)
+        return lo, hi
+
+    # O(1): number of days with an entry in [start, end]
+    def days_present(self, vehicle, start, end):
+        v = self.vehicle_pos.get(vehicle)
+        if v is None or self.day0 is None:
+            return 0
+        lo, hi = self._clip(start, end)
+        if hi < lo:
+            return 0
+        return int(self.present_cum[v, hi + 1] - self.present_cum[v, lo])
+
+    # O(1): days without an entry in [start, end]
+    def idle_days(self, vehicle, start, end):
+        span = _ordinal(end) - _ordinal(start) + 1
+        return max(span, 0) - self.days_present(vehicle, start, end)
+
+    # O(1): collection in [start, end]
+    def amount_between(self, vehicle, start, end):
+        v = self.vehicle_pos.get(vehicle)
+        if v is None or self.day0 is None:
+            return 0
+        lo, hi = self._clip(start, end)
+        if hi < lo:
+            return 0
+        return int(self.amount_cum[v, hi + 1] - self.amount_cum[v, lo])
+
+    # Per-vehicle present/idle days and collection over [start, end], all vehicles at once
+    def range_summary(self, start, end):
+        lo, hi = self._clip(start, end)
+        span = max(_ordinal(end) - _ordinal(start) + 1, 0)
+        present = self.present_cum[:, hi + 1] - self.present_cum[:, lo] if hi >= lo else 0
+        collected = self.amount_cum[:, hi + 1] - self.amount_cum[:, lo] if hi >= lo else 0
+        summary = pd.DataFrame({
+            "Vehicle No": self.vehicles,
+            "Days Collected": present,
+            "Idle Days": span - np.asarray(present),
+            "Collection": collected,
+        })
+        summary["Utilization (%)"] = summary["Days Collected"] / span * 100 if span else 0.0
+        return summary
+
+    # Long (vehicle, day, present, amount) frame for a heatmap of [start, end]
+    def heatmap_frame(self, start, end):
+        lo, hi = self._clip(start, end)
+        if hi < lo:
+            return pd.DataFrame(columns=["Vehicle No", "Date", "Collected", "Amount"])
+        days = pd.to_datetime([date.fromordinal(self.day0 + d) for d in range(lo, hi + 1)])
+        presence = self.present_matrix()[:, lo:hi + 1]
+        return pd.DataFrame({
+            "Vehicle No": np.repeat(self.vehicles, hi - lo + 1),
+            "Date": np.tile(days, len(self.vehicles)),
+            "Collected": presence.ravel(),
+            "Amount": self.amount[:, lo:hi + 1].ravel(),
+        })
+
+
+# ---------- Pending collections ----------
+# Every (date, vehicle) from start_date to end_date with no entry, for vehicles
+# already running by that date, with the vehicle's last non-zero collection and
+# the number of zero entries since. Same output as the old per-date scan, but
+# computed with running maxima/prefix sums over the whole grid at once.
+def pending_collections(index, start_date, end_date):
+    columns = ["Missing Date", "Vehicle No", "Last Meter Reading", "Last Assigned Name",
+               "Last Collected Amount", "Last Collection date", "Zero Collection from(Days)"]
+    if index.day0 is None or len(index.vehicles) == 0:
+        return pd.DataFrame(columns=columns)
+
+    end = _ordinal(end_date) - index.day0
+    if end < 0:
+        return pd.DataFrame(columns=columns)
+    n_days = max(end + 1, index.n_days)
+
+    def padded(matrix, fill):
+        out = np.full((matrix.shape[0], n_days), fill, dtype=matrix.dtype)
+        out[:, :matrix.shape[1]] = matrix
+        return out
+
+    presence = padded(index.present_matrix(), False)
+    last_row = padded(index.last_row, -1)
+    last_nonzero_row = padded(index.last_nonzero_row, -1)
+    zero_rows = padded(index.zero_rows, 0)
+
+    # Latest day with a (non-zero) entry strictly before each day: running max
+    # of the day index, shifted right by one day
+    day_idx = np.arange(n_days)
+
+    def previous_day(mask):
+        running = np.maximum.accumulate(np.where(mask, day_idx, -1), axis=1)
+        return np.pad(running, ((0, 0), (1, 0)), constant_values=-1)[:, :-1]
+
+    prev_nz_day = previous_day(last_nonzero_row >= 0)
+    prev_any_day = previous_day(last_row >= 0)
+    zero_cum = np.zeros((zero_rows.shape[0], n_days + 1), dtype=np.int64)
+    np.cumsum(zero_rows, axis=1, out=zero_cum[:, 1:])
+
+    # A vehicle is expected from max(first entry, start_date)
+    first_day = np.argmax(presence, axis=1)
+    baseline = np.maximum(first_day, _ordinal(start_date) - index.day0)
+    lo = max(_ordinal(start_date) - index.day0, 0)
+
+    expected = day_idx[None, :] >= baseline[:, None]
+    missing = expected & ~presence
+    missing[:, :lo] = False
+    missing[:, end + 1:] = False
+
+    # Date-major, then vehicle-number order, like the old loop
+    order = np.argsort(index.vehicles.astype(str), kind="stable")
+    d, k = np.nonzero(missing[order].T)
+    v = order[k]
+    if len(d) == 0:
+        return pd.DataFrame(columns=columns)
+
+    rows = index.rows
+    last_nz_day = prev_nz_day[v, d]
+    has_nz = last_nz_day >= 0
+    nz_safe = np.where(has_nz, last_nonzero_row[v, np.maximum(last_nz_day, 0)], 0)
+    any_day = prev_any_day[v, d]
+    any_r = np.where(any_day >= 0, last_row[v, np.maximum(any_day, 0)], -1)
+
+    zero_days = np.where(has_nz, zero_cum[v, d] - zero_cum[v, last_nz_day + 1], 0)
+
+    def pick(column, ids, mask):
+        values = rows[column].to_numpy(dtype=object)[ids]
+        return np.where(mask, values, None)
+
+    names = np.where(has_nz, pick("Name", nz_safe, has_nz),
+                     pick("Name", np.maximum(any_r, 0), any_r >= 0))
+    last_dates = [date.fromordinal(index.day0 + int(x)) if ok else None for x, ok in zip(last_nz_day, has_nz)]
+
+    return pd.DataFrame({
+        "Missing Date": [date.fromordinal(index.day0 + int(x)) for x in d],
+        "Vehicle No": index.vehicles[v],
+        "Last Meter Reading": pick("Meter Reading", nz_safe, has_nz),
+        "Last Assigned Name": names,
+        "Last Collected Amount": pick("Amount", nz_safe, has_nz),
+        "Last Collection date": last_dates,
+        "Zero Collection from(Days)": zero_days.astype(int),
+    }, columns=columns)
+
+
+# ---------- Per-process maintenance ----------
+# The index of the last load. Rows not seen before are added to a copy of it;
+# a removed or edited row moves vehicles' last entries and day counts in ways
+# a delta cannot undo, so the index is rebuilt from scratch.
+_latest = Latest(PresenceIndex())
+
+
+def refresh_index(df):
+    return _latest.advance(lambda previous: previous.refresh(df))
@@ -0,0 +1,128 @@
+import numpy as np
+import pandas as pd
+
+
+# Default matching rules: a deposit may cover collections from up to
+# WINDOW_DAYS before it, and the batch total may differ by up to TOLERANCE rupees.
+WINDOW_DAYS = 45
+TOLERANCE = 100
+
+
+def _daily_collections(collection_df):
+    frame = pd.DataFrame({
+        "Collector": collection_df["Received By"],
+        "Date": pd.to_datetime(collection_df["Collection Date"], errors="coerce").dt.normalize(),
+        "Amount": pd.to_numeric(collection_df["Amount"], errors="coerce").fillna(0),
+    }).dropna(subset=["Collector", "Date"])
+    frame = frame[frame["Amount"] > 0]
+    return (
+        frame.groupby(["Collector", "Date"], sort=True)["Amount"]
+        .agg(["sum", "count"])
+        .rename(columns={"sum": "Amount", "count": "Entries"})
+        .reset_index()
+    )
+
+
+def _deposits(bank_df):
+    frame = bank_df[bank_df["Transaction Type"].astype(str).str.strip() == "Collection_Credit"]
+    frame = pd.DataFrame({
+        "Collector": frame["Transaction By"],
+        "Date": pd.to_datetime(frame["Date"], dayfirst=True, errors="coerce").dt.normalize(),
+        "Amount": pd.to_numeric(frame["Amount"], errors="coerce").fillna(0),
+    }).dropna(subset=["Collector", "Date"])
+    return frame.sort_values(["Collector", "Date"], kind="stable").reset_index(drop=True)
+
+
+# ---------- Matching ----------
+# Per collector, collections (daily totals) and deposits are both sorted by
+# date. Each deposit, in date order, is matched to the earliest run of
+# not-yet-deposited days inside its window whose total is within `tolerance`
+# of the deposit. Candidate runs are found with prefix sums and searchsorted
+# over all possible start days at once.
+def reconcile(collection_df, bank_df, window_days=WINDOW_DAYS, tolerance=TOLERANCE):
+    daily = _daily_collections(collection_df)
+    deposits = _deposits(bank_df)
+
+    matches = []
+    unmatched_deposits = []
+    status = np.full(len(daily), "Not yet deposited", dtype=object)
+    deposit_dates = np.full(len(daily), np.datetime64("NaT"), dtype="datetime64[ns]")
+    window = np.timedelta64(int(window_days), "D")
+
+    collectors = set(daily["Collector"]) | set(deposits["Collector"])
+    for collector in sorted(collectors):
+        positions = np.flatnonzero(daily["Collector"].to_numpy() == collector)
+        dates = daily["Date"].to_numpy()[positions]
+        amounts = daily["Amount"].to_numpy(dtype="float64")[positions]
+        cum = np.concatenate([[0.0], np.cumsum(amounts)])
+        next_start = 0  # first collection day not yet covered by a deposit
+
+        mine = deposits[deposits["Collector"] == collector]
+        for dep_date, dep_amount in zip(mine["Date"].to_numpy(), mine["Amount"].to_numpy(dtype="float64")):
+            end = int(np.searchsorted(dates, dep_date, side="right"))
+            lo = max(next_start, int(np.searchsorted(dates, dep_date - window, side="left")))
+            if lo >= end:
+                unmatched_deposits.append((collector, dep_date, dep_amount, "No collections in window"))
+                continue
+
+            # For every start s in [lo, end): the end k whose run total is closest to the deposit
+            starts = np.arange(lo, end)
+            targets = cum[starts] + dep_amount
+            k = np.clip(np.searchsorted(cum, targets), starts + 1, end)
+            k_prev = np.clip(k - 1, starts + 1, end)
+            diff = cum[k] - targets
+            diff_prev = cum[k_prev] - targets
+            use_prev = np.abs(diff_prev) < np.abs(diff)
+            k = np.where(use_prev, k_prev, k)
+            diff = np.where(use_prev, diff_prev, diff)
+
+            ok = np.flatnonzero(np.abs(diff) <= tolerance)
+            if len(ok) == 0:
+                unmatched_deposits.append((collector, dep_date, dep_amount, "No batch within tolerance"))
+                continue
+
+            s, e = int(starts[ok[0]]), int(k[ok[0]])
+            matches.append({
+                "Collector": collector,
+                "Deposit Date": pd.Timestamp(dep_date),
+                "Deposit Amount": dep_amount,
+                "Batch From": pd.Timestamp(dates[s]),
+                "Batch To": pd.Timestamp(dates[e - 1]),
+                "Days": e - s,
+                "Collected Amount": cum[e] - cum[s],
+                "Difference": dep_amount - (cum[e] - cum[s]),
+            })
+            # Days skipped over before the batch were never deposited
+            status[positions[next_start:s]] = "Unmatched"
+            status[positions[s:e]] = "Deposited"
+            deposit_dates[positions[s:e]] = dep_date
+            next_start = e
+
+    daily["Status"] = status
+    daily["Deposit Date"] = deposit_dates
+
+    match_columns = ["Collector", "Deposit Date", "Deposit Amount", "Batch From", "Batch To",
+                     "Days", "Collected Amount", "Difference"]
+    return {
+        "matches": pd.DataFrame(matches, columns=match_columns),
+        "unmatched_deposits": pd.DataFrame(unmatched_deposits, columns=["Collector", "Date", "Amount", "Reason"]),
+        "collections": daily,
+    }
+
+
+# Per-collector roll-up of a reconcile() result
+def summary(result):
+    collections = result["collections"]
+    by_status = collections.pivot_table(index="Collector", columns="Status", values="Amount",
+                                        aggfunc="sum", fill_value=0)
+    for col in ["Deposited", "Unmatched", "Not yet deposited"]:
+        if col not in by_status.columns:
+            by_status[col] = 0
+    deposits = result["matches"].groupby("Collector")["Deposit Amount"].agg(["count", "sum"])
+    unmatched = result["unmatched_deposits"].groupby("Collector")["Amount"].agg(["count", "sum"])
+    out = by_status[["Deposited", "Unmatched", "Not yet deposited"]].join(
+        deposits.rename(columns={"count": "Matched Deposits", "sum": "Matched Amount"}), how="outer"
+    ).join(
+        unmatched.rename(columns={"count": "Unmatched Deposits", "sum": "Unmatched Deposit Amount"}), how="outer"
+    )
+    return out.fillna(0).reset_index()
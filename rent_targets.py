@@ -0,0 +1,200 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from versioning import frame_version
+
+
+# Daily rent target per vehicle, unless the rent targets file says otherwise
+DAILY_TARGET = 300
+
+# Pseudo-driver the sheets record zero-collection days under; the loss
+# matrix books company losses to it
+COMPANY_NAME = "Zero Collection"
+
+# Rent target overrides: a CSV with Vehicle No, Effective From (day first) and
+# Daily Target. A blank, "*" or "All" vehicle sets the fleet-wide target.
+# Without the file every vehicle keeps DAILY_TARGET.
+RENT_TARGETS_PATH = os.environ.get("VAYUVOLT_RENT_TARGETS", "rent_targets.csv")
+
+ALL_VEHICLES = "*"
+RULE_COLUMNS = ["Vehicle No", "Effective From", "Daily Target"]
+
+
+# ---------- Targets ----------
+# Daily rent target per vehicle and date. A vehicle's own rule in effect on
+# a date wins over the fleet-wide one; each is the latest rule whose
+# Effective From is on or before the date.
+class RentTargets:
+    def __init__(self, rules=None, default=DAILY_TARGET):
+        self.default = float(default)
+        rules = pd.DataFrame(rules, columns=RULE_COLUMNS) if rules is not None else pd.DataFrame(columns=RULE_COLUMNS)
+        vehicle = rules["Vehicle No"].fillna("").astype(str).str.strip()
+        rules = pd.DataFrame({
+            "Vehicle No": vehicle.where(~vehicle.str.lower().isin(["", "*", "all"]), ALL_VEHICLES),
+            "Effective From": pd.to_datetime(rules["Effective From"], dayfirst=True, errors="coerce").astype("datetime64[ns]"),
+            "Daily Target": pd.to_numeric(rules["Daily Target"], errors="coerce"),
+        }).dropna()
+        self.rules = rules.sort_values(["Effective From", "Vehicle No"], ignore_index=True)
+
+    @property
+    def is_flat(self):
+        return self.rules.empty
+
+    # Fingerprint of the rules, for caches of anything priced with them
+    @property
+    def version(self):
+        return f"{frame_version(self.rules)}-{self.default:g}"
+
+    def lookup(self, vehicles, dates):
+        vehicles = pd.Series(np.asarray(vehicles, dtype=object)).fillna("").astype(str).str.strip()
+        dates = pd.to_datetime(pd.Series(np.asarray(dates, dtype=object)), errors="coerce").astype("datetime64[ns]")
+        target = np.full(len(vehicles), self.default)
+        dated = dates.notna().to_numpy()
+        if self.is_flat or not dated.any():
+            return target
+
+        rows = pd.DataFrame({"row": np.flatnonzero(dated), "Vehicle No": vehicles[dated].to_numpy(),
+                             "date": dates[dated].to_numpy()}).sort_values("date")
+        fleet = self.rules[self.rules["Vehicle No"] == ALL_VEHICLES].drop(columns="Vehicle No")
+        own = self.rules[self.rules["Vehicle No"] != ALL_VEHICLES]
+        found = pd.Series(np.nan, index=rows["row"].to_numpy())
+        if not own.empty:
+            matched = pd.merge_asof(rows, own, left_on="date", right_on="Effective From", by="Vehicle No")
+            found = found.fillna(pd.Series(matched["Daily Target"].to_numpy(), index=matched["row"].to_numpy()))
+        if not fleet.empty:
+            matched = pd.merge_asof(rows, fleet, left_on="date", right_on="Effective From")
+            found = found.fillna(pd.Series(matched["Daily Target"].to_numpy(), index=matched["row"].to_numpy()))
+        target[found.index.to_numpy()] = found.fillna(self.default).to_numpy()
+        return target
+
+
+def load_targets(path=RENT_TARGETS_PATH, default=DAILY_TARGET):
+    if not path or not (path.startswith(("http://", "https://")) or os.path.exists(path)):
+        return RentTargets(default=default)
+    rules = pd.read_csv(path, dtype=str)
+    rules.columns = rules.columns.str.strip()
+    return RentTargets(rules.reindex(columns=RULE_COLUMNS), default=default)
+
+
+targets = load_targets()
+
+
+# Read the targets file again (the app's Refresh), so edits to it apply
+# without a restart; callers read `rent_targets.targets` at call time
+def reload_targets():
+    global targets
+    targets = load_targets()
+    return targets
+
+
+# ---------- What-if ----------
+# The loss matrix reduced to what the loss depends on, so a whole grid of
+# flat targets is evaluated in one broadcast instead of one loss-matrix run
+# per candidate. Same rules as loss_matrix: rows are grouped by
+# (date, driver); a driver with two or more vehicles on a day forms a pair
+# from the first two (by vehicle), every other row stands alone.
+#   single  loss = T - collected, booked to the company for COMPANY_NAME rows
+#   pair    with n the driver's vehicles that day and s what they collected
+#           (a third vehicle counts towards the pair's total but gets no row
+#           of its own): if s >= nT both rows stay with the driver, losses 0
+#           and nT - s; otherwise the driver owes (n - 1)T - s and the
+#           second vehicle's nT - s goes to the company
+def loss_units(perf_df):
+    frame = perf_df[["Collection Date", "Name", "Vehicle No", "Amount"]].dropna(subset=["Collection Date", "Name"])
+    frame = frame.assign(Amount=pd.to_numeric(frame["Amount"], errors="coerce").fillna(0))
+    frame = frame.sort_values(["Collection Date", "Name", "Vehicle No"], kind="stable")
+    group = frame.groupby(["Collection Date", "Name"], sort=False)
+    size = group["Amount"].transform("size").to_numpy()
+    total = group["Amount"].transform("sum").to_numpy()
+    rank = group.cumcount().to_numpy()
+    company = (frame["Name"] == COMPANY_NAME).to_numpy()
+    paired = (size > 1) & ~company
+
+    amounts = frame["Amount"].to_numpy(dtype=np.float64)
+    dates = pd.to_datetime(frame["Collection Date"]).to_numpy()
+    singles = ~paired
+    firsts = paired & (rank == 0)
+    return {
+        "single_amount": amounts[singles],
+        "single_company": company[singles],
+        "single_date": dates[singles],
+        "pair_sum": total[firsts],
+        "pair_size": size[firsts].astype(np.float64),
+        "pair_date": dates[firsts],
+    }
+
+
+# Driver, company and total loss (and rent due) for each flat target in
+# `candidates`, over units dated in [start, end]
+def what_if(units, candidates, start=None, end=None):
+    def window(dates):
+        keep = np.ones(len(dates), dtype=bool)
+        if start is not None:
+            keep &= dates >= np.datetime64(pd.Timestamp(start))
+        if end is not None:
+            keep &= dates <= np.datetime64(pd.Timestamp(end))
+        return keep
+
+    T = np.asarray(candidates, dtype=np.float64)[None, :]
+    single = window(units["single_date"])
+    amount = units["single_amount"][single][:, None]
+    company = units["single_company"][single][:, None]
+    single_loss = T - amount
+    pair = window(units["pair_date"])
+    s = units["pair_sum"][pair][:, None]
+    n = units["pair_size"][pair][:, None]
+    covered = s >= n * T
+    pair_driver = np.where(covered, n * T - s, (n - 1) * T - s)
+    pair_company = np.where(covered, 0.0, n * T - s)
+
+    driver_loss = np.where(company, 0.0, single_loss).sum(axis=0) + pair_driver.sum(axis=0)
+    company_loss = np.where(company, single_loss, 0.0).sum(axis=0) + pair_company.sum(axis=0)
+    vehicle_days = len(amount) + n.sum()
+    return pd.DataFrame({
+        "Daily Target": T[0],
+        "Rent Due": T[0] * vehicle_days,
+        "Collected": amount.sum() + s.sum(),
+        "Driver Loss": driver_loss,
+        "Company Loss": company_loss,
+        "Total Loss": driver_loss + company_loss,
+    })
+
+
+
+# ---------- Loss matrix ----------
+# Collection rows -> loss rows, in one vectorized pass. Amount becomes the
+# loss against the day's target T. Rows are grouped by (date, driver); a
+# driver with two or more vehicles on a day forms a pair from the first two
+# (by vehicle). In a pair, with total the summed loss of the driver's rows
+# that day, the first row carries total - T2 (0 when total <= 0, the targets
+# were covered) and the second the total, booked to the company unless
+# covered. Rows past the second of a pair, and rows without a driver, are
+# left out.
+def loss_matrix(perf_df, rent=None):
+    rent = rent or targets
+    frame = perf_df.dropna(subset=["Collection Date"]).copy()
+    target = rent.lookup(frame["Vehicle No"], frame["Collection Date"])
+    frame["Amount"] = target - pd.to_numeric(frame["Amount"], errors="coerce").fillna(0)
+    frame = frame.assign(_target=target).dropna(subset=["Name"])
+    frame = frame.sort_values(["Collection Date", "Name", "Vehicle No"], kind="stable")
+
+    group = frame.groupby(["Collection Date", "Name"], sort=False)
+    size = group["Amount"].transform("size").to_numpy()
+    total = group["Amount"].transform("sum").to_numpy()
+    rank = group.cumcount().to_numpy()
+    paired = (size > 1) & (frame["Name"] != COMPANY_NAME).to_numpy()
+    keep = ~paired | (rank < 2)
+    frame, size, total, rank, paired = frame[keep], size[keep], total[keep], rank[keep], paired[keep]
+
+    # T2 is the second row's target, read back onto the first
+    second_target = np.roll(frame["_target"].to_numpy(), -1)
+    first, second = paired & (rank == 0), paired & (rank == 1)
+    covered = total <= 0
+    amount = frame["Amount"].to_numpy().copy()
+    amount[first] = np.where(covered[first], 0.0, total[first] - second_target[first])
+    amount[second] = total[second]
+    frame["Amount"] = amount
+    frame.loc[second & ~covered, "Name"] = COMPANY_NAME
+    return frame.drop(columns="_target").reset_index(drop=True)
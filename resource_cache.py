@@ -0,0 +1,214 @@
+import functools
+import inspect
+import os
+import threading
+import time
+from collections import defaultdict
+
+import pandas as pd
+
+from view_cache import size_of
+
+
+# Memory budget for cached loaders and derived artifacts, shared by every
+# session of the process (the view cache has its own)
+MAX_BYTES = int(float(os.environ.get("VAYUVOLT_CACHE_MB", "1024")) * 2**20)
+
+# Share of the budget each namespace may hold. Pinned namespaces are counted
+# but never evicted, nor dropped by a plain clear(): the loaded sheets (evicting
+# them would refetch newer data in the middle of a session, and every artifact
+# holds on to them anyway) and per-process state such as the sheet connections.
+# A refresh clears the sheet loaders by name.
+QUOTAS = {
+    "sheets": None,
+    "process": None,
+    "indexes": 0.6,  # per data version: SQL store, KPIs, search and presence indexes, ledgers
+    "reports": 0.4,  # per data version and parameters: scorecards, P&L, statements, snapshots
+}
+PINNED = {"sheets", "process"}
+
+# Seconds of compute an entry is assumed to be worth at least, so instant
+# results do not all tie at zero
+MIN_COST = 0.001
+
+STATS_COLUMNS = ["Namespace", "Entries", "MB", "Quota MB", "Hits", "Misses", "Evictions", "Not Kept"]
+
+
+def _freeze(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, set):
+        return frozenset(value)
+    return value
+
+
+class _Entry:
+    __slots__ = ("value", "namespace", "bytes", "cost", "priority")
+
+    def __init__(self, value, namespace, size, cost):
+        self.value, self.namespace, self.bytes, self.cost = value, namespace, size, cost
+        self.priority = 0.0
+
+
+# ---------- Resource cache ----------
+# Memoizes the app's loaders and derived artifacts like st.cache_resource
+# (keyed by the function and its arguments, _-prefixed arguments left out of
+# the key), but accounts for the memory each value holds and keeps the total
+# within a budget. Eviction is cost-aware (GreedyDual-Size): an entry's
+# priority is the clock plus its compute seconds per byte, refreshed on every
+# hit, and the lowest priority goes first, so large, cheap, stale entries
+# (artifacts of superseded data versions) leave before small expensive ones.
+# A namespace over its quota evicts within itself first. Values are shared:
+# callers must not modify what they get back.
+class ResourceCache:
+    def __init__(self, max_bytes=MAX_BYTES, quotas=QUOTAS, pinned=PINNED):
+        self.max_bytes = max_bytes
+        self.quotas = {name: None if share is None else int(share * max_bytes) for name, share in quotas.items()}
+        self.pinned = set(pinned)
+        self._lock = threading.Lock()
+        self._entries = {}  # key -> _Entry
+        self._computing = {}  # key -> lock held while one caller computes it
+        self._clock = 0.0
+        self.bytes = 0
+        self._counts = defaultdict(lambda: defaultdict(int))  # namespace -> counter -> n
+
+    def memoize(self, namespace):
+        if namespace not in self.quotas:
+            raise ValueError(f"Unknown cache namespace: {namespace}")
+
+        def decorator(fn):
+            signature = inspect.signature(fn)
+            name = f"{fn.__module__}.{fn.__qualname__}"
+
+            @functools.wraps(fn)
+            def cached(*args, **kwargs):
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                key = (name,) + tuple((arg, _freeze(value)) for arg, value in bound.arguments.items()
+                                      if not arg.startswith("_"))
+                return self._get_or_compute(key, namespace, lambda: fn(*args, **kwargs))
+
+            cached.clear = lambda: self.clear(name)
+            return cached
+
+        return decorator
+
+    def _hit(self, key, namespace):
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry.priority = self._clock + entry.cost / max(entry.bytes, 1)
+            self._counts[namespace]["hits"] += 1
+        return entry
+
+    # The cached value for this key, or the result of `compute()`. Concurrent
+    # callers missing on the same key wait for the first one's result.
+    def _get_or_compute(self, key, namespace, compute):
+        with self._lock:
+            entry = self._hit(key, namespace)
+            if entry is not None:
+                return entry.value
+            computing = self._computing.setdefault(key, threading.Lock())
+
+        with computing:
+            with self._lock:
+                entry = self._hit(key, namespace)
+                if entry is not None:
+                    return entry.value
+                self._counts[namespace]["misses"] += 1
+            try:
+                start = time.perf_counter()
+                value = compute()
+                cost = max(time.perf_counter() - start, MIN_COST)
+                self._store(key, namespace, value, cost)
+            finally:
+                with self._lock:
+                    self._computing.pop(key, None)
+        return value
+
+    def _store(self, key, namespace, value, cost):
+        # Frames held by the pinned namespaces are counted there, not again in
+        # every artifact that refers to them
+        with self._lock:
+            shared = {id(e.value) for e in self._entries.values() if e.namespace in self.pinned}
+        size = size_of(value, shared)
+
+        with self._lock:
+            quota = self.quotas[namespace]
+            if namespace not in self.pinned and size > (quota if quota is not None else self.max_bytes):
+                self._counts[namespace]["rejected"] += 1
+                return
+            entry = _Entry(value, namespace, size, cost)
+            entry.priority = self._clock + cost / max(size, 1)
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous.bytes
+            self._entries[key] = entry
+            self.bytes += size
+            if quota is not None:
+                while self._namespace_bytes(namespace) > quota and self._evict(namespace):
+                    pass
+            while self.bytes > self.max_bytes and self._evict():
+                pass
+
+    def _namespace_bytes(self, namespace):
+        return sum(e.bytes for e in self._entries.values() if e.namespace == namespace)
+
+    # Drop the lowest-priority evictable entry (of one namespace, or any);
+    # False when there is none
+    def _evict(self, namespace=None):
+        candidates = [(e.priority, key) for key, e in self._entries.items()
+                      if e.namespace not in self.pinned and (namespace is None or e.namespace == namespace)]
+        if not candidates:
+            return False
+        priority, key = min(candidates, key=lambda candidate: candidate[0])
+        entry = self._entries.pop(key)
+        self.bytes -= entry.bytes
+        self._clock = priority
+        self._counts[entry.namespace]["evictions"] += 1
+        return True
+
+    # Drop the entries of one function, or every entry outside the pinned namespaces
+    def clear(self, name=None):
+        with self._lock:
+            for key in [k for k, e in self._entries.items()
+                        if (e.namespace not in self.pinned if name is None else k[0] == name)]:
+                self.bytes -= self._entries.pop(key).bytes
+            if name is None:
+                self._clock = 0.0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def evictions(self):
+        return sum(counts["evictions"] for counts in self._counts.values())
+
+    # Entries, memory and hit counts per namespace, for the startup report
+    def stats(self):
+        with self._lock:
+            entries, held = defaultdict(int), defaultdict(int)
+            for e in self._entries.values():
+                entries[e.namespace] += 1
+                held[e.namespace] += e.bytes
+            rows = [
+                {"Namespace": name, "Entries": entries[name], "MB": held[name] / 2**20,
+                 "Quota MB": None if self.quotas[name] is None else self.quotas[name] / 2**20,
+                 "Hits": self._counts[name]["hits"], "Misses": self._counts[name]["misses"],
+                 "Evictions": self._counts[name]["evictions"], "Not Kept": self._counts[name]["rejected"]}
+                for name in self.quotas
+            ]
+        return pd.DataFrame(rows, columns=STATS_COLUMNS)
+
+    # Largest entries first, for finding what holds the memory
+    def entries(self, limit=20):
+        with self._lock:
+            rows = [{"Function": key[0].rsplit(".", 1)[-1], "Arguments": ", ".join(f"{a}={v}" for a, v in key[1:]),
+                     "Namespace": e.namespace, "MB": e.bytes / 2**20, "Compute (s)": e.cost}
+                    for key, e in self._entries.items()]
+        return pd.DataFrame(rows, columns=["Function", "Arguments", "Namespace", "MB", "Compute (s)"]) \
+            .sort_values("MB", ascending=False).head(limit)
+
+
+resources = ResourceCache()
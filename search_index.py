@@ -0,0 +1,207 @@
+import numpy as np
+import pandas as pd
+
+
+# Per ledger: the columns a hit shows and the searchable fields with their weights
+LEDGERS = {
+    "collection": {
+        "date": "Collection Date", "amount": "Amount", "who": "Received By", "vehicle": "Vehicle No", "text": ["Name"],
+        "fields": {"Name": 1.0, "Vehicle No": 1.0, "Received By": 0.6},
+    },
+    "expense": {
+        "date": "Date", "amount": "Amount Used", "who": "Expense By", "vehicle": "Vehicle No", "text": ["Reason of Expense"],
+        "fields": {"Reason of Expense": 1.0, "Vehicle No": 1.0, "Expense By": 0.6},
+    },
+    "investment": {
+        "date": "Date", "amount": "Investment Amount", "who": "Investor Name", "vehicle": None, "text": ["Investment Type", "Comment"],
+        "fields": {"Comment": 1.0, "Investment Type": 0.8, "Investor Name": 0.6},
+    },
+    "bank": {
+        "date": "Date", "amount": "Amount", "who": "Transaction By", "vehicle": None, "text": ["Transaction Type", "Reason"],
+        "fields": {"Reason": 1.0, "Transaction Type": 0.8, "Transaction By": 0.6},
+    },
+}
+
+# Query words naming a ledger restrict the hits to it ("tyre expenses")
+LEDGER_WORDS = {
+    "collection": "collection", "collections": "collection",
+    "expense": "expense", "expenses": "expense",
+    "investment": "investment", "investments": "investment",
+    "bank": "bank",
+}
+STOPWORDS = {
+    "a", "an", "all", "and", "any", "by", "entries", "entry", "every", "for", "from", "in", "mentioning",
+    "of", "on", "the", "to", "vehicle", "vehicles", "with",
+}
+
+# Score of a term match by kind, times the term's idf and the field weight
+EXACT, PREFIX, FUZZY = 1.0, 0.7, 0.5
+MIN_PREFIX = 2  # shortest query word matched as a prefix
+MIN_FUZZY = 4  # shortest query word matched with one typo
+
+HIT_COLUMNS = ["Ledger", "Date", "Who", "Vehicle", "Amount", "Text", "Sheet Row", "Score", "Matched"]
+
+
+def _words(text):
+    return pd.Series(text, dtype="str").fillna("").str.lower().str.findall(r"[a-z0-9]+")
+
+
+# Tokens of a text column, one row per (document, token): words, plus the
+# letter and digit runs of mixed words with leading zeros dropped, so
+# "BR01LT0029" is found by "br01lt0029", "0029" and "29"
+def tokenize(column):
+    words = _words(column).explode().dropna()
+    words = words[words != ""]
+    mixed = words[words.str.contains(r"[a-z]") & words.str.contains(r"[0-9]")]
+    parts = mixed.str.findall(r"[a-z]+|[0-9]+").explode()
+    numbers = parts[parts.str.isdigit()].str.lstrip("0")
+    return pd.concat([words, parts, numbers[numbers != ""]])
+
+
+def _joined(df, columns):
+    text = df[columns[0]].fillna("").astype(str)
+    for column in columns[1:]:
+        text = text + " · " + df[column].fillna("").astype(str)
+    return text
+
+
+def _deletions(term):
+    return {term[:i] + term[i + 1:] for i in range(len(term))}
+
+
+# ---------- Inverted index ----------
+# One document per ledger row. Postings are stored per term, sorted by term:
+#   terms          sorted vocabulary (prefix lookups are a binary search)
+#   offsets        postings of term t are doc_ids/weights[offsets[t]:offsets[t + 1]]
+#   idf            log(1 + n_docs / document frequency) per term
+#   recency        date of each document, for ranking ties (undated last)
+#   deletions      single-character deletions of alphabetic terms -> term ids,
+#                  for one-typo matches (symmetric delete)
+class SearchIndex:
+    def __init__(self):
+        self.docs = pd.DataFrame(columns=HIT_COLUMNS[:7])
+        self.terms = np.array([], dtype=object)
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.doc_ids = np.array([], dtype=np.int64)
+        self.weights = np.array([], dtype=np.float64)
+        self.idf = np.array([], dtype=np.float64)
+        self.recency = np.array([], dtype=np.int64)
+        self.deletions = {}
+
+    @classmethod
+    def build(cls, frames):
+        index = cls()
+        docs, postings = [], []
+        n = 0
+        for ledger, spec in LEDGERS.items():
+            df = frames.get(ledger)
+            if df is None or df.empty:
+                continue
+            docs.append(pd.DataFrame({
+                "Ledger": ledger,
+                "Date": pd.to_datetime(df[spec["date"]], errors="coerce").to_numpy(),
+                "Who": df[spec["who"]].to_numpy(),
+                "Vehicle": df[spec["vehicle"]].to_numpy() if spec["vehicle"] else None,
+                "Amount": pd.to_numeric(df[spec["amount"]], errors="coerce").to_numpy(),
+                "Text": _joined(df, spec["text"]).to_numpy(),
+                "Sheet Row": np.asarray(df.index, dtype="int64") + 2,  # loaders keep the sheet's row order as the index
+            }))
+            for field, weight in spec["fields"].items():
+                if field not in df.columns:
+                    continue
+                tokens = tokenize(df[field].reset_index(drop=True))
+                postings.append(pd.DataFrame({"doc": tokens.index.to_numpy() + n, "term": tokens.to_numpy(), "weight": weight}))
+            n += len(df)
+        if not docs:
+            return index
+
+        index.docs = pd.concat(docs, ignore_index=True)
+        index.recency = index.docs["Date"].fillna(pd.Timestamp(0)).to_numpy().astype("datetime64[s]").astype(np.int64)
+        postings = pd.concat(postings, ignore_index=True)
+        # A term counts once per document, with its best field
+        postings = postings.groupby(["term", "doc"], sort=True)["weight"].max().reset_index()
+        index.terms, term_ids = np.unique(postings["term"].to_numpy(dtype=object), return_inverse=True)
+        counts = np.bincount(term_ids, minlength=len(index.terms))
+        index.offsets = np.concatenate([[0], np.cumsum(counts)])
+        index.doc_ids = postings["doc"].to_numpy(dtype=np.int64)
+        index.weights = postings["weight"].to_numpy(dtype=np.float64)
+        index.idf = np.log1p(len(index.docs) / counts)
+        for t, term in enumerate(index.terms):
+            if term.isalpha() and len(term) >= MIN_FUZZY:
+                for d in _deletions(term):
+                    index.deletions.setdefault(d, []).append(t)
+        return index
+
+    def _term_id(self, word):
+        i = np.searchsorted(self.terms, word)
+        return int(i) if i < len(self.terms) and self.terms[i] == word else None
+
+    # Term ids matching a query word, with the score of each kind of match
+    def _matches(self, word):
+        found = {}
+        exact = self._term_id(word)
+        if exact is not None:
+            found[exact] = EXACT
+        if len(word) >= MIN_PREFIX:
+            lo = np.searchsorted(self.terms, word)
+            hi = np.searchsorted(self.terms, word + "\uffff")
+            for t in range(lo, hi):
+                found.setdefault(t, PREFIX)
+        if word.isalpha() and len(word) >= MIN_FUZZY:
+            candidates = list(self.deletions.get(word, []))  # one letter missing from the query
+            for d in _deletions(word):
+                t = self._term_id(d)  # one letter too many
+                if t is not None:
+                    candidates.append(t)
+                candidates.extend(self.deletions.get(d, []))  # one letter wrong or swapped
+            for t in candidates:
+                found.setdefault(t, FUZZY)
+        return found
+
+    # Best score of a query word per document (0 where it does not match)
+    def _score(self, word):
+        best = np.zeros(len(self.docs))
+        found = self._matches(word)
+        if not found:
+            return best
+        ids = np.fromiter(found, dtype=np.int64)
+        kinds = np.fromiter(found.values(), dtype=np.float64)
+        starts, ends = self.offsets[ids], self.offsets[ids + 1]
+        lengths = ends - starts
+        positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        scores = self.weights[positions] * np.repeat(self.idf[ids] * kinds, lengths)
+        np.maximum.at(best, self.doc_ids[positions], scores)
+        return best
+
+    # Ranked hits: documents matching more of the query words first, then by
+    # score, then the most recent
+    def search(self, query, limit=50, ledgers=None):
+        words = [w for w in _words([query])[0] if w not in STOPWORDS]
+        named = {LEDGER_WORDS[w] for w in words if w in LEDGER_WORDS}
+        terms = [w for w in words if w not in LEDGER_WORDS]
+        if not terms:  # "bank" alone is a search term, not a filter
+            terms, named = words, set()
+        ledgers = set(ledgers or LEDGERS) & (named or set(LEDGERS))
+        if not terms or self.docs.empty:
+            return pd.DataFrame(columns=HIT_COLUMNS)
+
+        total = np.zeros(len(self.docs))
+        matched = np.zeros(len(self.docs), dtype=np.int64)
+        for word in terms:
+            best = self._score(word)
+            if not best.any() and word.isalnum() and not word.isalpha() and not word.isdigit():
+                # "lt0029" is no indexed word: match documents holding all its letter and digit runs
+                parts = [self._score(part) for part in _words([word]).str[0].str.findall(r"[a-z]+|[0-9]+")[0]]
+                best = np.where(np.logical_and.reduce([p > 0 for p in parts]), np.sum(parts, axis=0), 0.0)
+            total += best
+            matched += best > 0
+
+        candidates = np.flatnonzero((matched > 0) & self.docs["Ledger"].isin(ledgers).to_numpy())
+        if not len(candidates):
+            return pd.DataFrame(columns=HIT_COLUMNS)
+        order = np.lexsort((-self.recency[candidates], -total[candidates], -matched[candidates]))[:limit]
+        top = candidates[order]
+        hits = self.docs.iloc[top].copy()
+        hits["Score"] = total[top].round(2)
+        hits["Matched"] = [f"{m}/{len(terms)}" for m in matched[top]]
+        return hits.reset_index(drop=True)
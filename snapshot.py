@@ -0,0 +1,109 @@
+import os
+import pickle
+import threading
+from datetime import datetime
+from time import perf_counter
+
+
+# Last computed Dashboard, kept on disk so a restarted server has something
+# to show while the warm-up loads fresh data.
+SNAPSHOT_PATH = os.environ.get("VAYUVOLT_SNAPSHOT", os.path.join(".cache", "dashboard_snapshot.pkl"))
+
+
+def save(snapshot, path=SNAPSHOT_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+# The saved snapshot, or None when there is none (or it cannot be read)
+def load(path=SNAPSHOT_PATH):
+    try:
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return None
+
+
+# "42s", "7 min", "3 h", "2 d"
+def format_age(built_at, now=None):
+    seconds = max(0, ((now or datetime.now()) - built_at).total_seconds())
+    if seconds < 60:
+        return f"{seconds:.0f}s"
+    if seconds < 3600:
+        return f"{seconds // 60:.0f} min"
+    if seconds < 86400:
+        return f"{seconds // 3600:.0f} h"
+    return f"{seconds // 86400:.0f} d"
+
+
+# ---------- Warm-up ----------
+# Runs the warm-up function on a background thread, one run at a time per
+# process. `start_once` is for server start; `start` is for after a data
+# refresh. A start while a run is in progress queues one follow-up run (the
+# latest function asked for), so a refresh during the warm-up is not lost:
+# the run in progress may have read the data from before it.
+#
+# Streamlit runs no app code until the first session connects, so "server
+# start" is the first script run of the process, usually the login screen.
+class WarmupJob:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pending = None  # function to run again once the current run ends
+        self._started_once = False
+        self.status = {"state": "idle", "started": None, "seconds": None, "error": None, "runs": 0}
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    # True when a run starts now, False when it is queued behind the current one
+    def start(self, fn):
+        with self._lock:
+            if self.running:
+                self._pending = fn
+                return False
+            self.status.update(state="running", started=datetime.now(), seconds=None, error=None)
+            self._thread = threading.Thread(target=self._run, args=(fn,), name="dashboard-warmup", daemon=True)
+            self._thread.start()
+            return True
+
+    def start_once(self, fn):
+        with self._lock:
+            if self._started_once:
+                return False
+            self._started_once = True
+        return self.start(fn)
+
+    # Until the current run and any follow-up have finished
+    def wait(self, timeout=None):
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _run(self, fn):
+        while fn is not None:
+            start = perf_counter()
+            try:
+                fn()
+            except Exception as e:
+                self.status.update(state="failed", error=str(e))
+            else:
+                self.status.update(state="done")
+            self.status["seconds"] = perf_counter() - start
+            self.status["runs"] += 1
+
+            # Take the queued run, or finish; under the lock, so a start()
+            # either sees this thread running and queues, or starts a new one
+            with self._lock:
+                fn, self._pending = self._pending, None
+                if fn is None:
+                    self._thread = None
+                else:
+                    self.status.update(state="running", started=datetime.now(), seconds=None, error=None)
+
+
+warmup = WarmupJob()
@@ -0,0 +1,176 @@
+import os
+import re
+import sqlite3
+import threading
+from contextlib import closing
+from datetime import datetime
+from time import perf_counter
+
+import pandas as pd
+
+
+# Local analytical copy of the sheets. File-backed so large scans page from
+# disk instead of living in the app's memory.
+DB_PATH = os.environ.get("VAYUVOLT_SQL_STORE", os.path.join(".cache", "analytics.sqlite"))
+
+# Sheet column -> SQL column, per mirrored table
+TABLES = {
+    "collection": {
+        "Collection Date": "collection_date", "Vehicle No": "vehicle_no", "Amount": "amount",
+        "Meter Reading": "meter_reading", "Name": "name", "Distance": "distance",
+        "Month-Year": "month_year", "Received By": "received_by",
+    },
+    "expense": {
+        "Date": "date", "Vehicle No": "vehicle_no", "Reason of Expense": "reason",
+        "Amount Used": "amount", "Any Bill": "bill", "Month-Year": "month_year", "Expense By": "expense_by",
+    },
+    "investment": {
+        "Date": "date", "Investment Type": "investment_type", "Investment Amount": "amount",
+        "Comment": "comment", "Investor Name": "investor_name", "Month-Year": "month_year",
+    },
+    "bank": {
+        "Date": "date", "Transaction By": "transaction_by", "Transaction Type": "transaction_type",
+        "Reason": "reason", "Amount": "amount", "Bill": "bill", "Month-Year": "month_year",
+    },
+}
+
+DATE_COLUMNS = {"collection_date", "date"}
+
+# Bounds for ad-hoc queries from the query page: rows returned, and seconds
+# before SQLite is told to abort
+MAX_QUERY_ROWS = 10_000
+QUERY_TIMEOUT = float(os.environ.get("VAYUVOLT_SQL_TIMEOUT", "10"))
+
+# SQLite virtual machine steps between deadline checks
+PROGRESS_STEPS = 10_000
+
+# Indexes on date, vehicle and person columns
+INDEXES = {
+    "collection": ["collection_date", "vehicle_no", "name", "received_by", "month_year"],
+    "expense": ["date", "vehicle_no", "expense_by", "month_year"],
+    "investment": ["date", "investor_name"],
+    "bank": ["date", "transaction_by", "transaction_type"],
+}
+
+# Ready-made questions for the query page
+EXAMPLE_QUERIES = {
+    "Cost per km per vehicle per quarter": """
+WITH km AS (
+    SELECT vehicle_no,
+           strftime('%Y', collection_date) || '-Q' || ((CAST(strftime('%m', collection_date) AS INTEGER) + 2) / 3) AS quarter,
+           SUM(distance) AS distance_km,
+           SUM(amount) AS collection
+    FROM collection GROUP BY vehicle_no, quarter
+),
+cost AS (
+    SELECT vehicle_no,
+           strftime('%Y', date) || '-Q' || ((CAST(strftime('%m', date) AS INTEGER) + 2) / 3) AS quarter,
+           SUM(amount) AS expense
+    FROM expense GROUP BY vehicle_no, quarter
+)
+SELECT km.vehicle_no, km.quarter, km.distance_km, km.collection,
+       COALESCE(cost.expense, 0) AS expense,
+       ROUND(COALESCE(cost.expense, 0) / NULLIF(km.distance_km, 0), 2) AS cost_per_km
+FROM km LEFT JOIN cost USING (vehicle_no, quarter)
+ORDER BY km.quarter DESC, cost_per_km DESC""",
+    "Collection by driver and month": """
+SELECT month_year, name, COUNT(*) AS entries, SUM(amount) AS collection, SUM(distance) AS distance_km
+FROM collection GROUP BY month_year, name ORDER BY month_year DESC, collection DESC""",
+    "Bank flows by person and type": """
+SELECT transaction_by, transaction_type, COUNT(*) AS entries, SUM(amount) AS amount
+FROM bank GROUP BY transaction_by, transaction_type ORDER BY transaction_by, amount DESC""",
+    "Top expense reasons": """
+SELECT reason, COUNT(*) AS entries, SUM(amount) AS amount
+FROM expense GROUP BY reason ORDER BY amount DESC LIMIT 25""",
+}
+
+_lock = threading.Lock()
+
+
+def _prepare(df, columns):
+    frame = df[[c for c in columns if c in df.columns]].rename(columns=columns).copy()
+    for col in DATE_COLUMNS & set(frame.columns):
+        frame[col] = pd.to_datetime(frame[col], errors="coerce").dt.strftime("%Y-%m-%d")
+    return frame
+
+
+def store_version(path=DB_PATH):
+    if not os.path.exists(path):
+        return None
+    try:
+        with closing(sqlite3.connect(f"file:{path}?mode=ro", uri=True)) as conn:
+            row = conn.execute("SELECT version FROM meta").fetchone()
+        return row[0] if row else None
+    except sqlite3.Error:
+        return None
+
+
+# Rewrite the store from the loaded frames (name -> DataFrame, keys as in
+# TABLES). Built into a temp file and swapped in, so readers never see a
+# half-written store. No-op when the store already holds `version`.
+def mirror(frames, version, path=DB_PATH):
+    with _lock:
+        if store_version(path) == version:
+            return path
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+        conn = sqlite3.connect(tmp_path)
+        try:
+            for name, columns in TABLES.items():
+                df = frames.get(name)
+                if df is None or df.empty:
+                    # Keep the schema so queries still run against an empty sheet
+                    df = pd.DataFrame(columns=list(columns))
+                _prepare(df, columns).to_sql(name, conn, index=False, chunksize=5000)
+                for col in INDEXES[name]:
+                    conn.execute(f'CREATE INDEX IF NOT EXISTS "ix_{name}_{col}" ON "{name}" ("{col}")')
+            conn.execute("CREATE TABLE meta (version TEXT, built_at TEXT)")
+            conn.execute("INSERT INTO meta VALUES (?, ?)", (version, datetime.now().isoformat(timespec="seconds")))
+            conn.commit()
+        finally:
+            conn.close()
+
+        os.replace(tmp_path, path)
+        return path
+
+
+_READ_ONLY = re.compile(r"^\s*(select|with|pragma\s+table_info|explain)\b", re.IGNORECASE)
+_SELECT = re.compile(r"^\s*(select|with)\b", re.IGNORECASE)
+
+
+# Read-only query API for pages and the query page: returns a DataFrame.
+# With `limit`, a SELECT / WITH query is wrapped to return at most that many
+# rows (attrs["truncated"] tells whether it had more). With `timeout`,
+# SQLite aborts the query once it has run that many seconds and TimeoutError
+# is raised.
+def run_query(sql, params=None, path=DB_PATH, limit=None, timeout=None):
+    if not _READ_ONLY.match(sql):
+        raise ValueError("Only SELECT / WITH queries are allowed.")
+    if limit is not None and _SELECT.match(sql):
+        sql = f"SELECT * FROM ({sql.strip().rstrip(';')}\n) LIMIT {int(limit) + 1}"
+    with closing(sqlite3.connect(f"file:{path}?mode=ro", uri=True)) as conn:
+        conn.execute("PRAGMA query_only = ON")
+        if timeout is not None:
+            deadline = perf_counter() + timeout
+            conn.set_progress_handler(lambda: perf_counter() > deadline, PROGRESS_STEPS)
+        try:
+            result = pd.read_sql_query(sql, conn, params=params)
+        except Exception as e:
+            if timeout is not None and perf_counter() > deadline and "interrupted" in str(e):
+                raise TimeoutError(f"Query stopped after {timeout:g}s") from e
+            raise
+    result.attrs["truncated"] = limit is not None and len(result) > limit
+    return result.head(limit) if limit is not None else result
+
+
+# Table -> list of columns, for the schema browser
+def schema(path=DB_PATH):
+    tables = run_query("SELECT name FROM sqlite_master WHERE type = 'table' AND name != 'meta' ORDER BY name", path=path)
+    return {
+        t: run_query(f'PRAGMA table_info("{t}")', path=path)["name"].tolist()
+        for t in tables["name"]
+    }
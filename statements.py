@@ -0,0 +1,235 @@
+# Monthly statements: one PDF (or PNG) page and one CSV per vehicle and per
+# driver for a month, bundled into a zip. Usable from the app (Statements
+# page) and headless:
+#
+#   python statements.py --month 2026-09 --data-dir ./data --out statements.zip
+#
+# Vehicle totals come from the vehicle P&L cube and the month's rows are
+# grouped once for the whole fleet; only rendering is per statement, and it
+# is fanned out over a process pool.
+import argparse
+import io
+import os
+import re
+import sys
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import pandas as pd
+
+import ingest
+import rent_targets
+import vehicle_pnl
+from connections import LOCAL_DATA_DIR, sheet_csv_url
+from rent_targets import COMPANY_NAME
+
+
+FORMATS = ["pdf", "png"]
+
+# Rendering processes; 0 means one per CPU. With one worker (or a handful of
+# statements) rendering runs in this process.
+WORKERS = int(os.environ.get("VAYUVOLT_STATEMENT_WORKERS", "0")) or os.cpu_count() or 1
+MIN_PARALLEL_JOBS = 8
+
+DAILY_COLUMNS = ["Date", "Collection", "Target", "Loss", "Distance", "Detail"]
+SUMMARY_COLUMNS = ["Statement", "Name", "Days", "Collection", "Target", "Loss", "Expenses", "Distance", "File"]
+
+
+def _file_name(label):
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", str(label)).strip("_") or "unnamed"
+
+
+def _joined(values):
+    return ", ".join(sorted({str(v) for v in values if pd.notna(v)}))
+
+
+# ---------- Statement data ----------
+# One job per vehicle and per driver with everything its page shows:
+#   collection_df  the collection sheet (with Distance, as the app loads it)
+#   loss_df        the loss matrix over the same rows (Amount = loss)
+#   expense_df     the expense sheet
+#   cube           the vehicle x month P&L cube (vehicle_pnl.build_pnl_cube)
+#                  the app already caches; built for the month when None
+# Vehicle totals are read from the cube, so they match the Vehicle P&L page.
+# The daily tables, and the driver totals (the cube has no driver axis),
+# come from a single grouping of the month's rows.
+def statement_jobs(collection_df, loss_df, expense_df, month, cube=None):
+    rows = collection_df[collection_df["Month-Year"] == month]
+    rows = rows.assign(
+        Date=pd.to_datetime(rows["Collection Date"], errors="coerce").dt.normalize(),
+        Amount=pd.to_numeric(rows["Amount"], errors="coerce").fillna(0),
+        Distance=pd.to_numeric(rows["Distance"], errors="coerce").fillna(0),
+        Target=rent_targets.targets.lookup(rows["Vehicle No"], rows["Collection Date"]),
+        **{"Vehicle No": rows["Vehicle No"].astype("str").str.strip()},
+    ).dropna(subset=["Date"])
+    losses = loss_df[loss_df["Month-Year"] == month]
+    losses = losses.assign(Date=pd.to_datetime(losses["Collection Date"]).dt.normalize(),
+                           **{"Vehicle No": losses["Vehicle No"].astype("str").str.strip()})
+    expenses = expense_df[expense_df["Month-Year"] == month]
+    if cube is None:
+        cube = vehicle_pnl.build_pnl_cube(rows, expenses, None, losses)
+    by_vehicle = cube[cube["Month-Year"] == month].set_index("Vehicle No")
+
+    jobs = []
+    for kind, key, detail, loss_key in (("vehicle", "Vehicle No", "Name", "Vehicle No"),
+                                        ("driver", "Name", "Vehicle No", "Name")):
+        owned = rows if kind == "vehicle" else rows[rows["Name"].notna() & (rows["Name"] != COMPANY_NAME)]
+        daily = owned.groupby([key, "Date"], sort=True).agg(
+            Collection=("Amount", "sum"), Target=("Target", "sum"), Distance=("Distance", "sum"),
+            Detail=(detail, _joined),
+        )
+        # A driver's loss is what the loss matrix leaves with them (the company's share is not theirs)
+        daily["Loss"] = losses.groupby([loss_key, "Date"])["Amount"].sum().reindex(daily.index).fillna(0)
+        daily = daily.reset_index()
+        expense_rows = (dict(list(expenses.groupby(expenses["Vehicle No"].astype("str").str.strip())))
+                        if kind == "vehicle" else {})
+
+        for name, part in daily.groupby(key, sort=True):
+            if kind == "vehicle" and name in by_vehicle.index:
+                pnl = by_vehicle.loc[name]
+                totals = {"Collection": pnl["Collection"], "Target": pnl["Target"], "Loss": pnl["Loss vs Target"],
+                          "Expenses": pnl["Expenses"], "Distance": pnl["Distance"]}
+            else:
+                totals = {"Collection": part["Collection"].sum(), "Target": part["Target"].sum(),
+                          "Loss": part["Loss"].sum(), "Expenses": 0.0, "Distance": part["Distance"].sum()}
+            jobs.append({
+                "kind": kind,
+                "name": name,
+                "month": month,
+                "daily": part[DAILY_COLUMNS].reset_index(drop=True),
+                "expenses": expense_rows.get(name, expenses.iloc[:0])[["Date", "Reason of Expense", "Amount Used"]]
+                            .reset_index(drop=True),
+                "totals": {"Days": int(part["Date"].nunique()), **{k: float(v) for k, v in totals.items()}},
+            })
+    return jobs
+
+
+# ---------- Rendering ----------
+# One statement: a page with the totals, the daily chart and the daily table
+# (as PDF or PNG), and the daily rows as CSV. Runs in a worker process.
+def render_statement(job, fmt="pdf"):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    daily, totals = job["daily"], job["totals"]
+    title = f"{job['kind'].title()} statement · {job['name']} · {job['month']}"
+    fig = plt.figure(figsize=(8.27, 11.69))
+    fig.suptitle(title, fontsize=14, fontweight="bold", y=0.97)
+    fig.text(0.08, 0.91, "   ".join([
+        f"Days: {totals['Days']}",
+        f"Collection: ₹{totals['Collection']:,.0f}",
+        f"Target: ₹{totals['Target']:,.0f}",
+        f"Loss: ₹{totals['Loss']:,.0f}",
+    ] + ([f"Expenses: ₹{totals['Expenses']:,.0f}"] if job["kind"] == "vehicle" else [])
+      + [f"Distance: {totals['Distance']:,.0f} km"]), fontsize=9)
+
+    # ---------- Daily chart ----------
+    ax = fig.add_axes([0.1, 0.58, 0.84, 0.3])
+    days = daily["Date"].dt.day.to_numpy()
+    ax.bar(days, daily["Collection"], color="#00994C", label="Collection")
+    ax.step(days, daily["Target"], where="mid", color="#444444", linewidth=1, label="Target")
+    ax.bar(days, -daily["Loss"].clip(lower=0), color="#fc0324", label="Loss")
+    ax.axhline(0, color="black", linewidth=0.5)
+    ax.set_xlabel("Day of month")
+    ax.set_ylabel("₹")
+    ax.legend(loc="upper right", fontsize=8)
+
+    # ---------- Daily table ----------
+    # One monospaced text block: a matplotlib table draws every cell as its
+    # own artist and costs several times the rest of the page
+    lines = ["{:<8}{:>12}{:>10}{:>10}{:>10}   {}".format(*DAILY_COLUMNS)]
+    lines += [f"{d:%d %b}  {c:>12,.0f}{t:>10,.0f}{l:>10,.0f}{k:>10,.0f}   {str(x)[:40]}"
+              for d, c, t, l, k, x in daily[DAILY_COLUMNS].itertuples(index=False)]
+    fig.text(0.08, 0.52, "\n".join(lines), family="monospace", fontsize=7.5, va="top")
+
+    page = io.BytesIO()
+    fig.savefig(page, format=fmt, dpi=100)
+    plt.close(fig)
+
+    csv = daily.assign(Date=daily["Date"].dt.strftime("%Y-%m-%d")).to_csv(index=False)
+    if not job["expenses"].empty:
+        csv += "\nExpenses\n" + job["expenses"].to_csv(index=False)
+    base = f"{job['kind']}s/{_file_name(job['name'])}"
+    return [(f"{base}.{fmt}", page.getvalue()), (f"{base}.csv", csv.encode("utf-8"))]
+
+
+# ---------- Bundle ----------
+# Statements for every job, zipped with a summary CSV. Returns the zip bytes,
+# the summary and the seconds taken.
+def generate(jobs, fmt="pdf", workers=WORKERS):
+    start = time.perf_counter()
+    if workers > 1 and len(jobs) >= MIN_PARALLEL_JOBS:
+        # spawn, not fork: the app process runs threads (Streamlit, the warm-up)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) as pool:
+            chunk = max(1, len(jobs) // (workers * 4))
+            rendered = list(pool.map(render_statement, jobs, [fmt] * len(jobs), chunksize=chunk))
+    else:
+        rendered = [render_statement(job, fmt) for job in jobs]
+
+    summary = pd.DataFrame([
+        {"Statement": job["kind"].title(), "Name": job["name"], **job["totals"], "File": files[0][0]}
+        for job, files in zip(jobs, rendered)
+    ], columns=SUMMARY_COLUMNS)
+    bundle = io.BytesIO()
+    with zipfile.ZipFile(bundle, "w", zipfile.ZIP_DEFLATED) as archive:
+        for files in rendered:
+            for path, data in files:
+                archive.writestr(path, data)
+        archive.writestr("summary.csv", summary.to_csv(index=False))
+    return bundle.getvalue(), summary, time.perf_counter() - start
+
+
+# ---------- Headless ----------
+# The collection and expense sheets as the app loads them (Distance from
+# meter readings per vehicle)
+def load_sheets(collection_url, expense_url):
+    collection, _ = ingest.parse_collection(ingest.read_frame(collection_url, "collection"))
+    collection = ingest.add_distance(collection.sort_values(["Vehicle No", "Collection Date"]))
+    expense, _ = ingest.parse_expense(ingest.read_frame(expense_url, "expense"))
+    return collection, expense
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate monthly vehicle and driver statements.")
+    parser.add_argument("--month", required=True, help="statement month, YYYY-MM")
+    parser.add_argument("--data-dir", default=LOCAL_DATA_DIR, help="directory with the sheets' CSV exports")
+    parser.add_argument("--collection-url", help="collection sheet CSV (file or URL), instead of --data-dir")
+    parser.add_argument("--expense-url", help="expense sheet CSV (file or URL), instead of --data-dir")
+    parser.add_argument("--format", default="pdf", choices=FORMATS, help="statement page format")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="rendering processes")
+    parser.add_argument("--out", help="zip to write (default: statements_<month>.zip)")
+    args = parser.parse_args(argv)
+    if not (args.collection_url and args.expense_url) and not args.data_dir:
+        parser.error("give --data-dir (or VAYUVOLT_DATA_DIR), or both sheet URLs")
+
+    start = time.perf_counter()
+    collection, expense = load_sheets(
+        args.collection_url or sheet_csv_url(None, "collection", args.data_dir),
+        args.expense_url or sheet_csv_url(None, "expense", args.data_dir),
+    )
+    perf_df = collection.assign(
+        **{"Collection Date": pd.to_datetime(collection["Collection Date"], errors="coerce").dt.normalize(),
+           "Amount": pd.to_numeric(collection["Amount"], errors="coerce").fillna(0)}
+    ).dropna(subset=["Collection Date"])
+    jobs = statement_jobs(collection, rent_targets.loss_matrix(perf_df), expense, args.month)
+    loaded = time.perf_counter() - start
+    if not jobs:
+        print(f"No collection rows in {args.month}.")
+        return 1
+
+    bundle, summary, seconds = generate(jobs, args.format, args.workers)
+    out = args.out or f"statements_{args.month}.zip"
+    with open(out, "wb") as f:
+        f.write(bundle)
+    counts = summary["Statement"].value_counts()
+    print(f"{counts.get('Vehicle', 0)} vehicle and {counts.get('Driver', 0)} driver statements for {args.month}"
+          f" -> {out} ({len(bundle) / 2**20:,.1f} MB)"
+          f"\nloaded in {loaded:.2f}s, rendered in {seconds:.2f}s on {args.workers} worker(s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# The engine modules sit flat at the repository root, next to the app
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PARTNERS = ("Govind Kumar", "Kumar Gaurav")
+COMPANY = "Zero Collection"
+
+
+# ---------- Sheet factories ----------
+# Small seeded sheets shaped like the loaders' output (dates parsed to
+# datetime.date, amounts numeric, Month-Year filled), for checking a fast
+# path against a reference or a fresh build. Each fixture returns a factory.
+def _dates(rng, n, days, start="2026-01-01"):
+    return (pd.Timestamp(start) + pd.to_timedelta(rng.integers(0, days, n), unit="D")).date
+
+
+def _month_year(dates):
+    return pd.to_datetime(pd.Series(dates)).dt.strftime("%Y-%m").to_numpy()
+
+
+@pytest.fixture
+def make_collection():
+    def make(n=200, seed=0, days=60, vehicles=("V1", "V2", "V3"), drivers=("A", "B", COMPANY),
+             amounts=(0.0, 300.0, 500.0, 800.0), start="2026-01-01"):
+        rng = np.random.default_rng(seed)
+        dates = _dates(rng, n, days, start)
+        return pd.DataFrame({
+            "Collection Date": dates,
+            "Vehicle No": rng.choice(list(vehicles), n),
+            "Amount": rng.choice(list(amounts), n),
+            "Meter Reading": np.arange(n, dtype=float) * 10,
+            "Name": rng.choice(np.array(drivers, dtype=object), n),
+            "Received By": rng.choice(PARTNERS, n),
+            "Month-Year": _month_year(dates),
+        }).sort_values("Collection Date", kind="stable", ignore_index=True)
+    return make
+
+
+@pytest.fixture
+def make_expense():
+    def make(n=30, seed=1, days=60):
+        rng = np.random.default_rng(seed)
+        dates = _dates(rng, n, days)
+        return pd.DataFrame({
+            "Date": dates, "Vehicle No": rng.choice(["V1", "V2"], n), "Reason of Expense": "Tyre",
+            "Amount Used": rng.choice([50.0, 120.0, 250.0], n), "Any Bill": "",
+            "Expense By": rng.choice(PARTNERS, n), "Month-Year": _month_year(dates),
+        })
+    return make
+
+
+@pytest.fixture
+def make_investment():
+    def make(n=20, seed=2, days=60):
+        rng = np.random.default_rng(seed)
+        dates = _dates(rng, n, days)
+        return pd.DataFrame({
+            "Date": dates, "Investment Type": "Capital", "Investment Amount": rng.choice([1000.0, 5000.0], n),
+            "Comment": "", "Investor Name": rng.choice(PARTNERS, n), "Month-Year": _month_year(dates),
+        })
+    return make
+
+
+@pytest.fixture
+def make_bank():
+    from balances import BANK_CREDITS, BANK_DEBITS
+
+    def make(n=60, seed=3, days=60, types=BANK_CREDITS + BANK_DEBITS):
+        rng = np.random.default_rng(seed)
+        dates = _dates(rng, n, days)
+        return pd.DataFrame({
+            "Date": dates, "Transaction By": rng.choice(PARTNERS, n), "Transaction Type": rng.choice(types, n),
+            "Reason": "", "Amount": rng.choice([200.0, 700.0], n), "Month-Year": _month_year(dates),
+        })
+    return make
@@ -0,0 +1,57 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from assignments import AssignmentIndex
+from rent_targets import COMPANY_NAME
+
+
+def collection(rows):
+    return pd.DataFrame(rows, columns=["Vehicle No", "Name", "Collection Date", "Amount"])
+
+
+def test_zero_collection_day_stays_inside_the_drivers_run():
+    index = AssignmentIndex.build(collection([
+        ("V1", "A", "2026-01-01", 300),
+        ("V1", COMPANY_NAME, "2026-01-02", 0),
+        ("V1", "A", "2026-01-03", 300),
+    ]))
+
+    frame = index.intervals()
+    assert len(frame) == 1
+    assert frame.iloc[0]["Driver"] == "A"
+    assert (frame.iloc[0]["Start"], frame.iloc[0]["End"]) == (date(2026, 1, 1), date(2026, 1, 3))
+    assert index.holder("V1", "2026-01-02") == "A"
+    assert COMPANY_NAME not in index.drivers
+
+
+def test_lookup_matches_a_scan_of_the_intervals():
+    rng = np.random.default_rng(7)
+    days = pd.date_range("2026-01-01", periods=60)
+    df = collection([
+        (f"V{v}", rng.choice(["A", "B", "C", COMPANY_NAME]), day, 300)
+        for v in range(4) for day in days if rng.random() < 0.7
+    ])
+    index = AssignmentIndex.build(df)
+    intervals = index.intervals()
+
+    for vehicle in ["V0", "V1", "V2", "V3", "V9"]:
+        for day in pd.date_range("2025-12-30", "2026-03-05"):
+            covering = intervals[(intervals["Vehicle No"] == vehicle)
+                                 & (intervals["Start"] <= day.date()) & (intervals["End"] >= day.date())]
+            expected = covering.iloc[0]["Driver"] if len(covering) else None
+            assert index.holder(vehicle, day) == expected
+
+
+def test_overlapping_runs_are_a_driver_on_two_vehicles_at_once():
+    index = AssignmentIndex.build(collection([
+        ("V1", "A", "2026-01-01", 300),
+        ("V1", "A", "2026-01-05", 300),
+        ("V2", "A", "2026-01-03", 300),
+        ("V2", "B", "2026-01-10", 300),
+        ("V3", "B", "2026-01-20", 300),
+    ]))
+
+    overlaps = index.overlapping_runs()
+    assert list(zip(overlaps["Vehicle No"], overlaps["Driver"])) == [("V2", "A")]
@@ -0,0 +1,48 @@
+import pandas as pd
+import pytest
+
+from balances import PARTNERS, BalanceLedger, dashboard_figures
+from kpi import KpiAccumulator, contributions
+from rent_targets import loss_matrix
+
+
+@pytest.fixture
+def frames(make_collection, make_expense, make_investment, make_bank):
+    def make(seed=0):
+        return {"collection": make_collection(80, seed), "expense": make_expense(80, seed),
+                "investment": make_investment(80, seed), "bank": make_bank(80, seed)}
+    return make
+
+
+def test_totals_as_of_a_day_match_a_filtered_sum(frames):
+    data = frames()
+    ledger = BalanceLedger.build(data)
+    events = pd.concat([contributions(name, df) for name, df in data.items()], ignore_index=True)
+    events["date"] = pd.to_datetime(events["date"])
+
+    for as_of in ["2025-12-31", "2026-01-15", "2026-02-01", "2026-03-31"]:
+        upto = events[events["date"] <= pd.Timestamp(as_of)]
+        for metric in ["collection", "expense", "investment", "Collection_Credit"]:
+            assert ledger.total(metric, as_of=as_of) == pytest.approx(upto.loc[upto["metric"] == metric, "value"].sum())
+            for person in PARTNERS:
+                mine = upto[(upto["metric"] == metric) & (upto["person"] == person)]
+                assert ledger.total(metric, person, as_of) == pytest.approx(mine["value"].sum())
+
+
+def test_figures_match_the_running_kpi_totals(frames):
+    data = frames(1)
+    kpis = KpiAccumulator().refresh(data, loss_matrix)
+
+    expected = dashboard_figures(kpis.total)
+    figures = BalanceLedger.build(data).figures()
+    for key in ["total_collection", "total_expense", "total_investment", "bank", "net"]:
+        assert figures[key] == pytest.approx(expected[key])
+    assert figures["cash"] == pytest.approx(expected["cash"])
+
+
+def test_balance_series_ends_on_the_figures(frames):
+    ledger = BalanceLedger.build(frames(2))
+    series = ledger.balance_series()
+    last = series[series["Date"] == series["Date"].max()].set_index("Balance")["Value"]
+    assert last["Net"] == pytest.approx(ledger.figures()["net"])
+    assert last["Bank"] == pytest.approx(ledger.figures()["bank"])
@@ -0,0 +1,100 @@
+import pandas as pd
+import pytest
+
+import change_log
+from change_log import DELETED, INSERTED, UPDATED, ChangeTracker, SheetChanges
+from rent_targets import loss_matrix
+
+
+def collection(rows):
+    frame = pd.DataFrame(rows, columns=["Collection Date", "Vehicle No", "Amount", "Name"])
+    frame["Collection Date"] = pd.to_datetime(frame["Collection Date"]).dt.date
+    return frame.assign(**{
+        "Meter Reading": 0.0,
+        "Received By": "Govind Kumar",
+        "Month-Year": pd.to_datetime(frame["Collection Date"]).dt.strftime("%Y-%m"),
+    })
+
+
+BASE = [
+    ("2026-01-30", "V1", 500, "A"),
+    ("2026-01-31", "V1", 450, "A"),
+    ("2026-02-01", "V2", 500, "B"),
+    ("2026-02-01", "V3", 300, "B"),
+    ("2026-02-02", "V2", 500, "B"),
+    ("2026-02-03", "V1", 500, "A"),
+]
+
+
+def test_between_reports_an_insert_an_edit_and_a_delete():
+    old = collection(BASE)
+    # Delete the second row, edit the fifth, add one at the end: the rows
+    # below the deletion move up one label without being reported
+    new = collection([BASE[0]] + BASE[2:4] + [("2026-02-02", "V2", 550, "B"), BASE[5],
+                                             ("2026-02-04", "V3", 500, "C")])
+
+    changes = SheetChanges.between("collection", old, new)
+    assert changes.counts == {INSERTED: 1, UPDATED: 1, DELETED: 1}
+    assert changes.deleted["Amount"].tolist() == [450]
+    assert changes.before["Amount"].tolist() == [500] and changes.after["Amount"].tolist() == [550]
+    assert changes.inserted["Vehicle No"].tolist() == ["V3"]
+    assert changes.months == {"2026-01", "2026-02"}
+    assert changes.vehicles == {"V1", "V2", "V3"}
+    assert changes.dates == {pd.Timestamp(d) for d in ["2026-01-31", "2026-02-02", "2026-02-04"]}
+
+
+def test_unchanged_sheet_reports_nothing():
+    changes = SheetChanges.between("collection", collection(BASE), collection(BASE))
+    assert len(changes) == 0 and changes.months == set()
+
+
+def test_tracker_logs_each_change_once(tmp_path):
+    tracker = ChangeTracker(str(tmp_path))
+    assert tracker.record({"collection": collection(BASE)}) == {"collection": None}
+
+    edited = collection(BASE[:-1] + [("2026-02-03", "V1", 0, "A")])
+    first = tracker.record({"collection": edited})["collection"]
+    again = tracker.record({"collection": edited})["collection"]
+    assert first.counts == again.counts == {INSERTED: 0, UPDATED: 1, DELETED: 0}
+    assert len(tracker.log) == 1
+    assert ChangeTracker(str(tmp_path)).log.equals(tracker.log)
+
+
+@pytest.mark.parametrize("rules", ["flat", None])
+def test_refresh_by_date_patches_only_the_touched_dates(tmp_path, monkeypatch, rules):
+    monkeypatch.setattr(change_log, "tracker", ChangeTracker(str(tmp_path)))
+    monkeypatch.setattr(change_log, "_derived", {})
+    old = collection(BASE)
+    new = collection(BASE[:3] + [("2026-02-01", "V3", 900, "B")] + BASE[4:] + [("2026-02-05", "V2", 100, "C")])
+    calls = []
+
+    def counted(rows):
+        calls.append(len(rows))
+        return loss_matrix(rows)
+
+    change_log.tracker.record({"collection": old})
+    change_log.refresh_by_date("lm", "collection", change_log.dataset_version(old), old, counted,
+                               "Collection Date", rules)
+    change_log.tracker.record({"collection": new})
+    result = change_log.refresh_by_date("lm", "collection", change_log.dataset_version(new), new, counted,
+                                        "Collection Date", rules)
+
+    assert calls == [len(old), 3]  # the two rows of 1 Feb and the new row of 5 Feb
+    pd.testing.assert_frame_equal(result, loss_matrix(new))
+
+
+def test_refresh_by_date_recomputes_under_new_rules(tmp_path, monkeypatch):
+    monkeypatch.setattr(change_log, "tracker", ChangeTracker(str(tmp_path)))
+    monkeypatch.setattr(change_log, "_derived", {})
+    old, new = collection(BASE), collection(BASE[:-1])
+    calls = []
+
+    def counted(rows):
+        calls.append(len(rows))
+        return loss_matrix(rows)
+
+    change_log.tracker.record({"collection": old})
+    change_log.refresh_by_date("lm", "collection", change_log.dataset_version(old), old, counted, "Collection Date", "a")
+    change_log.tracker.record({"collection": new})
+    change_log.refresh_by_date("lm", "collection", change_log.dataset_version(new), new, counted, "Collection Date", "b")
+    assert calls == [len(old), len(new)]
@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+
+from chart_data import MAX_BUCKETS_PER_SERIES, MIN_SERIES_POINTS, build_rollups, chart_frame, lttb, pick_resolution
+
+
+def test_pick_resolution_keeps_a_series_within_the_bucket_limit():
+    start = pd.Timestamp("2020-01-01")
+    assert pick_resolution(start, start) == "Daily"
+    assert pick_resolution(start, start + pd.Timedelta(days=MAX_BUCKETS_PER_SERIES)) == "Daily"
+    assert pick_resolution(start, start + pd.Timedelta(days=MAX_BUCKETS_PER_SERIES + 1)) == "Weekly"
+    assert pick_resolution(start, start + pd.Timedelta(weeks=MAX_BUCKETS_PER_SERIES)) == "Weekly"
+    assert pick_resolution(start, start + pd.Timedelta(weeks=MAX_BUCKETS_PER_SERIES, days=1)) == "Monthly"
+
+
+def test_lttb_keeps_the_ends_and_the_spikes():
+    x = np.arange(1000)
+    y = np.sin(x / 50)
+    y[[137, 612]] = [25, -25]
+
+    keep = lttb(x, y, 50)
+    assert len(keep) == 50 and keep[0] == 0 and keep[-1] == 999
+    assert (np.diff(keep) > 0).all()
+    assert {137, 612} <= set(keep)
+
+    assert (lttb(x[:10], y[:10], 20) == np.arange(10)).all()
+    assert (lttb(x, y, 2) == np.arange(1000)).all()
+
+
+def rollups(n_vehicles, days=300):
+    dates = pd.date_range("2025-01-01", periods=days, freq="D")
+    df = pd.DataFrame({
+        "Date": np.repeat(dates, n_vehicles),
+        "Vehicle No": np.tile([f"V{i:03d}" for i in range(n_vehicles)], days),
+        "Amount": np.tile(np.arange(1, n_vehicles + 1, dtype=float), days) * 100,
+    })
+    return build_rollups(df, "Date", ["Amount"], by="Vehicle No")
+
+
+def test_chart_frames_stay_within_the_point_cap():
+    end = pd.Timestamp("2025-10-27")
+    # 20 vehicles x 300 days: every line is downsampled to 100 points
+    frame, resolution = chart_frame(rollups(20), "2025-01-01", end, "Date", ["Amount"], by="Vehicle No", max_points=2000)
+    assert resolution == "Daily" and len(frame) <= 2000
+    assert frame.groupby("Series").size().eq(100).all() and frame.attrs["hidden_series"] == 0
+
+    # 300 vehicles would need 3600 points at the per-line minimum: only the largest 166 are drawn
+    frame, _ = chart_frame(rollups(300), "2025-01-01", end, "Date", ["Amount"], by="Vehicle No", max_points=2000)
+    assert len(frame) <= 2000
+    assert frame.groupby("Series").size().eq(MIN_SERIES_POINTS).all()
+    assert frame["Series"].nunique() == 2000 // MIN_SERIES_POINTS
+    assert frame.attrs["hidden_series"] == 300 - 2000 // MIN_SERIES_POINTS
+    assert frame["Series"].min() == "V134"  # the smallest totals are the ones left out
+
+
+def test_the_first_partial_bucket_is_kept():
+    frame, resolution = chart_frame(rollups(2, days=900), "2025-01-15", "2027-06-01", "Date", ["Amount"])
+    assert resolution == "Weekly"
+    assert frame["Date"].min() == pd.Timestamp("2025-01-13")  # the Monday of the week holding the start
@@ -0,0 +1,88 @@
+from datetime import date
+
+import pandas as pd
+
+from data_quality import QualityReport, parse_failures, validate
+
+
+def collection(rows):
+    return pd.DataFrame(rows, columns=["Collection Date", "Vehicle No", "Amount", "Meter Reading", "Name", "Received By"])
+
+
+CLEAN = [
+    (date(2026, 1, 1), "V1", 500.0, 100.0, "Ravi Kumar", "Govind Kumar"),
+    (date(2026, 1, 2), "V1", 450.0, 160.0, "Ravi Kumar", "Kumar Gaurav"),
+    (date(2026, 1, 1), "V2", 500.0, 300.0, "Amit", "Govind Kumar"),
+    (date(2026, 1, 2), "V2", 520.0, 380.0, "Amit", "Govind Kumar"),
+    (date(2026, 1, 3), "V2", 480.0, 420.0, "Amit", "Kumar Gaurav"),
+]
+
+
+def found(issues):
+    return sorted(zip(issues["Sheet Row"], issues["Check"]))
+
+
+def test_clean_rows_have_no_issues():
+    assert validate("collection", collection(CLEAN)).empty
+
+
+def test_each_collection_check_reports_its_row():
+    df = collection(CLEAN + [
+        (date(2026, 1, 3), "V1", 5000.0, 200.0, "ravi  kumar", "Govind Kumar"),  # outlier, spelling
+        (date(2099, 1, 1), "V3", -50.0, 10.0, "Amit", "Someone"),  # future, negative, unknown partner
+        (date(2026, 1, 3), "V2 ", 480.0, 400.0, "", "Govind Kumar"),  # duplicate vehicle-day, meter, no driver
+    ])
+
+    issues = validate("collection", df)
+    # Sheet rows count from 2 (row 1 is the header)
+    assert found(issues) == [
+        (6, "Duplicate vehicle-day"),
+        (7, "Amount outlier"), (7, "Unknown driver"),
+        (8, "Future date"), (8, "Negative amount"), (8, "Unknown partner"),
+        (9, "Duplicate vehicle-day"), (9, "Meter regression"), (9, "Unknown driver"),
+    ]
+    spelling = issues[(issues["Sheet Row"] == 7) & (issues["Check"] == "Unknown driver")]
+    assert spelling["Detail"].tolist() == ["spelling of Ravi Kumar"]
+
+
+def test_parse_failures_travel_with_the_frame():
+    raw = pd.DataFrame({"Amount": ["500", "", "abc"]})
+    parsed = pd.DataFrame({"Amount": pd.to_numeric(raw["Amount"], errors="coerce")})
+    failures = parse_failures(raw, parsed)
+    assert [(f["Row"], f["Check"]) for f in failures] == [(1, "Missing value"), (2, "Unparseable value")]
+
+    df = collection(CLEAN[:3])
+    df.attrs["parse_failures"] = failures
+    assert found(validate("collection", df)) == [(3, "Missing value"), (4, "Unparseable value")]
+
+
+def test_bank_types_and_outliers_are_checked_per_type():
+    bank = pd.DataFrame({
+        "Date": [date(2026, 1, d) for d in range(1, 6)],
+        "Transaction By": "Govind Kumar",
+        "Transaction Type": ["Collection_Credit"] * 3 + ["Expence_Debit", "Cash_Gift"],
+        "Reason": "", "Amount": [10000.0, 11000.0, 12000.0, 200.0, 50.0],
+    })
+    # 200 is small next to the credits but alone in its type: not an outlier
+    assert found(validate("bank", bank)) == [(6, "Unknown bank type")]
+
+
+def test_appended_rows_are_validated_as_a_delta():
+    old = collection(CLEAN)
+    new = collection(CLEAN + [(date(2026, 1, 4), "V2", -1.0, 300.0, "Amit", "Govind Kumar")])
+    frames = {"collection": new, "expense": None}
+
+    report = QualityReport().refresh({"collection": old}).refresh(frames)
+    full = QualityReport().refresh(frames)
+    assert report.last_refresh["mode"] == "delta" and report.last_refresh["rows"] == 1
+    pd.testing.assert_frame_equal(report.issues, full.issues)
+    assert report.counts()["Issues"].sum() == 2  # negative amount, meter regression
+
+
+def test_edited_rows_run_every_check_again():
+    old = collection(CLEAN)
+    edited = collection([CLEAN[0], CLEAN[1][:2] + (-5.0,) + CLEAN[1][3:]] + CLEAN[2:])
+
+    report = QualityReport().refresh({"collection": old}).refresh({"collection": edited})
+    assert report.last_refresh["mode"] == "full"
+    assert found(report.issues) == [(3, "Negative amount")]
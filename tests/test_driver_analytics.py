@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from driver_analytics import ROLLING_WINDOWS, build_driver_scorecard, top_k, zero_streaks
+from rent_targets import COMPANY_NAME, DAILY_TARGET, RentTargets, loss_matrix
+
+
+def test_zero_streaks_per_key():
+    daily = pd.DataFrame({
+        "Name": ["A"] * 7 + ["B"] * 3 + ["C"],
+        "Amount": [0, 0, 300, 0, 0, 0, 500] + [300, 0, 0] + [0],
+    })
+    streaks = zero_streaks(daily, "Name")
+    assert streaks.to_dict("index") == {
+        "A": {"Longest Zero Streak": 3, "Current Zero Streak": 0},
+        "B": {"Longest Zero Streak": 2, "Current Zero Streak": 2},
+        "C": {"Longest Zero Streak": 1, "Current Zero Streak": 1},
+    }
+    assert zero_streaks(daily.iloc[:0], "Name").empty
+
+
+def test_rolling_windows_match_a_filtered_sum(make_collection):
+    perf_df = make_collection(400, seed=5, days=120, drivers=("A", "B", "C", COMPANY_NAME))
+    perf_df["Collection Date"] = pd.to_datetime(perf_df["Collection Date"])
+    as_of = pd.Timestamp("2026-03-15")  # rows after it are in no window
+
+    card = build_driver_scorecard(perf_df, loss_matrix(perf_df), as_of=as_of).set_index("Name")
+    assert COMPANY_NAME not in card.index
+    drivers = perf_df[perf_df["Name"] != COMPANY_NAME]
+    for w in ROLLING_WINDOWS:
+        age = (as_of - drivers["Collection Date"]).dt.days
+        expected = drivers[(age >= 0) & (age < w)].groupby("Name")["Amount"].sum()
+        assert card[f"Last {w}d Collection"].to_dict() == pytest.approx(expected.reindex(card.index, fill_value=0).to_dict())
+    assert card["Total Collection"].to_dict() == pytest.approx(drivers.groupby("Name")["Amount"].sum().to_dict())
+
+
+def test_rent_due_follows_the_targets():
+    perf_df = pd.DataFrame({
+        "Collection Date": pd.to_datetime(["2026-01-01", "2026-01-02", "2026-01-03", "2026-01-01"]),
+        "Name": ["A", "A", "A", "B"],
+        "Vehicle No": ["V1", "V1", "V1", "V2"],
+        "Amount": [300.0, 0.0, 0.0, 500.0],
+    })
+    flat = build_driver_scorecard(perf_df, None).set_index("Name")
+    assert flat["Rent Due"].to_dict() == {"A": 3 * DAILY_TARGET, "B": DAILY_TARGET}
+    assert flat.loc["A", "Current Zero Streak"] == 2 and flat.loc["A", "Days Active"] == 3
+
+    targets = RentTargets([("V1", "02/01/2026", 400)])
+    priced = build_driver_scorecard(perf_df, None, targets=targets).set_index("Name")
+    assert priced["Rent Due"].to_dict() == {"A": 300 + 400 + 400, "B": 300}
+
+
+def test_top_k_matches_a_full_sort():
+    rng = np.random.default_rng(3)
+    card = pd.DataFrame({"Name": [f"D{i}" for i in range(50)], "Total Collection": rng.integers(0, 20, 50) * 100.0})
+    for largest in (True, False):
+        expected = card.sort_values("Total Collection", ascending=not largest, kind="stable").head(5)
+        assert top_k(card, "Total Collection", 5, largest).equals(expected)
@@ -0,0 +1,80 @@
+import io
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+import ingest
+
+
+COLLECTION_CSV = """Collection Date,Vehicle No,Amount,Meter Reading,Name,Received By
+01/02/2026,0042,300,1200,Ravi,Govind Kumar
+02/02/2026 09:15:00,0042,450,1260,Ravi,Govind Kumar
+2026-02-03,V7,,1300,,Kumar Gaurav
+31/02/2026,V7,500,1350,Amit,Kumar Gaurav
+"""
+
+
+@pytest.fixture
+def export(tmp_path):
+    def write(text, name="collection.csv"):
+        path = tmp_path / name
+        path.write_text(text)
+        return str(path)
+    return write
+
+
+def test_columns_take_the_sheet_schema(export):
+    table = ingest.read_table(export(COLLECTION_CSV), "collection")
+    types = dict(zip(table.column_names, table.schema.types))
+    # Vehicle numbers stay text (leading zeros kept), dates are left to as_dates
+    assert types["Vehicle No"] == pa.string() and table["Vehicle No"][0].as_py() == "0042"
+    assert types["Collection Date"] == pa.string()
+    assert types["Amount"] == pa.float64()  # a blank keeps the column float
+    assert types["Meter Reading"] == pa.int64()  # whole and complete: narrowed like pandas would
+    assert table["Name"][2].as_py() is None
+
+
+def test_a_typo_in_a_number_column_reads_it_as_text(export):
+    path = export(COLLECTION_CSV.replace(",450,", ",45o,"))
+    df = ingest.read_frame(path, "collection")
+    assert df["Amount"].tolist()[:2] == ["300", "45o"]
+
+    rows, failures = ingest.parse_collection(df)
+    assert rows["Amount"].iloc[0] == 300 and np.isnan(rows["Amount"].iloc[1])
+    assert sorted((f["Row"], f["Column"], f["Check"]) for f in failures) == [
+        (1, "Amount", "Unparseable value"), (2, "Amount", "Missing value"), (3, "Collection Date", "Unparseable value"),
+    ]
+
+
+def test_as_dates_reads_every_sheet_format():
+    cells = pd.Series(["01/02/2026", "02/02/2026 09:15:00", "2026-02-03", "31/02/2026", None, "01/02/2026", "soon"])
+    dates = ingest.as_dates(cells)
+    assert dates.tolist()[:3] == [pd.Timestamp("2026-02-01"), pd.Timestamp("2026-02-02 09:15:00"), pd.Timestamp("2026-02-03")]
+    assert dates.isna().tolist() == [False, False, False, True, True, False, True]  # 31/02 does not roll over
+    assert dates[5] == dates[0]
+    months = ingest.month_year(dates)
+    assert months.isna().equals(dates.isna()) and set(months.dropna()) == {"2026-02"}
+
+    parsed = pd.Series(pd.to_datetime(["2026-01-01"]))
+    assert ingest.as_dates(parsed) is parsed
+
+
+def test_parsed_rows_are_typed(export):
+    rows, _ = ingest.parse_collection(ingest.read_frame(export(COLLECTION_CSV), "collection"))
+    assert rows["Collection Date"].tolist()[:3] == [date(2026, 2, 1), date(2026, 2, 2), date(2026, 2, 3)]
+    assert rows["Month-Year"].tolist()[:3] == ["2026-02"] * 3
+
+
+def test_downloads_have_a_timeout(monkeypatch):
+    opened = {}
+
+    def urlopen(url, timeout=None):
+        opened.update(url=url, timeout=timeout)
+        return io.BytesIO(COLLECTION_CSV.encode())
+
+    monkeypatch.setattr(ingest.urllib.request, "urlopen", urlopen)
+    table = ingest.read_table("https://docs.google.com/spreadsheets/d/x/gviz/tq?tqx=out:csv", "collection")
+    assert table.num_rows == 4 and opened["timeout"] == ingest.FETCH_TIMEOUT > 0
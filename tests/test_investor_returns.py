@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from investor_returns import investment_flows, investor_returns, xirr
+
+
+def test_xirr_solves_known_cash_flows():
+    # Investor 0: 1000 in a year ago, 1100 back now -> 10%
+    # Investor 1: 1000 in two years ago, 1000 more a year ago, 2310 back now -> 10%
+    # Investor 2: money only ever put in -> no rate
+    rates = xirr(
+        codes=[0, 0, 1, 1, 1, 2],
+        years=[1.0, 0.0, 2.0, 1.0, 0.0, 1.0],
+        cash_flows=[-1000, 1100, -1000, -1000, 2310, -500],
+        n_investors=3,
+    )
+    assert rates[:2] == pytest.approx([0.10, 0.10], abs=1e-9)
+    assert np.isnan(rates[2])
+
+
+def test_xirr_matches_a_scalar_root_find():
+    rng = np.random.default_rng(3)
+    years = rng.uniform(0, 3, 6)
+    flows = np.r_[-rng.uniform(100, 1000, 5), 0.0]
+    flows[-1] = -flows.sum() * 1.4
+    years[-1] = 0.0
+
+    rate = xirr(np.zeros(6, dtype=int), years, flows, 1)[0]
+    assert np.sum(flows * (1 + rate) ** years) == pytest.approx(0, abs=1e-6)
+
+
+def test_investor_returns_share_profit_by_capital_employed():
+    as_of = pd.Timestamp("2026-01-01")
+    flows = pd.DataFrame({
+        "Date": [as_of - pd.Timedelta(days=365), as_of - pd.Timedelta(days=365), as_of - pd.Timedelta(days=365)],
+        "Investor Name": ["A", "B", "B"],
+        "Investment Amount": [1000.0, 2000.0, -1000.0],
+    })
+
+    result = investor_returns(flows, profit=200.0, as_of=as_of).set_index("Investor Name")
+    assert result.loc["B", "Capital Invested"] == 2000 and result.loc["B", "Capital Withdrawn"] == 1000
+    assert result["Capital Share (%)"].tolist() == pytest.approx([50, 50])
+    assert result["Profit Share"].tolist() == pytest.approx([100, 100])
+    assert result["XIRR (%)"].tolist() == pytest.approx([10, 10], abs=1e-6)
+
+
+def test_bank_investment_debits_count_as_withdrawals():
+    investment = pd.DataFrame({"Date": ["2026-01-01"], "Investor Name": ["A"], "Investment Amount": [500.0],
+                               "Month-Year": ["2026-01"]})
+    bank = pd.DataFrame({
+        "Date": ["2026-01-05", "2026-01-06", "2026-01-07"],
+        "Transaction By": ["A", "A", "A"],
+        "Transaction Type": ["Investment_Credit", " Investment_Debit", "Expence_Debit"],
+        "Reason": "", "Amount": [300.0, 200.0, 50.0], "Month-Year": "2026-01",
+    })
+
+    flows = investment_flows(investment, bank)
+    assert flows["Investment Amount"].tolist() == [500, 300, -200]
+    assert flows["Source"].tolist() == ["Manual Sheet", "Bank Transaction", "Bank Transaction"]
@@ -0,0 +1,60 @@
+import pandas as pd
+import pytest
+
+from change_log import SheetChanges
+from kpi import KpiAccumulator
+from rent_targets import RentTargets, loss_matrix
+
+
+def assert_same_totals(result, expected):
+    keys = set(result.totals) | set(expected.totals)
+    for key in keys:
+        assert result.totals.get(key, 0) == pytest.approx(expected.totals.get(key, 0), abs=1e-6), key
+    assert result.loss_by_date.keys() == expected.loss_by_date.keys()
+    for day, losses in expected.loss_by_date.items():
+        assert result.loss_by_date[day] == pytest.approx(losses)
+
+
+def test_appended_rows_are_applied_as_a_delta(make_collection, make_expense):
+    full = {"collection": make_collection(120, days=75), "expense": make_expense()}
+    before = {"collection": full["collection"].iloc[:90], "expense": full["expense"].iloc[:20]}
+
+    state = KpiAccumulator().refresh(before, loss_matrix).refresh(full, loss_matrix)
+    assert state.last_refresh["mode"] == "delta"
+    assert_same_totals(state, KpiAccumulator().refresh(full, loss_matrix))
+
+
+def test_edits_and_deletions_are_patched(make_collection, make_expense):
+    old = make_collection(120, days=75)
+    new = old.copy()
+    new.loc[10, "Amount"] = 1234.0
+    new.loc[40, "Name"] = "B" if new.loc[40, "Name"] != "B" else "A"
+    new = new.drop(index=[70, 71]).reset_index(drop=True)
+    frames_old = {"collection": old, "expense": make_expense()}
+    frames_new = {"collection": new, "expense": make_expense()}
+    changes = {"collection": SheetChanges.between("collection", old, new)}
+
+    state = KpiAccumulator().refresh(frames_old, loss_matrix).refresh(frames_new, loss_matrix, changes)
+    assert state.last_refresh["mode"] == "patch"
+    assert_same_totals(state, KpiAccumulator().refresh(frames_new, loss_matrix))
+
+
+def test_edits_without_changes_recompute_everything(make_collection):
+    old = make_collection(120, days=75)
+    new = old.drop(index=5).reset_index(drop=True)
+
+    state = KpiAccumulator().refresh({"collection": old}, loss_matrix).refresh({"collection": new}, loss_matrix)
+    assert state.last_refresh["mode"] == "full"
+    assert_same_totals(state, KpiAccumulator().refresh({"collection": new}, loss_matrix))
+
+
+def test_new_rent_targets_reprice_every_date(make_collection):
+    frames = {"collection": make_collection(120, days=75)}
+    dearer = RentTargets(default=900)
+
+    def priced(rows):
+        return loss_matrix(rows, dearer)
+
+    state = KpiAccumulator().refresh(frames, loss_matrix, rules="flat").refresh(frames, priced, rules=dearer.version)
+    assert state.last_refresh["mode"] == "full"
+    assert_same_totals(state, KpiAccumulator().refresh(frames, priced))
@@ -0,0 +1,96 @@
+import os
+import threading
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import metrics
+from resource_cache import ResourceCache
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    # Metrics made by a test register here, not alongside the app's
+    monkeypatch.setattr(metrics, "registry", [])
+    return metrics.registry
+
+
+def test_render_writes_the_text_exposition_format(registry):
+    fetches = metrics.Counter("test_fetches_total", "Fetches.", ["sheet", "source"])
+    fetches.inc("bank", "gviz")
+    fetches.inc("bank", "gviz", amount=2)
+    fetches.inc('a "b"\\c\nd', "file")
+    rows = metrics.Gauge("test_rows", "Rows.")
+    rows.set(2.5)
+    collected = metrics.Gauge("test_collected", "Collected at scrape time.", ["page"], collect=lambda: {("Dashboard",): 7})
+
+    assert metrics.render() == "\n".join([
+        "# HELP test_fetches_total Fetches.",
+        "# TYPE test_fetches_total counter",
+        'test_fetches_total{sheet="a \\"b\\"\\\\c\\nd",source="file"} 1',
+        'test_fetches_total{sheet="bank",source="gviz"} 3',
+        "# HELP test_rows Rows.",
+        "# TYPE test_rows gauge",
+        "test_rows 2.5",
+        "# HELP test_collected Collected at scrape time.",
+        "# TYPE test_collected gauge",
+        'test_collected{page="Dashboard"} 7',
+    ]) + "\n"
+    assert collected in registry
+
+
+def test_histogram_buckets_are_cumulative_and_inclusive(registry):
+    seconds = metrics.Histogram("test_seconds", "Seconds.", ["page"], buckets=(0.1, 1, 10))
+    for value in [0.05, 0.1, 0.5, 20]:
+        seconds.observe(value, "Dashboard")
+    with seconds.time("Expenses"):
+        pass
+
+    samples = {(name, labels): value for name, labels, value in seconds.samples()}
+    assert [samples[("test_seconds_bucket", f'{{page="Dashboard",le="{le}"}}')] for le in ["0.1", "1.0", "10.0", "+Inf"]] \
+        == [2, 3, 3, 4]
+    assert samples[("test_seconds_sum", '{page="Dashboard"}')] == pytest.approx(20.65)
+    assert samples[("test_seconds_count", '{page="Dashboard"}')] == 4
+    assert samples[("test_seconds_bucket", '{page="Expenses",le="0.1"}')] == 1
+    assert "# TYPE test_seconds histogram" in seconds.render()
+
+
+def test_counted_cache_counts_lookups_and_misses():
+    cache = ResourceCache(1_000_000, {"indexes": 1.0}, ())
+
+    def counted_square(x, _unhashed=None):
+        return x * x
+
+    square = metrics.counted_cache(cache.memoize("indexes"), counted_square)
+    lookups, misses = metrics.cache_lookups._values, metrics.cache_misses._values
+    before = lookups[("counted_square",)], misses[("counted_square",)]
+
+    assert [square(3, _unhashed=[]), square(3, _unhashed=[1]), square(4)] == [9, 9, 16]
+    square.clear()
+    square(3)
+    assert lookups[("counted_square",)] - before[0] == 4
+    assert misses[("counted_square",)] - before[1] == 3
+
+
+def test_exporters_serve_the_rendered_metrics(registry, tmp_path):
+    metrics.Gauge("test_up", "Up.").set(1)
+
+    path = str(tmp_path / "vayuvolt.prom")
+    metrics.write_file(path)
+    assert open(path).read() == metrics.render()
+    assert os.listdir(tmp_path) == ["vayuvolt.prom"]  # written through a temporary file, then renamed
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), metrics._Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        with urllib.request.urlopen(f"{url}/metrics", timeout=5) as response:
+            assert response.read().decode() == metrics.render()
+            assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(f"{url}/other", timeout=5)
+    finally:
+        server.shutdown()
+        server.server_close()
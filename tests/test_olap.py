@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from olap import CollectionCube, top_k
+
+
+# Collection rows with the blanks the sheet has: no driver, no month, no
+# amount, no date
+@pytest.fixture
+def collection(make_collection):
+    def make(seed=0, n=300):
+        rng = np.random.default_rng(seed)
+        df = make_collection(n, seed, days=150, start="2025-11-01", drivers=("A", "B", "C", None), amounts=(0.0, 300.0, 500.0, np.nan))
+        return df.assign(**{
+            "Collection Date": df["Collection Date"].where(rng.random(n) < 0.95),
+            "Month-Year": df["Month-Year"].where(rng.random(n) < 0.9),
+            "Distance": rng.uniform(0, 120, n),
+        })
+    return make
+
+
+# The page's groupby over the raw rows, before the cube
+def reference_group(df, by):
+    grouped = df.groupby(by).agg(Amount=("Amount", "sum"), Distance=("Distance", "sum"),
+                                 **{"Total Collections": ("Collection Date", "count")}).reset_index()
+    grouped["Avg Amount"] = grouped["Amount"] / grouped["Total Collections"].where(grouped["Total Collections"] > 0)
+    grouped["Avg Distance"] = grouped["Distance"] / grouped["Total Collections"].where(grouped["Total Collections"] > 0)
+    return grouped.sort_values(by, ignore_index=True)
+
+
+@pytest.mark.parametrize("by", ["Name", "Month-Year", ["Vehicle No", "Month-Year"], ["Name", "Received By"]])
+def test_group_matches_a_groupby_of_the_rows(collection, by):
+    df = collection()
+    result = CollectionCube.build(df).group(by).sort_values(by, ignore_index=True)
+    pd.testing.assert_frame_equal(result, reference_group(df, by), check_dtype=False)
+
+
+def test_quarters_and_filters_match_the_rows(collection):
+    df = collection(seed=1)
+    quarter = pd.to_datetime(df["Month-Year"]).dt.to_period("Q").astype(str).str.replace("Q", "-Q")
+    rows = df.assign(**{"Month-Year": quarter.where(df["Month-Year"].notna())})
+    rows = rows[rows["Vehicle No"].isin(["V1", "V3"])]
+
+    cube = CollectionCube.build(df)
+    result = cube.group("Month-Year", "Quarter", {"Vehicle No": ["V1", "V3"]})
+    pd.testing.assert_frame_equal(result.sort_values("Month-Year", ignore_index=True),
+                                  reference_group(rows, "Month-Year"), check_dtype=False)
+    assert cube.members("Month-Year", "Year") == ["2025", "2026"]
+
+
+def test_top_k_is_the_head_of_a_sort():
+    rng = np.random.default_rng(2)
+    frame = pd.DataFrame({"Name": [f"D{i}" for i in range(50)], "Amount": rng.permutation(50).astype(float)})
+    frame.loc[[3, 9], "Amount"] = np.nan
+
+    for k, largest in [(5, True), (5, False), (60, True)]:
+        expected = frame.sort_values("Amount", ascending=not largest).head(k)
+        assert top_k(frame, "Amount", k, largest)["Name"].tolist() == expected["Name"].tolist()
@@ -0,0 +1,51 @@
+from datetime import date
+
+import pandas as pd
+
+from presence_index import PresenceIndex, pending_collections
+
+
+# Vehicle numbers with stray spaces, as typed into the sheet
+VEHICLES = ("V1", "V2", "V3", "V4 ")
+
+
+def assert_same_answers(result, expected):
+    start, end = date(2025, 12, 25), date(2026, 3, 1)
+    assert sorted(result.vehicles) == sorted(expected.vehicles)
+    for vehicle in expected.vehicles:
+        assert result.days_present(vehicle, start, end) == expected.days_present(vehicle, start, end)
+        assert result.amount_between(vehicle, start, end) == expected.amount_between(vehicle, start, end)
+    for day in pd.date_range(start, end):
+        assert sorted(result.active_vehicles(day)) == sorted(expected.active_vehicles(day))
+    pd.testing.assert_frame_equal(pending_collections(result, start, end), pending_collections(expected, start, end))
+
+
+def test_appended_rows_match_a_fresh_build(make_collection):
+    df = make_collection(days=50, vehicles=VEHICLES)
+    # Later rows with dates before the first ones and a vehicle not seen yet
+    extra = make_collection(40, seed=1).assign(**{"Vehicle No": "V9"})
+    extra.loc[:5, "Collection Date"] = date(2025, 12, 28)
+    full = pd.concat([df, extra], ignore_index=True)
+
+    refreshed = PresenceIndex.build(df).refresh(full)
+    assert len(refreshed.rows) == len(full)
+    assert_same_answers(refreshed, PresenceIndex.build(full))
+
+
+def test_repeated_rows_are_not_mistaken_for_old_ones(make_collection):
+    df = make_collection(50, days=50, vehicles=VEHICLES)
+    # The same entry typed twice, the second time in the new rows
+    full = pd.concat([df, df.iloc[[3]]], ignore_index=True)
+
+    refreshed = PresenceIndex.build(df).refresh(full)
+    assert len(refreshed.rows) == len(full)
+    assert_same_answers(refreshed, PresenceIndex.build(full))
+
+
+def test_edits_rebuild_the_index(make_collection):
+    df = make_collection(days=50, vehicles=VEHICLES)
+    edited = df.copy()
+    edited.loc[7, "Amount"] = 999.0
+    edited = edited.drop(index=20).reset_index(drop=True)
+
+    assert_same_answers(PresenceIndex.build(df).refresh(edited), PresenceIndex.build(edited))
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from reconcile import _daily_collections, _deposits, reconcile, summary
+
+
+# Both sheets with their dates parsed, as the loaders hand them over
+def sheets(collections, deposits):
+    collection = pd.DataFrame(collections, columns=["Received By", "Collection Date", "Amount"])
+    collection["Collection Date"] = pd.to_datetime(collection["Collection Date"]).dt.date
+    bank = pd.DataFrame(deposits, columns=["Transaction By", "Date", "Amount"]).assign(**{
+        "Transaction Type": "Collection_Credit",
+    })
+    bank["Date"] = pd.to_datetime(bank["Date"]).dt.date
+    return collection, bank
+
+
+# Every start day scanned, and for each the end day whose run total is
+# closest to the deposit (the later one on a tie)
+def reference_matches(daily, deposits, window_days, tolerance):
+    matches = []
+    for collector, mine in deposits.groupby("Collector", sort=True):
+        days = daily[daily["Collector"] == collector]
+        dates, amounts = days["Date"].to_numpy(), days["Amount"].to_numpy()
+        next_start = 0
+        for dep_date, dep_amount in zip(mine["Date"].to_numpy(), mine["Amount"].to_numpy()):
+            in_window = (dates <= dep_date) & (dates >= dep_date - np.timedelta64(window_days, "D"))
+            end = int(np.flatnonzero(dates <= dep_date).max()) + 1 if (dates <= dep_date).any() else 0
+            lo = max(next_start, int(np.argmax(in_window)) if in_window.any() else end)
+            for s in range(lo, end):
+                best = None
+                for k in range(s + 1, end + 1):
+                    diff = abs(amounts[s:k].sum() - dep_amount)
+                    if best is None or diff <= best[0]:
+                        best = (diff, k)
+                if best[0] <= tolerance:
+                    matches.append((collector, pd.Timestamp(dep_date), pd.Timestamp(dates[s]), best[1] - s))
+                    next_start = best[1]
+                    break
+    return matches
+
+
+def test_deposit_matches_the_run_of_days_it_covers():
+    collection, bank = sheets(
+        [("A", "2026-01-01", 500), ("A", "2026-01-02", 500), ("A", "2026-01-03", 400), ("A", "2026-01-04", 300)],
+        [("A", "2026-01-03", 1000), ("A", "2026-01-10", 690)],
+    )
+
+    result = reconcile(collection, bank)
+    matches = result["matches"]
+    assert matches["Days"].tolist() == [2, 2]
+    assert matches["Difference"].tolist() == [0, -10]
+    assert result["collections"]["Status"].tolist() == ["Deposited"] * 4
+    assert summary(result).loc[0, "Matched Deposits"] == 2
+
+
+def test_unmatched_deposits_give_their_reason():
+    collection, bank = sheets([("A", "2026-03-01", 500)], [("A", "2026-01-01", 500), ("A", "2026-03-02", 5000)])
+
+    reasons = reconcile(collection, bank)["unmatched_deposits"]["Reason"].tolist()
+    assert reasons == ["No collections in window", "No batch within tolerance"]
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2, 3])
+def test_matches_agree_with_a_scan_of_every_run(seed):
+    rng = np.random.default_rng(seed)
+    days = pd.date_range("2026-01-01", periods=90)
+    collections = [(who, day.strftime("%Y-%m-%d"), float(rng.choice([300, 450, 500])))
+                   for who in ["A", "B"] for day in days if rng.random() < 0.8]
+    deposits = [(who, day.strftime("%Y-%m-%d"), float(rng.choice([900, 1000, 1400, 2000])))
+                for who in ["A", "B"] for day in days[::6]]
+    collection, bank = sheets(collections, deposits)
+
+    result = reconcile(collection, bank, window_days=20, tolerance=60)
+    found = list(zip(result["matches"]["Collector"], result["matches"]["Deposit Date"],
+                     result["matches"]["Batch From"], result["matches"]["Days"]))
+    assert found == reference_matches(_daily_collections(collection), _deposits(bank), 20, 60)
@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import rent_targets
+from rent_targets import COMPANY_NAME, RentTargets, loss_matrix, loss_units, what_if
+
+
+RULES = pd.DataFrame({
+    "Vehicle No": ["*", "V1", "*", "V2"],
+    "Effective From": ["01/01/2026", "10/01/2026", "20/01/2026", "25/01/2026"],
+    "Daily Target": [500, 450, 550, 600],
+})
+
+
+# The per-group loop the app priced losses with before loss_matrix
+def reference_loss_matrix(input_df, targets):
+    df_proc = input_df.dropna(subset=["Collection Date"]).copy()
+    df_proc["Amount"] = pd.to_numeric(df_proc["Amount"], errors="coerce").fillna(0)
+    df_proc["Target"] = targets.lookup(df_proc["Vehicle No"], df_proc["Collection Date"])
+    df_proc["Amount"] = (df_proc["Amount"] - df_proc["Target"]) * -1
+    df_proc = df_proc.sort_values(by=["Collection Date", "Name", "Vehicle No"])
+
+    updated_rows = []
+    for (_, driver), group in df_proc.groupby(["Collection Date", "Name"], group_keys=False):
+        if driver != COMPANY_NAME and len(group) > 1:
+            total_amt = group["Amount"].sum()
+            first_row = group.iloc[0].to_dict()
+            second_row = group.iloc[1].to_dict()
+            first_loss = total_amt - second_row["Target"]
+            second_loss = second_row["Target"] + first_loss
+            if first_loss <= -second_row["Target"]:
+                first_loss = 0
+            else:
+                second_row["Name"] = COMPANY_NAME
+            first_row["Amount"] = first_loss
+            second_row["Amount"] = second_loss
+            updated_rows.extend([first_row, second_row])
+        else:
+            updated_rows.extend(group.to_dict("records"))
+    return pd.DataFrame(updated_rows).drop(columns="Target")
+
+
+# Collection rows as the loss matrix gets them (perf_df: dates as
+# Timestamps), with drivers on several vehicles a day and rows without one
+@pytest.fixture
+def collection(make_collection):
+    def make(seed, days=40):
+        df = make_collection(days * 3, seed, days, vehicles=("V1", "V2", "V3", "V4"),
+                             drivers=("A", "B", "C", COMPANY_NAME, None), amounts=(0.0, 200.0, 450.0, 500.0, 900.0))
+        return df.assign(**{"Collection Date": pd.to_datetime(df["Collection Date"])})
+    return make
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+@pytest.mark.parametrize("rules", [None, RULES])
+def test_loss_matrix_matches_the_loop(collection, seed, rules):
+    targets = RentTargets(rules)
+    df = collection(seed)
+
+    expected = reference_loss_matrix(df, targets).reset_index(drop=True)
+    result = loss_matrix(df, targets)
+    pd.testing.assert_frame_equal(result[expected.columns], expected, check_dtype=False)
+
+
+def test_loss_matrix_defaults_to_the_loaded_targets(collection, monkeypatch):
+    monkeypatch.setattr(rent_targets, "targets", RentTargets(default=700))
+    df = collection(4, days=5)
+    pd.testing.assert_frame_equal(loss_matrix(df), loss_matrix(df, RentTargets(default=700)))
+
+
+def test_lookup_takes_the_latest_rule_in_effect():
+    targets = RentTargets(RULES, default=400)
+    cases = [
+        ("V1", "2025-12-31", 400),  # before any rule
+        ("V1", "2026-01-05", 500),  # fleet-wide rule
+        ("V1", "2026-01-15", 450),  # vehicle rule wins over the fleet one
+        ("V1", "2026-01-22", 450),  # a later fleet rule does not override it
+        ("V2", "2026-01-22", 550),
+        ("V2", "2026-01-25", 600),
+        ("V9", "2026-02-01", 550),
+        ("V1", None, 400),
+    ]
+    vehicles, dates, expected = zip(*cases)
+    np.testing.assert_array_equal(targets.lookup(list(vehicles), list(dates)), expected)
+
+
+def test_version_follows_the_rules():
+    assert RentTargets(RULES).version == RentTargets(RULES.copy()).version
+    assert RentTargets(RULES).version != RentTargets(RULES.iloc[:2]).version
+    assert RentTargets().version != RentTargets(default=600).version
+
+
+@pytest.mark.parametrize("seed", [5, 6])
+def test_what_if_matches_a_loss_matrix_per_target(collection, seed):
+    df = collection(seed)
+    candidates = [300, 500, 750]
+    start, end = pd.Timestamp("2026-01-05"), pd.Timestamp("2026-01-30")
+    grid = what_if(loss_units(df), candidates, start, end)
+
+    for target, row in zip(candidates, grid.itertuples(index=False)):
+        lm = loss_matrix(df.dropna(subset=["Name"]), RentTargets(default=target))
+        lm = lm[(lm["Collection Date"] >= start) & (lm["Collection Date"] <= end)]
+        company = lm["Name"] == COMPANY_NAME
+        assert row[grid.columns.get_loc("Driver Loss")] == pytest.approx(lm.loc[~company, "Amount"].sum())
+        assert row[grid.columns.get_loc("Company Loss")] == pytest.approx(lm.loc[company, "Amount"].sum())
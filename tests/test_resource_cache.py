@@ -0,0 +1,99 @@
+import time
+
+import numpy as np
+import pytest
+
+from resource_cache import ResourceCache
+
+
+def make_cache(max_bytes=100_000, quotas=None, pinned=("sheets",)):
+    return ResourceCache(max_bytes, quotas or {"sheets": None, "indexes": 0.6, "reports": 0.4}, pinned)
+
+
+def loader(cache, namespace, calls=None):
+    @cache.memoize(namespace)
+    def build(n_bytes, name="", seconds=0.0, _frames=None):
+        if calls is not None:
+            calls.append(name)
+        time.sleep(seconds)
+        return np.zeros(n_bytes // 8)
+    return build
+
+
+def counts(cache, namespace):
+    return cache.stats().set_index("Namespace").loc[namespace]
+
+
+def test_arguments_key_the_entry_except_private_ones():
+    cache = make_cache()
+    calls = []
+    build = loader(cache, "indexes", calls)
+    first = build(800, "a", _frames=[1])
+    assert build(800, "a", _frames=[2]) is first
+    build(800, "b")
+    assert calls == ["a", "b"]
+    assert (counts(cache, "indexes")["Hits"], counts(cache, "indexes")["Misses"]) == (1, 2)
+
+    with pytest.raises(ValueError):
+        cache.memoize("nowhere")
+
+
+def test_cheap_large_entries_leave_before_small_expensive_ones():
+    cache = make_cache(quotas={"sheets": None, "indexes": 1.0})
+    build = loader(cache, "indexes")
+    build(20_000, "slow", seconds=0.05)
+    build(40_000, "big")
+    build(30_000, "medium")
+    build(30_000, "new")  # 120 KB held: one entry has to go
+
+    kept = {dict(key[1:])["name"] for key in cache._entries}
+    assert kept == {"slow", "medium", "new"}
+    assert cache.bytes <= cache.max_bytes and cache.evictions == 1
+
+
+def test_a_namespace_over_its_quota_evicts_within_itself():
+    cache = make_cache()
+    indexes, reports = loader(cache, "indexes"), loader(cache, "reports")
+    indexes(40_000, "a")
+    reports(30_000, "b")
+    reports(30_000, "c")  # reports over its 40 KB quota, the cache as a whole is not
+
+    assert counts(cache, "indexes")["Entries"] == 1 and counts(cache, "reports")["Entries"] == 1
+    assert counts(cache, "reports")["Evictions"] == 1 and cache.bytes == 70_000
+
+    value = reports(50_000, "huge")  # larger than the quota: returned, not kept
+    assert len(value) == 6250 and counts(cache, "reports")["Not Kept"] == 1
+
+
+def test_pinned_entries_are_never_evicted_and_survive_clear():
+    cache = make_cache()
+    sheets, indexes = loader(cache, "sheets"), loader(cache, "indexes")
+    sheets(150_000, "sheet")  # over the whole budget, kept anyway
+    indexes(20_000, "index")
+    assert counts(cache, "sheets")["Entries"] == 1 and counts(cache, "indexes")["Entries"] == 0
+    assert counts(cache, "indexes")["Evictions"] == 1
+
+    cache.max_bytes = 1_000_000
+    indexes(20_000, "index")
+    cache.clear()
+    assert [dict(key[1:])["name"] for key in cache._entries] == ["sheet"] and cache.bytes == 150_000
+
+    sheets.clear()
+    assert len(cache) == 0 and cache.bytes == 0
+
+
+def test_artifacts_do_not_count_the_sheets_they_hold():
+    cache = make_cache(max_bytes=1_000_000)
+    frame = np.zeros(10_000)
+
+    @cache.memoize("sheets")
+    def load():
+        return frame
+
+    @cache.memoize("indexes")
+    def index():
+        return {"frame": load(), "extra": np.zeros(100)}
+
+    index()
+    assert counts(cache, "sheets")["MB"] * 2**20 == pytest.approx(80_000)
+    assert counts(cache, "indexes")["MB"] * 2**20 < 2_000
@@ -0,0 +1,48 @@
+import threading
+from datetime import datetime
+
+from snapshot import WarmupJob, format_age, load, save
+
+
+def test_snapshots_round_trip_through_disk(tmp_path):
+    path = str(tmp_path / "snapshot.pkl")
+    assert load(path) is None
+    save({"built_at": datetime(2026, 1, 1), "total": 5.0}, path)
+    assert load(path) == {"built_at": datetime(2026, 1, 1), "total": 5.0}
+    assert [format_age(datetime(2026, 1, 1), datetime(2026, 1, 1, *t)) for t in [(0, 0, 42), (0, 7), (3,)]] \
+        == ["42s", "7 min", "3 h"]
+
+
+def test_a_start_during_a_run_queues_one_follow_up():
+    job, release, calls = WarmupJob(), threading.Event(), []
+
+    def first():
+        calls.append("first")
+        release.wait(5)
+
+    assert job.start(first)
+    assert not job.start(lambda: calls.append("second"))
+    assert not job.start(lambda: calls.append("third"))  # replaces the queued run
+    assert job.running
+    release.set()
+    job.wait(5)
+
+    assert calls == ["first", "third"]
+    assert not job.running and job.status["runs"] == 2 and job.status["state"] == "done"
+
+    assert job.start(lambda: calls.append("after"))
+    job.wait(5)
+    assert calls[-1] == "after" and job.status["runs"] == 3
+
+
+def test_start_once_runs_once_and_failures_are_recorded():
+    job = WarmupJob()
+
+    def fail():
+        raise ValueError("sheet unreachable")
+
+    assert job.start_once(fail)
+    job.wait(5)
+    assert not job.start_once(fail)
+    assert job.status["state"] == "failed" and job.status["error"] == "sheet unreachable"
+    assert job.status["runs"] == 1
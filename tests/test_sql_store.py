@@ -0,0 +1,59 @@
+import pandas as pd
+import pytest
+
+import ingest
+import sql_store
+
+
+@pytest.fixture
+def store(tmp_path, make_collection, make_expense):
+    path = str(tmp_path / "analytics.sqlite")
+    collection = ingest.add_distance(make_collection().sort_values(["Vehicle No", "Collection Date"]))
+    frames = {"collection": collection, "expense": make_expense()}
+    sql_store.mirror(frames, "v1", path)
+    return path, frames
+
+
+def test_the_mirror_answers_like_the_frames(store):
+    path, frames = store
+    assert sql_store.store_version(path) == "v1"
+    by_month = sql_store.run_query("SELECT month_year, SUM(amount) AS amount FROM collection GROUP BY month_year",
+                                   path=path).set_index("month_year")["amount"]
+    expected = frames["collection"].groupby("Month-Year")["Amount"].sum()
+    assert by_month.to_dict() == pytest.approx(expected.to_dict())
+    assert sql_store.run_query("SELECT COUNT(*) AS n FROM bank", path=path)["n"].item() == 0
+    assert "vehicle_no" in sql_store.schema(path)["expense"]
+
+    for example in sql_store.EXAMPLE_QUERIES.values():
+        sql_store.run_query(example, path=path)
+
+
+def test_only_reads_are_allowed(store):
+    path, _ = store
+    for sql in ["DELETE FROM collection", "DROP TABLE expense", "ATTACH DATABASE 'x.db' AS x"]:
+        with pytest.raises(ValueError):
+            sql_store.run_query(sql, path=path)
+    # A write hidden behind a read-looking prefix still fails on the read-only connection
+    with pytest.raises(Exception):
+        sql_store.run_query("WITH x AS (SELECT 1) DELETE FROM collection", path=path)
+    assert sql_store.run_query("SELECT COUNT(*) AS n FROM collection", path=path)["n"].item() == 200
+
+
+def test_limits_cap_the_rows_returned(store):
+    path, _ = store
+    result = sql_store.run_query("SELECT * FROM collection ORDER BY amount DESC; ", path=path, limit=50)
+    assert len(result) == 50 and result.attrs["truncated"]
+    assert result["amount"].is_monotonic_decreasing
+
+    # A trailing comment does not swallow the wrapper
+    result = sql_store.run_query("SELECT * FROM collection -- all of it", path=path, limit=500)
+    assert len(result) == 200 and not result.attrs["truncated"]
+    assert len(sql_store.run_query('PRAGMA table_info("collection")', path=path, limit=2)) == 2
+
+
+def test_long_queries_are_stopped(store):
+    path, _ = store
+    endless = "WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n) SELECT COUNT(*) FROM n"
+    with pytest.raises(TimeoutError):
+        sql_store.run_query(endless, path=path, timeout=0.2)
+    assert isinstance(sql_store.run_query("SELECT 1 AS one", path=path, timeout=0.2), pd.DataFrame)
@@ -0,0 +1,59 @@
+import pandas as pd
+import pytest
+
+import ingest
+from rent_targets import COMPANY_NAME, loss_matrix
+from statements import statement_jobs
+from vehicle_pnl import build_pnl_cube
+
+
+MONTH = "2026-02"
+
+
+@pytest.fixture
+def sheets(make_collection, make_expense, make_bank):
+    collection = make_collection(300, seed=4, days=90, drivers=("A", "B", "C", COMPANY_NAME))
+    collection = ingest.add_distance(collection.sort_values(["Vehicle No", "Collection Date"]))
+    perf_df = collection.assign(**{"Collection Date": pd.to_datetime(collection["Collection Date"])})
+    return collection, make_expense(60, seed=4, days=90), make_bank(), loss_matrix(perf_df)
+
+
+def totals(jobs, kind):
+    return pd.DataFrame([{"name": job["name"], **job["totals"]} for job in jobs if job["kind"] == kind]).set_index("name")
+
+
+def test_totals_match_the_collection_and_performance_figures(sheets):
+    collection, expense, bank, loss = sheets
+    cube = build_pnl_cube(collection, expense, bank, loss)
+    jobs = statement_jobs(collection, loss, expense, MONTH, cube)
+    vehicles, drivers = totals(jobs, "vehicle"), totals(jobs, "driver")
+
+    # Collection Data: the month's collection per vehicle; Performance: the loss matrix per vehicle and driver
+    month = collection[collection["Month-Year"] == MONTH]
+    month_loss = loss[loss["Month-Year"] == MONTH]
+    assert vehicles["Collection"].to_dict() == pytest.approx(month.groupby("Vehicle No")["Amount"].sum().to_dict())
+    assert vehicles["Distance"].to_dict() == pytest.approx(month.groupby("Vehicle No")["Distance"].sum().to_dict())
+    assert vehicles["Loss"].to_dict() == pytest.approx(month_loss.groupby("Vehicle No")["Amount"].sum().to_dict())
+    spent = expense[expense["Month-Year"] == MONTH].groupby("Vehicle No")["Amount Used"].sum()
+    assert vehicles["Expenses"].to_dict() == pytest.approx(spent.reindex(vehicles.index, fill_value=0).to_dict())
+
+    assert COMPANY_NAME not in drivers.index
+    driver_loss = month_loss[month_loss["Name"] != COMPANY_NAME].groupby("Name")["Amount"].sum()
+    assert drivers["Loss"].to_dict() == pytest.approx(driver_loss.reindex(drivers.index, fill_value=0).to_dict())
+    company = month.loc[month["Name"] == COMPANY_NAME, "Amount"].sum()
+    assert drivers["Collection"].sum() + company == pytest.approx(vehicles["Collection"].sum())
+
+    # Each statement's daily table adds up to its totals
+    for job in jobs:
+        for column in ["Collection", "Target", "Distance"]:
+            assert job["daily"][column].sum() == pytest.approx(job["totals"][column])
+
+
+def test_headless_jobs_build_the_same_totals(sheets):
+    collection, expense, bank, loss = sheets
+    cached = statement_jobs(collection, loss, expense, MONTH, build_pnl_cube(collection, expense, bank, loss))
+    headless = statement_jobs(collection, loss, expense, MONTH)
+    assert [(job["kind"], job["name"]) for job in cached] == [(job["kind"], job["name"]) for job in headless]
+    for a, b in zip(cached, headless):
+        assert a["totals"] == pytest.approx(b["totals"])
+        pd.testing.assert_frame_equal(a["daily"], b["daily"])
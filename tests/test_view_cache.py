@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+
+from view_cache import ViewCache, size_of
+
+
+def block(n_bytes):
+    return np.zeros(n_bytes // 8)
+
+
+def test_a_hit_returns_the_cached_view():
+    cache = ViewCache(max_bytes=10_000)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return block(800)
+
+    first = cache.get_or_compute("Page", "v1", ("All",), compute)
+    assert cache.get_or_compute("Page", "v1", ["All"], compute) is first
+    assert (len(calls), cache.hits, cache.misses) == (1, 1, 1)
+    assert cache.stats().loc[0, "Hit Rate (%)"] == 50
+
+
+def test_least_recently_used_views_leave_first_within_the_byte_bound():
+    cache = ViewCache(max_bytes=10_000)
+    for name in "abcd":
+        cache.get_or_compute("Page", "v1", (name,), lambda: block(2400))
+    cache.get_or_compute("Page", "v1", ("a",), lambda: block(2400))  # a is now the most recent
+    cache.get_or_compute("Page", "v1", ("e",), lambda: block(2400))
+
+    assert cache.bytes <= 10_000 and cache.evictions == 1
+    assert [key[2] for key in cache._entries] == [("c",), ("d",), ("a",), ("e",)]
+
+
+def test_a_view_over_the_entry_limit_is_returned_but_not_kept():
+    cache = ViewCache(max_bytes=10_000)
+    view = cache.get_or_compute("Page", "v1", (), lambda: block(4000))
+    assert len(view) == 500 and len(cache) == 0 and cache.bytes == 0
+
+
+def test_a_new_version_drops_the_pages_older_views():
+    cache = ViewCache(max_bytes=100_000)
+    cache.get_or_compute("Page", "v1", ("a",), lambda: block(800))
+    cache.get_or_compute("Other", "v1", ("a",), lambda: block(800))
+    cache.get_or_compute("Page", "v2", ("a",), lambda: block(800))
+
+    assert sorted((page, version) for page, version, _ in cache._entries) == [("Other", "v1"), ("Page", "v2")]
+
+
+def test_a_late_result_for_a_superseded_version_is_not_cached():
+    cache = ViewCache(max_bytes=100_000)
+    cache.get_or_compute("Page", "v1", ("a",), lambda: block(800))
+
+    # A slow compute for v1 that finishes after v2's first view was cached
+    def slow_v1():
+        cache.get_or_compute("Page", "v2", ("b",), lambda: block(800))
+        return block(800)
+
+    cache.get_or_compute("Page", "v1", ("c",), slow_v1)
+    assert [key[1:] for key in cache._entries] == [("v2", ("b",))]
+
+    # Nor is a later lookup from a session still on v1, even after a clear
+    cache.clear()
+    cache.get_or_compute("Page", "v1", ("d",), lambda: block(800))
+    assert len(cache) == 0
+    cache.get_or_compute("Page", "v2", ("d",), lambda: block(800))
+    assert len(cache) == 1
+
+
+def test_size_of_counts_shared_values_once():
+    frame = pd.DataFrame({"a": np.arange(1000)})
+    single = size_of(frame)
+    assert single >= 8000
+    assert size_of([frame, frame]) < 2 * single
+    assert size_of({"x": frame}, seen={id(frame)}) < single
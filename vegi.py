@@ -1,29 +1,53 @@
+from time import perf_counter
+_script_start = perf_counter()
+
 import streamlit as st
 import pandas as pd
 import numpy as np
 import time
-import bcrypt
-import matplotlib.pyplot as plt
-import gspread
-from google.oauth2.service_account import Credentials
 from datetime import date, time, datetime, timedelta
 import pytz
 from urllib.parse import quote
 import streamlit.components.v1 as components
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from versioning import frame_version, dataset_version, data_version
+import chart_data
+import driver_analytics
+import presence_index
+import sql_store
+import kpi
+import balances
+import reconcile
+import snapshot
+import view_cache
+import data_quality
+import ingest
+import partitions
+import search_index
+import vehicle_pnl
+import olap
+import investor_returns
+import rent_targets
+import assignments
+import change_log
+import statements
+import metrics
+import resource_cache
+from connections import SheetRegistry, sheet_csv_url
 
 
 
 
 
 # Function to get the background color based on amount
-def get_background_style(amount):
+def get_background_style(amount, target=rent_targets.DAILY_TARGET):
     if amount == 0:
         return "linear-gradient(135deg, #fc0324, #99021a);"  # Blood Red Gradient - Very Bad
-    elif 1 <= amount <= 299:
+    elif 0 < amount < target:
         return "linear-gradient(135deg, #4da6ff, #0077b6);"  # Good
-    elif amount == 300:
+    elif amount == target:
         return "linear-gradient(135deg, #FFD400, #FFB800);"  # Happy
-    elif amount > 300:
+    elif amount > target:
         return "linear-gradient(135deg, #00FF7F, #00994C);"  # More Happy
     return "linear-gradient(135deg, #4da6ff, #0077b6);"  # Default
 
@@ -196,23 +220,23 @@ AUTH_SHEET_NAME = "Sheet1"
 
 # --- DATA LOADING ---
 COLLECTION_SHEET_NAME = "collection"
-COLLECTION_CSV_URL = f"https://docs.google.com/spreadsheets/d/{COLLECTION_SHEET_ID}/gviz/tq?tqx=out:csv&sheet={COLLECTION_SHEET_NAME}"
+COLLECTION_CSV_URL = sheet_csv_url(COLLECTION_SHEET_ID, COLLECTION_SHEET_NAME)
 
 # --- EXPENSE DATA ---
 
 EXPENSE_SHEET_NAME = "expense"
-EXPENSE_CSV_URL = f"https://docs.google.com/spreadsheets/d/{EXPENSE_SHEET_ID}/gviz/tq?tqx=out:csv&sheet={EXPENSE_SHEET_NAME}"
+EXPENSE_CSV_URL = sheet_csv_url(EXPENSE_SHEET_ID, EXPENSE_SHEET_NAME)
 
 # --- INVESTMENT DATA ---
 
 INVESTMENT_SHEET_NAME = "Investment_Details"
-INVESTMENT_CSV_URL = f"https://docs.google.com/spreadsheets/d/{INVESTMENT_SHEET_ID}/gviz/tq?tqx=out:csv&sheet={INVESTMENT_SHEET_NAME}"
+INVESTMENT_CSV_URL = sheet_csv_url(INVESTMENT_SHEET_ID, INVESTMENT_SHEET_NAME)
 
 
 # --- Bank DATA ---
 
 BANK_SHEET_NAME = "Bank_Transaction"
-BANK_CSV_URL = f"https://docs.google.com/spreadsheets/d/{BANK_SHEET_ID}/gviz/tq?tqx=out:csv&sheet={BANK_SHEET_NAME}"
+BANK_CSV_URL = sheet_csv_url(BANK_SHEET_ID, BANK_SHEET_NAME)
 
 # ✅ Load credentials from Streamlit Secrets (Create a Copy)
 creds_dict = dict(st.secrets["gcp_service_account"])  # Create a mutable copy
@@ -220,49 +244,364 @@ creds_dict = dict(st.secrets["gcp_service_account"])  # Create a mutable copy
 # ✅ Fix private key formatting
 creds_dict["private_key"] = creds_dict["private_key"].replace("\\n", "\n")
 
+# Startup mode: "lazy" (default) opens worksheets on first use, "eager" opens all of them up front
+STARTUP_MODE = st.secrets.get("app", {}).get("STARTUP_MODE", "lazy")
+
+# ⏱ Startup report: seconds since the script started, per phase
+startup_phases = {"imports": perf_counter() - _script_start}
+
+# Memory-bounded cache (see resource_cache.QUOTAS for the namespaces), with lookups and
+# misses counted per function for the metrics exporters
+def cache_resource(namespace):
+    return lambda fn: metrics.counted_cache(resource_cache.resources.memoize(namespace), fn)
+
 # ✅ Function to Connect to Google Sheets (with Caching)
-@st.cache_resource  # Cache for 5 minutes
+@cache_resource("process")
 def connect_to_sheets():
+    registry = SheetRegistry(creds_dict, {
+        "auth": (st.secrets["sheets"]["AUTH_SHEET_ID"], AUTH_SHEET_NAME),
+        "collection": (st.secrets["sheets"]["COLLECTION_SHEET_ID"], COLLECTION_SHEET_NAME),
+        "expense": (st.secrets["sheets"]["EXPENSE_SHEET_ID"], EXPENSE_SHEET_NAME),
+        "investment": (st.secrets["sheets"]["INVESTMENT_SHEET_ID"], INVESTMENT_SHEET_NAME),
+        "bank": (st.secrets["sheets"]["BANK_SHEET_ID"], BANK_SHEET_NAME),
+    })
+    if STARTUP_MODE == "eager":
+        registry.open_all()
+    return registry
+
+
+# ✅ Get a worksheet from the registry (opened on first use)
+def get_sheet(name):
     try:
-        creds = Credentials.from_service_account_info(
-            creds_dict, 
-            scopes=["https://www.googleapis.com/auth/spreadsheets", "https://www.googleapis.com/auth/drive"]
-        )
-        client = gspread.authorize(creds)
-        
-        # Open sheets once and reuse them
-        AUTH_sheet = client.open_by_key(st.secrets["sheets"]["AUTH_SHEET_ID"]).worksheet(AUTH_SHEET_NAME)
-        COLLECTION_sheet = client.open_by_key(st.secrets["sheets"]["COLLECTION_SHEET_ID"]).worksheet(COLLECTION_SHEET_NAME)
-        EXPENSE_sheet = client.open_by_key(st.secrets["sheets"]["EXPENSE_SHEET_ID"]).worksheet(EXPENSE_SHEET_NAME)
-        INVESTMENT_sheet = client.open_by_key(st.secrets["sheets"]["INVESTMENT_SHEET_ID"]).worksheet(INVESTMENT_SHEET_NAME)
-        BANK_sheet = client.open_by_key(st.secrets["sheets"]["BANK_SHEET_ID"]).worksheet(BANK_SHEET_NAME)
-        
-        return AUTH_sheet, COLLECTION_sheet, EXPENSE_sheet, INVESTMENT_sheet , BANK_sheet
-
+        return connect_to_sheets().get(name)
     except Exception as e:
         st.error(f"❌ Failed to connect to Google Sheets: {e}")
         st.stop()
 
 
-
-
-# ✅ Get cached sheets
-AUTH_sheet, COLLECTION_sheet, EXPENSE_sheet, INVESTMENT_sheet ,BANK_sheet= connect_to_sheets()
-
 # Function to load authentication data securely
-@st.cache_resource # Cache for 5 minutes
+@cache_resource("process") # Cache for 5 minutes
 def load_auth_data():
-    data = AUTH_sheet.get_all_records()
+    data = get_sheet("auth").get_all_records()
     df = pd.DataFrame(data)
     return df
 
 # Load authentication data
 auth_df = load_auth_data()
+startup_phases["auth data"] = perf_counter() - _script_start
 
 # Function to Verify Password
 def verify_password(stored_hash, entered_password):
+    import bcrypt
     return bcrypt.checkpw(entered_password.encode(), stored_hash.encode())
 
+
+# Cold-start timings are kept from the first run of this server process
+@cache_resource("process")
+def get_startup_report():
+    return {}
+
+
+# The first run of the process keeps its phases as the cold-start timings
+def record_startup_phases():
+    cold = get_startup_report()
+    if not cold:
+        cold.update(startup_phases)
+    return cold
+
+
+# Internal state (cache contents, worksheet timings, metrics endpoints): admins only
+def render_startup_report(container):
+    cold = record_startup_phases()
+    with container.expander("⏱ Startup report"):
+        report_df = pd.DataFrame({
+            "Cold start (s)": pd.Series(cold),
+            "This run (s)": pd.Series(startup_phases),
+        }).round(3)
+        st.dataframe(report_df, use_container_width=True)
+        opened = connect_to_sheets()
+        st.caption(f"Mode: {STARTUP_MODE} · worksheets opened: "
+                   + (", ".join(f"{n} ({opened.timings[n]:.2f}s)" for n in opened.names if opened.is_open(n)) or "none"))
+        warm = snapshot.warmup.status
+        st.caption(f"Warm-up: {warm['state']}"
+                   + (f" in {warm['seconds']:.2f}s" if warm["seconds"] is not None else "")
+                   + (f" ({warm['error']})" if warm["error"] else ""))
+        st.caption("History: " + " · ".join(
+            f"{name} {len(sheet.stats())} frozen months ({sheet.last_load['frozen']:,} rows),"
+            f" {sheet.last_load['fetched']:,} rows fetched ({sheet.last_load['mode']}) in {sheet.last_load['seconds']:.2f}s"
+            for name, sheet in partitions.sheets.items() if sheet.last_load["mode"]
+        ))
+        cache = view_cache.views
+        st.caption(f"View cache: {len(cache)} views, {cache.bytes / 2**20:,.1f} of {cache.max_bytes / 2**20:,.0f} MB"
+                   f" · hit rate {cache.hit_rate:.0%} ({cache.hits}/{cache.hits + cache.misses})"
+                   f" · {cache.evictions} evicted")
+        resources = resource_cache.resources
+        st.caption(f"Data cache: {len(resources)} entries, {resources.bytes / 2**20:,.1f} of"
+                   f" {resources.max_bytes / 2**20:,.0f} MB · {resources.evictions} evicted")
+        st.dataframe(resources.stats().round(2), use_container_width=True, hide_index=True)
+        st.dataframe(resources.entries().round(3), use_container_width=True, hide_index=True)
+        exporters = [f"http://<host>:{metrics.METRICS_PORT}/metrics"] if metrics.METRICS_PORT else []
+        exporters += [metrics.METRICS_FILE] if metrics.METRICS_FILE else []
+        st.caption("Metrics: " + (" · ".join(exporters) or "off (set VAYUVOLT_METRICS_PORT or VAYUVOLT_METRICS_FILE)"))
+        if cache.hits + cache.misses:
+            st.dataframe(cache.stats().round(2), use_container_width=True, hide_index=True)
+
+
+# --- LOADERS AND DERIVED DATA ---
+# Loaders and derived caches live at module level so the warm-up can run them before anyone logs in
+@cache_resource("sheets") # Cache for 5 minutes
+def load_data(url):
+    # Typed Arrow ingestion, month partitioned: only recent months are fetched and parsed
+    df = partitions.sheets["collection"].load(url, ingest.parse_collection)
+
+    # Assuming df is your DataFrame and it's already sorted by 'Collection Date'
+    df = df.sort_values(by=['Vehicle No', 'Collection Date'])
+
+    # Calculate distance for each vehicle separately (across partitions)
+    df = ingest.add_distance(df)
+
+    df = df[['Collection Date', 'Vehicle No', 'Amount', 'Meter Reading', 'Name', 'Distance', 'Month-Year','Received By']]
+    df.attrs["version"] = frame_version(df)
+    metrics.dataset_rows.set(len(df), "collection")
+    return df
+
+@cache_resource("sheets")  # Cache for 5 minutes
+def load_expense_data(url):
+    df = partitions.sheets["expense"].load(url, ingest.parse_expense)
+    df = df[['Date', 'Vehicle No', 'Reason of Expense', 'Amount Used', 'Any Bill', 'Month-Year','Expense By']]
+    df.attrs["version"] = frame_version(df)
+    metrics.dataset_rows.set(len(df), "expense")
+    return df
+
+@cache_resource("sheets")  # Cache for 5 minutes    
+def load_investment_data(url):
+    df = ingest.read_frame(url, "investment")
+
+    # Strip spaces from column names to avoid formatting issues
+    df.columns = df.columns.str.strip()
+
+    # Ensure required columns exist
+    required_columns = ["Date", "Investment Type", "Amount", "Comment", "Received From"]
+    missing_columns = [col for col in required_columns if col not in df.columns]
+
+    if missing_columns:
+        st.error(f"❌ Missing columns in Investment Data: {missing_columns}")
+        return pd.DataFrame()  # Return empty DataFrame to avoid crashing
+
+    # Rename columns for consistency
+    df.rename(columns={"Amount": "Investment Amount", "Received From": "Investor Name"}, inplace=True)
+
+    # Convert data types
+    raw = df[['Date', 'Investment Amount']].copy()
+    dates = ingest.as_dates(df['Date'])
+    df['Date'] = dates.dt.date
+    df['Investment Amount'] = ingest.as_numbers(df['Investment Amount'])
+    df['Month-Year'] = ingest.month_year(dates)
+
+    df = df[['Date', 'Investment Type', 'Investment Amount', 'Comment', 'Investor Name', 'Month-Year']]
+    df.attrs["parse_failures"] = data_quality.parse_failures(raw, df)
+    df.attrs["version"] = frame_version(df)
+    metrics.dataset_rows.set(len(df), "investment")
+    return df
+
+@cache_resource("sheets")
+def load_bank_data(url):
+    df = partitions.sheets["bank"].load(url, ingest.parse_bank)
+    df.attrs["version"] = frame_version(df)
+    metrics.dataset_rows.set(len(df), "bank")
+    return df
+
+# Vehicle x day presence index, built once per data version (new rows are applied as a delta)
+@cache_resource("indexes")
+def get_presence_index(version, _df):
+    return presence_index.refresh_index(_df)
+
+# Rollups behind the time-series charts, built once per data version
+@cache_resource("reports")
+def get_chart_rollups(version, _df, date_col, value_cols, by=None):
+    return chart_data.build_rollups(_df, date_col, list(value_cols), by=by)
+
+
+# All four sheets, loaded (and cached) together
+def load_frames():
+    return {
+        "collection": load_data(COLLECTION_CSV_URL),
+        "expense": load_expense_data(EXPENSE_CSV_URL),
+        "investment": load_investment_data(INVESTMENT_CSV_URL),
+        "bank": load_bank_data(BANK_CSV_URL),
+    }
+
+
+# Mirror all sheets into the local SQL store, once per data version
+@cache_resource("indexes")
+def get_sql_store(version, _frames):
+    try:
+        return sql_store.mirror(_frames, version)
+    except Exception as e:
+        st.error(f"❌ Failed to build the local SQL store: {e}")
+        return None
+
+
+# Loss matrix over the full history, built once per data version for the pages that list it;
+# after edits only the dates they touched are run again
+@cache_resource("indexes")
+def get_loss_matrix(version, rules, _perf_df):
+    return change_log.refresh_by_date("loss_matrix", "collection", version, _perf_df,
+                                      rent_targets.loss_matrix, "Collection Date", rules)
+
+# Per-vehicle and per-driver statement data for a month, built once per data version
+@cache_resource("reports")
+def get_statement_jobs(version, rules, month, _df, _loss_df, _expense_df, _cube):
+    return statements.statement_jobs(_df, _loss_df, _expense_df, month, _cube)
+
+# Collection cube behind the Grouped Data page, built once per data version
+@cache_resource("indexes")
+def get_collection_cube(version, _df):
+    return olap.CollectionCube.build(_df)
+
+# Driver-vehicle assignment intervals, built once per data version
+@cache_resource("indexes")
+def get_assignment_index(version, _df):
+    return assignments.AssignmentIndex.build(_df)
+
+# Loss matrix reduced for the rent-target what-if, built once per data version
+@cache_resource("indexes")
+def get_loss_units(version, _perf_df):
+    return rent_targets.loss_units(_perf_df)
+
+# Driver scorecard, built once per data version (and day, for the rolling windows)
+@cache_resource("reports")
+def get_driver_scorecard(version, rules, as_of, _perf_df, _perf_df_lm):
+    return driver_analytics.build_driver_scorecard(_perf_df, _perf_df_lm, as_of=as_of, targets=rent_targets.targets)
+
+# Vehicle x month profit and loss, built once per data version
+@cache_resource("reports")
+def get_vehicle_pnl(version, rules, _collection_df, _expense_df, _bank_df, _loss_df):
+    return vehicle_pnl.build_pnl_cube(_collection_df, _expense_df, _bank_df, _loss_df)
+
+# Investor capital flows, time-weighted capital, profit shares and XIRR, per data version and day
+@cache_resource("reports")
+def get_investor_returns(version, as_of, _collection_df, _expense_df, _investment_df, _bank_df):
+    flows = investor_returns.investment_flows(_investment_df, _bank_df)
+    profit = investor_returns.operating_profit(_collection_df, _expense_df, _bank_df, as_of)
+    return investor_returns.investor_returns(flows, profit, as_of)
+
+# Inserted, edited and deleted rows since the previous load of each sheet, recorded once per data version
+@cache_resource("indexes")
+def get_changes(version, _frames):
+    return change_log.record_changes(_frames)
+
+
+# ---------- KPI accumulator ----------
+# Running totals per (metric, person, month); a new load only applies its new or changed rows
+@cache_resource("indexes")
+def get_kpis(version, rules, _frames):
+    return kpi.refresh_kpis(_frames, rent_targets.loss_matrix, get_changes(version, _frames), rules)
+
+
+# Data-quality issues over all sheets; a new load only validates its new rows
+@cache_resource("indexes")
+def get_quality_report(version, _frames):
+    return data_quality.refresh_report(_frames)
+
+
+# Full-text index over all four ledgers, built once per data version
+@cache_resource("indexes")
+def get_search_index(version, _frames):
+    return search_index.SearchIndex.build(_frames)
+
+
+# Daily cumulative balances per person and account, for as-of queries
+@cache_resource("indexes")
+def get_balance_ledger(version, _frames):
+    return balances.BalanceLedger.build(_frames)
+
+# Bank deposits matched to collection batches, once per data version and rule set
+@cache_resource("reports")
+def get_reconciliation(version, window_days, tolerance, _df, _bank_df):
+    return reconcile.reconcile(_df, _bank_df, window_days=window_days, tolerance=tolerance)
+
+
+# ---------- Dashboard snapshot ----------
+# Start date for pending collection tracking
+PENDING_START_DATE = date(2025, 8, 1)
+
+
+# Last day the pending list covers: today after 4 PM (Asia/Kolkata), else yesterday
+def pending_end_date():
+    now = datetime.now(pytz.timezone("Asia/Kolkata"))
+    return now.date() if now.hour >= 16 else now.date() - timedelta(days=1)
+
+
+# Everything the Dashboard shows, computed once per data version and pending
+# window; saved to disk so a restarted server can show it while it warms up
+@cache_resource("reports")
+def get_dashboard_snapshot(version, rules, end_date, _frames):
+    df = _frames["collection"]
+    kpis = get_kpis(version, rules, _frames)
+    ledger = get_balance_ledger(version, _frames)
+
+    current_month = pd.Timestamp.today().strftime("%Y-%m")
+    total_loss = max(0, kpis.total("loss_total", month=current_month))
+    company_loss = max(0, kpis.total("loss_company", month=current_month))
+    last_month = kpis.latest_month()
+
+    snap = {
+        "version": version,
+        "built_at": datetime.now(),
+        "figures": balances.dashboard_figures(kpis.total),
+        "month": last_month,
+        "month_collection": sum(kpis.total("collection", p, last_month) for p in balances.PARTNERS),
+        "month_expense": sum(kpis.total("expense", p, last_month) for p in balances.PARTNERS),
+        "month_loss": {"total": total_loss, "company": company_loss, "driver": max(0, total_loss - company_loss)},
+        "kpi_refresh": dict(kpis.last_refresh),
+        "balance_series": ledger.balance_series(),
+        "rollups": get_chart_rollups(dataset_version(df), df, "Collection Date", ("Amount", "Distance")),
+        "first_date": pd.to_datetime(df["Collection Date"]).min(),
+        "pending": presence_index.pending_collections(
+            get_presence_index(dataset_version(df), df), PENDING_START_DATE, end_date
+        ),
+        "recent": df.sort_values(by="Collection Date", ascending=False).head(14),
+    }
+    try:
+        snapshot.save(snap)
+    except OSError:
+        pass  # the in-memory snapshot still serves this process
+    return snap
+
+
+# Warm-up: load every sheet, validate it and build the Dashboard snapshot off the request path
+def warm_up():
+    frames = load_frames()
+    version = data_version(*frames.values())
+    get_changes(version, frames)
+    get_sql_store(version, frames)
+    get_quality_report(version, frames)
+    get_search_index(version, frames)
+    get_dashboard_snapshot(version, rent_targets.targets.version, pending_end_date(), frames)
+
+
+# Refresh: fetch the sheets and rent targets again and drop everything derived from them.
+# The sheet connections and the cold-start timings (pinned) are kept.
+def reload_data():
+    rent_targets.reload_targets()
+    for loader in (load_auth_data, load_data, load_expense_data, load_investment_data, load_bank_data):
+        loader.clear()
+    resource_cache.resources.clear()
+    view_cache.views.clear()
+
+
+# First run of this server process (usually the first login screen) starts the warm-up;
+# Streamlit runs no app code before a session connects, so there is no earlier hook
+snapshot.warmup.start_once(warm_up)
+
+# 📈 Prometheus metrics, once per process (off unless VAYUVOLT_METRICS_PORT / _FILE is set)
+metrics.start_exporters()
+ctx = get_script_run_ctx()
+if ctx is not None:
+    metrics.session_seen(ctx.session_id)
+
+
 # Initialize Session State for Authentication
 if "authenticated" not in st.session_state:
     st.session_state.authenticated = False
@@ -290,7 +629,7 @@ if not st.session_state.authenticated:
                 st.session_state.user_role = role
                 st.session_state.username = username
                 st.session_state.user_name = name
-                st.experimental_set_query_params(logged_in="true")
+                st.query_params["logged_in"] = "true"
 
                 st.success(f"✅ Welcome, {name}!")
                 st.rerun()
@@ -299,6 +638,9 @@ if not st.session_state.authenticated:
         else:
             st.error("❌ User not found")
 
+    startup_phases["login screen"] = perf_counter() - _script_start
+    record_startup_phases()
+
 # --- LOGGED-IN USER SEES DASHBOARD ---
 else:
     if st.sidebar.button("🚪 Logout"):
@@ -306,314 +648,43 @@ else:
         st.session_state.user_role = None
         st.session_state.username = None
         st.session_state.user_name = None
-        st.experimental_set_query_params(logged_in="false")
+        st.query_params["logged_in"] = "false"
         st.rerun()
 
     st.sidebar.write(f"👤 **Welcome, {st.session_state.user_name}!**")
 
-    @st.cache_resource # Cache for 5 minutes
-    def load_data(url):
-        df = pd.read_csv(url, dayfirst=True, dtype={"Vehicle No": str})  # Ensure Vehicle No remains a string
-        
-        df['Collection Date'] = pd.to_datetime(df['Collection Date'], dayfirst=True, errors='coerce').dt.date
-        df['Amount'] = pd.to_numeric(df['Amount'], errors='coerce')
-        df['Meter Reading'] = pd.to_numeric(df['Meter Reading'], errors='coerce')
-
-        # Assuming df is your DataFrame and it's already sorted by 'Collection Date'
-        df = df.sort_values(by=['Vehicle No', 'Collection Date'])
-
-        # Calculate distance for each vehicle separately
-        df['Distance'] = df.groupby('Vehicle No')['Meter Reading'].diff().fillna(0)
-
-        # Replace negative distances with the average of positive distances
-        positive_avg_distance = df[df['Distance'] > 0]['Distance'].mean()
-        df.loc[df['Distance'] < 0, 'Distance'] = np.round(positive_avg_distance)
-
-        # Month-Year Column
-        df['Month-Year'] = pd.to_datetime(df['Collection Date']).dt.strftime('%Y-%m')
-
-        return df[['Collection Date', 'Vehicle No', 'Amount', 'Meter Reading', 'Name', 'Distance', 'Month-Year','Received By']]
-
-    @st.cache_resource  # Cache for 5 minutes
-    def load_expense_data(url):
-        df = pd.read_csv(url, dayfirst=True, dtype={"Vehicle No": str})  # Ensure Vehicle No remains a string
-        df['Date'] = pd.to_datetime(df['Date'], dayfirst=True, errors='coerce').dt.date
-        df['Amount Used'] = pd.to_numeric(df['Amount Used'], errors='coerce')
-        df['Month-Year'] = pd.to_datetime(df['Date']).dt.strftime('%Y-%m')
-        return df[['Date', 'Vehicle No', 'Reason of Expense', 'Amount Used', 'Any Bill', 'Month-Year','Expense By']]
-    
-    @st.cache_resource  # Cache for 5 minutes    
-    def load_investment_data(url):
-        df = pd.read_csv(url, dayfirst=True)
-
-        # Strip spaces from column names to avoid formatting issues
-        df.columns = df.columns.str.strip()
-
-        # Ensure required columns exist
-        required_columns = ["Date", "Investment Type", "Amount", "Comment", "Received From"]
-        missing_columns = [col for col in required_columns if col not in df.columns]
-
-        if missing_columns:
-            st.error(f"❌ Missing columns in Investment Data: {missing_columns}")
-            return pd.DataFrame()  # Return empty DataFrame to avoid crashing
-
-        # Rename columns for consistency
-        df.rename(columns={"Amount": "Investment Amount", "Received From": "Investor Name"}, inplace=True)
-
-        # Convert data types
-        df['Date'] = pd.to_datetime(df['Date'], dayfirst=True, errors='coerce').dt.date
-        df['Investment Amount'] = pd.to_numeric(df['Investment Amount'], errors='coerce')
-        df['Month-Year'] = pd.to_datetime(df['Date']).dt.strftime('%Y-%m')
-
-        return df[['Date', 'Investment Type', 'Investment Amount', 'Comment', 'Investor Name', 'Month-Year']]
-
-    @st.cache_resource
-    def load_bank_data(url):
-        df = pd.read_csv(url, dayfirst=True)
-        df['Date'] = pd.to_datetime(df['Date'], dayfirst=True, errors='coerce').dt.date
-        df['Month-Year'] = pd.to_datetime(df['Date']).dt.strftime('%Y-%m')
-        return df
-
-    
-
-
-    df = load_data(COLLECTION_CSV_URL)
-    expense_df = load_expense_data(EXPENSE_CSV_URL)
-    investment_df = load_investment_data(INVESTMENT_CSV_URL)
-    bank_df = load_bank_data(BANK_CSV_URL)
-
-
-    # Calculate credits and debits
-    # Ensure Amount is numeric
-    bank_df['Amount'] = pd.to_numeric(bank_df['Amount'], errors='coerce').fillna(0)
-
-    # Calculate total credits and debits
-    Collection_Credit_Bank=bank_df[bank_df['Transaction Type'].isin(['Collection_Credit'])]['Amount'].sum()
-    Investment_Credit_Bank=bank_df[bank_df['Transaction Type'].isin(['Investment_Credit'])]['Amount'].sum()
-    Payment_Credit_Bank=bank_df[bank_df['Transaction Type'].isin(['Payment_Credit'])]['Amount'].sum()
-    ## by ayush
-    settlement_credit = bank_df[bank_df['Transaction Type'].isin(['Settlement_Credit'])]['Amount'].sum()
-
-    total_credits = Collection_Credit_Bank+Investment_Credit_Bank+Payment_Credit_Bank+settlement_credit
-
-    Expence_Debit_Bank=bank_df[bank_df['Transaction Type'].isin(['Expence_Debit'])]['Amount'].sum()
-    Investment_Debit_Bank=bank_df[bank_df['Transaction Type'].isin(['Investment_Debit'])]['Amount'].sum()
-    
-    Settlement_Debit_Bank=bank_df[bank_df['Transaction Type'].isin(['Settlement_Debit'])]['Amount'].sum()
-    total_debits = Expence_Debit_Bank+Settlement_Debit_Bank+Investment_Debit_Bank
-
-    bank_balance = total_credits - total_debits
-
-    # === Individual Summary ===
-    # Initialize all required variables
-    # For Govind Kumar
-    govind_collection_credit = 0
-    govind_settlement_credit = 0
-    govind_investment_credit = 0
-    govind_total_credit = 0
-    govind_expense_debit = 0
-    govind_settlement_debit = 0
-    govind_total_debit = 0
-    govind_investment_debit = 0
-
-    # For Kumar Gaurav
-    gaurav_collection_credit = 0
-    gaurav_settlement_credit = 0
-    gaurav_investment_credit = 0
-    gaurav_total_credit = 0
-    gaurav_expense_debit = 0
-    gaurav_settlement_debit = 0
-    gaurav_total_debit = 0
-    gaurav_investment_debit = 0
-
-    # Filter data by person and assign values
-    govind_df = bank_df[bank_df['Transaction By'] == 'Govind Kumar']
-    gaurav_df = bank_df[bank_df['Transaction By'] == 'Kumar Gaurav']
-
-    # Govind Kumar
-    govind_collection_credit = govind_df[govind_df['Transaction Type'] == 'Collection_Credit']['Amount'].sum()
-    govind_settlement_credit = govind_df[govind_df['Transaction Type'] == 'Settlement_Credit']['Amount'].sum()
-    govind_investment_credit = govind_df[govind_df['Transaction Type'] == 'Investment_Credit']['Amount'].sum()
-    govind_total_credit = govind_collection_credit + govind_settlement_credit + govind_investment_credit
-
-    govind_expense_debit = govind_df[govind_df['Transaction Type'] == 'Expence_Debit']['Amount'].sum()
-    govind_settlement_debit = govind_df[govind_df['Transaction Type'] == 'Settlement_Debit']['Amount'].sum()
-    govind_investment_debit = govind_df[govind_df['Transaction Type'] == 'Investment_Debit']['Amount'].sum()
-    govind_total_debit = govind_expense_debit + govind_settlement_debit+govind_investment_debit
-
-    # Kumar Gaurav
-    gaurav_collection_credit = gaurav_df[gaurav_df['Transaction Type'] == 'Collection_Credit']['Amount'].sum()
-    gaurav_settlement_credit = gaurav_df[gaurav_df['Transaction Type'] == 'Settlement_Credit']['Amount'].sum()
-    gaurav_investment_credit = gaurav_df[gaurav_df['Transaction Type'] == 'Investment_Credit']['Amount'].sum()
-    gaurav_total_credit = gaurav_collection_credit + gaurav_settlement_credit + gaurav_investment_credit
-
-    gaurav_expense_debit = gaurav_df[gaurav_df['Transaction Type'] == 'Expence_Debit']['Amount'].sum()
-    gaurav_settlement_debit = gaurav_df[gaurav_df['Transaction Type'] == 'Settlement_Debit']['Amount'].sum()
-    gaurav_investment_debit = gaurav_df[gaurav_df['Transaction Type'] == 'Investment_Debit']['Amount'].sum()
-    gaurav_total_debit = gaurav_expense_debit + gaurav_settlement_debit+gaurav_investment_debit
-
-    #------------Bank Calculation End-----------------
-
-
-
-    #-------------Remaining Balance at you ----------
-
-
-
-
-
-    #---------------Remaining Balance calculation end------------
-    ## Current month loss calculation ##
-    # ---------- Base DF ----------
-    perf_df = df.copy()
-    perf_df["Collection Date"] = pd.to_datetime(
-    perf_df["Collection Date"], dayfirst=True, errors="coerce"
-    ).dt.normalize()
-    perf_df["Amount"] = pd.to_numeric(perf_df["Amount"], errors="coerce").fillna(0)
-    perf_df = perf_df.dropna(subset=["Collection Date"])
-
-
-        #st.write(f"start_date: {custom_start_date}, end_date: {custom_end_date}")
-
-    # ---------- Loss Matrix preprocessing ----------
-    def apply_loss_matrix_logic(input_df: pd.DataFrame) -> pd.DataFrame:
-        df_proc = input_df.copy()
-        df_proc = df_proc.dropna(subset=["Collection Date"]).copy()
-        df_proc["Amount"] = pd.to_numeric(df_proc["Amount"], errors="coerce").fillna(0)
-
-        # Subtract 300 and flip sign
-        df_proc["Amount"] = (df_proc["Amount"] - 300) * -1
-
-        # Handle multi-vehicle for same driver/date
-        df_proc = df_proc.sort_values(by=["Collection Date", "Name", "Vehicle No"])
-        updated_rows = []
-        grouped = df_proc.groupby(["Collection Date", "Name"], group_keys=False)
-
-        for (date, driver), group in grouped:
-            if driver != "Zero Collection" and len(group) > 1:
-                total_amt = group["Amount"].sum()
-
-                first_loss = (total_amt - 300) #* -1
-
-                second_loss = 300 + first_loss
-
-                first_row = group.iloc[0].copy().to_dict()
-                second_row = group.iloc[1].copy().to_dict()
-
-                if first_loss <= -300:
-                    first_loss = 0
-                else:
-                    second_row["Name"] = "Zero Collection"
-
-
-                first_row["Amount"] = first_loss
-                second_row["Amount"] = second_loss
-                     
-
-                updated_rows.extend([first_row, second_row])
-            else:
-                updated_rows.extend(group.to_dict("records"))
-
-        return pd.DataFrame(updated_rows)
-    # Apply new Loss Matrix logic
-    perf_df_lm = apply_loss_matrix_logic(perf_df)
-    # apply your exact driver vs company split here
-
-    #-------- current month loss ---------#
-    today = pd.Timestamp.today().normalize()
-    current_month_df = perf_df_lm[
-        (perf_df_lm["Collection Date"].dt.year == today.year) &
-        (perf_df_lm["Collection Date"].dt.month == today.month)
-        ]
-    current_total_loss = max(0, current_month_df["Amount"].sum() if not current_month_df.empty else 0)
-    current_company_loss = max(0, current_month_df.loc[current_month_df["Name"] == "Zero Collection", "Amount"].sum() if not current_month_df.empty else 0)
-    current_driver_loss = max(0, current_total_loss - current_company_loss)
-
-    
-
-
-
     # --- DASHBOARD UI ---
     st.sidebar.header("📂 Navigation")
-    page = st.sidebar.radio("Go to:", ["Dashboard", "Monthly Summary", "Grouped Data", "Expenses", "Investment", "Collection Data", "Bank Transaction", "Performance" ])
-
-    if page == "Dashboard":
-        st.title("📊 VayuVolt Dashboard")
-        
-        # Get latest month
-        last_month = df['Month-Year'].max()
-
-        # Optional: Clean column names in case of leading/trailing spaces
-        df.columns = df.columns.str.strip()
-        expense_df.columns = expense_df.columns.str.strip()
-        investment_df.columns = investment_df.columns.str.strip()
-        
-        # === Individual Totals (Govind Kumar) ===
-        govind_total_collection = df[df['Received By'].isin(['Govind Kumar'])]['Amount'].sum()
-        govind_total_investment = investment_df[investment_df['Investor Name'].isin(['Govind Kumar'])]['Investment Amount'].sum()
-        govind_total_expense = expense_df[expense_df['Expense By'].isin(['Govind Kumar'])]['Amount Used'].sum()
-
-        govind_last_month_collection = df[(df['Received By'].isin(['Govind Kumar'])) & (df['Month-Year'] == last_month)]['Amount'].sum()
-        govind_last_month_expense = expense_df[(expense_df['Expense By'].isin(['Govind Kumar'])) & (expense_df['Month-Year'] == last_month)]['Amount Used'].sum()
-
-        # === Individual Totals (Kumar Gaurav) ===
-        gaurav_total_collection = df[df['Received By'].isin(['Kumar Gaurav'])]['Amount'].sum()
-        gaurav_total_investment = investment_df[investment_df['Investor Name'].isin(['Kumar Gaurav'])]['Investment Amount'].sum()
-        gaurav_total_expense = expense_df[expense_df['Expense By'].isin(['Kumar Gaurav'])]['Amount Used'].sum()
-
-        gaurav_last_month_collection = df[(df['Received By'].isin(['Kumar Gaurav'])) & (df['Month-Year'] == last_month)]['Amount'].sum()
-        gaurav_last_month_expense = expense_df[(expense_df['Expense By'].isin(['Kumar Gaurav'])) & (expense_df['Month-Year'] == last_month)]['Amount Used'].sum()
-
-        # === Combined Totals ===
-        total_collection = govind_total_collection + gaurav_total_collection
-        total_investment = govind_total_investment + gaurav_total_investment + Investment_Credit_Bank-Investment_Debit_Bank
-        total_expense = govind_total_expense + gaurav_total_expense + govind_expense_debit +gaurav_expense_debit
-
-        remaining_fund_gaurav= (gaurav_total_collection - gaurav_total_expense - gaurav_collection_credit + gaurav_settlement_debit - gaurav_settlement_credit + gaurav_total_investment)
-        remaining_fund_govind= (govind_total_collection - govind_total_expense - govind_collection_credit + govind_settlement_debit - govind_settlement_credit + govind_total_investment)
-        Net_balance=remaining_fund_gaurav + remaining_fund_govind + bank_balance
-
-        last_month_collection = govind_last_month_collection + gaurav_last_month_collection
-        last_month_expense = govind_last_month_expense + gaurav_last_month_expense
-
-        collection_percentage_current_month = round((last_month_collection/(last_month_collection + current_total_loss)) * 100)
-        total_loss_percentage_current_month = round((current_total_loss/(last_month_collection + current_total_loss)) * 100)
-  
-
-        col1, col2, col3, col4, col5,col6,col7 = st.columns(7)
-        col1.metric(label="💰 Total Collection", value=f"₹{total_collection:,.0f}")
-        col2.metric(label="📉 Total Expenses", value=f"₹{total_expense:,.0f}")
-        col3.metric(label="💸 Total Investment", value=f"₹{total_investment:,.0f}")
-        col4.metric(label="💵 Govind Balance", value=f"₹{remaining_fund_govind:,.0f}")
-        col5.metric(label="💵 Gaurav Balance", value=f"₹{remaining_fund_gaurav:,.0f}")
-        col6.metric(label="🏦 Bank Balance", value=f"₹{bank_balance:,.0f}")
-        col7.metric(label="🏦 Net Balance", value=f"₹{Net_balance:,.0f}")
-
-
-        st.markdown("---")
-        formatted_last_month = pd.to_datetime(last_month).strftime("%b %Y")  
-        st.subheader("📅 "+formatted_last_month+"   Overview")
-
-        col4, col5, col6, col7, col8, col9, col10 = st.columns(7)
-        col4.metric(label="📈"+formatted_last_month+"  Collection", value=f"₹{last_month_collection:,.0f}")
-        col5.metric(label=" ", value=f"{collection_percentage_current_month:,.0f}%", delta=f"{collection_percentage_current_month:,.0f}%", delta_color="normal")
-        col6.metric(label="📉"+formatted_last_month+" Expenses", value=f"₹{last_month_expense:,.0f}")
-        col7.metric(label="📉"+formatted_last_month+" Driver Loss", value= f"{max(current_driver_loss,0):,.0f}")
-        col8.metric(label="📉"+formatted_last_month+" Company Loss",value= f"{max(current_company_loss,0):,.0f}")
-        col9.metric(label="📉"+formatted_last_month+" Total Loss",value= f"{max(current_total_loss,0):,.0f}")
-        col10.metric(label=" ", value=f"{total_loss_percentage_current_month:,.0f}%", delta=f"{total_loss_percentage_current_month:,.0f}%", delta_color="inverse")
-
-
-
-
-        st.markdown("---")
-        
-        # Convert Collection Date to datetime
-        df["Collection Date"] = pd.to_datetime(df["Collection Date"])
-        
-        # Default full data before filtering
-        filtered_df = df.copy()
-        
+    is_admin = str(st.session_state.user_role).strip().lower() == "admin"
+    pages = ["Dashboard", "Monthly Summary", "Grouped Data", "Expenses", "Investment", "Collection Data", "Bank Transaction", "Performance", "Driver Scorecard", "Fleet Utilization", "Vehicle P&L", "Rent Targets", "Statements", "Reconciliation", "Data Quality", "Change Log"]
+    if is_admin:
+        pages.append("SQL Query")  # raw access to every sheet, like the startup report
+    page = st.sidebar.radio("Go to:", pages)
+
+    def render_sidebar_footer():
+        startup_phases["page rendered"] = perf_counter() - _script_start
+        metrics.rerun_seconds.observe(startup_phases["page rendered"], page)
+        if is_admin:
+            render_startup_report(st.sidebar)
+
+        # 🔁 Refresh button
+        if st.sidebar.button("🔁 Refresh"):
+            reload_data()
+            snapshot.warmup.start(warm_up)
+            st.rerun()
+
+        # 🧱 Refetch the frozen months too, for edits and deletions older than the backfill window
+        if is_admin and st.sidebar.button("🧱 Rebuild history", help="Fetch every month of the sheets again; "
+                                          f"closed months are otherwise refetched every {partitions.HISTORY_MAX_AGE_DAYS:g} days"):
+            for sheet in partitions.sheets.values():
+                sheet.rebuild()
+            reload_data()
+            snapshot.warmup.start(warm_up)
+            st.rerun()
+
+    # Range radio and trend chart; a range change reruns only this fragment
+    @st.fragment
+    def render_trend_chart(rollups, first_date):
         # === RADIO BUTTONS CENTERED BELOW CHART ===
         col1, col2, col3 = st.columns([1, 3, 1])  # Center the middle column
         with col2:
@@ -641,123 +712,96 @@ else:
         elif range_option == "5 Years":
             start_date = today - pd.DateOffset(years=5)
         else:
-            start_date = df["Collection Date"].min()
-        
-        # Filter data based on selected date range
-        filtered_df = df[df["Collection Date"] >= start_date]
+            start_date = first_date
         
         # === RERENDER CHART ===
-        st.line_chart(filtered_df.set_index("Collection Date")[["Amount", "Distance"]])
+        # Bucketed daily/weekly/monthly totals instead of every raw row
+        trend_df, resolution = chart_data.chart_frame(rollups, start_date, today, "Collection Date", ["Amount", "Distance"])
+        st.line_chart(trend_df, x="Collection Date", y="Value", color="Series")
+        st.caption(f"{resolution} totals")
+
+    # Renders a Dashboard snapshot (see get_dashboard_snapshot)
+    def render_dashboard(snap, as_of):
+        figures = snap["figures"]
+        total_collection = figures["total_collection"]
+        total_expense = figures["total_expense"]
+        total_investment = figures["total_investment"]
+        remaining_fund_govind = figures["cash"]["Govind Kumar"]
+        remaining_fund_gaurav = figures["cash"]["Kumar Gaurav"]
+        Net_balance = figures["net"]
+
+        last_month = snap["month"]
+        last_month_collection = snap["month_collection"]
+        last_month_expense = snap["month_expense"]
+        current_total_loss = snap["month_loss"]["total"]
+        current_company_loss = snap["month_loss"]["company"]
+        current_driver_loss = snap["month_loss"]["driver"]
 
+        collection_percentage_current_month = round((last_month_collection/(last_month_collection + current_total_loss)) * 100)
+        total_loss_percentage_current_month = round((current_total_loss/(last_month_collection + current_total_loss)) * 100)
+  
 
-        ## changes start here by Ayush
+        col1, col2, col3, col4, col5,col6,col7 = st.columns(7)
+        col1.metric(label="💰 Total Collection", value=f"₹{total_collection:,.0f}")
+        col2.metric(label="📉 Total Expenses", value=f"₹{total_expense:,.0f}")
+        col3.metric(label="💸 Total Investment", value=f"₹{total_investment:,.0f}")
+        col4.metric(label="💵 Govind Balance", value=f"₹{remaining_fund_govind:,.0f}")
+        col5.metric(label="💵 Gaurav Balance", value=f"₹{remaining_fund_gaurav:,.0f}")
+        col6.metric(label="🏦 Bank Balance", value=f"₹{figures['bank']:,.0f}")
+        col7.metric(label="🏦 Net Balance", value=f"₹{Net_balance:,.0f}")
+        refresh = snap["kpi_refresh"]
+        st.caption(f"🕒 Snapshot age: {snapshot.format_age(snap['built_at'])} (built {snap['built_at']:%d %b %H:%M})"
+                   f" · KPIs: {refresh['mode']} update of {refresh['rows']:,} rows in {refresh['seconds']:.2f}s")
+
+        # ---------- Balance over time ----------
+        with st.expander("📈 Balance Over Time"):
+            balance_df = snap["balance_series"]
+            balance_df = balance_df[balance_df["Date"] <= pd.Timestamp(as_of)]
+            if balance_df.empty:
+                st.info("No dated entries yet.")
+            else:
+                st.line_chart(balance_df, x="Date", y="Value", color="Balance")
 
+
+        st.markdown("---")
+        formatted_last_month = pd.to_datetime(last_month).strftime("%b %Y")  
+        st.subheader("📅 "+formatted_last_month+"   Overview")
+
+        col4, col5, col6, col7, col8, col9, col10 = st.columns(7)
+        col4.metric(label="📈"+formatted_last_month+"  Collection", value=f"₹{last_month_collection:,.0f}")
+        col5.metric(label=" ", value=f"{collection_percentage_current_month:,.0f}%", delta=f"{collection_percentage_current_month:,.0f}%", delta_color="normal")
+        col6.metric(label="📉"+formatted_last_month+" Expenses", value=f"₹{last_month_expense:,.0f}")
+        col7.metric(label="📉"+formatted_last_month+" Driver Loss", value= f"{max(current_driver_loss,0):,.0f}")
+        col8.metric(label="📉"+formatted_last_month+" Company Loss",value= f"{max(current_company_loss,0):,.0f}")
+        col9.metric(label="📉"+formatted_last_month+" Total Loss",value= f"{max(current_total_loss,0):,.0f}")
+        col10.metric(label=" ", value=f"{total_loss_percentage_current_month:,.0f}%", delta=f"{total_loss_percentage_current_month:,.0f}%", delta_color="inverse")
+
+        st.markdown("---")
         
-        # Pending Collection
-        # Clean 'Vehicle No' column: ensure all values are strings with no leading/trailing spaces
-        df['Vehicle No'] = df['Vehicle No'].astype(str).str.strip()
-        # Convert 'Collection Date' to datetime format (day first), coerce invalid values to NaT, and keep only the date part
-        df['Collection Date'] = pd.to_datetime(df['Collection Date'], dayfirst=True, errors='coerce').dt.date
-        
-        # Start date for pending collection tracking
-        start_date = date(2025, 8, 1)
-        
-        # Get all unique vehicle numbers
-        baseline_vehicles = df['Vehicle No'].unique()
-
-        # If no vehicles found for the dataset, show warning
-        if len(baseline_vehicles)==0:
-            st.warning("no rows found for 1 august")
-            baseline_vehicles = df['Vehicle No'].unique()
-
-        # Get the current time in Asia/Kolkata timezone and Get today's date and yesterday's date
-        tz = pytz.timezone("Asia/Kolkata")
-        now = datetime.now(tz)
-        latest_date = date.today()
-        yesterday = latest_date - timedelta(days=1)
-        cur_hour = now.hour
-        # If current time is after 4 PM, include today in the date range, else only till yesterday
-        if cur_hour >= 16:
-            all_dates = pd.date_range(start=start_date, end=latest_date)
-        else:
-            all_dates = pd.date_range(start=start_date, end= yesterday)
-        all_dates = [d.date() for d in all_dates.to_pydatetime()]
-
-        # Determine baseline collection dates for each vehicle 
-        first_dates = df.groupby('Vehicle No')['Collection Date'].min()
-        baseline_dates = {}
-        for v,f_date in first_dates.items():
-            if f_date <= start_date:
-                baseline_dates[v] = start_date
-            else:
-                baseline_dates[v] = f_date
-
-        # --- Identify missing collection entries
-        missing_entries = []
-
-        for cur_date in all_dates:
-            # Vehicles that should be active on this date
-            active_vehicles = [v for v, base_date in baseline_dates.items() if base_date <= cur_date]
-            # Vehicles that actually have a collection entry on this date
-            vehicles_on_date = df[df['Collection Date'] == cur_date]['Vehicle No'].unique()
-
-            # Vehicles that are missing collection on this date
-            missing_vehicles = [v for v in active_vehicles if v not in vehicles_on_date]
-            for v in missing_vehicles:
-                # Get vehicle's collection history before the current date
-                vehicle_history= df[(df['Vehicle No']== v) & (df['Collection Date']< cur_date)].sort_values('Collection Date')
-
-                # Filter rows with non-zero collection amounts
-                non_zero_history = vehicle_history[vehicle_history['Amount'] > 0]
-                if not non_zero_history.empty:
-                    # Last date when non-zero collection happened
-                    last_non_zero_row = non_zero_history.iloc[-1]
-                    last_non_zero_date = last_non_zero_row['Collection Date']
-                    last_non_zero_amount = last_non_zero_row['Amount']
-                    last_meter_reading = last_non_zero_row['Meter Reading']
-                    last_driver_name = last_non_zero_row['Name']
-                
+        render_trend_chart(snap["rollups"], snap["first_date"])
 
-                else:
-                    # If no non-zero collection ever happened
-                    last_non_zero_date =None
-                    last_non_zero_amount = None
-                    last_meter_reading = None
-
-                    # Get last driver name if any history exists 
-                    if not vehicle_history.empty:
-                        last_driver_name = vehicle_history.iloc[-1]['Name']
-                    else:
-                        last_driver_name = None
-
-                
-                # Calculate number of days since last non-zero collection with zero amount
-                if last_non_zero_date:
-                    zero_days = vehicle_history[
-                        (vehicle_history['Collection Date']> last_non_zero_date)& (vehicle_history['Amount'] == 0)
-                    ].shape[0]
 
-                else:
-                    zero_days = 0
+        ## changes start here by Ayush
 
-                
-                
-                missing_entries.append({"Missing Date": cur_date, "Vehicle No":v, "Last Meter Reading": last_meter_reading, "Last Assigned Name": last_driver_name, "Last Collected Amount": last_non_zero_amount, "Last Collection date": last_non_zero_date, "Zero Collection from(Days)":zero_days })
         
-        missing_df = pd.DataFrame(missing_entries)
+        # Pending Collection (vehicle x day presence index, from PENDING_START_DATE to pending_end_date())
+        missing_df = snap["pending"]
 
 
         # Display pending collection data        
         
         if missing_df.empty:
             st.write("### 🔍 Recent Collection:")
-            Recent_Collection = df.sort_values(by="Collection Date", ascending=False).head(14)
+            Recent_Collection = snap["recent"].copy()
+            Recent_Collection["Vehicle No"] = Recent_Collection["Vehicle No"].astype(str).str.strip()
             Recent_Collection["Collection Date"] = pd.to_datetime(Recent_Collection["Collection Date"])
+            Recent_Collection["Target"] = rent_targets.targets.lookup(Recent_Collection["Vehicle No"], Recent_Collection["Collection Date"])
             Recent_Collection["Collection Date"] = Recent_Collection["Collection Date"].dt.strftime("%d %b %Y")
+            cards_html = html_content
             for _, row in Recent_Collection.iterrows():
-                bg_style = get_background_style(row['Amount'])
+                bg_style = get_background_style(row['Amount'], row['Target'])
                         
-                html_content += f"""
+                cards_html += f"""
                     <div class="card" style="background: {bg_style}">
                         <div class="vehicle-no">{row['Vehicle No']}</div>
                         <div class="card-header">
@@ -776,10 +820,10 @@ else:
                     </div>
                 """
 
-            html_content += "</div>"
+            cards_html += "</div>"
 
             # Render HTML
-            components.html(html_content, height=300, scrolling=True)
+            components.html(cards_html, height=300, scrolling=True)
         else:
             st.subheader("🕒 Pending Collection:")
             form_base = "https://docs.google.com/forms/d/e/1FAIpQLSdnNBpKKxpWVkrZfj0PLKW8K26-3i0bO43hBADOHvGcpGqjvA/viewform?usp=pp_url"
@@ -787,6 +831,7 @@ else:
             
 
             # Add each button to the HTML string
+            links_html = buttons_html
             for _, row in missing_df.iterrows():
                 form_link = (
                     f"{form_base}"
@@ -798,72 +843,238 @@ else:
                     f"&entry.1925700467={quote('Govind Kumar')}"
                 )
 
-                buttons_html += f"""
+                links_html += f"""
         <a href="{form_link}" target="_blank" class="custom-btn">
             <span class="vehicle-no">{row['Vehicle No']}</span>
             <span class="missing-date">{row['Missing Date']}</span>
         </a>
         """
 
-            buttons_html += "</div>"
+            links_html += "</div>"
 
             # Render all buttons at once
-            st.markdown(buttons_html, unsafe_allow_html=True)
+            st.markdown(links_html, unsafe_allow_html=True)
             
 
 
 
         ## changes by ayush end here ##############################
 
-    elif page == "Monthly Summary":
-        st.title("📊 Monthly Summary Report")
-    
-        # --- Monthly Aggregation ---
-        # Govind and Gaurav Collection
-        govind_monthly = df[df['Received By'] == 'Govind Kumar'].groupby('Month-Year', as_index=False)['Amount'].sum().rename(columns={"Amount": "Govind Collection"})
-        gaurav_monthly = df[df['Received By'] == 'Kumar Gaurav'].groupby('Month-Year', as_index=False)['Amount'].sum().rename(columns={"Amount": "Gaurav Collection"})
-    
-        # Govind and Gaurav Expenses
-        govind_expense_monthly = expense_df[expense_df['Expense By'] == 'Govind Kumar'].groupby('Month-Year', as_index=False)['Amount Used'].sum().rename(columns={"Amount Used": "Govind Expense"})
-        gaurav_expense_monthly = expense_df[expense_df['Expense By'] == 'Kumar Gaurav'].groupby('Month-Year', as_index=False)['Amount Used'].sum().rename(columns={"Amount Used": "Gaurav Expense"})
-    
-        # Merge all
-        monthly_summary = pd.merge(govind_monthly, gaurav_monthly, on="Month-Year", how="outer")
-        monthly_summary = pd.merge(monthly_summary, govind_expense_monthly, on="Month-Year", how="outer")
-        monthly_summary = pd.merge(monthly_summary, gaurav_expense_monthly, on="Month-Year", how="outer")
-    
-        monthly_summary.fillna(0, inplace=True)
-    
-        # Total columns
-        monthly_summary["Total Collection"] = monthly_summary["Govind Collection"] + monthly_summary["Gaurav Collection"]
-        monthly_summary["Total Expense"] = monthly_summary["Govind Expense"] + monthly_summary["Gaurav Expense"]
-    
-        # Net Balance
-        monthly_summary["Net Balance"] = monthly_summary["Total Collection"] - monthly_summary["Total Expense"]
-    
-        # Percentage Change
-        monthly_summary["Collection Change (%)"] = monthly_summary["Total Collection"].pct_change().fillna(0) * 100
-        monthly_summary["Expense Change (%)"] = monthly_summary["Total Expense"].pct_change().fillna(0) * 100
-    
-        # Reorder columns
-        ordered_columns = [
-            "Month-Year", 
-            "Govind Collection", "Gaurav Collection", 
-            "Total Collection", "Collection Change (%)", 
-            "Govind Expense", "Gaurav Expense", 
-            "Total Expense", "Expense Change (%)", 
-            "Net Balance"
-        ]
-        monthly_summary = monthly_summary[ordered_columns]
-    
-        # === UI ===
-        st.subheader("📅 Monthly Breakdown")
-        st.dataframe(monthly_summary.style.format({
-            "Govind Collection": "₹{:.0f}",
-            "Gaurav Collection": "₹{:.0f}",
-            "Total Collection": "₹{:.0f}",
-            "Collection Change (%)": "{:+.1f}%",
-            "Govind Expense": "₹{:.0f}",
+    # While the warm-up is loading fresh data, the Dashboard is served from the
+    # last saved snapshot instead of waiting for every sheet
+    if (page == "Dashboard" and snapshot.warmup.running
+            and st.session_state.get("dashboard_as_of", date.today()) == date.today()):
+        saved = snapshot.load()
+        if saved is not None:
+            st.title("📊 VayuVolt Dashboard")
+            st.date_input("📅 Balances As Of", value=date.today(), max_value=date.today(), key="dashboard_as_of")
+            st.info("⏳ Fresh data is loading in the background; showing the last saved snapshot.")
+            render_dashboard(saved, date.today())
+            render_sidebar_footer()
+            st.stop()
+
+    frames = load_frames()
+    df = frames["collection"]
+    expense_df = frames["expense"]
+    investment_df = frames["investment"]
+    bank_df = frames["bank"]
+
+    get_changes(
+        data_version(df, expense_df, investment_df, bank_df),
+        {"collection": df, "expense": expense_df, "investment": investment_df, "bank": bank_df},
+    )
+    get_sql_store(
+        data_version(df, expense_df, investment_df, bank_df),
+        {"collection": df, "expense": expense_df, "investment": investment_df, "bank": bank_df},
+    )
+
+    #------------Bank Calculation End-----------------
+
+
+
+    #-------------Remaining Balance at you ----------
+
+
+
+
+
+    #---------------Remaining Balance calculation end------------
+    ## Current month loss calculation ##
+    # ---------- Base DF ----------
+    perf_df = df.copy()
+    perf_df["Collection Date"] = pd.to_datetime(
+    perf_df["Collection Date"], dayfirst=True, errors="coerce"
+    ).dt.normalize()
+    perf_df["Amount"] = pd.to_numeric(perf_df["Amount"], errors="coerce").fillna(0)
+    perf_df = perf_df.dropna(subset=["Collection Date"])
+
+
+        #st.write(f"start_date: {custom_start_date}, end_date: {custom_end_date}")
+
+
+    kpis = get_kpis(
+        data_version(df, expense_df, investment_df, bank_df),
+        rent_targets.targets.version,
+        {"collection": df, "expense": expense_df, "investment": investment_df, "bank": bank_df},
+    )
+
+    # Calculate total credits and debits
+    Collection_Credit_Bank = kpis.total("Collection_Credit")
+    Investment_Credit_Bank = kpis.total("Investment_Credit")
+    Payment_Credit_Bank = kpis.total("Payment_Credit")
+    ## by ayush
+    settlement_credit = kpis.total("Settlement_Credit")
+
+    total_credits = Collection_Credit_Bank+Investment_Credit_Bank+Payment_Credit_Bank+settlement_credit
+
+    Expence_Debit_Bank = kpis.total("Expence_Debit")
+    Investment_Debit_Bank = kpis.total("Investment_Debit")
+    Settlement_Debit_Bank = kpis.total("Settlement_Debit")
+    total_debits = Expence_Debit_Bank+Settlement_Debit_Bank+Investment_Debit_Bank
+
+    bank_balance = total_credits - total_debits
+
+    # === Individual Summary ===
+    # Govind Kumar
+    govind_collection_credit = kpis.total("Collection_Credit", "Govind Kumar")
+    govind_settlement_credit = kpis.total("Settlement_Credit", "Govind Kumar")
+    govind_investment_credit = kpis.total("Investment_Credit", "Govind Kumar")
+    govind_total_credit = govind_collection_credit + govind_settlement_credit + govind_investment_credit
+
+    govind_expense_debit = kpis.total("Expence_Debit", "Govind Kumar")
+    govind_settlement_debit = kpis.total("Settlement_Debit", "Govind Kumar")
+    govind_investment_debit = kpis.total("Investment_Debit", "Govind Kumar")
+    govind_total_debit = govind_expense_debit + govind_settlement_debit+govind_investment_debit
+
+    # Kumar Gaurav
+    gaurav_collection_credit = kpis.total("Collection_Credit", "Kumar Gaurav")
+    gaurav_settlement_credit = kpis.total("Settlement_Credit", "Kumar Gaurav")
+    gaurav_investment_credit = kpis.total("Investment_Credit", "Kumar Gaurav")
+    gaurav_total_credit = gaurav_collection_credit + gaurav_settlement_credit + gaurav_investment_credit
+
+    gaurav_expense_debit = kpis.total("Expence_Debit", "Kumar Gaurav")
+    gaurav_settlement_debit = kpis.total("Settlement_Debit", "Kumar Gaurav")
+    gaurav_investment_debit = kpis.total("Investment_Debit", "Kumar Gaurav")
+    gaurav_total_debit = gaurav_expense_debit + gaurav_settlement_debit+gaurav_investment_debit
+
+    #-------- current month loss ---------#
+    today = pd.Timestamp.today().normalize()
+    current_month = today.strftime("%Y-%m")
+    current_total_loss = max(0, kpis.total("loss_total", month=current_month))
+    current_company_loss = max(0, kpis.total("loss_company", month=current_month))
+    current_driver_loss = max(0, current_total_loss - current_company_loss)
+
+    # ---------- Global search ----------
+    # Ranked hits across all four ledgers; typing a query reruns only this fragment
+    @st.fragment
+    def render_search(frames):
+        query = st.text_input("🔎 Search all ledgers", key="global_search", label_visibility="collapsed",
+                              placeholder="🔎 Search all ledgers, e.g. tyre 0029 · settlement bank · Govind")
+        if not query.strip():
+            return
+        index = get_search_index(data_version(*frames.values()), frames)
+        start = perf_counter()
+        hits = index.search(query, limit=50)
+        elapsed_ms = (perf_counter() - start) * 1000
+        if hits.empty:
+            st.caption(f"No matches for “{query}” ({elapsed_ms:.1f} ms)")
+            return
+        st.caption(f"Top {len(hits)} matches across {len(index.docs):,} ledger rows ({elapsed_ms:.1f} ms)")
+        st.dataframe(hits.drop(columns=["Score"]), use_container_width=True, hide_index=True)
+
+    render_search(frames)
+
+
+
+    if page == "Dashboard":
+        st.title("📊 VayuVolt Dashboard")
+
+        # ---------- As-of date ----------
+        # Today reads the live snapshot; any earlier day is answered from the balance ledger
+        as_of = st.date_input("📅 Balances As Of", value=date.today(), max_value=date.today(), key="dashboard_as_of")
+        data_key = data_version(df, expense_df, investment_df, bank_df)
+        snap = get_dashboard_snapshot(data_key, rent_targets.targets.version, pending_end_date(), frames)
+
+        if as_of < date.today():
+            ledger = get_balance_ledger(data_key, frames)
+            month_start = as_of.replace(day=1)
+            total_loss, company_loss = (max(0, v) for v in kpis.losses_between(month_start, as_of))
+            snap = {
+                **snap,
+                "figures": ledger.figures(as_of),
+                "month": as_of.strftime("%Y-%m"),
+                "month_collection": sum(ledger.between("collection", p, month_start, as_of) for p in balances.PARTNERS),
+                "month_expense": sum(ledger.between("expense", p, month_start, as_of) for p in balances.PARTNERS),
+                "month_loss": {"total": total_loss, "company": company_loss, "driver": max(0, total_loss - company_loss)},
+            }
+            st.caption(f"Showing balances at the end of {as_of:%d %b %Y}")
+
+        render_dashboard(snap, as_of)
+
+    elif page == "Monthly Summary":
+        st.title("📊 Monthly Summary Report")
+    
+        # --- Monthly Aggregation (local SQL store) ---
+        # Govind and Gaurav collection and expenses per month, in one query
+        monthly_summary = sql_store.run_query("""
+            WITH c AS (
+                SELECT month_year,
+                       SUM(CASE WHEN received_by = 'Govind Kumar' THEN amount END) AS govind,
+                       SUM(CASE WHEN received_by = 'Kumar Gaurav' THEN amount END) AS gaurav
+                FROM collection
+                WHERE received_by IN ('Govind Kumar', 'Kumar Gaurav') AND month_year IS NOT NULL
+                GROUP BY month_year
+            ),
+            e AS (
+                SELECT month_year,
+                       SUM(CASE WHEN expense_by = 'Govind Kumar' THEN amount END) AS govind,
+                       SUM(CASE WHEN expense_by = 'Kumar Gaurav' THEN amount END) AS gaurav
+                FROM expense
+                WHERE expense_by IN ('Govind Kumar', 'Kumar Gaurav') AND month_year IS NOT NULL
+                GROUP BY month_year
+            ),
+            m AS (SELECT month_year FROM c UNION SELECT month_year FROM e)
+            SELECT m.month_year AS "Month-Year",
+                   c.govind AS "Govind Collection", c.gaurav AS "Gaurav Collection",
+                   e.govind AS "Govind Expense", e.gaurav AS "Gaurav Expense"
+            FROM m
+            LEFT JOIN c ON c.month_year = m.month_year
+            LEFT JOIN e ON e.month_year = m.month_year
+            ORDER BY m.month_year
+        """)
+    
+        monthly_summary.fillna(0, inplace=True)
+    
+        # Total columns
+        monthly_summary["Total Collection"] = monthly_summary["Govind Collection"] + monthly_summary["Gaurav Collection"]
+        monthly_summary["Total Expense"] = monthly_summary["Govind Expense"] + monthly_summary["Gaurav Expense"]
+    
+        # Net Balance
+        monthly_summary["Net Balance"] = monthly_summary["Total Collection"] - monthly_summary["Total Expense"]
+    
+        # Percentage Change
+        monthly_summary["Collection Change (%)"] = monthly_summary["Total Collection"].pct_change().fillna(0) * 100
+        monthly_summary["Expense Change (%)"] = monthly_summary["Total Expense"].pct_change().fillna(0) * 100
+    
+        # Reorder columns
+        ordered_columns = [
+            "Month-Year", 
+            "Govind Collection", "Gaurav Collection", 
+            "Total Collection", "Collection Change (%)", 
+            "Govind Expense", "Gaurav Expense", 
+            "Total Expense", "Expense Change (%)", 
+            "Net Balance"
+        ]
+        monthly_summary = monthly_summary[ordered_columns]
+    
+        # === UI ===
+        st.subheader("📅 Monthly Breakdown")
+        st.dataframe(monthly_summary.style.format({
+            "Govind Collection": "₹{:.0f}",
+            "Gaurav Collection": "₹{:.0f}",
+            "Total Collection": "₹{:.0f}",
+            "Collection Change (%)": "{:+.1f}%",
+            "Govind Expense": "₹{:.0f}",
             "Gaurav Expense": "₹{:.0f}",
             "Total Expense": "₹{:.0f}",
             "Expense Change (%)": "{:+.1f}%",
@@ -871,14 +1082,18 @@ else:
         }), use_container_width=True)
     
         # === Charts ===
-        chart_option = st.radio("📊 Show Chart for:", ["Collection vs Expense", "Net Balance Trend"])
-        
-        if chart_option == "Collection vs Expense":
-            chart_df = monthly_summary[["Month-Year", "Total Collection", "Total Expense"]].set_index("Month-Year")
-            st.bar_chart(chart_df)
-        else:
-            net_df = monthly_summary[["Month-Year", "Net Balance"]].set_index("Month-Year")
-            st.line_chart(net_df)
+        @st.fragment
+        def render_summary_chart(monthly_summary):
+            chart_option = st.radio("📊 Show Chart for:", ["Collection vs Expense", "Net Balance Trend"])
+
+            if chart_option == "Collection vs Expense":
+                chart_df = monthly_summary[["Month-Year", "Total Collection", "Total Expense"]].set_index("Month-Year")
+                st.bar_chart(chart_df)
+            else:
+                net_df = monthly_summary[["Month-Year", "Net Balance"]].set_index("Month-Year")
+                st.line_chart(net_df)
+
+        render_summary_chart(monthly_summary)
     
         # === Download Option ===
         csv = monthly_summary.to_csv(index=False).encode("utf-8")
@@ -887,55 +1102,76 @@ else:
 
     elif page == "Grouped Data":
         st.title("🔍 Grouped Collection Data")
-    
-        group_by = st.sidebar.radio("🔄 Group Data By:", ["Name", "Vehicle No"])
-        selected_month = st.sidebar.selectbox("📅 Select Month-Year:", ["All"] + sorted(df['Month-Year'].unique(), reverse=True))
-    
-        chart_type = st.sidebar.radio("📈 Show Chart For:", ["Amount", "Distance", "Both"])
-        top_n = st.sidebar.slider("🔢 Show Top N Groups", min_value=3, max_value=20, value=10)
-    
-        # Filter by month
-        df_filtered = df.copy()
-        if selected_month != "All":
-            df_filtered = df[df['Month-Year'] == selected_month]
-    
-        # Grouping logic
-        grouped_df = df_filtered.groupby(group_by, as_index=False).agg({
-            "Amount": "sum",
-            "Distance": "sum",
-            "Collection Date": "count"
-        }).rename(columns={"Collection Date": "Total Collections"})
-    
-        # Add averages
-        grouped_df["Avg Amount"] = grouped_df["Amount"] / grouped_df["Total Collections"]
-        grouped_df["Avg Distance"] = grouped_df["Distance"] / grouped_df["Total Collections"]
-    
-        # Sort and get top N
-        grouped_df = grouped_df.sort_values(by="Amount", ascending=False).head(top_n)
-    
-        # Display Data
-        st.subheader(f"📊 Top {top_n} - Grouped by {group_by}")
-        st.dataframe(grouped_df.style.format({
-            "Amount": "₹{:.0f}",
-            "Distance": "{:.0f} km",
-            "Avg Amount": "₹{:.0f}",
-            "Avg Distance": "{:.1f} km"
-        }), use_container_width=True)
-    
-        # Download CSV
-        csv_grouped = grouped_df.to_csv(index=False).encode("utf-8")
-        st.download_button("⬇️ Download Grouped Data", data=csv_grouped, file_name="grouped_data.csv", mime="text/csv")
-    
-        # Chart View
-        st.subheader("📈 Grouped Chart")
-    
-        if chart_type == "Amount":
-            st.bar_chart(grouped_df.set_index(group_by)["Amount"])
-        elif chart_type == "Distance":
-            st.bar_chart(grouped_df.set_index(group_by)["Distance"])
-        else:
-            st.line_chart(grouped_df.set_index(group_by)[["Amount", "Distance"]])
-    
+
+        cube = get_collection_cube(dataset_version(df), df)
+
+        # Grouping controls, table and chart; a control change reruns only this fragment
+        @st.fragment
+        def render_grouped(cube):
+            dimensions = {"Name": "Name", "Vehicle No": "Vehicle No", "Received By": "Received By", "Period": olap.TIME}
+            col1, col2, col3, col4 = st.columns(4)
+            group_by = col1.selectbox("🔄 Group Data By:", list(dimensions))
+            then_by = col2.selectbox("➕ Then By:", ["None"] + [d for d in dimensions if d != group_by])
+            period = col3.radio("🗓️ Period Level:", olap.PERIODS, horizontal=True)
+            selected_period = col4.selectbox(f"📅 Select {period}:", ["All"] + cube.members(olap.TIME, period)[::-1])
+
+            col1, col2, col3 = st.columns([2, 2, 1])
+            chart_type = col1.radio("📈 Show Chart For:", ["Amount", "Distance", "Both"], horizontal=True)
+            top_n = col2.slider("🔢 Show Top N Groups", min_value=3, max_value=20, value=10)
+            pivoted = col3.toggle("🔀 Pivot", disabled=then_by == "None") and then_by != "None"
+
+            # Slices and roll-ups of the cube; the raw rows are not touched again
+            levels = [dimensions[group_by]] + ([dimensions[then_by]] if then_by != "None" else [])
+            filters = {olap.TIME: selected_period} if selected_period != "All" else None
+            grouped_df = cube.group(levels, period, filters)
+            period_name = "Month-Year" if period == "Month" else period
+            labels = [period_name if level == olap.TIME else level for level in levels]
+            grouped_df = grouped_df.rename(columns={olap.TIME: period_name})
+
+            # Display Data
+            title = " › ".join(labels)
+            if pivoted:
+                measure = "Distance" if chart_type == "Distance" else "Amount"
+                # Top rows by their total across the columns
+                row_totals = grouped_df.groupby(labels[0], as_index=False)[measure].sum()
+                top_rows = olap.top_k(row_totals, measure, top_n)[labels[0]]
+                grouped_df = cube.pivot(*levels, measure=measure, period=period, filters=filters).loc[top_rows]
+                grouped_df.index.name, grouped_df.columns.name = labels
+                st.subheader(f"📊 Top {top_n} - {measure} by {labels[0]} × {labels[1]}")
+                st.dataframe(grouped_df.style.format("₹{:.0f}" if measure == "Amount" else "{:.0f} km"),
+                             use_container_width=True)
+            else:
+                grouped_df = olap.top_k(grouped_df, "Amount", top_n)
+                st.subheader(f"📊 Top {top_n} - Grouped by {title}")
+                st.dataframe(grouped_df.style.format({
+                    "Amount": "₹{:.0f}",
+                    "Distance": "{:.0f} km",
+                    "Avg Amount": "₹{:.0f}",
+                    "Avg Distance": "{:.1f} km"
+                }), use_container_width=True)
+
+            # Download CSV
+            csv_grouped = grouped_df.to_csv(index=pivoted).encode("utf-8")
+            st.download_button("⬇️ Download Grouped Data", data=csv_grouped, file_name="grouped_data.csv", mime="text/csv")
+
+            # Chart View
+            st.subheader("📈 Grouped Chart")
+
+            if pivoted:
+                st.bar_chart(grouped_df)
+            elif len(labels) > 1:
+                chart_df = grouped_df.assign(**{labels[0]: grouped_df[labels[0]].astype(str)})
+                measure = "Distance" if chart_type == "Distance" else "Amount"
+                st.bar_chart(chart_df, x=labels[0], y=measure, color=labels[1])
+            elif chart_type == "Amount":
+                st.bar_chart(grouped_df.set_index(labels[0])["Amount"])
+            elif chart_type == "Distance":
+                st.bar_chart(grouped_df.set_index(labels[0])["Distance"])
+            else:
+                st.line_chart(grouped_df.set_index(labels[0])[["Amount", "Distance"]])
+
+        render_grouped(cube)
+
 
     elif page == "Expenses":
         st.title("💸 Expense Insights")
@@ -952,11 +1188,15 @@ else:
     
         # ─────────────────────────────────────────────────────
         # 🔹 Preprocessing
-        expense_df["Date"] = pd.to_datetime(expense_df["Date"], errors='coerce')
-        expense_df["Year"] = expense_df["Date"].dt.year
-        expense_df["Month"] = expense_df["Date"].dt.strftime('%B')
-        expense_df["Month_Num"] = expense_df["Date"].dt.month
-        expense_df["YearMonth"] = expense_df["Date"].dt.to_period("M").astype(str)
+        # (on a copy: the loaded frame is shared by every session)
+        expense_dates = pd.to_datetime(expense_df["Date"], errors='coerce')
+        expense_df = expense_df.assign(
+            Date=expense_dates,
+            Year=expense_dates.dt.year,
+            Month=expense_dates.dt.strftime('%B'),
+            Month_Num=expense_dates.dt.month,
+            YearMonth=expense_dates.dt.to_period("M").astype(str),
+        )
     
         # ─────────────────────────────────────────────────────
         # 🔹 Static Metrics (Not Filter Dependent)
@@ -971,118 +1211,129 @@ else:
     
         st.markdown("---")
     
-        # ─────────────────────────────────────────────────────
-        # 🔹 Filter: Expense By
-        st.sidebar.markdown("### 🔍 Filter")
-        expense_by_options = ["All"] + sorted(expense_df["Expense By"].dropna().unique().tolist())
-        selected_expense_by = st.sidebar.selectbox("Expense By", expense_by_options)
-        # ─────────────────────────────────────────────────────
-        #edit by ayush
-        st.sidebar.markdown("**📅 Filter By Date**")
-
-        year_month_option = st.sidebar.selectbox(
-            "",
-            ["All", "Current Month", "Last 6 Months", "Current Year", "Custom Date"],
-            key="exp_range_select",
-        )
-
-        custom_start_date, custom_end_date = None, None
-        if year_month_option == "Custom Date":
-            min_date = date(2024, 1, 1)
-            max_date = date.today()
-
-            custom_start_date = st.sidebar.date_input(
-                "Select Start Date",
-                value=date.today(),
-                min_value=min_date,
-                max_value=max_date,
-                key="exp_start_date_picker"
+        # Filters, charts and table; a filter change reruns only this fragment
+        @st.fragment
+        def render_expense_details(expense_df):
+            # ─────────────────────────────────────────────────────
+            # 🔹 Filter: Expense By
+            st.markdown("### 🔍 Filter")
+            col1, col2, col3, col4 = st.columns(4)
+            expense_by_options = ["All"] + sorted(expense_df["Expense By"].dropna().unique().tolist())
+            selected_expense_by = col1.selectbox("Expense By", expense_by_options)
+            # ─────────────────────────────────────────────────────
+            #edit by ayush
+            year_month_option = col2.selectbox(
+                "📅 Filter By Date",
+                ["All", "Current Month", "Last 6 Months", "Current Year", "Custom Date"],
+                key="exp_range_select",
             )
 
-            if custom_start_date < max_date:
-                next_day = custom_start_date + timedelta(days=1)
-                custom_end_date = st.sidebar.date_input(
-                    "Select End Date",
-                    value=next_day,
-                    min_value=next_day,
+            custom_start_date, custom_end_date = None, None
+            if year_month_option == "Custom Date":
+                min_date = date(2024, 1, 1)
+                max_date = date.today()
+
+                custom_start_date = col3.date_input(
+                    "Select Start Date",
+                    value=date.today(),
+                    min_value=min_date,
                     max_value=max_date,
-                    key="exp_end_date_picker"
+                    key="exp_start_date_picker"
                 )
 
-        today = pd.Timestamp.today().normalize()
+                if custom_start_date < max_date:
+                    next_day = custom_start_date + timedelta(days=1)
+                    custom_end_date = col4.date_input(
+                        "Select End Date",
+                        value=next_day,
+                        min_value=next_day,
+                        max_value=max_date,
+                        key="exp_end_date_picker"
+                    )
+
+            today = pd.Timestamp.today().normalize()
+
+
+            # ─────────────────────────────────────────────────────
+            # Filtered rows, month-on-month pivot and table for this filter
+            # combination, shared with every session that asks for the same one
+            def build_view():
+                # 🔹 Apply expense by Filter
+                if selected_expense_by == "All":
+                    filtered_df = expense_df.copy()
+                else:
+                    filtered_df = expense_df[expense_df["Expense By"] == selected_expense_by]
+
+                #apply date filter
+                if year_month_option == "Current Month":
+                    start_date = today.replace(day=1)
+                    filtered_df = filtered_df[filtered_df["Date"] >= start_date]
+                elif year_month_option == "Last 6 Months":
+                    start_date = today - pd.DateOffset(months=6)
+                    filtered_df = filtered_df[filtered_df["Date"] >= start_date]
+                elif year_month_option == "Current Year":
+                    start_date = today.replace(month=1, day=1)
+                    filtered_df = filtered_df[filtered_df["Date"] >= start_date]
+                elif (year_month_option == "Custom Date" and isinstance(custom_start_date, date) and isinstance(custom_end_date, date)):
+                    filtered_df = filtered_df[
+                        (filtered_df["Date"].dt.date >= custom_start_date) & (filtered_df["Date"].dt.date <= custom_end_date)]
+
+                recent_12_months = (
+                    expense_df["YearMonth"]
+                    .dropna()
+                    .sort_values()
+                    .unique()
+                )[-12:]
+
+                momo_df = (
+                    filtered_df[filtered_df["YearMonth"].isin(recent_12_months)]
+                    .groupby(["YearMonth", "Expense By"])["Amount Used"]
+                    .sum()
+                    .reset_index()
+                    .sort_values(by="YearMonth")
+                )
 
-    
-        # ─────────────────────────────────────────────────────
-        # 🔹 Apply expense by Filter
-        if selected_expense_by == "All":
-            filtered_df = expense_df.copy()
-        else:
-            filtered_df = expense_df[expense_df["Expense By"] == selected_expense_by]
+                display_df = filtered_df.sort_values(by="Date", ascending=False).copy()
+                if "Any Bill" in display_df.columns:
+                    url_mask = display_df["Any Bill"].astype(str).str.startswith("http")
+                    display_df.loc[~url_mask, "Any Bill"] = None  # hide non-URLs
 
-        #apply date filter
-        if year_month_option == "Current Month":
-            start_date = today.replace(day=1)
-            filtered_df = filtered_df[filtered_df["Date"] >= start_date]
-        elif year_month_option == "Last 6 Months":
-            start_date = today - pd.DateOffset(months=6)
-            filtered_df = filtered_df[filtered_df["Date"] >= start_date]
-        elif year_month_option == "Current Year":
-            start_date = today.replace(month=1, day=1)
-            filtered_df = filtered_df[filtered_df["Date"] >= start_date]
-        elif (year_month_option == "Custom Date" and isinstance(custom_start_date, date) and isinstance(custom_end_date, date)):
-            filtered_df = filtered_df[
-                (filtered_df["Date"].dt.date >= custom_start_date) & (filtered_df["Date"].dt.date <= custom_end_date)]
+                return {
+                    "pivot": momo_df.pivot(index="YearMonth", columns="Expense By", values="Amount Used").fillna(0),
+                    "total": filtered_df["Amount Used"].sum(),
+                    "table": display_df,
+                }
 
-    
-        # ─────────────────────────────────────────────────────
-        # 🔹 Month-on-Month Summary (Last 12 Months)
-        st.subheader("📊 Month-on-Month Expense (Last 12 Months)")
-    
-        recent_12_months = (
-            expense_df["YearMonth"]
-            .dropna()
-            .sort_values()
-            .unique()
-        )[-12:]
-    
-        momo_df = (
-            filtered_df[filtered_df["YearMonth"].isin(recent_12_months)]
-            .groupby(["YearMonth", "Expense By"])["Amount Used"]
-            .sum()
-            .reset_index()
-            .sort_values(by="YearMonth")
-        )
-    
-        pivot_df = momo_df.pivot(index="YearMonth", columns="Expense By", values="Amount Used").fillna(0)
-    
-        st.bar_chart(pivot_df)
+            view = view_cache.views.get_or_compute(
+                "Expenses", dataset_version(expense_df),
+                (selected_expense_by, year_month_option, custom_start_date, custom_end_date, today), build_view,
+            )
 
-        # 🔹 Total of Filtered Data
-        total_filtered_expense = filtered_df["Amount Used"].sum()
-        st.metric("📌 Total Filtered Expense", f"₹{total_filtered_expense:,.0f}")
+            # ─────────────────────────────────────────────────────
+            # 🔹 Month-on-Month Summary (Last 12 Months)
+            st.subheader("📊 Month-on-Month Expense (Last 12 Months)")
+            st.bar_chart(view["pivot"])
 
+            # 🔹 Total of Filtered Data
+            st.metric("📌 Total Filtered Expense", f"₹{view['total']:,.0f}")
 
+            # ─────────────────────────────────────────────────────
+            # 🔹 View Filtered Table with Clickable Links
+            st.subheader("📋 Filtered Expense Table")
+            st.dataframe(
+                view["table"],
+                use_container_width = True,
+                height = 420,
+                column_config={
+                    "Any Bill": st.column_config.LinkColumn("Any Bill", display_text="View Bill"),
+                    "Amount Used": st.column_config.NumberColumn("Amount Used", format="₹%d"),
+                    "Date": st.column_config.DateColumn("Date", format="YYYY-MM-DD"),
+                },
+                hide_index=False
+            )
 
+        render_expense_details(expense_df)
 
-        # ─────────────────────────────────────────────────────
-        # 🔹 View Filtered Table with Clickable Links
-        st.subheader("📋 Filtered Expense Table")
-        display_df = filtered_df.sort_values(by="Date", ascending=False).copy()
-        if "Any Bill" in display_df.columns:
-            url_mask = display_df["Any Bill"].astype(str).str.startswith("http")
-            display_df.loc[~url_mask, "Any Bill"] = None  # hide non-URLs
-
-        st.dataframe(
-            display_df,
-            use_container_width = True,
-            height = 420,
-            column_config={
-                "Any Bill": st.column_config.LinkColumn("Any Bill", display_text="View Bill"),
-                "Amount Used": st.column_config.NumberColumn("Amount Used", format="₹%d"),
-                "Date": st.column_config.DateColumn("Date", format="YYYY-MM-DD"),
-            },
-            hide_index=False
-        )
 
 
 
@@ -1101,59 +1352,13 @@ else:
             )
 
         # ===============================
-        # 1️⃣ MANUAL INVESTMENT SHEET
+        # 1️⃣ MANUAL + BANK INVESTMENT FLOWS
         # ===============================
-        investment_df["Source"] = "Manual Sheet"
-        sheet_total_investment = investment_df["Investment Amount"].sum()
-
-        investment_df_clean = investment_df[
-            ["Date", "Investor Name", "Investment Amount", "Investment Type", "Comment", "Month-Year", "Source"]
-        ]
-
-        # ===============================
-        # 2️⃣ BANK INVESTMENT (CREDIT + DEBIT)
-        # ===============================
-        bank_investment_df = bank_df[
-            bank_df["Transaction Type"].isin(["Investment_Credit", "Investment_Debit"])
-        ].copy()
-
-        # Rename columns
-        bank_investment_df.rename(columns={
-            "Transaction By": "Investor Name",
-            "Amount": "Investment Amount",
-            "Reason": "Comment"
-        }, inplace=True)
-
-        # ➕ Credit = +Amount | ➖ Debit = -Amount
-        bank_investment_df["Investment Amount"] = bank_investment_df.apply(
-            lambda x: x["Investment Amount"]
-            if x["Transaction Type"] == "Investment_Credit"
-            else -x["Investment Amount"],
-            axis=1
-        )
-
-        bank_investment_df["Investment Type"] = bank_investment_df["Transaction Type"].replace({
-            "Investment_Credit": "Bank Credit",
-            "Investment_Debit": "Bank Debit"
-        })
-
-        bank_investment_df["Month-Year"] = pd.to_datetime(
-            bank_investment_df["Date"], dayfirst=True, errors="coerce"
-        ).dt.strftime("%Y-%m")
-
-        bank_investment_df["Source"] = "Bank Transaction"
-
-        bank_investment_df_clean = bank_investment_df[
-            ["Date", "Investor Name", "Investment Amount", "Investment Type", "Comment", "Month-Year", "Source"]
-        ]
-
-        # ===============================
-        # 3️⃣ COMBINE ALL INVESTMENTS
-        # ===============================
-        full_investment_df = pd.concat(
-            [investment_df_clean, bank_investment_df_clean],
-            ignore_index=True
-        )
+        # Signed flows: bank Investment_Credit adds capital, Investment_Debit takes it out
+        full_investment_df = investor_returns.investment_flows(investment_df, bank_df)
+        investment_df_clean = full_investment_df[full_investment_df["Source"] == "Manual Sheet"]
+        bank_investment_df_clean = full_investment_df[full_investment_df["Source"] == "Bank Transaction"]
+        sheet_total_investment = investment_df_clean["Investment Amount"].sum()
 
         # ===============================
         # 4️⃣ TOTAL SUMMARY
@@ -1186,6 +1391,8 @@ else:
             investor_totals = investor_totals[investor_totals["Investment Amount"] > 0]
 
             if not investor_totals.empty:
+                import matplotlib.pyplot as plt  # only this chart needs matplotlib
+
                 fig1, ax1 = plt.subplots(figsize=(3.5, 3.5))
                 ax1.pie(
                     investor_totals["Investment Amount"],
@@ -1224,76 +1431,83 @@ else:
         st.markdown("---")
 
         # ===============================
-        # 6️⃣ SIDEBAR FILTER
+        # 6️⃣ INVESTOR SUMMARY TABLE
         # ===============================
-        st.sidebar.markdown("### 🔎 Filter Investment Records")
-
-        investors_list = sorted(full_investment_df["Investor Name"].dropna().unique().tolist())
-        investors_list.insert(0, "All")
-
-        selected_investor = st.sidebar.selectbox("Select Investor", investors_list)
+        st.markdown("#### 💼 Capital Summary by Investor")
 
-        filtered_df = (
-            full_investment_df
-            if selected_investor == "All"
-            else full_investment_df[full_investment_df["Investor Name"] == selected_investor]
-        )
+        as_of = pd.Timestamp.today().normalize()
+        returns_df = get_investor_returns(data_version(df, expense_df, investment_df, bank_df), as_of,
+                                          df, expense_df, investment_df, bank_df)
+        capital_summary_df = returns_df[["Investor Name", "Capital Invested", "Capital Withdrawn", "Net Capital"]]
+        st.dataframe(capital_summary_df.style.format({
+            "Capital Invested": "₹{:,.0f}",
+            "Capital Withdrawn": "₹{:,.0f}",
+            "Net Capital": "₹{:,.0f}",
+        }), hide_index=True)
 
         # ===============================
-        # 7️⃣ INVESTOR SUMMARY TABLE
+        # 7️⃣ INVESTOR RETURNS
         # ===============================
-        st.markdown("#### 💼 Capital Summary by Investor")
-
-        # ---- Capital Invested ----
-        capital_invested = (
-            full_investment_df[full_investment_df["Investment Amount"] > 0]
-            .groupby("Investor Name")["Investment Amount"]
-            .sum()
-            .rename("Capital Invested")
+        st.markdown("#### 📐 Investor Returns")
+        st.caption(
+            f"As of {as_of:%d %b %Y}. Capital employed weights every flow by how long it has been in the business; "
+            "operating profit (collections less sheet expenses and bank expense debits) is split by it. "
+            "XIRR treats net capital plus the profit share as each investor's value today."
         )
+        if returns_df.empty:
+            st.info("No dated investment flows yet.")
+        else:
+            col1, col2, col3 = st.columns(3)
+            col1.metric("🏭 Capital Employed", f"₹{returns_df['Capital Employed'].sum():,.0f}")
+            col2.metric("💹 Operating Profit", f"₹{returns_df['Profit Share'].sum():,.0f}")
+            col3.metric("📊 Return on Capital Employed",
+                        f"{returns_df['Profit Share'].sum() / returns_df['Capital Employed'].sum() * 100:,.1f}%"
+                        if returns_df["Capital Employed"].sum() > 0 else "–")
+            st.dataframe(returns_df.style.format({
+                "Capital Invested": "₹{:,.0f}",
+                "Capital Withdrawn": "₹{:,.0f}",
+                "Net Capital": "₹{:,.0f}",
+                "Capital Employed": "₹{:,.0f}",
+                "Capital Share (%)": "{:.1f}%",
+                "Profit Share": "₹{:,.0f}",
+                "XIRR (%)": "{:.1f}%",
+            }, na_rep="–"), use_container_width=True, hide_index=True)
 
-        # ---- Capital Withdrawn (Debit) ----
-        capital_withdrawn = (
-            full_investment_df[full_investment_df["Investment Amount"] < 0]
-            .groupby("Investor Name")["Investment Amount"]
-            .sum()
-            .abs()
-            .rename("Capital Withdrawn")
-        )
+        st.markdown("---")
 
-        # ---- Combine ----
-        capital_summary_df = pd.concat(
-            [capital_invested, capital_withdrawn],
-            axis=1
-        ).fillna(0)
+        # Investor filter and records table; a filter change reruns only this fragment
+        @st.fragment
+        def render_investment_records(full_investment_df):
+            # ===============================
+            # 8️⃣ FILTER
+            # ===============================
+            st.markdown("### 🔎 Filter Investment Records")
 
-        # ---- Net Capital ----
-        capital_summary_df["Net Capital"] = (
-            capital_summary_df["Capital Invested"]
-            - capital_summary_df["Capital Withdrawn"]
-        )
+            investors_list = sorted(full_investment_df["Investor Name"].dropna().unique().tolist())
+            investors_list.insert(0, "All")
 
-        capital_summary_df = capital_summary_df.reset_index()
+            selected_investor = st.selectbox("Select Investor", investors_list)
 
-        # ---- Formatting ----
-        for col in ["Capital Invested", "Capital Withdrawn", "Net Capital"]:
-            capital_summary_df[col] = capital_summary_df[col].apply(lambda x: f"₹{x:,.0f}")
+            filtered_df = (
+                full_investment_df
+                if selected_investor == "All"
+                else full_investment_df[full_investment_df["Investor Name"] == selected_investor]
+            )
 
-        st.dataframe(capital_summary_df)
+            # ===============================
+            # 9️⃣ FINAL TABLE
+            # ===============================
+            filtered_df["Date"] = pd.to_datetime(
+                filtered_df["Date"], dayfirst=True, errors="coerce"
+            )
 
-        st.markdown("---")
+            filtered_df = filtered_df.dropna(subset=["Date"]).sort_values("Date", ascending=False)
 
-        # ===============================
-        # 8️⃣ FINAL TABLE
-        # ===============================
-        filtered_df["Date"] = pd.to_datetime(
-            filtered_df["Date"], dayfirst=True, errors="coerce"
-        )
+            st.subheader("📋 All Investment Records (Credit & Debit)")
+            st.dataframe(filtered_df)
 
-        filtered_df = filtered_df.dropna(subset=["Date"]).sort_values("Date", ascending=False)
+        render_investment_records(full_investment_df)
 
-        st.subheader("📋 All Investment Records (Credit & Debit)")
-        st.dataframe(filtered_df)
 
 
 
@@ -1311,8 +1525,8 @@ else:
                 unsafe_allow_html=True
             )
     
-        # Ensure date column is in datetime format
-        df["Collection Date"] = pd.to_datetime(df["Collection Date"])
+        # Ensure date column is in datetime format (on a copy: the loaded frame is shared)
+        df = df.assign(**{"Collection Date": pd.to_datetime(df["Collection Date"])})
     
         # Sort by Collection Date descending
         df = df.sort_values("Collection Date", ascending=False)
@@ -1338,184 +1552,205 @@ else:
     
         st.markdown("---")
     
-    # edit by ayush starts
-        # Vehicle filter
-        st.sidebar.markdown("### 🚗 Filter by Vehicle")
-        #vehicle_list = ["All"] + sorted(df["Vehicle No"].unique())
-        #selected_vehicle = st.sidebar.selectbox("###🚗 Filter by Vehicle", vehicle_list)
-        selected_vehicle = st.sidebar.selectbox("", ["All"] + sorted(df["Vehicle No"].unique()),key = "vehicle_select",)
-    
+        # Range radio and trend chart; a range change reruns only this fragment
+        @st.fragment
+        def render_collection_trend(df):
+            st.markdown("### 📈 Collection Trend")
 
-        # ensure date column is datetime
-        df["Collection Date"] = pd.to_datetime(df["Collection Date"], dayfirst=True, errors="coerce")
-        #custom date
-        # apply vehicle filter
-        if selected_vehicle != "All":
-            filtered_df = df[df["Vehicle No"] == selected_vehicle].copy()
-        else:
-            filtered_df = df.copy()
-
-        #custom_year, custom_month = None, None
-        st.sidebar.markdown("### 📅 Filter by Date")
-        year_month_option = st.sidebar.selectbox(
-            "",
-            ["All", "Current Month", "Last 6 Months", "Current Year", "Custom Date"],
-            key="range_select",
-        )
+            # Per-vehicle rollups, built once per data version
+            rollups = get_chart_rollups(dataset_version(df), df, "Collection Date", ("Amount",), by="Vehicle No")
 
-        custom_start_date, custom_end_date = None, None
-        if year_month_option == "Custom Date":
-            min_date = date(2024, 1, 1)
-            max_date = date.today()
-            #all_dates = sorted(filtered_df["Collection Date"].dt.date.dropna().unique().tolist())
-            #custom_start_date = st.sidebar.selectbox("Select Start Date" , [None] + all_dates,format_func=lambda d: "— Select start date —" if d is None else d.strftime("%d %b %Y"), key="start_date_select", index=0,)
-            #possible_end_dates = [d for d in all_dates if d > custom_start_date]
-            #years = sorted(pd.to_datetime(df["Collection Date"]).dt.year.unique())
-            #months = list(range(1,13))
-            #custom_year = st.sidebar.selectbox("Select Year", years)
-            #custom_month = st.sidebar.selectbox("Select Month", months, format_func=lambda x: pd.to_datetime(str(x), format='%m').strftime('%B'))
-            custom_start_date = st.sidebar.date_input(
-                "Select Start Date",
-                value=date.today(),
-                min_value=min_date,
-                max_value=max_date,
-                key="start_date_picker"
+
+            # === RADIO BUTTONS CENTERED BELOW CHART WITHOUT LABEL ===
+            col1, col2, col3 = st.columns([1, 3, 1])
+            with col2:
+                range_option = st.radio(
+                    "",  # Remove label
+                    ["1 Week", "1 Month", "3 Months", "6 Months", "1 Year", "3 Years", "5 Years", "Max"],
+                    horizontal=True,
+                    index=2
+                )
+
+            # === FILTER BASED ON SELECTION ===
+            today = pd.to_datetime("today")
+            if range_option == "1 Week":
+                start_date = today - pd.Timedelta(weeks=1)
+            elif range_option == "1 Month":
+                start_date = today - pd.DateOffset(months=1)
+            elif range_option == "3 Months":
+                start_date = today - pd.DateOffset(months=3)
+            elif range_option == "6 Months":
+                start_date = today - pd.DateOffset(months=6)
+            elif range_option == "1 Year":
+                start_date = today - pd.DateOffset(years=1)
+            elif range_option == "3 Years":
+                start_date = today - pd.DateOffset(years=3)
+            elif range_option == "5 Years":
+                start_date = today - pd.DateOffset(years=5)
+            else:
+                start_date = rollups["Daily"]["Collection Date"].min()
+
+            # Apply the filter (bucketed and LTTB-downsampled per vehicle)
+            trend_df, resolution = chart_data.chart_frame(rollups, start_date, today, "Collection Date", ["Amount"], by="Vehicle No")
+
+            # Rerender chart with filtered data
+            st.line_chart(trend_df, x="Collection Date", y="Value", color="Series")
+            hidden = trend_df.attrs["hidden_series"]
+            st.caption(f"{resolution} totals per vehicle"
+                       + (f" · {hidden} vehicles with the smallest totals not drawn" if hidden else ""))
+
+        render_collection_trend(df)
+
+        # Vehicle and date filters with the matching records; a filter change reruns only this fragment
+        @st.fragment
+        def render_collection_records(df):
+        # edit by ayush starts
+            # Vehicle filter
+            col1, col2, col3, col4 = st.columns(4)
+            #vehicle_list = ["All"] + sorted(df["Vehicle No"].unique())
+            #selected_vehicle = st.sidebar.selectbox("###🚗 Filter by Vehicle", vehicle_list)
+            selected_vehicle = col1.selectbox("🚗 Filter by Vehicle", ["All"] + sorted(df["Vehicle No"].unique()),key = "vehicle_select",)
+
+
+            # ensure date column is datetime
+            df = df.assign(**{"Collection Date": pd.to_datetime(df["Collection Date"], dayfirst=True, errors="coerce")})
+
+            #custom_year, custom_month = None, None
+            year_month_option = col2.selectbox(
+                "📅 Filter by Date",
+                ["All", "Current Month", "Last 6 Months", "Current Year", "Custom Date"],
+                key="range_select",
             )
 
-            if custom_start_date<max_date:
-                next_day = custom_start_date + timedelta(days=1)
-                custom_end_date = st.sidebar.date_input(
-                    "Select End Date",
-                    value=next_day,
-                    min_value=next_day,
+            custom_start_date, custom_end_date = None, None
+            if year_month_option == "Custom Date":
+                min_date = date(2024, 1, 1)
+                max_date = date.today()
+                #all_dates = sorted(filtered_df["Collection Date"].dt.date.dropna().unique().tolist())
+                #custom_start_date = st.sidebar.selectbox("Select Start Date" , [None] + all_dates,format_func=lambda d: "— Select start date —" if d is None else d.strftime("%d %b %Y"), key="start_date_select", index=0,)
+                #possible_end_dates = [d for d in all_dates if d > custom_start_date]
+                #years = sorted(pd.to_datetime(df["Collection Date"]).dt.year.unique())
+                #months = list(range(1,13))
+                #custom_year = st.sidebar.selectbox("Select Year", years)
+                #custom_month = st.sidebar.selectbox("Select Month", months, format_func=lambda x: pd.to_datetime(str(x), format='%m').strftime('%B'))
+                custom_start_date = col3.date_input(
+                    "Select Start Date",
+                    value=date.today(),
+                    min_value=min_date,
                     max_value=max_date,
-                    key="end_date_picker"
+                    key="start_date_picker"
                 )
 
+                if custom_start_date<max_date:
+                    next_day = custom_start_date + timedelta(days=1)
+                    custom_end_date = col4.date_input(
+                        "Select End Date",
+                        value=next_day,
+                        min_value=next_day,
+                        max_value=max_date,
+                        key="end_date_picker"
+                    )
+
+
+            today = pd.Timestamp.today().normalize()
+
+            # Filtered records, totals and cards for this filter combination,
+            # shared with every session that asks for the same one
+            def build_view():
+                # apply vehicle filter
+                if selected_vehicle != "All":
+                    filtered_df = df[df["Vehicle No"] == selected_vehicle].copy()
+                else:
+                    filtered_df = df.copy()
+
+                # apply year-month filter
+                if year_month_option == "Current Month":
+                    start_date = today.replace(day=1)
+                    filtered_df = filtered_df[filtered_df["Collection Date"] >= start_date]
+                elif year_month_option == "Last 6 Months":
+                    start_date = today - pd.DateOffset(months=6)
+                    filtered_df = filtered_df[filtered_df["Collection Date"] >= start_date]
+                elif year_month_option == "Current Year":
+                    start_date = today.replace(month=1, day=1)
+                    filtered_df = filtered_df[filtered_df["Collection Date"] >= start_date]
+                elif (year_month_option == "Custom Date" and isinstance(custom_start_date, date) and isinstance(custom_end_date, date)):
+                    filtered_df = filtered_df[
+                        (filtered_df["Collection Date"].dt.date >= custom_start_date)&
+                        (filtered_df["Collection Date"].dt.date <= custom_end_date)
+                    ]
+
+                collection_amount = filtered_df["Amount"].sum()
+
+                monthly_totals = filtered_df.groupby(pd.to_datetime(filtered_df["Collection Date"]).dt.to_period("M"))["Amount"].sum()
+                best_month = monthly_totals.idxmax().strftime('%B %Y') if not monthly_totals.empty else "N/A"
+                worst_month = monthly_totals.idxmin().strftime('%B %Y') if not monthly_totals.empty else "N/A"
+
+                Daily_Collection = (
+                    filtered_df.copy()
+                    .assign(**{"Collection Date": lambda x: pd.to_datetime(x["Collection Date"])})
+                    .sort_values("Collection Date", ascending=False)
+                )
 
-        today = pd.Timestamp.today().normalize()
-        # apply year-month filter
-        if year_month_option == "Current Month":
-            start_date = today.replace(day=1)
-            filtered_df = filtered_df[filtered_df["Collection Date"] >= start_date]
-        elif year_month_option == "Last 6 Months":
-            start_date = today - pd.DateOffset(months=6)
-            filtered_df = filtered_df[filtered_df["Collection Date"] >= start_date]
-        elif year_month_option == "Current Year":
-            start_date = today.replace(month=1, day=1)
-            filtered_df = filtered_df[filtered_df["Collection Date"] >= start_date]
-        elif (year_month_option == "Custom Date" and isinstance(custom_start_date, date) and isinstance(custom_end_date, date)):
-            filtered_df = filtered_df[
-                (filtered_df["Collection Date"].dt.date >= custom_start_date)&
-                (filtered_df["Collection Date"].dt.date <= custom_end_date)
-            ]
-        
+                Daily_Collection["Target"] = rent_targets.targets.lookup(Daily_Collection["Vehicle No"], Daily_Collection["Collection Date"])
 
-        
-    ## edit by ayush ends
-    
-        st.markdown("### 📈 Collection Trend")
-    
-        # Line chart with time range filter
-        chart_df = df.groupby(["Collection Date", "Vehicle No"])["Amount"].sum().reset_index()
-        chart_df["Collection Date"] = pd.to_datetime(chart_df["Collection Date"])
-        
-        
-        # === RADIO BUTTONS CENTERED BELOW CHART WITHOUT LABEL ===
-        col1, col2, col3 = st.columns([1, 3, 1])
-        with col2:
-            range_option = st.radio(
-                "",  # Remove label
-                ["1 Week", "1 Month", "3 Months", "6 Months", "1 Year", "3 Years", "5 Years", "Max"],
-                horizontal=True,
-                index=2
+                # Format for display
+                Daily_Collection["Collection Date"] = Daily_Collection["Collection Date"].dt.strftime("%d %b %Y")
+
+                cards_html = html_content
+                for index, row in Daily_Collection.iterrows():
+                    bg_style = get_background_style(row['Amount'], row['Target'])
+
+                    cards_html += f"""
+                    <div class="card" style="background: {bg_style}">
+                        <div class="vehicle-no">{row['Vehicle No']}</div>
+                        <div class="card-header">
+                            <div class="date">{row['Collection Date']}</div>
+                            <div class="meter-reading-header">{row['Meter Reading']} Km</div>
+                        </div>
+                        <div class="info-row">
+                            <div class="info-left">
+                                <div class="info-value">₹ {row['Amount']}</div>
+                                <div class="info-value">{row['Distance']} km</div>
+                            </div>
+                            <div class="info-right">
+                                <div class="info-value name">{row['Name']}</div>
+                            </div>
+                        </div>
+                    </div>
+                    """
+                cards_html += "</div>"
+
+                return {"amount": collection_amount, "best_month": best_month, "worst_month": worst_month,
+                        "cards_html": cards_html}
+
+            view = view_cache.views.get_or_compute(
+                "Collection Data", (dataset_version(df), rent_targets.targets.version),
+                (selected_vehicle, year_month_option, custom_start_date, custom_end_date, today), build_view,
             )
-        
-        # === FILTER BASED ON SELECTION ===
-        today = pd.to_datetime("today")
-        if range_option == "1 Week":
-            start_date = today - pd.Timedelta(weeks=1)
-        elif range_option == "1 Month":
-            start_date = today - pd.DateOffset(months=1)
-        elif range_option == "3 Months":
-            start_date = today - pd.DateOffset(months=3)
-        elif range_option == "6 Months":
-            start_date = today - pd.DateOffset(months=6)
-        elif range_option == "1 Year":
-            start_date = today - pd.DateOffset(years=1)
-        elif range_option == "3 Years":
-            start_date = today - pd.DateOffset(years=3)
-        elif range_option == "5 Years":
-            start_date = today - pd.DateOffset(years=5)
-        else:
-            start_date = chart_df["Collection Date"].min()
-        
-        # Apply the filter
-        filtered_chart_df = chart_df[chart_df["Collection Date"] >= start_date]
-        filtered_pivot = filtered_chart_df.pivot(index="Collection Date", columns="Vehicle No", values="Amount").fillna(0)
-        
-        # Rerender chart with filtered data
-        st.line_chart(filtered_pivot)
-## edit by ayush starts
+            collection_amount = view["amount"]
+            selected_vehicle_display= selected_vehicle if selected_vehicle != "All" else "All Vehicles"
 
-        
-        collection_amount = filtered_df["Amount"].sum()
-        selected_vehicle_display= selected_vehicle if selected_vehicle != "All" else "All Vehicles"
+            col1, col2 = st.columns(2)
+            col1.metric("🚐 Selected Vehicle", selected_vehicle_display)
+            col2.metric("💰 Collection Amount", f"₹{collection_amount:,.0f}")
 
-        monthly_totals = filtered_df.groupby(pd.to_datetime(filtered_df["Collection Date"]).dt.to_period("M"))["Amount"].sum()
-        best_month = monthly_totals.idxmax().strftime('%B %Y') if not monthly_totals.empty else "N/A"
-        worst_month = monthly_totals.idxmin().strftime('%B %Y') if not monthly_totals.empty else "N/A"
 
-        col1, col2 = st.columns(2)
-        col1.metric("🚐 Selected Vehicle", selected_vehicle_display)
-        col2.metric("💰 Collection Amount", f"₹{collection_amount:,.0f}")
-        
+            st.markdown("---")
+    ### edit by ayush ends
 
-        st.markdown("---")
-### edit by ayush ends
-        
-        st.markdown("### 📄 Collection Records")
-    
-        # Columns to show
-        display_cols = ["Collection Date", "Vehicle No", "Amount", "Meter Reading", "Name", "Distance"]
-    
-        # Round distance
-        df["Distance"] = df["Distance"].round(2)
+            st.markdown("### 📄 Collection Records")
 
-        Daily_Collection = (
-            filtered_df.copy()
-            .assign(**{"Collection Date": lambda x: pd.to_datetime(x["Collection Date"])})
-            .sort_values("Collection Date", ascending=False)
-        )
+            # Columns to show
+            display_cols = ["Collection Date", "Vehicle No", "Amount", "Meter Reading", "Name", "Distance"]
 
-        # Format for display
-        Daily_Collection["Collection Date"] = Daily_Collection["Collection Date"].dt.strftime("%d %b %Y")
+            # Round distance
+            df = df.assign(Distance=df["Distance"].round(2))
 
-        for index, row in Daily_Collection.iterrows():
-            bg_style = get_background_style(row['Amount'])
-            
-            html_content += f"""
-            <div class="card" style="background: {bg_style}">
-                <div class="vehicle-no">{row['Vehicle No']}</div>
-                <div class="card-header">
-                    <div class="date">{row['Collection Date']}</div>
-                    <div class="meter-reading-header">{row['Meter Reading']} Km</div>
-                </div>
-                <div class="info-row">
-                    <div class="info-left">
-                        <div class="info-value">₹ {row['Amount']}</div>
-                        <div class="info-value">{row['Distance']} km</div>
-                    </div>
-                    <div class="info-right">
-                        <div class="info-value name">{row['Name']}</div>
-                    </div>
-                </div>
-            </div>
-            """
-        html_content += "</div>"
+            # Render HTML
+            components.html(view["cards_html"], height=600, scrolling=True)
+
+        render_collection_records(df)
 
-        # Render HTML
-        components.html(html_content, height=600, scrolling=True)
 
 
     elif page == "Bank Transaction":
@@ -1531,11 +1766,14 @@ else:
                 unsafe_allow_html=True
             )
     
-        # Ensure 'Date' is datetime
-        bank_df["Date"] = pd.to_datetime(bank_df["Date"], dayfirst=True, errors="coerce")
-        bank_df["Transaction Type"] = bank_df["Transaction Type"].str.strip()
-        bank_df["Month"] = bank_df["Date"].dt.strftime("%B")
-        bank_df["Year"] = bank_df["Date"].dt.year
+        # Ensure 'Date' is datetime (on a copy: the loaded frame is shared)
+        bank_dates = pd.to_datetime(bank_df["Date"], dayfirst=True, errors="coerce")
+        bank_df = bank_df.assign(
+            Date=bank_dates,
+            **{"Transaction Type": bank_df["Transaction Type"].str.strip()},
+            Month=bank_dates.dt.strftime("%B"),
+            Year=bank_dates.dt.year,
+        )
     
         # 🔒 Full data copy for current balance
         full_df = bank_df.copy()
@@ -1548,272 +1786,914 @@ else:
         total_debit = full_df.loc[debit_mask_full, "Amount"].sum()
         balance = total_credit - total_debit
     
-        # 📌 Sidebar Filters
-        st.sidebar.header("📅 Filter Transactions")
-    
-    ## edit by ayush
-        filtered_df = bank_df.copy()
-        filter_option = st.sidebar.selectbox("Choose filter type:", ["All", "Last 3 Months", "Select Date"],key="range_select",)
-
-        start_date, end_date = None, None
-        if filter_option == "Select Date":
-            min_date= date(2025, 1, 1)
-            max_date= date.today()
-            start_date= st.sidebar.date_input(
-                "Select Start Date",
-                value = date.today(),
-                min_value= min_date,
-                max_value= max_date,
-                key="start_date_picker"
-            )
-            if start_date < max_date:
-                next_day= start_date + timedelta(days=1)
-                end_date = st.sidebar.date_input(
-                    "Select End Date",
-                    value=next_day,
-                    min_value=next_day,
-                    max_value=max_date,
-                    key="end_date_picker"
-                )
-        today = pd.Timestamp.today().normalize()
-
-
-        if filter_option == "All":
-            filtered_df = bank_df
-        elif filter_option == "Last 3 Months":
-            last_3_months = pd.Timestamp.today() - pd.DateOffset(months=3)
-            filtered_df = bank_df[bank_df["Date"] >= last_3_months]
-        elif filter_option == "Select Date" and isinstance(start_date, date) and isinstance(end_date, date):
-            #selected_year = st.sidebar.selectbox("Year", sorted(bank_df["Year"].unique(), reverse=True))
-            #selected_month = st.sidebar.selectbox("Month", sorted(bank_df["Month"].unique(), key=lambda x: pd.to_datetime(x, format="%B").month))
-            date_filtered = bank_df[
-                (bank_df["Date"].dt.date >= start_date) &
-                (bank_df["Date"].dt.date <= end_date)
-            ]
-            filtered_df = date_filtered.copy()
-    ## edit by ayush
-
         # 💰 Current Balance (Always from full data)
         st.subheader("💰 Current Bank Balance")
         st.metric(label="Available Balance", value=f"₹ {balance:,.0f}", delta=f"₹ {total_credit - total_debit:,.0f}")
     
-        # 📌 Closing Balance of Filtered Data
-        st.subheader("📉 Closing Balance for Selected Period")
-        credit_mask = filtered_df["Transaction Type"].str.lower().str.contains("credit", na=False)
-        debit_mask = filtered_df["Transaction Type"].str.lower().str.contains("debit", na=False)
-        closing_credit = filtered_df.loc[credit_mask, "Amount"].sum()
-        closing_debit = filtered_df.loc[debit_mask, "Amount"].sum()
-        closing_balance = closing_credit - closing_debit
-        st.metric(label="Closing Balance (Filtered)", value=f"₹ {closing_balance:,.0f}")
-    
-        # 📊 Monthly Summary (From filtered data)
-        st.subheader("📊 Monthly Transaction Summary")
-        monthly_summary = (
-            filtered_df.groupby(["Month", "Transaction Type"])["Amount"]
-            .sum()
-            .unstack(fill_value=0)
-            .reset_index()
-        )
-        st.dataframe(monthly_summary)
-    
-        # 📋 Full Transaction Log
-        st.subheader("📋 Full Bank Transaction Log")
-    
-        display_df = filtered_df[["Date", "Transaction By", "Transaction Type", "Reason", "Amount", "Bill"]].copy()
-
-
-        #def format_amount(row):
-        #    amt = row["Amount"]
-        #    if "credit" in row["Transaction Type"].lower():
-        #        return f"+₹{amt:,.0f}"
-        #    elif "debit" in row["Transaction Type"].lower():
-        #        return f"-₹{amt:,.0f}"
-        #    return f"₹{amt:,.0f}"
-        #display_df["Amount"] = filtered_df.apply(format_amount, axis=1)
-
-        def format_amount(row):
-            amt = pd.to_numeric(row.get("Amount", 0), errors="coerce")
-            if pd.isna(amt):
-                amt = 0
-            t = str(row.get("Transaction Type", "")).lower()
-            if "credit" in t:
-                return f"+₹{amt:,.0f}"
-            elif "debit" in t:
-                return f"-₹{amt:,.0f}"
-            return f"₹{amt:,.0f}"
-        
-    
+        # Filters and the filtered summary, log and export; a filter change reruns only this fragment
+        @st.fragment
+        def render_bank_transactions(bank_df):
+            # 📌 Filters
+            st.header("📅 Filter Transactions")
+            col1, col2, col3 = st.columns(3)
+
+        ## edit by ayush
+            filter_option = col1.selectbox("Choose filter type:", ["All", "Last 3 Months", "Select Date"],key="range_select",)
+
+            start_date, end_date = None, None
+            if filter_option == "Select Date":
+                min_date= date(2025, 1, 1)
+                max_date= date.today()
+                start_date= col2.date_input(
+                    "Select Start Date",
+                    value = date.today(),
+                    min_value= min_date,
+                    max_value= max_date,
+                    key="start_date_picker"
+                )
+                if start_date < max_date:
+                    next_day= start_date + timedelta(days=1)
+                    end_date = col3.date_input(
+                        "Select End Date",
+                        value=next_day,
+                        min_value=next_day,
+                        max_value=max_date,
+                        key="end_date_picker"
+                    )
+            today = pd.Timestamp.today().normalize()
+
+
+            # Filtered rows, balance, monthly summary and rendered log for this
+            # filter, shared with every session that asks for the same one
+            def build_view():
+                filtered_df = bank_df.copy()
+                if filter_option == "All":
+                    filtered_df = bank_df
+                elif filter_option == "Last 3 Months":
+                    last_3_months = pd.Timestamp.today() - pd.DateOffset(months=3)
+                    filtered_df = bank_df[bank_df["Date"] >= last_3_months]
+                elif filter_option == "Select Date" and isinstance(start_date, date) and isinstance(end_date, date):
+                    #selected_year = st.sidebar.selectbox("Year", sorted(bank_df["Year"].unique(), reverse=True))
+                    #selected_month = st.sidebar.selectbox("Month", sorted(bank_df["Month"].unique(), key=lambda x: pd.to_datetime(x, format="%B").month))
+                    date_filtered = bank_df[
+                        (bank_df["Date"].dt.date >= start_date) &
+                        (bank_df["Date"].dt.date <= end_date)
+                    ]
+                    filtered_df = date_filtered.copy()
+
+                credit_mask = filtered_df["Transaction Type"].str.lower().str.contains("credit", na=False)
+                debit_mask = filtered_df["Transaction Type"].str.lower().str.contains("debit", na=False)
+                closing_credit = filtered_df.loc[credit_mask, "Amount"].sum()
+                closing_debit = filtered_df.loc[debit_mask, "Amount"].sum()
+
+                monthly_summary = (
+                    filtered_df.groupby(["Month", "Transaction Type"])["Amount"]
+                    .sum()
+                    .unstack(fill_value=0)
+                    .reset_index()
+                )
 
-        if not display_df.empty:
-            display_df["Amount"] = display_df.apply(format_amount, axis=1)
-        else:
-            display_df["Amount"] = pd.Series(dtype="object")
-        
-        if "Bill" in display_df.columns:
-            display_df["Bill"] = display_df["Bill"].apply(
-                lambda x: f'<a href="{x}" target="_blank">View Bill</a>' if pd.notna(x) and str(x).startswith("http") else ""
+                display_df = filtered_df[["Date", "Transaction By", "Transaction Type", "Reason", "Amount", "Bill"]].copy()
+
+
+                #def format_amount(row):
+                #    amt = row["Amount"]
+                #    if "credit" in row["Transaction Type"].lower():
+                #        return f"+₹{amt:,.0f}"
+                #    elif "debit" in row["Transaction Type"].lower():
+                #        return f"-₹{amt:,.0f}"
+                #    return f"₹{amt:,.0f}"
+                #display_df["Amount"] = filtered_df.apply(format_amount, axis=1)
+
+                def format_amount(row):
+                    amt = pd.to_numeric(row.get("Amount", 0), errors="coerce")
+                    if pd.isna(amt):
+                        amt = 0
+                    t = str(row.get("Transaction Type", "")).lower()
+                    if "credit" in t:
+                        return f"+₹{amt:,.0f}"
+                    elif "debit" in t:
+                        return f"-₹{amt:,.0f}"
+                    return f"₹{amt:,.0f}"
+
+                if not display_df.empty:
+                    display_df["Amount"] = display_df.apply(format_amount, axis=1)
+                else:
+                    display_df["Amount"] = pd.Series(dtype="object")
+
+                if "Bill" in display_df.columns:
+                    display_df["Bill"] = display_df["Bill"].apply(
+                        lambda x: f'<a href="{x}" target="_blank">View Bill</a>' if pd.notna(x) and str(x).startswith("http") else ""
+                    )
+
+                def color_amount(val):
+                    if isinstance(val, str):
+                        if val.startswith("+"):
+                            return "color: green"
+                        elif val.startswith("-"):
+                            return "color: red"
+                    return ""
+
+                styled = display_df[["Date", "Transaction By", "Transaction Type", "Reason", "Amount", "Bill"]].sort_values(by="Date", ascending=False)
+                styled_df = styled.style.applymap(color_amount, subset=["Amount"])
+
+                return {
+                    "closing_balance": closing_credit - closing_debit,
+                    "monthly_summary": monthly_summary,
+                    "table_html": styled_df.to_html(escape=False, index=False),
+                    "csv": filtered_df.to_csv(index=False),
+                }
+
+            view = view_cache.views.get_or_compute(
+                "Bank Transaction", dataset_version(bank_df), (filter_option, start_date, end_date, today), build_view,
             )
-    
-        def color_amount(val):
-            if isinstance(val, str):
-                if val.startswith("+"):
-                    return "color: green"
-                elif val.startswith("-"):
-                    return "color: red"
-            return ""
-    
-        styled = display_df[["Date", "Transaction By", "Transaction Type", "Reason", "Amount", "Bill"]].sort_values(by="Date", ascending=False)
-        styled_df = styled.style.applymap(color_amount, subset=["Amount"])
 
-    
-        # 💡 Full Width Styling for Table
-        st.markdown(
-            """
-            <style>
-                .full-width-table {
-                    width: 100%;
-                    overflow-x: auto;
-                }
-            </style>
-            """,
-            unsafe_allow_html=True
-        )
-    
-        # ✅ Render styled DataFrame with clickable links and full width
-        st.markdown(
-            f'<div class="full-width-table">{styled_df.to_html(escape=False, index=False)}</div>',
-            unsafe_allow_html=True
-        )
-    
-        # ⬇️ Export Filtered Data
-        st.download_button(
-            label="📥 Download Filtered Transactions as CSV",
-            data=filtered_df.to_csv(index=False),
-            file_name="filtered_bank_transactions.csv",
-            mime="text/csv"
-        )
+            # 📌 Closing Balance of Filtered Data
+            st.subheader("📉 Closing Balance for Selected Period")
+            st.metric(label="Closing Balance (Filtered)", value=f"₹ {view['closing_balance']:,.0f}")
+
+            # 📊 Monthly Summary (From filtered data)
+            st.subheader("📊 Monthly Transaction Summary")
+            st.dataframe(view["monthly_summary"])
+
+            # 📋 Full Transaction Log
+            st.subheader("📋 Full Bank Transaction Log")
+
+            # 💡 Full Width Styling for Table
+            st.markdown(
+                """
+                <style>
+                    .full-width-table {
+                        width: 100%;
+                        overflow-x: auto;
+                    }
+                </style>
+                """,
+                unsafe_allow_html=True
+            )
+
+            # ✅ Render styled DataFrame with clickable links and full width
+            st.markdown(
+                f'<div class="full-width-table">{view["table_html"]}</div>',
+                unsafe_allow_html=True
+            )
+
+            # ⬇️ Export Filtered Data
+            st.download_button(
+                label="📥 Download Filtered Transactions as CSV",
+                data=view["csv"],
+                file_name="filtered_bank_transactions.csv",
+                mime="text/csv"
+            )
+
+        render_bank_transactions(bank_df)
+
 
     
 
     elif page == "Performance":
         st.title("📉 Performance Analysis")
 
+        perf_df_lm = get_loss_matrix(dataset_version(df), rent_targets.targets.version, perf_df)
+
         if "Amount" not in perf_df_lm.columns:
             perf_df_lm["Amount"] = pd.Series(dtype=float)
         
-        #filtered_df_lm = apply_loss_matrix_logic(filtered_df)
-    # ---------- Vehicle , Driver Filter ----------
-        st.sidebar.markdown("### 🚗 Filter by Vehicle")
-        selected_vehicle = st.sidebar.selectbox(
-            "",
-            ["All"] + sorted(perf_df["Vehicle No"].dropna().astype(str).unique()),
-            key="Vehicle_select"
-        )
+        #filtered_df_lm = rent_targets.loss_matrix(filtered_df)
+    # ---------- All-time losses ----------
+        all_total_loss = kpis.total("loss_total")
+        all_company_loss = kpis.total("loss_company")
+        all_driver_loss = all_total_loss - all_company_loss
 
-        st.sidebar.markdown("### 👨‍✈️ Filter by Driver")
-        selected_driver = st.sidebar.selectbox(
-            "",
-            ["All"] + sorted(perf_df["Name"].dropna().astype(str).unique()),
-            key="Driver_select"
-        )
+        col0, col1, col2 = st.columns(3)
+        col0.metric("All-time Total Loss", f"{all_total_loss:,.0f}")
+        col1.metric("All-time Driver Loss", f"{all_driver_loss:,.0f}")
+        col2.metric("All-time Company Loss", f"{all_company_loss:,.0f}")
 
-        filtered_df_lm = perf_df_lm.copy()
-        if selected_vehicle != "All":
-            filtered_df_lm = filtered_df_lm[filtered_df_lm["Vehicle No"] == selected_vehicle]
-        if selected_driver != "All":
-            filtered_df_lm = filtered_df_lm[filtered_df_lm["Name"] == selected_driver]
-
-    # ----------  Date Filter ----------
-        st.sidebar.markdown("### 📅 Filter by Date")
-        year_month_option = st.sidebar.selectbox(
-            "",
-            ["All", "Current Month", "Last 6 Months", "Current Year", "Custom Date"],
-            key="range_select",
-        )
-        
-        start_date, end_date = None, None
-        custom_start_date, custom_end_date = None, None
-
-        if year_month_option == "All":
-            pass
-        elif year_month_option == "Current Month":
-            start_date = today.replace(day=1)
-            end_date = today
-        elif year_month_option == "Last 6 Months":
-            start_date = today - pd.DateOffset(months=6)
-            end_date = today
-        elif year_month_option == "Current Year":
-            start_date = today.replace(month=1, day=1)
-            end_date = today
-
-        if year_month_option == "Custom Date":
-            min_date = date(2024, 1, 1)
-            max_date = date.today()
-            custom_start_date = st.sidebar.date_input(
-                "Select start Date",
-                value=date.today(),
-                min_value=min_date,
-                max_value=max_date,
-                key="start_date_picker"
+        st.markdown("---")
+
+        # Vehicle, driver and date filters with the filtered losses; a filter change reruns only this fragment
+        @st.fragment
+        def render_performance_details(perf_df, perf_df_lm):
+        # ---------- Vehicle , Driver Filter ----------
+            col1, col2, col3, col4, col5 = st.columns(5)
+            selected_vehicle = col1.selectbox(
+                "🚗 Filter by Vehicle",
+                ["All"] + sorted(perf_df["Vehicle No"].dropna().astype(str).unique()),
+                key="Vehicle_select"
             )
-            default_end_date = custom_start_date
-            if custom_start_date < max_date:
-                default_end_date = min(custom_start_date + timedelta(days=1), max_date)
-            custom_end_date = st.sidebar.date_input(
-                "Select End Date",
-                value=default_end_date,
-                min_value=custom_start_date,
-                max_value=max_date,
-                key="end_date_picker"
+
+            selected_driver = col2.selectbox(
+                "👨‍✈️ Filter by Driver",
+                ["All"] + sorted(perf_df["Name"].dropna().astype(str).unique()),
+                key="Driver_select"
             )
-            start_date = pd.Timestamp(custom_start_date)
-            end_date = pd.Timestamp(custom_end_date)
 
-        if start_date is not None and end_date is not None:
-            filtered_df_lm = filtered_df_lm[
-                (filtered_df_lm["Collection Date"] >= start_date) &
-                (filtered_df_lm["Collection Date"] <= end_date)
-            ]
+        # ----------  Date Filter ----------
+            year_month_option = col3.selectbox(
+                "📅 Filter by Date",
+                ["All", "Current Month", "Last 6 Months", "Current Year", "Custom Date"],
+                key="range_select",
+            )
 
-    # ---------- Calculate losses ----------
-        all_total_loss = perf_df_lm["Amount"].sum()
-        all_company_loss = perf_df_lm.loc[perf_df_lm["Name"] == "Zero Collection", "Amount"].sum()
-        all_driver_loss = all_total_loss - all_company_loss
+            today = pd.Timestamp.today().normalize()
+            start_date, end_date = None, None
+            custom_start_date, custom_end_date = None, None
+
+            if year_month_option == "All":
+                pass
+            elif year_month_option == "Current Month":
+                start_date = today.replace(day=1)
+                end_date = today
+            elif year_month_option == "Last 6 Months":
+                start_date = today - pd.DateOffset(months=6)
+                end_date = today
+            elif year_month_option == "Current Year":
+                start_date = today.replace(month=1, day=1)
+                end_date = today
+
+            if year_month_option == "Custom Date":
+                min_date = date(2024, 1, 1)
+                max_date = date.today()
+                custom_start_date = col4.date_input(
+                    "Select start Date",
+                    value=date.today(),
+                    min_value=min_date,
+                    max_value=max_date,
+                    key="start_date_picker"
+                )
+                default_end_date = custom_start_date
+                if custom_start_date < max_date:
+                    default_end_date = min(custom_start_date + timedelta(days=1), max_date)
+                custom_end_date = col5.date_input(
+                    "Select End Date",
+                    value=default_end_date,
+                    min_value=custom_start_date,
+                    max_value=max_date,
+                    key="end_date_picker"
+                )
+                start_date = pd.Timestamp(custom_start_date)
+                end_date = pd.Timestamp(custom_end_date)
+
+            # Filtered loss matrix and its losses for this filter combination,
+            # shared with every session that asks for the same one
+            def build_view():
+                filtered_df_lm = perf_df_lm.copy()
+                if selected_vehicle != "All":
+                    filtered_df_lm = filtered_df_lm[filtered_df_lm["Vehicle No"] == selected_vehicle]
+                if selected_driver != "All":
+                    filtered_df_lm = filtered_df_lm[filtered_df_lm["Name"] == selected_driver]
+
+                if start_date is not None and end_date is not None:
+                    filtered_df_lm = filtered_df_lm[
+                        (filtered_df_lm["Collection Date"] >= start_date) &
+                        (filtered_df_lm["Collection Date"] <= end_date)
+                    ]
+
+            # ---------- Calculate losses ----------
+                f_total_loss = filtered_df_lm["Amount"].sum() if "Amount" in filtered_df_lm.columns else 0
+                f_company_loss = filtered_df_lm.loc[filtered_df_lm.get("Name") == "Zero Collection", "Amount"].sum() if "Amount" in filtered_df_lm.columns else 0
+
+                return {
+                    "total_loss": f_total_loss,
+                    "company_loss": f_company_loss,
+                    "table": filtered_df_lm.sort_values(by="Collection Date", ascending=False),
+                }
+
+            view = view_cache.views.get_or_compute(
+                "Performance", (dataset_version(perf_df), rent_targets.targets.version),
+                (selected_vehicle, selected_driver, start_date, end_date), build_view,
+            )
+            f_total_loss = view["total_loss"]
+            f_company_loss = view["company_loss"]
+            f_driver_loss = f_total_loss - f_company_loss
 
-        f_total_loss = filtered_df_lm["Amount"].sum() if "Amount" in filtered_df_lm.columns else 0
-        f_company_loss = filtered_df_lm.loc[filtered_df_lm.get("Name") == "Zero Collection", "Amount"].sum() if "Amount" in filtered_df_lm.columns else 0
-        f_driver_loss = f_total_loss - f_company_loss
+            #current_total_loss, current_driver_loss, current_company_loss = calculate_current_month_losses(perf_df_lm)
 
 
+        # ---------- Metrics ----------
+            col0, col1, col2 = st.columns(3)
+            col0.metric("Filtered Total Loss", f"{f_total_loss:,.0f}")
+            col1.metric("Filtered Driver Loss", f"{f_driver_loss:,.0f}")
+            col2.metric("Filtered Company Loss", f"{f_company_loss:,.0f}")
 
-        #current_total_loss, current_driver_loss, current_company_loss = calculate_current_month_losses(perf_df_lm)
+        # ---------- Table ----------
+            st.subheader("📉 Loss Matrix (Filtered)")
+            if view["table"].empty:
+                st.info("No records in this period.")
+            else:
+                st.dataframe(
+                    view["table"],
+                    use_container_width=True
+                )
+
+        render_performance_details(perf_df, perf_df_lm)
+
+
+
+    elif page == "Driver Scorecard":
+        st.title("🏅 Driver Scorecard")
+
+        as_of = pd.Timestamp.today().normalize()
+        perf_df_lm = get_loss_matrix(dataset_version(df), rent_targets.targets.version, perf_df)
+        scorecard = get_driver_scorecard(dataset_version(df), rent_targets.targets.version, as_of, perf_df, perf_df_lm)
+
+        if scorecard.empty:
+            st.info("No driver records yet.")
+        else:
+            # ---------- Fleet metrics ----------
+            fleet_target = scorecard["Rent Due"].sum()
+            fleet_loss_rate = scorecard["Driver Loss"].sum() / fleet_target * 100 if fleet_target else 0
+
+            col1, col2, col3, col4 = st.columns(4)
+            col1.metric("👨‍✈️ Drivers", len(scorecard))
+            col2.metric("🟢 Active in Last 7 Days", int((scorecard["Last 7d Collection"] > 0).sum()))
+            col3.metric("📉 Driver Loss Rate", f"{fleet_loss_rate:,.1f}%")
+            col4.metric("🛑 On a Zero Streak", int((scorecard["Current Zero Streak"] > 0).sum()))
+
+            st.markdown("---")
+
+            # Ranking controls, top-k table and chart; a control change reruns only this fragment
+            @st.fragment
+            def render_driver_ranking(scorecard, as_of):
+                # ---------- Ranking controls ----------
+                rank_options = [
+                    "Last 7d Collection", "Last 30d Collection", "Last 90d Collection",
+                    "Total Collection", "Avg per Day", "Days Active",
+                    "Loss Rate (%)", "Longest Zero Streak", "Current Zero Streak",
+                ]
+                col1, col2, col3 = st.columns(3)
+                rank_by = col1.selectbox("🏆 Rank Drivers By", rank_options, key="scorecard_rank")
+                order = col2.radio("Order", ["Highest first", "Lowest first"], horizontal=True, key="scorecard_order")
+                top_n = col3.slider("🔢 Show Top N Drivers", min_value=3, max_value=30, value=10, key="scorecard_top_n")
+
+                # ---------- Top-k table ----------
+                top_df = driver_analytics.top_k(scorecard, rank_by, top_n, largest=(order == "Highest first"))
+                st.subheader(f"📊 Top {top_n} Drivers by {rank_by}")
+                st.caption(f"Rolling windows as of {as_of:%d %b %Y} · loss rate against each vehicle-day's rent target")
+                st.dataframe(top_df.style.format({
+                    "Last 7d Collection": "₹{:,.0f}",
+                    "Last 30d Collection": "₹{:,.0f}",
+                    "Last 90d Collection": "₹{:,.0f}",
+                    "Total Collection": "₹{:,.0f}",
+                    "Avg per Day": "₹{:,.0f}",
+                    "Driver Loss": "₹{:,.0f}",
+                    "Rent Due": "₹{:,.0f}",
+                    "Loss Rate (%)": "{:.1f}%",
+                }), use_container_width=True, hide_index=True)
+
+                st.bar_chart(top_df.set_index("Name")[rank_by])
+
+            render_driver_ranking(scorecard, as_of)
+
+            csv_scorecard = scorecard.to_csv(index=False).encode("utf-8")
+            st.download_button("⬇️ Download Driver Scorecard", data=csv_scorecard, file_name="driver_scorecard.csv", mime="text/csv")
+
+
+    elif page == "Fleet Utilization":
+        st.title("🗓️ Fleet Utilization")
+
+        index = get_presence_index(dataset_version(df), df)
+        if index.day0 is None:
+            st.info("No collection records yet.")
+        else:
+            last_day = date.fromordinal(index.day0 + index.n_days - 1)
+
+            # Window and heatmap controls with everything they drive; a change reruns only this fragment
+            @st.fragment
+            def render_utilization(index, last_day):
+                # ---------- Range ----------
+                col1, col2, col3, col4 = st.columns(4)
+                window_option = col1.selectbox(
+                    "📅 Utilization Window",
+                    ["Last 30 Days", "Current Month", "Last 3 Months", "Custom Date"],
+                    key="util_range_select",
+                )
+                end_day = date.today()
+                if window_option == "Current Month":
+                    start_day = end_day.replace(day=1)
+                elif window_option == "Last 3 Months":
+                    start_day = (pd.Timestamp(end_day) - pd.DateOffset(months=3)).date()
+                elif window_option == "Custom Date":
+                    start_day = col2.date_input("Select Start Date", value=end_day - timedelta(days=30),
+                                                max_value=end_day, key="util_start_date_picker")
+                    end_day = col3.date_input("Select End Date", value=end_day, min_value=start_day,
+                                              max_value=date.today(), key="util_end_date_picker")
+                else:
+                    start_day = end_day - timedelta(days=29)
+
+                heat_metric = col4.radio("🔥 Heatmap Shows", ["Collected", "Amount"], key="util_metric")
+
+                # ---------- Fleet metrics (O(1) range reductions per vehicle) ----------
+                summary = index.range_summary(start_day, end_day)
+                active_today = index.active_vehicles(min(end_day, last_day))
+
+                col1, col2, col3, col4 = st.columns(4)
+                col1.metric("🚐 Vehicles", len(summary))
+                col2.metric("📈 Fleet Utilization", f"{summary['Utilization (%)'].mean():,.1f}%")
+                col3.metric("😴 Idle Vehicle-Days", f"{int(summary['Idle Days'].sum()):,}")
+                col4.metric(f"🟢 Active on {min(end_day, last_day):%d %b}", len(active_today))
+
+                st.markdown("---")
+
+                # ---------- Heatmap ----------
+                import altair as alt
+
+                heat_df = index.heatmap_frame(start_day, end_day)
+                color = (
+                    alt.Color("Collected:N", scale=alt.Scale(domain=[False, True], range=["#fc0324", "#00994C"]))
+                    if heat_metric == "Collected"
+                    else alt.Color("Amount:Q", scale=alt.Scale(scheme="greens"))
+                )
+                heatmap = alt.Chart(heat_df).mark_rect().encode(
+                    x=alt.X("yearmonthdate(Date):O", title="Date"),
+                    y=alt.Y("Vehicle No:N", title="Vehicle"),
+                    color=color,
+                    tooltip=["Vehicle No", alt.Tooltip("Date:T", format="%d %b %Y"), "Collected", "Amount"],
+                )
+                st.altair_chart(heatmap, use_container_width=True)
+
+                # ---------- Per-vehicle table ----------
+                st.subheader("📋 Utilization by Vehicle")
+                st.dataframe(summary.sort_values("Utilization (%)").style.format({
+                    "Collection": "₹{:,.0f}",
+                    "Utilization (%)": "{:.1f}%",
+                }), use_container_width=True, hide_index=True)
+
+            render_utilization(index, last_day)
+
+            # Single vehicle-day lookup; a change reruns only this fragment
+            @st.fragment
+            def render_lookup(index, assignment_index, last_day):
+                # ---------- Point lookup ----------
+                st.subheader("🔎 Quick Lookup")
+                col1, col2 = st.columns(2)
+                lookup_vehicle = col1.selectbox("Vehicle", sorted(index.vehicles), key="util_lookup_vehicle")
+                lookup_day = col2.date_input("Date", value=min(date.today(), last_day), key="util_lookup_date")
+                if index.was_collected(lookup_vehicle, lookup_day):
+                    st.success(f"✅ {lookup_vehicle} was collected on {lookup_day:%d %b %Y}")
+                else:
+                    st.warning(f"❌ No collection for {lookup_vehicle} on {lookup_day:%d %b %Y}")
+                holder = assignment_index.holder(lookup_vehicle, lookup_day, covering_only=False)
+                if holder is not None:
+                    st.caption(f"🧑‍✈️ Assigned to {holder} (last driver on or before {lookup_day:%d %b %Y})")
+
+            assignment_index = get_assignment_index(dataset_version(df), df)
+            render_lookup(index, assignment_index, last_day)
+
+            # Assignment timeline and per-driver history; a change reruns only this fragment
+            @st.fragment
+            def render_assignments(assignment_index, last_day):
+                import altair as alt
+
+                st.markdown("---")
+                st.subheader("🧑‍✈️ Assignment Timeline")
+                st.caption("Who held each vehicle: consecutive collection entries of a vehicle by the same driver form one assignment.")
+
+                col1, col2 = st.columns(2)
+                timeline_start = col1.date_input("From", value=last_day - timedelta(days=59), max_value=last_day,
+                                                 key="assign_start")
+                timeline_end = col2.date_input("To", value=last_day, min_value=timeline_start, key="assign_end")
+                timeline = assignment_index.intervals(timeline_start, timeline_end)
+                if timeline.empty:
+                    st.info("No assignments in this window.")
+                else:
+                    # Clip to the window and draw each run through its last day
+                    timeline["From"] = pd.to_datetime(timeline["Start"]).clip(lower=pd.Timestamp(timeline_start))
+                    timeline["To"] = pd.to_datetime(timeline["End"]).clip(upper=pd.Timestamp(timeline_end)) + pd.Timedelta(days=1)
+                    gantt = alt.Chart(timeline).mark_bar().encode(
+                        x=alt.X("From:T", title="Date"),
+                        x2="To:T",
+                        y=alt.Y("Vehicle No:N", title="Vehicle"),
+                        color=alt.Color("Driver:N", legend=alt.Legend(columns=2)),
+                        tooltip=["Vehicle No", "Driver", alt.Tooltip("Start:T", format="%d %b %Y"),
+                                 alt.Tooltip("End:T", format="%d %b %Y"), "Days", alt.Tooltip("Amount:Q", format=",.0f")],
+                    )
+                    st.altair_chart(gantt, use_container_width=True)
+
+                # ---------- Driver history ----------
+                st.subheader("🚐 Vehicles Held by Driver")
+                driver = st.selectbox("Driver", assignments.drivers(assignment_index), key="assign_driver")
+                held = assignment_index.driver_intervals(driver) if driver else assignment_index.frame([])
+                if held.empty:
+                    st.info("No assignments for this driver.")
+                else:
+                    col1, col2, col3 = st.columns(3)
+                    col1.metric("🚐 Vehicles", held["Vehicle No"].nunique())
+                    col2.metric("📅 Days", f"{int(held['Days'].sum()):,}")
+                    col3.metric("💰 Collected", f"₹{held['Amount'].sum():,.0f}")
+                    st.dataframe(held.sort_values("Start", ascending=False).style.format({"Amount": "₹{:,.0f}"}),
+                                 use_container_width=True, hide_index=True)
+
+            render_assignments(assignment_index, last_day)
 
 
-    # ---------- Metrics ----------
-        col0, col1, col2 = st.columns(3)
-        col0.metric("All-time Total Loss", f"{all_total_loss:,.0f}")
-        col1.metric("All-time Driver Loss", f"{all_driver_loss:,.0f}")
-        col2.metric("All-time Company Loss", f"{all_company_loss:,.0f}")
+
+    elif page == "Vehicle P&L":
+        st.title("🚐 Vehicle Profit & Loss")
+        st.caption("Collections, sheet expenses and bank expense debits per vehicle and month. "
+                   f"Bank debits are booked to a vehicle when their reason names it; the rest show as {vehicle_pnl.UNALLOCATED}.")
+
+        perf_df_lm = get_loss_matrix(dataset_version(df), rent_targets.targets.version, perf_df)
+        cube = get_vehicle_pnl(data_version(df, expense_df, bank_df), rent_targets.targets.version, df, expense_df, bank_df, perf_df_lm)
+
+        if cube.empty:
+            st.info("No collection or expense records yet.")
+        else:
+            pnl_format = {
+                "Collection": "₹{:,.0f}", "Target": "₹{:,.0f}", "Loss vs Target": "₹{:,.0f}",
+                "Expenses": "₹{:,.0f}", "Bank Expense Debits": "₹{:,.0f}", "Total Cost": "₹{:,.0f}",
+                "Net": "₹{:,.0f}", "Distance": "{:,.0f} km", "Revenue per km": "₹{:,.2f}", "Cost per km": "₹{:,.2f}",
+            }
+
+            # Month range, fleet table and vehicle drill-down; a change reruns only this fragment
+            @st.fragment
+            def render_vehicle_pnl(cube):
+                # ---------- Month range ----------
+                months = sorted(cube["Month-Year"].unique())
+                start, end = st.select_slider("📅 Months", options=months, value=(months[max(0, len(months) - 12)], months[-1]),
+                                              key="pnl_months")
+                fleet = vehicle_pnl.by_vehicle(cube, start, end)
+                totals = vehicle_pnl.add_ratios(fleet[vehicle_pnl.MEASURES].sum().to_frame().T)
+
+                col1, col2, col3, col4, col5 = st.columns(5)
+                col1.metric("🚐 Vehicles", int((fleet["Vehicle No"] != vehicle_pnl.UNALLOCATED).sum()))
+                col2.metric("💰 Collection", f"₹{totals['Collection'].iloc[0]:,.0f}")
+                col3.metric("🧾 Total Cost", f"₹{totals['Total Cost'].iloc[0]:,.0f}")
+                col4.metric("📈 Net", f"₹{totals['Net'].iloc[0]:,.0f}")
+                col5.metric("🛣️ Cost per km", f"₹{totals['Cost per km'].iloc[0]:,.2f}")
+
+                st.markdown("---")
+
+                # ---------- Fleet table ----------
+                st.subheader(f"📋 By Vehicle ({start} to {end})")
+                st.dataframe(fleet.sort_values("Net").style.format(pnl_format, na_rep="–"),
+                             use_container_width=True, hide_index=True)
+
+                # ---------- Drill-down ----------
+                st.subheader("🔍 Vehicle by Month")
+                vehicle = st.selectbox("Vehicle", fleet["Vehicle No"].tolist(), key="pnl_vehicle")
+                monthly = cube[(cube["Vehicle No"] == vehicle) & cube["Month-Year"].between(start, end)]
+                st.line_chart(monthly.set_index("Month-Year")[["Collection", "Total Cost", "Net"]])
+                st.dataframe(monthly.drop(columns=["Vehicle No"]).style.format(pnl_format, na_rep="–"),
+                             use_container_width=True, hide_index=True)
+
+                csv_fleet = fleet.to_csv(index=False).encode("utf-8")
+                st.download_button("⬇️ Download Vehicle P&L", data=csv_fleet,
+                                   file_name=f"vehicle_pnl_{start}_{end}.csv", mime="text/csv")
+
+            render_vehicle_pnl(cube)
+
+            csv_cube = cube.to_csv(index=False).encode("utf-8")
+            st.download_button("⬇️ Download Vehicle x Month Cube", data=csv_cube, file_name="vehicle_pnl_cube.csv", mime="text/csv")
+
+
+
+    elif page == "Rent Targets":
+        st.title("🎯 Rent Targets")
+
+        # ---------- Configured targets ----------
+        targets = rent_targets.targets
+        if targets.is_flat:
+            st.info(f"Every vehicle uses the default target of ₹{targets.default:,.0f}/day. "
+                    f"Per-vehicle and dated overrides are read from `{rent_targets.RENT_TARGETS_PATH}` "
+                    "(columns: Vehicle No, Effective From, Daily Target; set VAYUVOLT_RENT_TARGETS to move it).")
+        else:
+            st.caption(f"Overrides from `{rent_targets.RENT_TARGETS_PATH}`; vehicles without one use ₹{targets.default:,.0f}/day. "
+                       f"A vehicle's own target wins over a fleet-wide ({rent_targets.ALL_VEHICLES}) one.")
+            st.dataframe(targets.rules.assign(**{"Effective From": targets.rules["Effective From"].dt.date}).style.format({
+                "Daily Target": "₹{:,.0f}",
+            }), use_container_width=True, hide_index=True)
 
         st.markdown("---")
-        col0, col1, col2 = st.columns(3)
-        col0.metric("Filtered Total Loss", f"{f_total_loss:,.0f}")
-        col1.metric("Filtered Driver Loss", f"{f_driver_loss:,.0f}")
-        col2.metric("Filtered Company Loss", f"{f_company_loss:,.0f}")
-
-    # ---------- Table ----------
-        st.subheader("📉 Loss Matrix (Filtered)")
-        if filtered_df_lm.empty:
-            st.info("No records in this period.")
+
+        units = get_loss_units(dataset_version(df), perf_df)
+
+        # Window and candidate grid; a change reruns only this fragment
+        @st.fragment
+        def render_what_if(units):
+            # ---------- What-if ----------
+            st.subheader("🧪 What-if: Flat Daily Target")
+            st.caption("Driver, company and total loss under the loss-matrix rules for every candidate target, "
+                       "evaluated together in one pass over the history.")
+            col1, col2, col3 = st.columns(3)
+            window = col1.selectbox("📅 Period", ["Current Month", "Last 3 Months", "Last 12 Months", "All Time"],
+                                    index=1, key="rent_window")
+            low, high = col2.slider("💰 Candidate Targets (₹/day)", min_value=50, max_value=1000,
+                                    value=(200, 400), step=10, key="rent_range")
+            step = col3.number_input("Step (₹)", min_value=1, max_value=100, value=10, key="rent_step")
+
+            today = pd.Timestamp.today().normalize()
+            start = {
+                "Current Month": today.replace(day=1),
+                "Last 3 Months": today - pd.DateOffset(months=3),
+                "Last 12 Months": today - pd.DateOffset(months=12),
+                "All Time": None,
+            }[window]
+            candidates = np.arange(low, high + step, step)
+            candidates = candidates[candidates <= high]
+            grid = rent_targets.what_if(units, candidates, start, today)
+
+            current = rent_targets.what_if(units, [targets.default], start, today).iloc[0]
+            best = grid.loc[grid["Total Loss"].abs().idxmin()]
+            col1, col2, col3 = st.columns(3)
+            col1.metric(f"📉 Total Loss at ₹{targets.default:,.0f}", f"₹{current['Total Loss']:,.0f}")
+            col2.metric("🏢 Company Share", f"₹{current['Company Loss']:,.0f}")
+            col3.metric("⚖️ Break-even Target", f"₹{best['Daily Target']:,.0f}",
+                        help="Candidate whose total loss is closest to zero")
+
+            st.line_chart(grid.set_index("Daily Target")[["Driver Loss", "Company Loss", "Total Loss"]])
+            st.dataframe(grid.style.format({
+                "Daily Target": "₹{:,.0f}",
+                "Rent Due": "₹{:,.0f}",
+                "Collected": "₹{:,.0f}",
+                "Driver Loss": "₹{:,.0f}",
+                "Company Loss": "₹{:,.0f}",
+                "Total Loss": "₹{:,.0f}",
+            }), use_container_width=True, hide_index=True)
+
+            csv_grid = grid.to_csv(index=False).encode("utf-8")
+            st.download_button("⬇️ Download What-if Grid", data=csv_grid, file_name="rent_target_what_if.csv", mime="text/csv")
+
+        render_what_if(units)
+
+
+
+    elif page == "Statements":
+        st.title("🧾 Monthly Statements")
+        st.caption("One page (PDF or PNG) and one CSV per vehicle and per driver for a month: daily collection, target, "
+                   "loss and distance, plus the month's expenses for vehicles. Also runs headless: "
+                   "`python statements.py --month YYYY-MM --data-dir DIR`.")
+
+        perf_df_lm = get_loss_matrix(dataset_version(df), rent_targets.targets.version, perf_df)
+        cube = get_vehicle_pnl(data_version(df, expense_df, bank_df), rent_targets.targets.version, df, expense_df, bank_df, perf_df_lm)
+
+        # Month and format pickers with the generated bundle; a change reruns only this fragment
+        @st.fragment
+        def render_statements(df, perf_df_lm, expense_df, cube):
+            months = sorted(m for m in df["Month-Year"].dropna().unique())
+            if not months:
+                st.info("No collection records yet.")
+                return
+            col1, col2, col3 = st.columns(3)
+            month = col1.selectbox("📅 Month", months[::-1], index=min(1, len(months) - 1), key="statement_month")
+            fmt = col2.radio("📄 Format", statements.FORMATS, horizontal=True, key="statement_format")
+            col3.metric("⚙️ Workers", statements.WORKERS)
+
+            version = data_version(df, expense_df)
+            jobs = get_statement_jobs(version, rent_targets.targets.version, month, df, perf_df_lm, expense_df, cube)
+            vehicles = sum(job["kind"] == "vehicle" for job in jobs)
+            st.caption(f"{vehicles} vehicle and {len(jobs) - vehicles} driver statements for {month}")
+
+            key = (version, month, fmt)
+            if st.button("🧾 Generate Statements", key="statement_generate"):
+                with st.spinner(f"Rendering {len(jobs)} statements ..."):
+                    st.session_state["statement_bundle"] = (key, *statements.generate(jobs, fmt))
+            saved = st.session_state.get("statement_bundle")
+            if saved is not None and saved[0] == key:
+                _, bundle, summary, seconds = saved
+                st.success(f"✅ {len(summary)} statements in {seconds:.1f}s ({len(bundle) / 2**20:,.1f} MB)")
+                st.download_button("⬇️ Download Statements (ZIP)", data=bundle, file_name=f"statements_{month}.zip",
+                                   mime="application/zip")
+                st.dataframe(summary.style.format({
+                    "Collection": "₹{:,.0f}", "Target": "₹{:,.0f}", "Loss": "₹{:,.0f}",
+                    "Expenses": "₹{:,.0f}", "Distance": "{:,.0f}",
+                }), use_container_width=True, hide_index=True)
+
+        render_statements(df, perf_df_lm, expense_df, cube)
+
+
+
+    elif page == "Reconciliation":
+        st.title("🧾 Bank Reconciliation")
+        st.caption("Each Collection_Credit deposit is matched to the run of its collector's collection days it covers.")
+
+        # Matching rules, collector filter and results; a change reruns only this fragment
+        @st.fragment
+        def render_reconciliation(df, bank_df):
+            # ---------- Matching rules ----------
+            col1, col2, col3 = st.columns([2, 1, 2])
+            window_days = col1.slider("📅 Deposit Window (days)", min_value=7, max_value=120,
+                                      value=reconcile.WINDOW_DAYS, key="recon_window")
+            tolerance = col2.number_input("± Tolerance (₹)", min_value=0, max_value=5000,
+                                          value=reconcile.TOLERANCE, step=50, key="recon_tolerance")
+
+            result = get_reconciliation(data_version(df, bank_df), window_days, int(tolerance), df, bank_df)
+            matches = result["matches"]
+            unmatched_deposits = result["unmatched_deposits"]
+            collections = result["collections"]
+
+            collectors = sorted(collections["Collector"].unique())
+            selected = col3.multiselect("👤 Collector", collectors, default=collectors, key="recon_collectors")
+            matches = matches[matches["Collector"].isin(selected)]
+            unmatched_deposits = unmatched_deposits[unmatched_deposits["Collector"].isin(selected)]
+            collections = collections[collections["Collector"].isin(selected)]
+
+            # ---------- Metrics ----------
+            n_deposits = len(matches) + len(unmatched_deposits)
+            col1, col2, col3, col4 = st.columns(4)
+            col1.metric("✅ Matched Deposits", f"{len(matches)} / {n_deposits}")
+            col2.metric("❓ Unmatched Deposits", f"₹{unmatched_deposits['Amount'].sum():,.0f}")
+            col3.metric("⚠️ Collections Never Deposited", f"₹{collections.loc[collections['Status'] == 'Unmatched', 'Amount'].sum():,.0f}")
+            col4.metric("💼 Not Yet Deposited", f"₹{collections.loc[collections['Status'] == 'Not yet deposited', 'Amount'].sum():,.0f}")
+
+            st.subheader("👥 By Collector")
+            st.dataframe(reconcile.summary({"matches": matches, "unmatched_deposits": unmatched_deposits,
+                                            "collections": collections}).style.format({
+                "Deposited": "₹{:,.0f}", "Unmatched": "₹{:,.0f}", "Not yet deposited": "₹{:,.0f}",
+                "Matched Deposits": "{:,.0f}", "Matched Amount": "₹{:,.0f}",
+                "Unmatched Deposits": "{:,.0f}", "Unmatched Deposit Amount": "₹{:,.0f}",
+            }), use_container_width=True, hide_index=True)
+
+            st.markdown("---")
+
+            # ---------- Exceptions ----------
+            st.subheader("❓ Unmatched Deposits")
+            if unmatched_deposits.empty:
+                st.success("Every deposit matched a collection batch.")
+            else:
+                st.dataframe(unmatched_deposits.sort_values("Date", ascending=False).style.format({
+                    "Date": "{:%d %b %Y}", "Amount": "₹{:,.0f}",
+                }), use_container_width=True, hide_index=True)
+
+            st.subheader("⚠️ Collection Days Without a Deposit")
+            open_days = collections[collections["Status"] != "Deposited"]
+            if open_days.empty:
+                st.success("Every collection day is covered by a deposit.")
+            else:
+                st.dataframe(open_days.drop(columns=["Deposit Date"]).sort_values("Date", ascending=False).style.format({
+                    "Date": "{:%d %b %Y}", "Amount": "₹{:,.0f}",
+                }), use_container_width=True, hide_index=True)
+
+            # ---------- Matched deposits with drill-down ----------
+            st.subheader("🔗 Matched Deposits")
+            if matches.empty:
+                st.info("No matched deposits for this selection.")
+            else:
+                matches = matches.sort_values("Deposit Date", ascending=False).reset_index(drop=True)
+                st.dataframe(matches.style.format({
+                    "Deposit Date": "{:%d %b %Y}", "Batch From": "{:%d %b %Y}", "Batch To": "{:%d %b %Y}",
+                    "Deposit Amount": "₹{:,.0f}", "Collected Amount": "₹{:,.0f}", "Difference": "₹{:,.0f}",
+                }), use_container_width=True, hide_index=True)
+
+                labels = [
+                    f"{row['Collector']} · {row['Deposit Date']:%d %b %Y} · ₹{row['Deposit Amount']:,.0f}"
+                    for _, row in matches.iterrows()
+                ]
+                pick = st.selectbox("🔍 Show Collections Behind Deposit", range(len(labels)),
+                                    format_func=lambda i: labels[i], key="recon_drill")
+                chosen = matches.iloc[pick]
+                rows = df[
+                    (df["Received By"] == chosen["Collector"])
+                    & (pd.to_datetime(df["Collection Date"]).dt.normalize().between(chosen["Batch From"], chosen["Batch To"]))
+                    & (df["Amount"] > 0)
+                ]
+                st.dataframe(rows.sort_values("Collection Date"), use_container_width=True, hide_index=True)
+
+                csv_matches = matches.to_csv(index=False).encode("utf-8")
+                st.download_button("⬇️ Download Matched Deposits", data=csv_matches, file_name="reconciliation.csv", mime="text/csv")
+
+        render_reconciliation(df, bank_df)
+
+
+
+    elif page == "Data Quality":
+        st.title("🩺 Data Quality")
+        st.caption("Rows the loaders coerce, drop or overwrite, found by checks run after every load.")
+
+        report = get_quality_report(data_version(*frames.values()), frames)
+        issues = report.issues
+        counts = report.counts()
+
+        # ---------- Metrics ----------
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("📄 Rows Checked", f"{sum(report.rows.values()):,}")
+        col2.metric("⚠️ Issues", f"{len(issues):,}")
+        col3.metric("🧾 Rows With Issues", f"{len(issues[['Sheet', 'Sheet Row']].drop_duplicates()):,}")
+        refresh = report.last_refresh
+        col4.metric("🔄 Last Validation", f"{refresh['mode']}", f"{refresh['rows']:,} rows in {refresh['seconds']:.2f}s", delta_color="off")
+
+        if issues.empty:
+            st.success("No issues found in any sheet.")
         else:
-            st.dataframe(
-                filtered_df_lm.sort_values(by="Collection Date", ascending=False),
-                use_container_width=True
-            )
+            st.subheader("📋 Issues by Sheet and Check")
+            st.dataframe(counts.pivot_table(index="Check", columns="Sheet", values="Issues", aggfunc="sum", fill_value=0),
+                         use_container_width=True)
+
+            # Check filter, drill-down and export; a change reruns only this fragment
+            @st.fragment
+            def render_quality_issues(issues, counts, frames):
+                st.subheader("🔍 Drill Down")
+                col1, col2 = st.columns(2)
+                sheets = [s for s in data_quality.SHEETS if s in set(issues["Sheet"])]
+                sheet = col1.selectbox("📄 Sheet", sheets, key="dq_sheet")
+                checks = counts.loc[counts["Sheet"] == sheet, "Check"].tolist()
+                check = col2.selectbox("✅ Check", ["All"] + checks, key="dq_check")
+
+                selected = issues[issues["Sheet"] == sheet]
+                if check != "All":
+                    selected = selected[selected["Check"] == check]
+                st.dataframe(selected, use_container_width=True, hide_index=True)
+
+                # The flagged rows as loaded (loaders keep the sheet's row order as the index)
+                rows = frames[sheet]
+                rows = rows.loc[rows.index.intersection(selected["Sheet Row"].unique() - 2)]
+                st.caption(f"{len(rows):,} affected rows in the {sheet} sheet")
+                st.dataframe(rows.assign(**{"Sheet Row": rows.index + 2}).sort_values("Sheet Row"),
+                             use_container_width=True, hide_index=True)
+
+                csv_issues = issues.to_csv(index=False).encode("utf-8")
+                st.download_button("⬇️ Download All Issues", data=csv_issues, file_name="data_quality.csv", mime="text/csv")
+
+            render_quality_issues(issues, counts, frames)
+
+
+
+    elif page == "Change Log":
+        st.title("🧾 Change Log")
+        st.caption("Rows inserted, edited or deleted in the sheets, found by comparing each load with the one before. "
+                   "Closed months are frozen (see the startup report), so only edits to recent months can be seen.")
+
+        changes = get_changes(data_version(*frames.values()), frames)
+        log = change_log.tracker.log
+
+        # ---------- Last load ----------
+        st.subheader("🔄 Last Load")
+        latest = pd.DataFrame([
+            {"Sheet": name, **(sheet_changes.counts if sheet_changes is not None else {}),
+             "Months": ", ".join(sorted(m for m in sheet_changes.months if m)) if sheet_changes is not None else "",
+             "Vehicles": ", ".join(sorted(sheet_changes.vehicles)) if sheet_changes is not None else "",
+             "Status": "baseline" if sheet_changes is None else ("changed" if len(sheet_changes) else "unchanged")}
+            for name, sheet_changes in changes.items()
+        ], columns=["Sheet", change_log.INSERTED, change_log.UPDATED, change_log.DELETED, "Months", "Vehicles", "Status"])
+        st.dataframe(latest, use_container_width=True, hide_index=True)
+        kpi_refresh = get_kpis(data_version(*frames.values()), rent_targets.targets.version, frames).last_refresh
+        st.caption(f"KPI totals: {kpi_refresh['mode']} refresh over {kpi_refresh['rows']:,} rows in {kpi_refresh['seconds']:.2f}s")
+
+        if log.empty:
+            st.info("No changes recorded yet. The first load of each sheet is the baseline.")
+        else:
+            # Filters, history and export; a change reruns only this fragment
+            @st.fragment
+            def render_change_history(log):
+                st.subheader("📜 History")
+                col1, col2, col3 = st.columns(3)
+                sheets = col1.multiselect("📄 Sheet", list(data_quality.SHEETS), default=list(data_quality.SHEETS), key="change_sheets")
+                kinds = col2.multiselect("✏️ Change", [change_log.INSERTED, change_log.UPDATED, change_log.DELETED],
+                                         default=[change_log.UPDATED, change_log.DELETED], key="change_kinds")
+                vehicle = col3.selectbox("🚐 Vehicle", ["All"] + sorted(v for v in log["Vehicle No"].unique() if v),
+                                         key="change_vehicle")
+
+                selected = log[log["Sheet"].isin(sheets) & log["Change"].isin(kinds)]
+                if vehicle != "All":
+                    selected = selected[selected["Vehicle No"] == vehicle]
+
+                col1, col2, col3 = st.columns(3)
+                col1.metric("➕ Inserted", f"{(selected['Change'] == change_log.INSERTED).sum():,}")
+                col2.metric("✏️ Updated", f"{(selected['Change'] == change_log.UPDATED).sum():,}")
+                col3.metric("🗑️ Deleted", f"{(selected['Change'] == change_log.DELETED).sum():,}")
+                st.dataframe(selected.sort_values("Detected At", ascending=False, kind="stable"),
+                             use_container_width=True, hide_index=True)
+
+                csv_log = log.to_csv(index=False).encode("utf-8")
+                st.download_button("⬇️ Download Change Log", data=csv_log, file_name="change_log.csv", mime="text/csv")
+
+            render_change_history(log)
+
+
+
+    elif page == "SQL Query" and is_admin:
+        st.title("🧮 SQL Query")
+        st.caption("Read-only SQL over a local copy of the collection, expense, investment and bank sheets (SQLite). "
+                   f"Results stop at {sql_store.MAX_QUERY_ROWS:,} rows; queries stop after {sql_store.QUERY_TIMEOUT:g}s.")
+
+        # Query editor and results; running a query reruns only this fragment
+        @st.fragment
+        def render_sql_query():
+            example = st.selectbox("📚 Example Queries", ["Custom"] + list(sql_store.EXAMPLE_QUERIES), key="sql_example")
+            default_sql = sql_store.EXAMPLE_QUERIES.get(example, "SELECT * FROM collection ORDER BY collection_date DESC LIMIT 100").strip()
+            sql = st.text_area("SQL", value=default_sql, height=240, key=f"sql_text_{example}")
+
+            with st.expander("🗂️ Tables and Columns"):
+                for table, columns in sql_store.schema().items():
+                    st.markdown(f"**{table}**: " + ", ".join(columns))
+
+            if st.button("▶️ Run Query"):
+                try:
+                    query_start = perf_counter()
+                    result = sql_store.run_query(sql, limit=sql_store.MAX_QUERY_ROWS, timeout=sql_store.QUERY_TIMEOUT)
+                    query_time = perf_counter() - query_start
+                except Exception as e:
+                    st.error(f"❌ Query failed: {e}")
+                else:
+                    st.caption(f"{len(result):,} rows in {query_time * 1000:,.0f} ms"
+                               + (" (first rows only; add a LIMIT or aggregate)" if result.attrs["truncated"] else ""))
+                    st.dataframe(result, use_container_width=True)
+                    st.download_button("⬇️ Download Result (CSV)", data=result.to_csv(index=False).encode("utf-8"),
+                                       file_name="query_result.csv", mime="text/csv")
 
+        render_sql_query()
 
-    
-    # 🔁 Refresh button
-    if st.sidebar.button("🔁 Refresh"):
-        st.cache_resource.clear()
-        st.experimental_rerun()
+
+
+    render_sidebar_footer()
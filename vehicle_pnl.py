@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+
+import rent_targets
+from search_index import tokenize
+
+
+# Costs that name no fleet vehicle (company-wide expenses, bank debits whose
+# reason mentions none) are kept under this row, so the cube adds up to the
+# sheet totals
+UNALLOCATED = "Unallocated"
+
+MEASURES = ["Days", "Collection", "Target", "Loss vs Target", "Expenses", "Bank Expense Debits", "Distance"]
+CUBE_COLUMNS = ["Vehicle No", "Month-Year"] + MEASURES + ["Total Cost", "Net", "Revenue per km", "Cost per km"]
+
+
+# ---------- Bank debits by vehicle ----------
+# The bank sheet has no vehicle column; an Expence_Debit is booked to a
+# vehicle when its reason names one, in full ("BR01LT0029") or by its number
+# as written ("0029"), and the number belongs to a single vehicle
+def bank_debit_vehicles(bank_df, vehicles):
+    debits = bank_df[bank_df["Transaction Type"].astype(str).str.strip() == "Expence_Debit"]
+    vehicles = pd.Series(sorted(set(vehicles) - {UNALLOCATED}), dtype="str")
+    numbers = vehicles.str.extract(r"(\d{4,})$")[0]
+    unique_numbers = numbers[~numbers.duplicated(keep=False) & numbers.notna()]
+    lookup = pd.concat([
+        pd.Series(vehicles.to_numpy(), index=vehicles.str.lower()),
+        pd.Series(vehicles[unique_numbers.index].to_numpy(), index=unique_numbers.to_numpy()),
+    ])
+    lookup = lookup[~lookup.index.duplicated()]
+
+    tokens = tokenize(debits["Reason"].reset_index(drop=True))
+    named = tokens.map(lookup).dropna()
+    first = named[~named.index.duplicated()]  # the first vehicle a reason names
+    vehicle = pd.Series(UNALLOCATED, index=range(len(debits)), dtype="str")
+    vehicle[first.index] = first.to_numpy()
+    return debits, vehicle.to_numpy()
+
+
+# ---------- Cube ----------
+# Vehicle x month profit and loss in one pass: each sheet contributes its
+# measure columns (zero elsewhere) to one long frame, summed by (vehicle,
+# month) with a single groupby. `loss_df` is the loss matrix over the same
+# collection rows (amount below the daily target, per vehicle-day).
+def build_pnl_cube(collection_df, expense_df, bank_df, loss_df=None, targets=None):
+    targets = targets or rent_targets.targets
+    parts = []
+    if collection_df is not None and not collection_df.empty:
+        parts.append(pd.DataFrame({
+            "Vehicle No": collection_df["Vehicle No"],
+            "Month-Year": collection_df["Month-Year"],
+            "Days": 1,
+            "Collection": pd.to_numeric(collection_df["Amount"], errors="coerce"),
+            "Target": targets.lookup(collection_df["Vehicle No"], collection_df["Collection Date"]),
+            "Distance": pd.to_numeric(collection_df["Distance"], errors="coerce"),
+        }))
+    if loss_df is not None and not loss_df.empty:
+        parts.append(pd.DataFrame({
+            "Vehicle No": loss_df["Vehicle No"],
+            "Month-Year": loss_df["Month-Year"],
+            "Loss vs Target": pd.to_numeric(loss_df["Amount"], errors="coerce"),
+        }))
+    if expense_df is not None and not expense_df.empty:
+        parts.append(pd.DataFrame({
+            "Vehicle No": expense_df["Vehicle No"],
+            "Month-Year": expense_df["Month-Year"],
+            "Expenses": pd.to_numeric(expense_df["Amount Used"], errors="coerce"),
+        }))
+    if bank_df is not None and not bank_df.empty and parts:
+        fleet = pd.concat([p["Vehicle No"] for p in parts]).dropna().astype(str).str.strip().unique()
+        debits, vehicle = bank_debit_vehicles(bank_df, fleet)
+        parts.append(pd.DataFrame({
+            "Vehicle No": vehicle,
+            "Month-Year": debits["Month-Year"].to_numpy(),
+            "Bank Expense Debits": pd.to_numeric(debits["Amount"], errors="coerce").to_numpy(),
+        }))
+    if not parts:
+        return pd.DataFrame(columns=CUBE_COLUMNS)
+
+    long = pd.concat(parts, ignore_index=True)
+    long["Vehicle No"] = long["Vehicle No"].astype("str").str.strip().replace("", np.nan).fillna(UNALLOCATED)
+    long = long.dropna(subset=["Month-Year"])
+    long[MEASURES] = long.reindex(columns=MEASURES).fillna(0)
+    cube = long.groupby(["Vehicle No", "Month-Year"], sort=True)[MEASURES].sum().reset_index()
+    cube["Days"] = cube["Days"].astype("int64")
+    return add_ratios(cube)
+
+
+# Derived columns; also applied after rolling months up, since ratios do not add
+def add_ratios(cube):
+    cube = cube.copy()
+    cube["Total Cost"] = cube["Expenses"] + cube["Bank Expense Debits"]
+    cube["Net"] = cube["Collection"] - cube["Total Cost"]
+    distance = cube["Distance"].where(cube["Distance"] > 0)
+    cube["Revenue per km"] = cube["Collection"] / distance
+    cube["Cost per km"] = cube["Total Cost"] / distance
+    return cube
+
+
+# One row per vehicle over the months in [start, end] ("YYYY-MM", inclusive)
+def by_vehicle(cube, start=None, end=None):
+    months = cube["Month-Year"]
+    mask = np.ones(len(cube), dtype=bool)
+    if start:
+        mask &= (months >= start).to_numpy()
+    if end:
+        mask &= (months <= end).to_numpy()
+    rolled = cube[mask].groupby("Vehicle No", sort=True)[MEASURES].sum().reset_index()
+    return add_ratios(rolled)
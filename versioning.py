@@ -0,0 +1,57 @@
+import hashlib
+import threading
+
+import pandas as pd
+
+
+# Content fingerprint of a loaded frame. Derived caches (chart rollups, indexes,
+# analytics) are keyed on it, so they are rebuilt only when the sheet data
+# actually changes and not on every refresh or rerun.
+def frame_version(df):
+    if df is None or df.empty:
+        return "empty"
+    row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    digest = hashlib.blake2b(row_hashes.tobytes(), digest_size=8)
+    digest.update("|".join(map(str, df.columns)).encode())
+    return digest.hexdigest()
+
+
+# One 64-bit hash per row, for telling new rows from already-seen ones.
+# Repeats of an identical row are numbered so each copy gets its own hash
+# (the first copy keeps the plain row hash).
+def row_hashes(df):
+    hashes = pd.util.hash_pandas_object(df, index=False)
+    occurrence = hashes.groupby(hashes.to_numpy()).cumcount().to_numpy()
+    result = hashes.to_numpy().copy()
+    repeats = occurrence > 0
+    if repeats.any():
+        keyed = pd.DataFrame({"hash": result[repeats], "n": occurrence[repeats]})
+        result[repeats] = pd.util.hash_pandas_object(keyed, index=False).to_numpy()
+    return result
+
+
+# Version recorded on a frame by its loader (falls back to hashing it now)
+def dataset_version(df):
+    return df.attrs.get("version") or frame_version(df)
+
+
+# Combined version of several datasets, for artifacts derived from more than one sheet
+def data_version(*frames):
+    return "-".join(dataset_version(f) for f in frames)
+
+
+# ---------- Incremental state ----------
+# The newest state of an artifact maintained across data versions (KPI totals,
+# quality report, presence index). It lives at module level rather than in the
+# app's cache, so a Refresh that clears the cache still leaves the next load a
+# delta to apply. `advance` swaps in fn(state) under a lock: concurrent
+# sessions loading the same version apply it once, one after the other.
+class Latest:
+    def __init__(self, initial):
+        self.value = initial
+        self._lock = threading.Lock()
+
+    def advance(self, fn):
+        with self._lock:
+            self.value = fn(self.value)
+            return self.value
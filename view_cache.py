@@ -0,0 +1,149 @@
+import os
+import sys
+import threading
+import types
+from collections import OrderedDict, defaultdict
+
+import numpy as np
+import pandas as pd
+
+
+# Memory budget for cached views, shared by every session of the process
+MAX_BYTES = int(float(os.environ.get("VAYUVOLT_VIEW_CACHE_MB", "256")) * 2**20)
+
+# A single view larger than this share of the budget is computed but not kept
+MAX_ENTRY_FRACTION = 0.25
+
+# Superseded dataset versions remembered per page, so a late result for one
+# is not cached
+MAX_RETIRED_VERSIONS = 16
+
+
+# Approximate memory held by a cached value: frames, arrays, strings,
+# containers of them and the attributes of objects built from them (indexes,
+# cubes). Objects reached twice are counted once; `seen` carries the ids
+# already counted (or to leave out, such as frames another entry holds).
+def size_of(value, seen=None):
+    seen = set() if seen is None else seen
+    if id(value) in seen or isinstance(value, _OPAQUE):
+        return 0
+    seen.add(id(value))
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, (pd.Series, pd.Index)):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        held = int(value.nbytes)
+        if value.dtype == object:
+            held += sum(size_of(v, seen) for v in value.ravel())
+        return held
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(size_of(k, seen) + size_of(v, seen) for k, v in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + sum(size_of(v, seen) for v in value)
+    if hasattr(value, "__dict__"):
+        return sys.getsizeof(value) + size_of(vars(value), seen)
+    return sys.getsizeof(value)
+
+
+# Shared machinery that a cached value points to but does not own
+_OPAQUE = (type, types.ModuleType, types.FunctionType, types.MethodType, types.BuiltinFunctionType,
+           threading.Thread, type(threading.Lock()), type(threading.RLock()))
+
+
+# ---------- View cache ----------
+# Least-recently-used cache of filtered and aggregated page views, keyed by
+# (page, dataset version, filter tuple) and bounded by the memory the views
+# hold rather than by their count. One instance serves all sessions, so a
+# filter combination computed for one user is instant for the next. A new
+# dataset version of a page drops that page's older views, and a version
+# once superseded is never cached again: a slow compute for the old data (or
+# a session still holding it) that finishes after the new version's first
+# view is returned to its caller but not kept. Views are shared: callers
+# must not modify what they get back.
+class ViewCache:
+    def __init__(self, max_bytes=MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (view, bytes)
+        self._versions = {}  # page -> dataset version of its cached views
+        self._retired = defaultdict(OrderedDict)  # page -> versions it has moved past
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._page_counts = defaultdict(lambda: [0, 0])  # page -> [hits, misses]
+
+    # Cached view for this key, or the result of `compute()` (cached if it fits).
+    # Two sessions missing on the same key at once both compute it.
+    def get_or_compute(self, page, version, filters, compute):
+        key = (page, version, tuple(filters))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                self._page_counts[page][0] += 1
+                return entry[0]
+            self.misses += 1
+            self._page_counts[page][1] += 1
+
+        view = compute()
+        size = size_of(view)
+
+        with self._lock:
+            if version in self._retired[page]:
+                return view
+            current = self._versions.get(page)
+            if current != version:
+                self._drop_page(page)
+                if current is not None:
+                    retired = self._retired[page]
+                    retired[current] = True
+                    while len(retired) > MAX_RETIRED_VERSIONS:
+                        retired.popitem(last=False)
+                self._versions[page] = version
+            if size <= self.max_bytes * MAX_ENTRY_FRACTION and key not in self._entries:
+                self._entries[key] = (view, size)
+                self.bytes += size
+                while self.bytes > self.max_bytes:
+                    _, (_, evicted) = self._entries.popitem(last=False)
+                    self.bytes -= evicted
+                    self.evictions += 1
+        return view
+
+    def _drop_page(self, page):
+        for key in [k for k in self._entries if k[0] == page]:
+            self.bytes -= self._entries.pop(key)[1]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()  # superseded versions stay retired
+            self.bytes = 0
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    # Hits, misses and memory per page, for the startup report
+    def stats(self):
+        with self._lock:
+            views = defaultdict(int)
+            held = defaultdict(int)
+            for (page, _, _), (_, size) in self._entries.items():
+                views[page] += 1
+                held[page] += size
+            rows = [
+                {"Page": page, "Views": views[page], "MB": held[page] / 2**20,
+                 "Hits": hits, "Misses": misses, "Hit Rate (%)": hits / (hits + misses) * 100}
+                for page, (hits, misses) in self._page_counts.items()
+            ]
+        return pd.DataFrame(rows, columns=["Page", "Views", "MB", "Hits", "Misses", "Hit Rate (%)"])
+
+
+views = ViewCache()